@@ -1,15 +1,15 @@
 import csv
 import json
 
+from node_details_store import open_node_details
+
 # Đường dẫn file
 csv_path = 'graph_out/nodes_unified.csv'
 json_path = 'graph_out/node_details.json'
 out_path = 'graph_out/nodes_unified_with_properties.csv'
 
-# Đọc node details
-with open(json_path, 'r', encoding='utf-8') as f:
-    details = json.load(f)
-    details_map = {node['title']: node.get('properties', {}) for node in details}
+# Node details: tra theo title (seek trong node_details.ndjson nếu có, không nạp cả file)
+details = open_node_details(json_path)
 
 # Đọc CSV, thêm cột properties
 with open(csv_path, 'r', encoding='utf-8') as f:
@@ -18,7 +18,7 @@ with open(csv_path, 'r', encoding='utf-8') as f:
 
 for row in rows:
     title = row['title']
-    props = details_map.get(title, {})
+    props = (details.get(title) or {}).get('properties', {})
     row['properties'] = json.dumps(props, ensure_ascii=False)
 
 # Ghi ra file mới
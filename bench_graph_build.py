@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+bench_graph_build.py — Đo thời gian dựng KnowledgeGraph từ CSV (chatbot/1_knowledge_graph.py):
+bản hiện tại (hoặc --rev) so với một phiên bản cũ trong git (--baseline-rev, bắt buộc),
+trên đồ thị đang có và trên bản sao tổng hợp gấp --scale lần.
+
+- Bản sao tổng hợp: mỗi nút / cạnh / thành viên nhóm lặp --scale lần, id thêm hậu tố " #k" (k ≥ 1)
+  → cùng phân bố bậc và loại cạnh, kích thước gấp --scale lần
+- Mỗi lần đo chạy trong process riêng (import sạch), không dùng snapshot / cache khởi động;
+  in trung vị của --repeat lần cùng số nút / cạnh để đối chiếu 2 bản
+- Bản cũ (và --rev) được giải nén bằng `git archive <rev>` vào thư mục tạm
+- Bản hiện tại có thể dựng thêm các chỉ mục mà bản cũ chưa có (theo quan hệ, tìm kiếm); để so riêng 1 thay đổi,
+  chọn --baseline-rev / --rev là 2 commit liền nhau
+
+Ví dụ:
+  py bench_graph_build.py --baseline-rev 0764982
+  py bench_graph_build.py --baseline-rev 0764982 --scale 10 --repeat 5
+  py bench_graph_build.py --baseline-rev "" --scale 1
+  py bench_graph_build.py --baseline-rev HEAD~3 --nodes graph_out/nodes_unified.csv --edges graph_out/edges_unified.csv
+"""
+import os, sys, csv, io, json, shutil, argparse, statistics, subprocess, tempfile, zipfile
+
+from clique_groups import groups_path
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+csv.field_size_limit(min(sys.maxsize, 2 ** 31 - 1))
+
+# Chạy trong process con: argv = [thư mục mã nguồn, nodes, edges]
+_CHILD = r"""
+import os, sys, json, time, inspect, importlib
+root = sys.argv[1]
+sys.path[:0] = [os.path.join(root, 'chatbot'), root]
+KG = importlib.import_module('1_knowledge_graph').KnowledgeGraph
+params = inspect.signature(KG).parameters  # bản cũ: KnowledgeGraph(nodes_file, edges_file)
+kw = {}
+if 'snapshot_dir' in params:
+    kw['snapshot_dir'] = os.path.join(os.path.dirname(sys.argv[2]), '_no_snapshot')
+if 'cache_dir' in params:
+    kw['cache_dir'] = ''
+t0 = time.perf_counter()
+kg = KG(sys.argv[2], sys.argv[3], **kw)
+dt = time.perf_counter() - t0
+print('BENCH ' + json.dumps({'seconds': dt, 'nodes': kg.G.number_of_nodes(), 'edges': kg.G.number_of_edges()}))
+"""
+
+def _suffix(value, k):
+    return value if k == 0 or not value else f"{value} #{k}"
+
+def _scale_csv(src, dst, scale, id_cols):
+    with open(src, "r", encoding="utf-8", newline="") as fi, open(dst, "w", encoding="utf-8", newline="") as fo:
+        rdr = csv.DictReader(fi)
+        w = csv.DictWriter(fo, fieldnames=rdr.fieldnames)
+        w.writeheader()
+        rows = list(rdr)
+        for k in range(scale):
+            for r in rows:
+                w.writerow({c: (_suffix(v, k) if c in id_cols else v) for c, v in r.items()})
+        return len(rows) * scale
+
+def prepare_inputs(nodes, edges, out_dir, scale=1):
+    """Chép (scale=1) hoặc nhân bản (scale>1) nodes / edges / groups_*.csv vào out_dir → (nodes, edges)"""
+    os.makedirs(out_dir, exist_ok=True)
+    pairs = [(nodes, ("id", "title")), (edges, ("from", "to"))]
+    if os.path.exists(groups_path(edges)):
+        pairs.append((groups_path(edges), ("group", "member")))
+    for src, id_cols in pairs:
+        dst = os.path.join(out_dir, os.path.basename(src))
+        if scale == 1:
+            shutil.copyfile(src, dst)
+        else:
+            _scale_csv(src, dst, scale, id_cols)
+    return os.path.join(out_dir, os.path.basename(nodes)), os.path.join(out_dir, os.path.basename(edges))
+
+def export_revision(rev, out_dir):
+    """Giải nén cây mã nguồn ở commit rev vào out_dir"""
+    data = subprocess.run(["git", "archive", "--format=zip", rev], cwd=HERE, check=True,
+                          stdout=subprocess.PIPE).stdout
+    zipfile.ZipFile(io.BytesIO(data)).extractall(out_dir)
+    return out_dir
+
+def time_build(code_dir, nodes, edges):
+    out = subprocess.run([sys.executable, "-c", _CHILD, code_dir, nodes, edges], check=True,
+                         stdout=subprocess.PIPE, stderr=subprocess.STDOUT, encoding="utf-8", errors="replace").stdout
+    line = next(l for l in reversed(out.splitlines()) if l.startswith("BENCH "))
+    return json.loads(line[len("BENCH "):])
+
+def bench(label, versions, nodes, edges, repeat):
+    print(f"\n== {label}: {nodes}")
+    results = {}
+    for name, code_dir in versions:
+        runs = [time_build(code_dir, nodes, edges) for _ in range(repeat)]
+        results[name] = runs[-1]
+        med = statistics.median(r["seconds"] for r in runs)
+        print(f"  {name:<9} {med:7.2f}s  (trung vị {repeat} lần) | nút={runs[-1]['nodes']} cạnh={runs[-1]['edges']}")
+    if len(results) == 2:
+        old, new = results.values()
+        same = (old["nodes"], old["edges"]) == (new["nodes"], new["edges"])
+        print(f"  số nút / cạnh {'khớp' if same else 'KHÁC NHAU'} giữa 2 bản")
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark dựng KnowledgeGraph từ CSV: bản hiện tại vs bản cũ.")
+    ap.add_argument("--nodes", default="graph_out/nodes_unified.csv")
+    ap.add_argument("--edges", default="graph_out/edges_unified.csv")
+    ap.add_argument("--scale", type=int, default=10, help="Hệ số nhân bản cho đồ thị tổng hợp (≤1 = bỏ qua)")
+    ap.add_argument("--repeat", type=int, default=3, help="Số lần đo mỗi cấu hình")
+    ap.add_argument("--baseline-rev", required=True,
+                    help="Commit git của bản cũ ('' = chỉ đo bản mới)")
+    ap.add_argument("--rev", default="", help="Commit git của bản mới ('' = cây mã hiện tại)")
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench_graph_build_")
+    try:
+        versions = []
+        if args.baseline_rev:
+            versions.append(("cũ", export_revision(args.baseline_rev, os.path.join(tmp, "baseline"))))
+            print(f"[i] Bản cũ: {args.baseline_rev}")
+        if args.rev:
+            versions.append(("mới", export_revision(args.rev, os.path.join(tmp, "rev"))))
+            print(f"[i] Bản mới: {args.rev}")
+        else:
+            versions.append(("hiện tại", HERE))
+
+        nodes, edges = prepare_inputs(args.nodes, args.edges, os.path.join(tmp, "x1"))
+        bench("Đồ thị hiện có", versions, nodes, edges, args.repeat)
+        if args.scale > 1:
+            nodes, edges = prepare_inputs(args.nodes, args.edges, os.path.join(tmp, f"x{args.scale}"), args.scale)
+            bench(f"Đồ thị tổng hợp x{args.scale}", versions, nodes, edges, args.repeat)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+bench_wikitext_vs_html.py — So sánh đường HTML (BeautifulSoup) và WIKITEXT (mwparserfromhell)
+trên CÙNG một tập trang:
+- kích thước payload tải về
+- thời gian tải (1 lần / trang) và thời gian parse + trích xuất (lặp --repeat lần)
+- mức độ khớp của extract_person_education giữa 2 đường
+
+Ví dụ:
+  py bench_wikitext_vs_html.py --title "Barack Obama" --title "Bill Gates"
+  py bench_wikitext_vs_html.py --titles-csv graph_out/nodes_persons.csv --limit 50
+"""
+import argparse, csv, time
+
+from utils_wiki import (
+    fetch_parse_html, soup_from_html, is_person_page,
+    extract_person_education, extract_page_links, normalize
+)
+from utils_wikitext import (
+    fetch_parse_wikitext, code_from_wikitext, is_person_wikitext,
+    extract_person_education_wikitext, extract_page_links_wikitext
+)
+
+def load_titles(path, limit=None):
+    out = []
+    with open(path, "r", encoding="utf-8") as f:
+        rdr = csv.DictReader(f)
+        col = "title" if "title" in rdr.fieldnames else rdr.fieldnames[0]
+        for r in rdr:
+            t = (r.get(col) or "").strip()
+            if t: out.append(t)
+            if limit and len(out) >= limit: break
+    return out
+
+def run_html(html):
+    soup = soup_from_html(html)
+    return is_person_page(soup), extract_person_education(soup), extract_page_links(soup)
+
+def run_wikitext(wt):
+    code = code_from_wikitext(wt)
+    return is_person_wikitext(code), extract_person_education_wikitext(code), extract_page_links_wikitext(code)
+
+def edu_key(edu):
+    return {(normalize(u), y) for u, y in edu}
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark HTML vs WIKITEXT extractor trên cùng các trang.")
+    ap.add_argument("--title", action="append", default=[], help="Tiêu đề trang; có thể truyền nhiều lần")
+    ap.add_argument("--titles-csv", default=None, help="CSV có cột title (vd. nodes_persons.csv)")
+    ap.add_argument("--limit", type=int, default=20)
+    ap.add_argument("--repeat", type=int, default=3, help="Số lần lặp phần parse để đo ổn định")
+    ap.add_argument("--sleep", type=float, default=0.05)
+    args = ap.parse_args()
+
+    titles = list(args.title)
+    if args.titles_csv:
+        titles += load_titles(args.titles_csv, limit=args.limit)
+    titles = titles[:args.limit] if args.limit else titles
+    if not titles:
+        raise SystemExit("Cần --title hoặc --titles-csv")
+
+    pages = []
+    t_fetch_html = t_fetch_wt = 0.0
+    for t in titles:
+        try:
+            t0 = time.perf_counter(); html, _ = fetch_parse_html(t, sleep=0); t_fetch_html += time.perf_counter() - t0
+            t0 = time.perf_counter(); wt, _ = fetch_parse_wikitext(t, sleep=0); t_fetch_wt += time.perf_counter() - t0
+            time.sleep(args.sleep)
+        except Exception as e:
+            print(f"  ⚠️ {t}: {e}")
+            continue
+        if html and wt:
+            pages.append((t, html, wt))
+
+    if not pages:
+        raise SystemExit("Không tải được trang nào.")
+
+    bytes_html = sum(len(h.encode("utf-8")) for _, h, _ in pages)
+    bytes_wt = sum(len(w.encode("utf-8")) for _, _, w in pages)
+
+    t0 = time.perf_counter()
+    for _ in range(args.repeat):
+        res_html = [run_html(h) for _, h, _ in pages]
+    t_parse_html = (time.perf_counter() - t0) / args.repeat
+
+    t0 = time.perf_counter()
+    for _ in range(args.repeat):
+        res_wt = [run_wikitext(w) for _, _, w in pages]
+    t_parse_wt = (time.perf_counter() - t0) / args.repeat
+
+    same_person = same_edu = 0
+    for (t, _, _), (p1, e1, _), (p2, e2, _) in zip(pages, res_html, res_wt):
+        same_person += int(p1 == p2)
+        if edu_key(e1) == edu_key(e2):
+            same_edu += 1
+        else:
+            print(f"  ≠ {t}: html={sorted(edu_key(e1), key=str)} | wikitext={sorted(edu_key(e2), key=str)}")
+
+    n = len(pages)
+    print("\n===== KẾT QUẢ =====")
+    print(f"Trang               : {n}")
+    print(f"Payload HTML        : {bytes_html/1024:.1f} KB | WIKITEXT: {bytes_wt/1024:.1f} KB "
+          f"(x{bytes_html/max(1, bytes_wt):.1f})")
+    print(f"Tải HTML            : {t_fetch_html:.2f}s | WIKITEXT: {t_fetch_wt:.2f}s")
+    print(f"Parse+trích xuất    : HTML {t_parse_html*1000/n:.1f} ms/trang | WIKITEXT {t_parse_wt*1000/n:.1f} ms/trang "
+          f"(x{t_parse_html/max(1e-9, t_parse_wt):.1f})")
+    print(f"Khớp is_person      : {same_person}/{n}")
+    print(f"Khớp học vấn        : {same_edu}/{n}")
+
+if __name__ == "__main__":
+    main()
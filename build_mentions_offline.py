@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+build_mentions_offline.py — Dựng cạnh MENTIONS (như Step 4) từ bảng liên kết LƯU CỤC BỘ, không crawl lại.
+Đầu ra (cùng header với step4_enrich_full.py):
+    edges_mentions_pp.csv     (Person -> Person : MENTIONS_PERSON)
+    edges_mentions_pu.csv     (Person -> Univ.  : MENTIONS_UNIVERSITY)
+    edges_uni_mentions_p.csv  (Univ.  -> Person : UNI_MENTIONS_PERSON)
+    edges_uni_mentions_u.csv  (Univ.  -> Univ.  : UNIVERSITY_MENTIONS_UNIVERSITY)
+
+Nguồn liên kết (chọn 1):
+  A) Dump SQL của Wikipedia (có thể .gz):
+       --page-sql viwiki-*-page.sql.gz --pagelinks-sql viwiki-*-pagelinks.sql.gz [--linktarget-sql viwiki-*-linktarget.sql.gz]
+     - schema mới: pagelinks(pl_from, pl_from_namespace, pl_target_id) + linktarget(lt_id, lt_namespace, lt_title)
+     - schema cũ : pagelinks(pl_from, pl_namespace, pl_title, pl_from_namespace)  (không cần linktarget)
+  B) Kho liên kết riêng dạng CSV (source_title,target_title), vd. links.csv của Step 1:
+       --links-csv graph_out/links.csv
+
+Cách làm: chỉ giữ trong RAM các id (int) thuộc tập node (page_id → node, lt_id → node),
+rồi quét pagelinks MỘT LẦN (hash join trên id nguyên) và ghi thẳng 4 file CSV.
+"""
+
+import os, csv, re, gzip, argparse, time
+
+from utils_wiki import normalize
+from step4_enrich_full import load_titles_from_csv, load_roots
+
+PERSON, UNIVERSITY = 1, 2
+
+OUTPUTS = {
+    (PERSON, PERSON):         ("edges_mentions_pp.csv",    ["src_person","dst_person","relation"],         "MENTIONS_PERSON"),
+    (PERSON, UNIVERSITY):     ("edges_mentions_pu.csv",    ["src_person","dst_university","relation"],     "MENTIONS_UNIVERSITY"),
+    (UNIVERSITY, PERSON):     ("edges_uni_mentions_p.csv", ["src_university","dst_person","relation"],     "UNI_MENTIONS_PERSON"),
+    (UNIVERSITY, UNIVERSITY): ("edges_uni_mentions_u.csv", ["src_university","dst_university","relation"], "UNIVERSITY_MENTIONS_UNIVERSITY"),
+}
+
+# ---------- SQL dump reader ----------
+ROW_RE   = re.compile(r"\(((?:'(?:[^'\\]|\\.)*'|[^'()])*)\)")
+FIELD_RE = re.compile(r"'((?:[^'\\]|\\.)*)'|([^,]+)")
+ESC_RE   = re.compile(r"\\(.)")
+ESC_MAP  = {"n": "\n", "r": "\r", "t": "\t", "0": "\0"}
+
+def _open_text(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    return open(path, "r", encoding="utf-8", errors="replace")
+
+def iter_sql_rows(path):
+    """Duyệt từng tuple của các câu INSERT INTO ... VALUES (...),(...); — streaming, không nạp cả file."""
+    with _open_text(path) as f:
+        for line in f:
+            if not line.startswith("INSERT INTO"):
+                continue
+            body = line[line.index(" VALUES ") + 8:]
+            for m in ROW_RE.finditer(body):
+                row = []
+                for q, raw in FIELD_RE.findall(m.group(1)):
+                    if raw:
+                        raw = raw.strip()
+                        row.append(None if raw == "NULL" else raw)
+                    else:
+                        row.append(ESC_RE.sub(lambda e: ESC_MAP.get(e.group(1), e.group(1)), q))
+                yield row
+
+def dump_title(t):
+    return normalize(t.replace("_", " "))
+
+# ---------- node set ----------
+def load_node_kinds(odir, persons_csv, universities_csv, roots_csv):
+    """title_norm → (title, kind). Person được ưu tiên như Step 4 (crawl person trước)."""
+    persons = load_titles_from_csv(os.path.join(odir, persons_csv), "title")
+    unis    = load_titles_from_csv(os.path.join(odir, universities_csv), "title")
+    roots_p, roots_u = load_roots(os.path.join(odir, roots_csv))
+    kinds = {}
+    for t in persons + roots_p:
+        kinds.setdefault(normalize(t), (t, PERSON))
+    for t in unis + roots_u:
+        kinds.setdefault(normalize(t), (t, UNIVERSITY))
+    return kinds
+
+# ---------- writers ----------
+class MentionWriters:
+    def __init__(self, odir):
+        self.files, self.writers, self.counts = {}, {}, {}
+        for key, (fn, header, _) in OUTPUTS.items():
+            f = open(os.path.join(odir, fn), "w", encoding="utf-8", newline="")
+            w = csv.writer(f); w.writerow(header)
+            self.files[key], self.writers[key], self.counts[key] = f, w, 0
+
+    def write(self, src, dst):
+        key = (src[1], dst[1])
+        self.writers[key].writerow([src[0], dst[0], OUTPUTS[key][2]])
+        self.counts[key] += 1
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+
+# ---------- joins ----------
+def join_sql_dump(kinds, page_sql, pagelinks_sql, linktarget_sql, writers, stats):
+    # 1) page_id → node (chỉ namespace 0, chỉ tiêu đề thuộc tập node)
+    src_by_id = {}
+    for r in iter_sql_rows(page_sql):
+        # page(page_id, page_namespace, page_title, ...)
+        if len(r) < 3 or r[1] != "0":
+            continue
+        node = kinds.get(dump_title(r[2]))
+        if node:
+            src_by_id[int(r[0])] = node
+    stats["node_pages"] = len(src_by_id)
+
+    # 2) lt_id → node (schema mới)
+    dst_by_lt = {}
+    if linktarget_sql:
+        for r in iter_sql_rows(linktarget_sql):
+            # linktarget(lt_id, lt_namespace, lt_title)
+            if len(r) < 3 or r[1] != "0":
+                continue
+            node = kinds.get(dump_title(r[2]))
+            if node:
+                dst_by_lt[int(r[0])] = node
+        stats["node_linktargets"] = len(dst_by_lt)
+
+    # 3) quét pagelinks một lần
+    for r in iter_sql_rows(pagelinks_sql):
+        stats["pagelinks_rows"] += 1
+        src = src_by_id.get(int(r[0]))
+        if src is None:
+            continue
+        if linktarget_sql:
+            # pagelinks(pl_from, pl_from_namespace, pl_target_id) — kể cả khi không lt_id nào khớp node
+            # (dst_by_lt rỗng): pl_target_id là số, không được hiểu như title của schema cũ
+            dst = dst_by_lt.get(int(r[2]))
+        else:
+            # pagelinks(pl_from, pl_namespace, pl_title, pl_from_namespace)
+            dst = kinds.get(dump_title(r[2])) if r[1] == "0" else None
+        if dst is None or dst is src:
+            continue
+        writers.write(src, dst)
+
+def join_links_csv(kinds, links_csv, writers, stats):
+    # Intern tiêu đề node → id nguyên, dedupe theo cặp id (như dedupe_norm của Step 4)
+    ids, nodes = {}, []
+    for n, node in kinds.items():
+        ids[n] = len(nodes)
+        nodes.append(node)
+    seen = set()
+    with open(links_csv, "r", encoding="utf-8") as f:
+        rdr = csv.DictReader(f)
+        for r in rdr:
+            stats["pagelinks_rows"] += 1
+            a = ids.get(normalize(r.get("source_title") or ""))
+            if a is None:
+                continue
+            b = ids.get(normalize(r.get("target_title") or ""))
+            if b is None or a == b or (a, b) in seen:
+                continue
+            seen.add((a, b))
+            writers.write(nodes[a], nodes[b])
+
+# ---------- main ----------
+def main():
+    ap = argparse.ArgumentParser(description="Dựng 4 file mention edges từ pagelinks dump / links.csv cục bộ (không crawl).")
+    ap.add_argument("--outdir", default="graph_out")
+    ap.add_argument("--persons-csv", default="nodes_persons.csv")
+    ap.add_argument("--universities-csv", default="nodes_universities.csv")
+    ap.add_argument("--roots-csv", default="root_nodes.csv")
+
+    ap.add_argument("--page-sql", default=None, help="page.sql(.gz) — ánh xạ page_id ↔ title")
+    ap.add_argument("--pagelinks-sql", default=None, help="pagelinks.sql(.gz)")
+    ap.add_argument("--linktarget-sql", default=None, help="linktarget.sql(.gz) (schema pagelinks mới)")
+    ap.add_argument("--links-csv", default=None, help="Kho liên kết CSV (source_title,target_title)")
+    args = ap.parse_args()
+
+    use_dump = bool(args.page_sql and args.pagelinks_sql)
+    if not use_dump and not args.links_csv:
+        raise SystemExit("Cần --page-sql + --pagelinks-sql, hoặc --links-csv")
+
+    odir = args.outdir
+    os.makedirs(odir, exist_ok=True)
+
+    t0 = time.perf_counter()
+    kinds = load_node_kinds(odir, args.persons_csv, args.universities_csv, args.roots_csv)
+    print(f"Nodes (persons + universities): {len(kinds)}")
+
+    stats = {"pagelinks_rows": 0}
+    writers = MentionWriters(odir)
+    try:
+        if use_dump:
+            join_sql_dump(kinds, args.page_sql, args.pagelinks_sql, args.linktarget_sql, writers, stats)
+        else:
+            join_links_csv(kinds, args.links_csv, writers, stats)
+    finally:
+        writers.close()
+
+    print("\n✅ MENTIONS (offline) DONE")
+    for k, v in stats.items():
+        print(f"  {k}: {v}")
+    for key, (fn, _, _) in OUTPUTS.items():
+        print(f"  {fn}: {writers.counts[key]}")
+    print(f"  elapsed: {time.perf_counter() - t0:.2f}s")
+
+if __name__ == "__main__":
+    main()
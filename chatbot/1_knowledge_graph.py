@@ -3,105 +3,609 @@
 1_knowledge_graph.py
 Xây dựng và quản lý Knowledge Graph (Đồ thị tri thức) từ dữ liệu alumni
 """
-import pandas as pd
+import os
+import sys
+import json
+import itertools
+import threading
+from bisect import bisect_left, bisect_right
+import numpy as np
 import networkx as nx
+from contextlib import contextmanager
 from typing import List, Dict, Optional
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import clique_groups, graph_changelog, graph_loader, graph_snapshot, node_details_store, path_search, search_index
+from graph_snapshot import SNAPSHOT_DIR, load_snapshot, snapshot_is_fresh
+from clique_groups import GROUP_RELATIONS, CliqueIndex, groups_path, pairs_to_groups, read_groups
+from graph_loader import load_edges, load_nodes, parse_years, print_report
+from graph_changelog import Changelog, validate_op
+from graph_cache import CACHE_DIR, cache_key, cache_path, load_cache, save_cache
+from search_index import NodeSearchIndex
+from path_search import DEFAULT_BUDGET, count_paths, k_shortest_paths
+
+# Mã quyết định kết quả dựng đồ thị — đổi nội dung file nào thì cache khởi động bị dựng lại
+_CACHE_CODE = (os.path.abspath(__file__), clique_groups.__file__, graph_changelog.__file__, graph_loader.__file__,
+               graph_snapshot.__file__, node_details_store.__file__, path_search.__file__, search_index.__file__)
+
+class _ReadWriteLock:
+    """Khoá đọc/ghi: nhiều request đọc song song, refresh() ghi độc quyền (ưu tiên bên ghi đang chờ)"""
+    
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writing = False
+        self._waiting = 0
+    
+    @contextmanager
+    def reading(self):
+        with self._cond:
+            while self._writing or self._waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+    
+    @contextmanager
+    def writing(self):
+        with self._cond:
+            self._waiting += 1
+            while self._writing or self._readers:
+                self._cond.wait()
+            self._waiting -= 1
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writing = False
+                self._cond.notify_all()
+
+
 class KnowledgeGraph:
     """Biểu diễn mạng xã hội alumni dưới dạng Knowledge Graph"""
     
-    def __init__(self, nodes_file: str, edges_file: str):
+    # Trạng thái sau khi dựng (đồ thị + chỉ mục) được lưu trong cache khởi động — chỉ mục mới thêm vào đây
+    _CACHED_ATTRS = ('G', 'cliques', '_edge_types', 'node_to_title', 'title_to_node', 'node_types', '_rel_adj',
+                     'search_index')
+    
+    def __init__(self, nodes_file: str, edges_file: str, snapshot_dir: Optional[str] = None,
+                 cache_dir: Optional[str] = None):
+        """
+        snapshot_dir: thư mục snapshot nhị phân (mặc định <thư mục nodes_file>/snapshot).
+        Nếu snapshot còn khớp với 2 file CSV thì dựng đồ thị từ mmap thay vì parse CSV.
+        
+        cache_dir: thư mục cache khởi động (graph_cache.py, mặc định <thư mục nodes_file>/kg_cache; '' = tắt).
+        Lần nạp đầu ghi đồ thị + chỉ mục đã dựng; các lần sau nạp 1 bước nếu file nguồn và mã không đổi.
+        
+        Cạnh clique (same_birth_country / same_career / same_uni) không nằm trong self.G mà trong
+        self.cliques (nhóm thành viên, đọc từ groups_*.csv cạnh edges_file; các cặp clique kiểu cũ trong
+        file cạnh được gom thành nhóm khi nạp) — dùng neighbor_ids / edge_relations / has_edge / find_paths
+        của lớp này thay vì truy cập self.G trực tiếp khi cần tính cả cạnh ảo.
+        
+        Cạnh alumni_of có cột year mang thuộc tính years (tuple năm tốt nghiệp tăng dần); graduates() /
+        same_graduation_year() trả lời truy vấn theo khoảng năm bằng chỉ mục năm đã sắp xếp (bisect).
+        
+        self.version: phiên bản đồ thị (graph_changelog.py). Khi nạp, các lô changelog.ndjson chưa compact
+        được áp sau CSV; refresh() áp lô mới trên đồ thị đang chạy (chi phí theo delta, không dựng lại).
+        
+        Dùng chung giữa các thread (Flask): refresh() tuần tự hoá bằng khoá và chỉ sửa đồ thị khi không có
+        ai đọc; mọi truy vấn của 1 request đặt trong `with kg.reading():` (gọi refresh() ngoài khối này).
+        """
+        self.nodes_file, self.edges_file = nodes_file, edges_file
+        if snapshot_dir is None:
+            snapshot_dir = os.path.join(os.path.dirname(nodes_file), SNAPSHOT_DIR)
+        self.snapshot_dir = snapshot_dir
+        if cache_dir is None:
+            cache_dir = os.path.join(os.path.dirname(nodes_file), CACHE_DIR)
+        self.cache_dir = cache_dir
+        self.changelog = Changelog(os.path.dirname(nodes_file) or '.')
+        self._refresh_lock = threading.Lock()
+        self._rw = _ReadWriteLock()
+        self._load()
+    
+    def _load(self):
+        """Nạp đồ thị ở phiên bản của CSV (graph_version.json) rồi áp các lô changelog sau đó"""
         self.G = nx.DiGraph()
-        self.nodes_df = pd.read_csv(nodes_file)
-        self.edges_df = pd.read_csv(edges_file)
-        self._build_graph()
-        self._create_indexes()
+        self.cliques = CliqueIndex()
+        self._edge_types = {}  # (src, dst) → các type theo thứ tự file, chỉ với cặp có > 1 cạnh
+        self._grad_index = None  # chỉ mục năm tốt nghiệp, dựng khi truy vấn lần đầu (xem _graduation_index)
+        self._nodes_df = self._edges_df = None
+        self._log_base = self.version = self.changelog.base_version()
+        self._log_offset = 0
+        path = self._cache_path() if self.cache_dir else None
+        state = load_cache(path) if path else None
+        if state is not None:
+            print(f"[+] ⚡ Nạp Knowledge Graph từ cache {path}")
+            for attr in self._CACHED_ATTRS:
+                setattr(self, attr, state[attr])
+            self._print_loaded()
+        else:
+            if snapshot_is_fresh(self.snapshot_dir, self.nodes_file, self.edges_file):
+                self._build_graph_from_snapshot(self.snapshot_dir)
+            else:
+                self._build_graph()
+            if path:
+                save_cache(path, {attr: getattr(self, attr) for attr in self._CACHED_ATTRS})
+        applied = self.refresh()
+        if applied:
+            print(f"    ✓ Áp {applied} lô changelog → phiên bản {self.version}")
+    
+    def _cache_path(self):
+        """File cache ứng với các file nguồn hiện tại (groups_*.csv / graph_version.json tính cả khi chưa có)"""
+        sources = (self.nodes_file, self.edges_file, groups_path(self.edges_file), self.changelog.version_path)
+        return cache_path(self.cache_dir, cache_key(sources, _CACHE_CODE))
+    
+    @property
+    def nodes_df(self):
+        # Chỉ đọc CSV khi thực sự cần (chế độ snapshot không parse CSV)
+        if self._nodes_df is None:
+            self._load_frames()
+        return self._nodes_df
+    
+    @property
+    def edges_df(self):
+        if self._edges_df is None:
+            self._load_frames()
+        return self._edges_df
+    
+    def _load_frames(self):
+        """Đọc 2 file CSV qua graph_loader: dòng hỏng bị cách ly vào *.quarantine.csv thay vì vào đồ thị"""
+        nodes, node_report = load_nodes(self.nodes_file)
+        edges, edge_report = load_edges(self.edges_file, node_ids=set(nodes['id']))
+        print_report(node_report)
+        print_report(edge_report)
+        self._nodes_df, self._edges_df = nodes, edges
     
     def _build_graph(self):
-        """Xây dựng đồ thị từ file CSV"""
+        """Xây dựng đồ thị từ file CSV (đã kiểm tra) — thêm nút/cạnh theo lô, không duyệt từng dòng DataFrame"""
         print("[+] 🔨 Xây dựng Knowledge Graph...")
+        nodes, edges = self.nodes_df, self.edges_df
         
-        # Thêm nodes với attributes
-        for _, row in self.nodes_df.iterrows():
-            # Một số file có thể thiếu cột hoặc giá trị rỗng, nên dùng fallback an toàn
-            node_id = row.get('id')
-            title_raw = row.get('title')
-
-            # Nếu id trống, thử dùng title làm id; nếu cả hai đều trống thì bỏ qua
-            if (pd.isna(node_id) or node_id == '') and (pd.isna(title_raw) or title_raw == ''):
-                continue  # không có id/title, bỏ qua
-
-            if pd.isna(node_id) or node_id == '':
-                node_id = title_raw  # fallback id = title
-
-            title = title_raw if not (pd.isna(title_raw) or title_raw == '') else node_id
-
-            node_type = row.get('type', 'unknown')
-
-            attrs = {
-                'title': title,
-                'node_type': node_type
-            }
-            # Thêm properties nếu có
-            if 'properties' in self.nodes_df.columns and pd.notnull(row.get('properties')):
+        # Nút: id trống đã được thay bằng title trong graph_loader; trùng id → bản sau cập nhật bản trước
+        def node_attrs(title, node_type, raw_props):
+            attrs = {'title': title, 'node_type': node_type}
+            if raw_props:
                 try:
-                    import json
-                    props = json.loads(row['properties']) if isinstance(row['properties'], str) else row['properties']
-                    attrs['properties'] = props
-                except:
+                    attrs['properties'] = json.loads(raw_props)
+                except ValueError:
                     attrs['properties'] = None
-            
-            self.G.add_node(node_id, **attrs)
+            return attrs
+        self.G.add_nodes_from(zip(nodes['id'], map(node_attrs, nodes['title'], nodes['type'], nodes['properties'])))
         
-        # Thêm edges với relation types
-        for _, row in self.edges_df.iterrows():
-            src = row['from']
-            dst = row['to']
-            rel = row['type']
-            if isinstance(rel, str):
-                rel = rel.strip()
-
-            # Nếu đã có cạnh, ưu tiên giữ cạnh chuyên biệt hơn (alumni_of > link_to)
-            if self.G.has_edge(src, dst):
-                existing_rel = self.G[src][dst].get('relation')
-                # Nếu cạnh mới là alumni_of và cạnh cũ không phải, thay thế
-                if rel == 'alumni_of' and existing_rel != 'alumni_of':
-                    self.G[src][dst]['relation'] = rel
-                # Ngược lại giữ nguyên cạnh cũ để tránh ghi đè thông tin
-                continue
-
-            self.G.add_edge(
-                src,
-                dst,
-                relation=rel
-            )
-
-        # Đảm bảo mọi node đều có title và node_type tối thiểu
+        # Cặp clique → gom nhóm, không thêm vào self.G
+        is_clique = edges['type'].isin(GROUP_RELATIONS).to_numpy()
+        cl = edges[is_clique]
+        clique_pairs = list(zip(cl['type'], cl['from'], cl['to'], cl['weight'].tolist()))
+        
+        # Trùng (src, dst) → giữ cạnh xuất hiện đầu (theo thứ tự file), trừ khi có cạnh alumni_of
+        # (cạnh chuyên biệt hơn link_to) thì quan hệ là alumni_of
+        rest = edges[~is_clique]
+        first = ~rest.duplicated(['from', 'to']).to_numpy()
+        dup = rest.duplicated(['from', 'to'], keep=False).to_numpy()
+        if dup.any():
+            types = rest[dup].groupby(['from', 'to'], sort=False)['type'].agg(lambda t: list(dict.fromkeys(t)))
+            self._edge_types = dict(zip(types.index, types.tolist()))
+        has_alumni = (rest['type'] == 'alumni_of').groupby([rest['from'], rest['to']], sort=False).transform('any')
+        rel = np.where(has_alumni.to_numpy()[first], 'alumni_of', rest['type'].to_numpy()[first])
+        self.G.add_edges_from(zip(rest['from'].to_numpy()[first], rest['to'].to_numpy()[first],
+                                  ({'relation': r} for r in rel.tolist())))
+        # Năm tốt nghiệp: gộp cột year của mọi dòng alumni_of cùng cặp (mỗi dòng edges_up là 1 bằng)
+        dated = rest[(rest['type'] == 'alumni_of').to_numpy() & (rest['year'] != '').to_numpy()]
+        grad = {}
+        for key in zip(dated['from'], dated['to'], dated['year']):
+            grad.setdefault(key[:2], set()).update(parse_years(key[2]))
+        for (a, b), years in grad.items():
+            self.G[a][b]['years'] = tuple(sorted(years))
+        self._load_cliques(clique_pairs)
+        
+        # Đảm bảo mọi node đều có title và node_type tối thiểu (nút chỉ xuất hiện trong cạnh)
         for node_id, data in self.G.nodes(data=True):
             if not data.get('title'):
                 data['title'] = node_id
             if not data.get('node_type'):
                 data['node_type'] = 'unknown'
         
-        print(f"    ✓ {self.G.number_of_nodes()} nút, {self.G.number_of_edges()} cạnh")
+        self._create_indexes()
+        self._print_loaded()
+    
+    def _build_graph_from_snapshot(self, snapshot_dir: str):
+        """Dựng đồ thị từ snapshot nhị phân — cùng kết quả (và thứ tự nút/cạnh) với _build_graph"""
+        print(f"[+] 🔨 Xây dựng Knowledge Graph từ snapshot {snapshot_dir}...")
+        snap = load_snapshot(snapshot_dir)
+        ids = snap.ids()
+        props = snap.properties_raw()
+        has_props = snap.meta.get('has_properties')
+        nodes = []
+        for i, (node_id, title, node_type) in enumerate(zip(ids, snap.titles(), snap.types())):
+            attrs = {'title': title or node_id, 'node_type': node_type or 'unknown'}
+            if has_props and i < snap.n_explicit and props[i] is not None:
+                try:
+                    attrs['properties'] = json.loads(props[i])
+                except:
+                    attrs['properties'] = None
+            nodes.append((node_id, attrs))
+        self.G.add_nodes_from(nodes)
+        
+        # Cạnh theo thứ tự file gốc; trùng (src, dst) → giữ cạnh đầu, trừ khi cạnh sau là alumni_of
+        rels = [r.strip() for r in snap.relation_types]
+        alumni = rels.index('alumni_of') if 'alumni_of' in rels else -1
+        clique_rel = {i for i, r in enumerate(rels) if r in GROUP_RELATIONS}
+        edge_rel, multi, clique_pairs, grad = {}, {}, [], {}
+        src, dst, rel, weight = snap.edge_arrays(file_order=True)
+        edge_years = snap.edge_years()
+        for e, (key_src, key_dst, r, w) in enumerate(zip(src.tolist(), dst.tolist(), rel.tolist(), weight.tolist())):
+            if r in clique_rel:
+                clique_pairs.append((rels[r], ids[key_src], ids[key_dst], int(w) if w == int(w) else w))
+                continue
+            key = (key_src, key_dst)
+            if r == alumni and e in edge_years:
+                grad.setdefault(key, set()).update(edge_years[e])
+            cur = edge_rel.get(key)
+            if cur is None:
+                edge_rel[key] = r
+            else:
+                multi.setdefault(key, [cur]).append(r)
+        for key, rs in multi.items():
+            if alumni in rs:
+                edge_rel[key] = alumni
+            self._edge_types[(ids[key[0]], ids[key[1]])] = [rels[r] for r in dict.fromkeys(rs)]
+        self.G.add_edges_from((ids[a], ids[b], {'relation': rels[r]}) for (a, b), r in edge_rel.items())
+        for (a, b), years in grad.items():
+            self.G[ids[a]][ids[b]]['years'] = tuple(sorted(years))
+        self._load_cliques(clique_pairs)
+        self._create_indexes()
+        self._print_loaded()
+    
+    def _load_cliques(self, clique_pairs):
+        """Nhóm từ groups_*.csv + nhóm phủ các cặp clique kiểu cũ chưa có trong đó"""
+        for relation, group, weight, members in read_groups(groups_path(self.edges_file)):
+            self.cliques.add(relation, group, weight, members, min_size=1)
+        pending = [p for p in clique_pairs if not self.cliques.has_edge(p[1], p[2], p[0])]
+        groups, loops = pairs_to_groups(pending)
+        for relation, group, weight, members in groups:
+            self.cliques.add(relation, group, weight, members, register=False)
+        for relation, node_id, _, _ in loops:
+            if not self.G.has_edge(node_id, node_id):
+                self.G.add_edge(node_id, node_id, relation=relation)
+        # Thành viên chưa có trong file nút vẫn là nút (như khi cặp clique là cạnh thật) — nếu có láng giềng
+        self.G.add_nodes_from((m, {'title': m, 'node_type': 'unknown'})
+                              for m in self.cliques.nodes() if m not in self.G and self.cliques.degree(m))
+    
+    def _print_loaded(self):
+        print(f"    ✓ {self.G.number_of_nodes()} nút, {self.G.number_of_edges()} cạnh"
+              f" + {len(self.cliques)} nhóm clique ({sum(len(g[3]) for g in self.cliques.groups)} thành viên)")
     
     def _create_indexes(self):
         """Tạo index cho tra cứu nhanh"""
         self.node_to_title = {n: d.get('title', n) for n, d in self.G.nodes(data=True)}
         self.title_to_node = {d.get('title', n): n for n, d in self.G.nodes(data=True) if d.get('title', n)}
         self.node_types = {n: d.get('node_type', 'unknown') for n, d in self.G.nodes(data=True)}
+        self.search_index = NodeSearchIndex((n, t, self.node_types[n]) for n, t in self.node_to_title.items())
+        self._create_adjacency()
     
-    def find_paths(self, src_id: str, dst_id: str, max_hops: int = 3) -> List[List[str]]:
-        """Tìm tất cả đường đi giữa hai nút (Multi-hop)"""
-        try:
-            paths = list(nx.all_simple_paths(self.G, src_id, dst_id, cutoff=max_hops))
-            return paths
-        except (nx.NodeNotFound, nx.NetworkXNoPath):
+    def _create_adjacency(self):
+        """
+        Chỉ mục kề theo quan hệ của self.G: self._rel_adj[relation] = (cạnh ra, cạnh vào), mỗi chiều
+        node → {láng giềng: None} theo đúng thứ tự successors / predecessors của self.G — tra láng giềng 1
+        quan hệ tốn O(số láng giềng khớp) thay vì duyệt mọi cạnh của nút.
+        """
+        self._rel_adj = {}
+        for a, nbrs in self.G.succ.items():
+            for b, data in nbrs.items():
+                self._rel_adj.setdefault(data['relation'], ({}, {}))[0].setdefault(a, {})[b] = None
+        for b, nbrs in self.G.pred.items():
+            for a, data in nbrs.items():
+                self._rel_adj.setdefault(data['relation'], ({}, {}))[1].setdefault(b, {})[a] = None
+    
+    def _adj_add(self, src, dst, rel, reorder=False):
+        """Cạnh mới nằm cuối successors / predecessors; cạnh cũ đổi quan hệ (reorder) → lấy lại thứ tự từ self.G"""
+        out, inn = self._rel_adj.setdefault(rel, ({}, {}))
+        if reorder:
+            out[src] = {n: None for n, d in self.G.succ[src].items() if d['relation'] == rel}
+            inn[dst] = {n: None for n, d in self.G.pred[dst].items() if d['relation'] == rel}
+        else:
+            out.setdefault(src, {})[dst] = None
+            inn.setdefault(dst, {})[src] = None
+    
+    def _adj_remove(self, src, dst, rel):
+        for index, a, b in zip(self._rel_adj[rel], (src, dst), (dst, src)):
+            nbrs = index[a]
+            del nbrs[b]
+            if not nbrs:
+                del index[a]
+    
+    def _set_relation(self, src, dst, rel):
+        """Đổi quan hệ đại diện của cạnh src→dst đã có, giữ chỉ mục kề khớp"""
+        old = self.G[src][dst]['relation']
+        if old != rel:
+            self.G[src][dst]['relation'] = rel
+            self._adj_remove(src, dst, old)
+            self._adj_add(src, dst, rel, reorder=True)
+    
+    
+    # ---------- Cập nhật tăng dần từ changelog (graph_changelog.py) ----------
+    def reading(self):
+        """Khối đọc: refresh() chờ các khối đang mở xong mới sửa đồ thị"""
+        return self._rw.reading()
+    
+    def refresh(self) -> int:
+        """Áp các lô changelog mới hơn self.version → số lô đã áp. Changelog đã compact/reset vượt qua
+        phiên bản đang chạy (lô cần áp không còn trong file) → dựng đồ thị mới từ CSV/snapshot mới rồi thay
+        vào 1 lần; bên đọc không bao giờ thấy đồ thị dựng dở.
+        Không gọi bên trong `with kg.reading():` (khoá ghi sẽ chờ chính khối đọc đó)."""
+        with self._refresh_lock:
+            base = self.changelog.base_version()
+            if base != self._log_base:
+                if base > self.version:
+                    old = self.version
+                    print(f"[+] 🔄 Đồ thị đã compact lên phiên bản {base} — nạp lại")
+                    fresh = KnowledgeGraph(self.nodes_file, self.edges_file, self.snapshot_dir, self.cache_dir)
+                    fresh._refresh_lock, fresh._rw = self._refresh_lock, self._rw
+                    with self._rw.writing():
+                        self.__dict__ = fresh.__dict__
+                    return self.version - old
+                self._log_base, self._log_offset = base, 0
+            if self.changelog.size() == self._log_offset:
+                return 0
+            batches, offset = self.changelog.read(since=self.version, offset=self._log_offset)
+            with self._rw.writing():
+                for version, ops in batches:
+                    self.apply_delta(ops, version)
+                self._log_offset = offset
+            return len(batches)
+    
+    def apply_delta(self, ops: List[Dict], version: Optional[int] = None):
+        """Áp 1 lô thao tác (định dạng graph_changelog) lên đồ thị đã nạp — kết quả như nạp lại CSV đã compact.
+        version: phiên bản của lô (mặc định self.version + 1)."""
+        for op in ops:
+            op = validate_op(op)
+            if op['op'] != 'upsert_node':
+                self._grad_index = None  # cạnh alumni_of / năm có thể đổi → dựng lại khi truy vấn
+            getattr(self, '_op_' + op['op'])(op)
+        self.version = self.version + 1 if version is None else version
+    
+    def _ensure_node(self, node_id):
+        """Nút chỉ xuất hiện trong cạnh / nhóm (như khi nạp CSV)"""
+        if node_id not in self.G:
+            self.G.add_node(node_id, title=node_id, node_type='unknown')
+            self._index_node(node_id)
+    
+    def _index_node(self, node_id, old_title=None):
+        data = self.G.nodes[node_id]
+        if old_title is not None and self.title_to_node.get(old_title) == node_id:
+            del self.title_to_node[old_title]
+        title = data.get('title', node_id)
+        self.node_to_title[node_id] = title
+        if title:
+            self.title_to_node[title] = node_id
+        self.node_types[node_id] = data.get('node_type', 'unknown')
+        self.search_index.add(node_id, title, self.node_types[node_id])
+    
+    def _drop_node(self, node_id):
+        title = self.node_to_title.pop(node_id, None)
+        if title is not None and self.title_to_node.get(title) == node_id:
+            del self.title_to_node[title]
+        self.node_types.pop(node_id, None)
+        self.search_index.remove(node_id)
+        # dict.fromkeys: khuyên (node_id → node_id) có trong cả cạnh ra và cạnh vào, chỉ gỡ 1 lần
+        for a, b, rel in dict.fromkeys(itertools.chain(self.G.out_edges(node_id, data='relation'),
+                                                       self.G.in_edges(node_id, data='relation'))):
+            self._adj_remove(a, b, rel)
+        self.G.remove_node(node_id)
+    
+    def _prune(self, node_id):
+        """Nút ngầm không còn cạnh / láng giềng clique nào thì biến mất (như khi nạp CSV đã compact)"""
+        if (node_id in self.G and self.G.nodes[node_id].get('node_type') == 'unknown'
+                and self.G.degree(node_id) == 0 and not self.cliques.degree(node_id)):
+            self._drop_node(node_id)
+    
+    def _op_upsert_node(self, op):
+        node_id = op['id']
+        old_title = None
+        if node_id in self.G:
+            old_title = self.G.nodes[node_id].get('title')
+        else:
+            self.G.add_node(node_id, title=node_id)
+        data = self.G.nodes[node_id]
+        data['node_type'] = op['type']
+        if 'title' in op:
+            data['title'] = op['title']
+        if 'properties' in op:
+            if op['properties'] is None:
+                data.pop('properties', None)
+            else:
+                data['properties'] = op['properties']
+        self._index_node(node_id, old_title)
+    
+    def _op_delete_node(self, op):
+        node_id = op['id']
+        nbrs = self.cliques.neighbor_set(node_id)
+        self.cliques.remove_node(node_id)
+        if node_id not in self.G:
+            for nbr in nbrs:
+                self._prune(nbr)
+            return
+        nbrs |= set(self.G.successors(node_id)) | set(self.G.predecessors(node_id))
+        for nbr in nbrs:
+            self._edge_types.pop((node_id, nbr), None)
+            self._edge_types.pop((nbr, node_id), None)
+        self._drop_node(node_id)
+        for nbr in nbrs:
+            self._prune(nbr)
+    
+    def _op_upsert_edge(self, op):
+        src, dst, rel = op['from'], op['to'], op['type']
+        self._ensure_node(src)
+        self._ensure_node(dst)
+        if rel in GROUP_RELATIONS and src != dst:
+            if not self.cliques.has_edge(src, dst, rel):
+                self.cliques.add(rel, f'{rel}#{src}|{dst}', op['weight'], [src, dst], register=False)
+            return
+        if not self.G.has_edge(src, dst):
+            self.G.add_edge(src, dst, relation=rel)
+            self._adj_add(src, dst, rel)
+        else:
+            types = self._edge_types.get((src, dst)) or [self.G[src][dst]['relation']]
+            if rel not in types:
+                types = types + [rel]
+                self._edge_types[(src, dst)] = types
+                self._set_relation(src, dst, 'alumni_of' if 'alumni_of' in types else types[0])
+        if rel == 'alumni_of' and 'year' in op:
+            if op['year']:
+                self.G[src][dst]['years'] = parse_years(op['year'])
+            else:
+                self.G[src][dst].pop('years', None)
+    
+    def _op_delete_edge(self, op):
+        src, dst, rel = op['from'], op['to'], op.get('type')
+        if not self.G.has_edge(src, dst):
+            return
+        types = self._edge_types.pop((src, dst), None) or [self.G[src][dst]['relation']]
+        types = [t for t in types if t in GROUP_RELATIONS or (rel is not None and t != rel)]
+        if not types:
+            self._adj_remove(src, dst, self.G[src][dst]['relation'])
+            self.G.remove_edge(src, dst)
+            self._prune(src)
+            self._prune(dst)
+            return
+        if len(types) > 1:
+            self._edge_types[(src, dst)] = types
+        self._set_relation(src, dst, 'alumni_of' if 'alumni_of' in types else types[0])
+        if 'alumni_of' not in types:
+            self.G[src][dst].pop('years', None)
+    
+    def _op_add_member(self, op):
+        self.cliques.add_member(op['relation'], op['group'], op['weight'], op['member'])
+        members = self.cliques.members(op['relation'], op['group'])
+        if len(members) >= 2:
+            # nhóm vừa đủ 2 thành viên → thành viên đầu cũng bắt đầu có láng giềng
+            for m in (members if len(members) == 2 else (op['member'],)):
+                self._ensure_node(m)
+    
+    def _op_remove_member(self, op):
+        if self.cliques.remove_member(op['relation'], op['group'], op['member']):
+            for m in (op['member'],) + self.cliques.members(op['relation'], op['group'])[:1]:
+                self._prune(m)
+    def neighbor_ids(self, node_id: str, undirected: bool = True) -> List[str]:
+        """Láng giềng (không trùng): cạnh ra, cạnh vào (nếu undirected), rồi cạnh clique ảo"""
+        if node_id not in self.G:
             return []
+        out = dict.fromkeys(self.G.successors(node_id))
+        if undirected:
+            out.update(dict.fromkeys(self.G.predecessors(node_id)))
+        for nbr, _, _ in self.cliques.neighbors(node_id):
+            out[nbr] = None
+        return list(out)
+    
+    def relation_neighbors(self, node_id: str, relation: str, direction: str = 'both') -> List[str]:
+        """Láng giềng qua cạnh thật có quan hệ relation: 'out' (node_id → x), 'in' (x → node_id) hoặc 'both'
+        (ra trước, vào sau, có thể lặp nếu có cả 2 chiều) — O(số láng giềng khớp) nhờ chỉ mục kề.
+        Không gồm cạnh clique ảo (xem cliques.neighbors)."""
+        out, inn = self._rel_adj.get(relation, ({}, {}))
+        nbrs = list(out.get(node_id, ())) if direction != 'in' else []
+        if direction != 'out':
+            nbrs.extend(inn.get(node_id, ()))
+        return nbrs
+    
+    def edge_relations(self, a: str, b: str) -> List[str]:
+        """Các quan hệ giữa a và b: cạnh a→b, cạnh b→a, rồi cạnh clique ảo (vô hướng)"""
+        rels = []
+        if self.G.has_edge(a, b):
+            rels.append(self.G[a][b].get('relation'))
+        if self.G.has_edge(b, a):
+            rels.append(self.G[b][a].get('relation'))
+        return rels + self.cliques.relations(a, b)
+    
+    def has_edge(self, a: str, b: str, relation: Optional[str] = None) -> bool:
+        """Cạnh a→b trong self.G hoặc cạnh clique ảo a—b"""
+        if self.G.has_edge(a, b) and (relation is None or self.G[a][b].get('relation') == relation):
+            return True
+        return self.cliques.has_edge(a, b, relation)
+    
+    def number_of_edges(self) -> int:
+        return self.G.number_of_edges() + self.cliques.number_of_edges()
+    
+    def shortest_paths(self, src_id: str, dst_id: str, k: int = 5, max_hops: int = 3, undirected: bool = False,
+                       budget: int = DEFAULT_BUDGET, count: bool = True) -> Dict:
+        """
+        Tối đa k đường đi đơn ngắn nhất src → dst (≤ max_hops cạnh, qua cả cạnh clique ảo) bằng path_search.py:
+        BFS 2 chiều + liệt kê lười, chi phí giới hạn bởi budget (số láng giềng được đọc) thay vì liệt kê mọi
+        đường như find_paths — an toàn với nút hub (nhóm same_birth_country hàng nghìn thành viên).
+        → {'distance', 'paths', 'num_shortest', 'truncated'} + (count=True) 'num_paths' (số đường đi đơn
+        ≤ max_hops) và 'num_paths_exact' (False = ước lượng khi đếm hết budget).
+        """
+        if src_id not in self.G or dst_id not in self.G:
+            result = {'distance': None, 'paths': [], 'num_shortest': 0, 'truncated': False}
+            if count:
+                result.update(num_paths=0, num_paths_exact=True)
+            return result
+        out = lambda n: self.neighbor_ids(n, undirected)
+        inn = None if undirected else self._in_neighbor_ids
+        result = k_shortest_paths(out, src_id, dst_id, k, max_hops, budget, inn)
+        if count:
+            if result['distance'] is None and not result['truncated']:
+                result.update(num_paths=0, num_paths_exact=True)
+            else:
+                n, exact = count_paths(out, src_id, dst_id, max_hops, budget, inn)
+                result.update(num_paths=max(n, len(result['paths'])), num_paths_exact=exact)
+        return result
+    
+    def _in_neighbor_ids(self, node_id: str) -> List[str]:
+        """Láng giềng theo cạnh vào (+ cạnh clique ảo, vô hướng) — chiều ngược của neighbor_ids(undirected=False)"""
+        if node_id not in self.G:
+            return []
+        out = dict.fromkeys(self.G.predecessors(node_id))
+        for nbr, _, _ in self.cliques.neighbors(node_id):
+            out[nbr] = None
+        return list(out)
+    
+    def find_paths(self, src_id: str, dst_id: str, max_hops: int = 3,
+                   undirected: bool = False) -> List[List[str]]:
+        """Tìm tất cả đường đi đơn giữa hai nút (Multi-hop), đi qua cả cạnh clique ảo
+        (cùng thuật toán DFS với nx.all_simple_paths). Số đường tăng tổ hợp qua nút hub — chỉ cần vài
+        đường ngắn nhất / số lượng thì dùng shortest_paths."""
+        if src_id not in self.G or dst_id not in self.G or max_hops is None or max_hops < 1:
+            return []
+        paths = []
+        visited = dict.fromkeys([src_id])
+        stack = [iter(self.neighbor_ids(src_id, undirected))]
+        while stack:
+            children = stack[-1]
+            child = next(children, None)
+            if child is None:
+                stack.pop()
+                visited.popitem()
+            elif len(visited) < max_hops:
+                if child in visited:
+                    continue
+                if child == dst_id:
+                    paths.append(list(visited) + [child])
+                    continue
+                visited[child] = None
+                stack.append(iter(self.neighbor_ids(child, undirected)))
+            else:
+                if dst_id not in visited and (child == dst_id or dst_id in children):
+                    paths.append(list(visited) + [dst_id])
+                stack.pop()
+                visited.popitem()
+        return paths
     
     def get_neighbors(self, node_id: str, relation_type: Optional[str] = None) -> List[Dict]:
         """Lấy láng giềng của một nút (kiểm tra cả cạnh ra và vào)"""
         neighbors = []
+        if relation_type is not None:
+            # Chỉ mục kề theo quan hệ: không duyệt các cạnh quan hệ khác của nút
+            for nbr in self.relation_neighbors(node_id, relation_type):
+                neighbors.append({'id': nbr, 'title': self.node_to_title.get(nbr, nbr), 'relation': relation_type})
+            for nbr, rel, _ in self.cliques.neighbors(node_id, relation_type):
+                neighbors.append({'id': nbr, 'title': self.node_to_title.get(nbr, nbr), 'relation': rel})
+            return neighbors
         # Cạnh ra
         for nbr in self.G.successors(node_id):
             edge_data = self.G[node_id][nbr]
@@ -120,8 +624,75 @@ class KnowledgeGraph:
                     'title': self.node_to_title.get(src, src),
                     'relation': edge_data['relation']
                 })
+        # Cạnh clique ảo (same_birth_country / same_career / same_uni)
+        for nbr, rel, _ in self.cliques.neighbors(node_id, relation_type):
+            neighbors.append({
+                'id': nbr,
+                'title': self.node_to_title.get(nbr, nbr),
+                'relation': rel
+            })
         return neighbors
-    
+
+    # ---------- Năm tốt nghiệp (thuộc tính years của cạnh alumni_of) ----------
+    def _graduation_index(self):
+        """(trường → (năm tăng dần, person tương ứng), person → {trường: [năm]}, năm toàn cục, (năm, person, trường))
+        — dựng lười 1 lần O(E log E), huỷ khi apply_delta đụng tới cạnh"""
+        if self._grad_index is None:
+            rows = []
+            for a, b, data in self.G.edges(data=True):
+                if data.get('relation') != 'alumni_of' or not data.get('years'):
+                    continue
+                # alumni_of thường là person → university; phòng khi dữ liệu đảo chiều
+                person, uni = (b, a) if self.node_types.get(a) == 'university' else (a, b)
+                rows.extend((y, person, uni) for y in data['years'])
+            rows.sort()
+            by_uni, by_person = {}, {}
+            for y, person, uni in rows:
+                years, persons = by_uni.setdefault(uni, ([], []))
+                years.append(y)
+                persons.append(person)
+                by_person.setdefault(person, {}).setdefault(uni, []).append(y)
+            self._grad_index = (by_uni, by_person, [r[0] for r in rows], rows)
+        return self._grad_index
+
+    @staticmethod
+    def _year_slice(years, start, end):
+        lo = 0 if start is None else bisect_left(years, start)
+        hi = len(years) if end is None else bisect_right(years, end)
+        return lo, max(lo, hi)
+
+    def _graduate(self, person, uni, year):
+        return {'id': person, 'title': self.node_to_title.get(person, person), 'university': uni, 'year': year}
+
+    def graduates(self, university_id: Optional[str] = None, start: Optional[int] = None,
+                  end: Optional[int] = None) -> List[Dict]:
+        """Alumni tốt nghiệp trong [start, end] (None = không chặn) của 1 trường hoặc mọi trường, năm tăng dần.
+        Tìm nhị phân trên chỉ mục năm: O(log n + số kết quả)."""
+        by_uni, _, all_years, rows = self._graduation_index()
+        if university_id is None:
+            lo, hi = self._year_slice(all_years, start, end)
+            return [self._graduate(p, u, y) for y, p, u in rows[lo:hi]]
+        years, persons = by_uni.get(university_id, ([], []))
+        lo, hi = self._year_slice(years, start, end)
+        return [self._graduate(p, university_id, y) for y, p in zip(years[lo:hi], persons[lo:hi])]
+
+    def graduation_years(self, person_id: str) -> Dict[str, List[int]]:
+        """{trường: [năm tốt nghiệp]} của 1 person (chỉ các bằng có năm)"""
+        return {uni: list(years) for uni, years in self._graduation_index()[1].get(person_id, {}).items()}
+
+    def same_graduation_year(self, person_id: str, university_id: Optional[str] = None) -> List[Dict]:
+        """Người tốt nghiệp cùng năm, cùng trường với person_id (mọi trường của người đó, hoặc chỉ university_id)"""
+        by_uni, by_person, _, _ = self._graduation_index()
+        peers = []
+        for uni, person_years in by_person.get(person_id, {}).items():
+            if university_id is not None and uni != university_id:
+                continue
+            years, persons = by_uni[uni]
+            for y in dict.fromkeys(person_years):
+                lo, hi = self._year_slice(years, y, y)
+                peers.extend(self._graduate(p, uni, y) for p in persons[lo:hi] if p != person_id)
+        return peers
+
     def get_node_info(self, node_id: str) -> Optional[Dict]:
         """Lấy thông tin chi tiết về một nút"""
         if node_id not in self.G:
@@ -132,24 +703,16 @@ class KnowledgeGraph:
             'title': data['title'],
             'type': data['node_type'],
             'out_degree': len(list(self.G.successors(node_id))),
-            'in_degree': len(list(self.G.predecessors(node_id)))
+            'in_degree': len(list(self.G.predecessors(node_id))),
+            'virtual_degree': self.cliques.degree(node_id)
         }
     
     def search_nodes(self, query: str, node_type: Optional[str] = None, limit: int = 10) -> List[Dict]:
-        """Tìm kiếm nút theo tên"""
-        query_lower = query.lower()
-        results = []
-        for node, data in self.G.nodes(data=True):
-            if query_lower in data['title'].lower():
-                if node_type is None or data['node_type'] == node_type:
-                    results.append({
-                        'id': node,
-                        'title': data['title'],
-                        'type': data['node_type']
-                    })
-                    if len(results) >= limit:
-                        break
-        return results
+        """Tìm kiếm nút theo tên (không phân biệt dấu / hoa thường) qua chỉ mục search_index.py: chuỗi con
+        của tên (truy vấn 1–2 ký tự: tiền tố của 1 từ), xếp theo độ khớp rồi bậc nút — dùng được cho gợi ý
+        khi gõ (type-ahead) mà không duyệt toàn bộ nút."""
+        return [{'id': node, 'title': self.node_to_title.get(node, node), 'type': self.node_types.get(node)}
+                for node in self.search_index.search(query, node_type, limit, degree=self.G.degree)]
     
     def get_statistics(self) -> Dict:
         """Lấy thống kê tổng quan"""
@@ -162,10 +725,16 @@ class KnowledgeGraph:
         for _, _, d in self.G.edges(data=True):
             t = d['relation']
             edge_types[t] = edge_types.get(t, 0) + 1
+        # Cạnh clique ảo: đếm số cặp không trùng (= số cạnh nếu vật chất hoá)
+        virtual = self.cliques.pair_counts()
+        for t, cnt in virtual.items():
+            edge_types[t] = edge_types.get(t, 0) + cnt
         
         return {
             'nodes': self.G.number_of_nodes(),
-            'edges': self.G.number_of_edges(),
+            'edges': self.G.number_of_edges() + sum(virtual.values()),
+            'virtual_edges': sum(virtual.values()),
+            'clique_groups': len(self.cliques),
             'node_types': node_types,
             'edge_types': edge_types
         }
@@ -178,7 +747,8 @@ class KnowledgeGraph:
         print(f"🔵 Nút: {stats['nodes']}")
         for ntype, cnt in sorted(stats['node_types'].items(), key=lambda x: x[1], reverse=True):
             print(f"   • {ntype}: {cnt}")
-        print(f"\n🔗 Cạnh: {stats['edges']}")
+        print(f"\n🔗 Cạnh: {stats['edges']} (trong đó {stats['virtual_edges']} cạnh clique ảo"
+              f" từ {stats['clique_groups']} nhóm)")
         for etype, cnt in sorted(stats['edge_types'].items(), key=lambda x: x[1], reverse=True):
             print(f"   • {etype}: {cnt}")
         print("=" * 60)
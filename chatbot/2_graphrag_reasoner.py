@@ -5,6 +5,7 @@ Triển khai GraphRAG và suy luận Multi-hop trên đồ thị
 """
 from typing import List, Dict, Optional
 import importlib
+import re
 
 KnowledgeGraph = None  # Sẽ được import khi cần
 
@@ -90,7 +91,9 @@ class GraphRAGReasoner:
         """Format thông tin nút với mô tả rõ ràng về cạnh/kết nối"""
         s = f"\n📌 {info['title']} ({info['type']})\n"
         s += f"   Số cạnh vào (in-degree): {info['in_degree']}, Số cạnh ra (out-degree): {info['out_degree']}"
-        s += f"\n   💡 Giải thích: Node này có {info['in_degree'] + info['out_degree']} kết nối/quan hệ trong đồ thị"
+        if info.get('virtual_degree'):
+            s += f", Cạnh clique (cùng nước/nghề/trường): {info['virtual_degree']}"
+        s += f"\n   💡 Giải thích: Node này có {info['in_degree'] + info['out_degree'] + info.get('virtual_degree', 0)} kết nối/quan hệ trong đồ thị"
         # Thêm properties nếu có
         props = info.get('properties')
         if props:
@@ -120,39 +123,35 @@ class GraphRAGReasoner:
                 'missing_entities': missing
             }
         
-        # Dùng đồ thị vô hướng để bắt cả trường hợp cạnh chỉ có một chiều
+        # Đi vô hướng để bắt cả trường hợp cạnh chỉ có một chiều (gồm cả cạnh clique ảo). Chỉ lấy tối đa
+        # 5 đường ngắn nhất + số đường (ước lượng nếu quá nhiều) — không liệt kê mọi đường qua nút hub
         try:
-            undirected = self.kg.G.to_undirected(as_view=True)
-            import networkx as nx
-            paths = list(nx.all_simple_paths(undirected, node1, node2, cutoff=max_hops))
+            found = self.kg.shortest_paths(node1, node2, k=5, max_hops=max_hops, undirected=True)
         except Exception:
-            paths = []
+            found = {'paths': []}
         
-        if not paths:
+        if not found['paths']:
             return {
                 'connected': False, 
                 'reason': f'Không có đường đi (chuỗi cạnh kết nối) giữa {entity1} và {entity2} trong {max_hops} bước'
             }
         
-        shortest = min(paths, key=len)
+        shortest = found['paths'][0]
         shortest_len = len(shortest)
 
         # Giữ tối đa 5 đường đi ngắn nhất để hiển thị
-        shortest_paths = [p for p in paths if len(p) == shortest_len][:5]
+        shortest_paths = [p for p in found['paths'] if len(p) == shortest_len][:5]
         path_descs = [self._describe_path(p) for p in shortest_paths]
+        num_paths = found['num_paths']
+        num_text = str(num_paths) if found['num_paths_exact'] else f'khoảng {num_paths}'
 
         # Tìm hàng xóm chung (đường đi 2 bước)
-        neighbors1 = set(self.kg.G.successors(node1)) | set(self.kg.G.predecessors(node1))
-        neighbors2 = set(self.kg.G.successors(node2)) | set(self.kg.G.predecessors(node2))
+        neighbors1 = set(self.kg.neighbor_ids(node1))
+        neighbors2 = set(self.kg.neighbor_ids(node2))
         common_neighbors = list(neighbors1 & neighbors2)
 
         def _edge_rels(a, b):
-            rels = []
-            if self.kg.G.has_edge(a, b):
-                rels.append(self.kg.G[a][b].get('relation'))
-            if self.kg.G.has_edge(b, a):
-                rels.append(self.kg.G[b][a].get('relation'))
-            rels = [r for r in rels if r]
+            rels = [r for r in self.kg.edge_relations(a, b) if r]
             return sorted(set(rels)) if rels else []
 
         common_details = []
@@ -171,9 +170,9 @@ class GraphRAGReasoner:
             'path': [self.kg.node_to_title[n] for n in shortest],
             'description': path_descs[0] if path_descs else '',
             'paths': path_descs,
-            'num_paths': len(paths),
+            'num_paths': num_paths,
             'common_neighbors': common_details,
-            'explanation': f'Tìm thấy {len(paths)} đường đi qua các cạnh/quan hệ. Đường ngắn nhất có {shortest_len - 1} cạnh.'
+            'explanation': f'Tìm thấy {num_text} đường đi qua các cạnh/quan hệ. Đường ngắn nhất có {shortest_len - 1} cạnh.'
         }
     
     def _describe_path(self, path: List[str]) -> str:
@@ -184,12 +183,7 @@ class GraphRAGReasoner:
             src_title = self.kg.node_to_title[src]
             dst_title = self.kg.node_to_title[dst]
             # lấy relation cả hai chiều nếu có xung đột/khác nhau
-            rels = []
-            if self.kg.G.has_edge(src, dst):
-                rels.append(self.kg.G[src][dst].get('relation'))
-            if self.kg.G.has_edge(dst, src):
-                rels.append(self.kg.G[dst][src].get('relation'))
-            rels = [r for r in rels if r]
+            rels = [r for r in self.kg.edge_relations(src, dst) if r]
             if rels:
                 rel_txt = ", ".join(sorted(set(rels)))
             else:
@@ -206,8 +200,8 @@ class GraphRAGReasoner:
             return {'common': [], 'count': 0}
         
         # Lấy láng giềng
-        neighbors1 = set(self.kg.G.successors(node1)) | set(self.kg.G.predecessors(node1))
-        neighbors2 = set(self.kg.G.successors(node2)) | set(self.kg.G.predecessors(node2))
+        neighbors1 = set(self.kg.neighbor_ids(node1))
+        neighbors2 = set(self.kg.neighbor_ids(node2))
         
         common = neighbors1.intersection(neighbors2)
         
@@ -255,33 +249,8 @@ class GraphRAGReasoner:
 
     def find_people_by_country_and_university(self, country_title: str, university_title: str, limit: int = 50) -> Dict:
         """Tìm các person có cạnh from_country/born_in tới country và alumni_of tới university"""
-        def _resolve(title: str):
-            """Tìm node id theo title với so khớp mềm (bỏ dấu, bỏ gạch dưới/khoảng trắng)"""
-            import unicodedata, re
-            def norm(s):
-                s = unicodedata.normalize('NFD', s)
-                s = ''.join(ch for ch in s if unicodedata.category(ch) != 'Mn')
-                s = s.lower().replace('_', '').replace(' ', '')
-                # loại tiền tố country để so khớp linh hoạt (Trung Quoc vs country_Trung_Quoc)
-                if s.startswith('country'):
-                    s = s[len('country'):]
-                s = re.sub(r"[^a-z0-9]+", "", s)
-                return s
-
-            t_lower = title.lower()
-            # 1) So khớp exact (case-insensitive)
-            for t, n in self.kg.title_to_node.items():
-                if t.lower() == t_lower:
-                    return n
-            # 2) So khớp normalized (bỏ dấu, bỏ _ và space)
-            target = norm(title)
-            for t, n in self.kg.title_to_node.items():
-                if norm(t) == target:
-                    return n
-            return None
-
-        country_id = _resolve(country_title)
-        uni_id = _resolve(university_title)
+        country_id = self._resolve_title(country_title)
+        uni_id = self._resolve_title(university_title)
 
         missing = []
         if not country_id:
@@ -292,28 +261,15 @@ class GraphRAGReasoner:
             return {'people': [], 'missing': missing}
 
         people = []
-        for node, data in self.kg.G.nodes(data=True):
-            if data.get('node_type') != 'person':
-                continue
+        # Xuất phát từ alumni của trường (chỉ mục kề alumni_of) rồi kiểm tra cạnh quốc gia của từng người
+        for node in self._alumni_of(uni_id):
             # Kiểm tra cả cạnh ra và vào (phòng khi dữ liệu đảo chiều)
             has_country = any(
-                (nbr == country_id and self.kg.G[node][nbr].get('relation') in ['from_country', 'born_in'])
-                for nbr in self.kg.G.successors(node)
-            ) or any(
-                (nbr == country_id and self.kg.G[nbr][node].get('relation') in ['from_country', 'born_in'])
-                for nbr in self.kg.G.predecessors(node)
+                self.kg.G.has_edge(a, b) and self.kg.G[a][b].get('relation') in ['from_country', 'born_in']
+                for a, b in ((node, country_id), (country_id, node))
             )
-            if not has_country:
-                continue
-            has_uni = any(
-                (nbr == uni_id and self.kg.G[node][nbr].get('relation') == 'alumni_of')
-                for nbr in self.kg.G.successors(node)
-            ) or any(
-                (nbr == uni_id and self.kg.G[nbr][node].get('relation') == 'alumni_of')
-                for nbr in self.kg.G.predecessors(node)
-            )
-            if has_uni:
-                people.append(data.get('title', node))
+            if has_country:
+                people.append(self.kg.node_to_title.get(node, node))
             if len(people) >= limit:
                 break
 
@@ -321,88 +277,68 @@ class GraphRAGReasoner:
 
     def find_people_by_university(self, university_title: str, limit: int = 100) -> Dict:
         """Liệt kê các person có cạnh alumni_of tới một university"""
-        def _resolve(title: str):
-            import unicodedata, re
-            def norm(s):
-                s = unicodedata.normalize('NFD', s)
-                s = ''.join(ch for ch in s if unicodedata.category(ch) != 'Mn')
-                s = s.lower().replace('_', '').replace(' ', '')
-                s = re.sub(r"[^a-z0-9]+", "", s)
-                return s
+        uni_id = self._resolve_title(university_title)
+        if not uni_id:
+            return {'people': [], 'missing': [university_title]}
+
+        people = [self.kg.node_to_title.get(node, node) for node in self._alumni_of(uni_id)][:limit]
+        return {'people': people, 'missing': []}
+
+    def _alumni_of(self, uni_id: str) -> List[str]:
+        """Các person có cạnh alumni_of với trường, không trùng — cạnh vào (person -> uni) hoặc cạnh ra
+        (uni -> person) tùy dữ liệu; O(số alumni) qua chỉ mục kề thay vì duyệt mọi nút"""
+        return [node for node in dict.fromkeys(self.kg.relation_neighbors(uni_id, 'alumni_of'))
+                if self.kg.node_types.get(node) == 'person']
 
-            t_lower = title.lower()
-            for t, n in self.kg.title_to_node.items():
-                if t.lower() == t_lower:
-                    return n
-            target = norm(title)
-            for t, n in self.kg.title_to_node.items():
-                if norm(t) == target:
-                    return n
+    def _resolve_title(self, title: str) -> Optional[str]:
+        """
+        Node id theo title: khớp đúng, rồi khớp bỏ dấu / hoa thường / gạch dưới qua kg.search_index (khoá
+        node_details_store.normalize_key — không duyệt mọi nút), rồi id nút, rồi bỏ tiền tố country_ / career_
+        (country_Trung_Quoc → Trung Quốc). Nhiều nút cùng khoá → ưu tiên title trùng không phân biệt hoa thường.
+        """
+        if not title:
             return None
+        node = self.kg.title_to_node.get(title)
+        if node is not None:
+            return node
+        t_lower = title.lower()
+        rank = lambda n: (str(self.kg.node_to_title.get(n, n)).lower() != t_lower, str(n))
+        matches = self.kg.search_index.exact(title)
+        if matches:
+            return min(matches, key=rank)
+        if title in self.kg.G:
+            return title
+        bare = re.sub(r'^(?:country|career)[_ ]+', '', title, flags=re.I)
+        matches = self.kg.search_index.exact(bare) if bare != title else None
+        return min(matches, key=rank) if matches else None
 
-        uni_id = _resolve(university_title)
+    def find_people_by_university_and_years(self, university_title: str, start: Optional[int] = None,
+                                            end: Optional[int] = None, limit: int = 100) -> Dict:
+        """Alumni của một university tốt nghiệp trong khoảng năm [start, end] (chỉ mục năm của KG)"""
+        uni_id = self._resolve_title(university_title)
         if not uni_id:
             return {'people': [], 'missing': [university_title]}
+        rows = self.kg.graduates(uni_id, start, end)
+        people = [f"{r['title']} ({r['year']})" for r in rows[:limit]]
+        return {'people': people, 'missing': [], 'count': len(rows)}
 
-        people = []
-        for node, data in self.kg.G.nodes(data=True):
-            if data.get('node_type') != 'person':
-                continue
-            # alumni_of có thể là cạnh ra (person -> uni) hoặc cạnh vào (uni -> person) tùy dữ liệu
-            has_uni = any(
-                (nbr == uni_id and self.kg.G[node][nbr].get('relation') == 'alumni_of')
-                for nbr in self.kg.G.successors(node)
-            ) or any(
-                (nbr == uni_id and self.kg.G[nbr][node].get('relation') == 'alumni_of')
-                for nbr in self.kg.G.predecessors(node)
-            )
-            if has_uni:
-                people.append(data.get('title', node))
-            if len(people) >= limit:
-                break
-
-        return {'people': people, 'missing': []}
+    def find_same_graduation_year(self, person_title: str, university_title: Optional[str] = None,
+                                  limit: int = 100) -> Dict:
+        """Những người tốt nghiệp cùng năm, cùng trường với person_title"""
+        person_id = self._resolve_title(person_title)
+        uni_id = self._resolve_title(university_title) if university_title else None
+        missing = [t for t, n in ((person_title, person_id), (university_title, uni_id)) if t and not n]
+        if missing:
+            return {'people': [], 'missing': missing}
+        rows = self.kg.same_graduation_year(person_id, uni_id)
+        people = [f"{r['title']} ({self.kg.node_to_title.get(r['university'], r['university'])}, {r['year']})"
+                  for r in rows[:limit]]
+        return {'people': people, 'missing': [], 'count': len(rows),
+                'years': self.kg.graduation_years(person_id)}
 
     def find_people_by_country(self, country_title: str, limit: int = 100) -> Dict:
         """Tìm các person có cạnh from_country/born_in tới country (không yêu cầu trường)"""
-        import unicodedata, re
-        
-        country_id = None
-        
-        def norm(s):
-            """Normalize string for comparison"""
-            s = unicodedata.normalize('NFD', s)
-            s = ''.join(ch for ch in s if unicodedata.category(ch) != 'Mn')
-            s = s.lower().replace('_', '').replace(' ', '')
-            s = re.sub(r"[^a-z0-9]+", "", s)
-            return s
-        
-        # Strategy 1: Exact match (case-insensitive) via title_to_node
-        t_lower = country_title.lower()
-        for t, n in self.kg.title_to_node.items():
-            if t.lower() == t_lower:
-                country_id = n
-                break
-        
-        # Strategy 2: Normalized match (remove diacritics, spaces, underscores)
-        if not country_id:
-            target = norm(country_title)
-            for t, n in self.kg.title_to_node.items():
-                if norm(t) == target:
-                    country_id = n
-                    break
-        
-        # Strategy 3: Try as node_id directly (if user provides raw node_id)
-        if not country_id and country_title in self.kg.G.nodes():
-            country_id = country_title
-        
-        # Strategy 4: Search in graph nodes by title attribute if not found yet
-        if not country_id:
-            for node_id, node_data in self.kg.G.nodes(data=True):
-                node_title = node_data.get('title', '')
-                if norm(node_title) == norm(country_title):
-                    country_id = node_id
-                    break
+        country_id = self._resolve_title(country_title)
         
         if not country_id:
             return {'people': [], 'missing': [country_title]}
@@ -30,15 +30,10 @@ class EvaluationDatasetGenerator:
             title1 = self.kg.node_to_title[p1]
             title2 = self.kg.node_to_title[p2]
             
-            # Kiểm tra kết nối
-            try:
-                import networkx as nx
-                path = nx.shortest_path(self.kg.G, p1, p2)
-                connected = True
-                hops = len(path) - 1
-            except:
-                connected = False
-                hops = 0
+            # Kiểm tra kết nối — cùng cách chatbot trả lời (check_connection): vô hướng, ≤ 3 bước, gồm cạnh clique ảo
+            found = self.kg.shortest_paths(p1, p2, k=1, max_hops=3, undirected=True, count=False)
+            connected = found['distance'] is not None
+            hops = found['distance'] if connected else 0
             
             questions.append({
                 'id': i + 1,
@@ -5,9 +5,13 @@ Chatbot kết hợp GraphRAG + LLM Qwen OWen3 0.6B
 """
 import os
 import re
-import unicodedata
+import sys
 from typing import Dict, Optional, List
 
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+from node_details_store import normalize_key, open_node_details
+
 
 class QwenLLM:
     """LLM Qwen OWen3 0.6B + GraphRAG"""
@@ -212,19 +216,15 @@ ANSWER:"""
 class GraphRAGChatbot:
     """Chatbot kết hợp GraphRAG + Qwen OWen3 LLM"""
     
-    def __init__(self, kg, reasoner, node_details_path='../graph_out/node_details.json'):
+    def __init__(self, kg, reasoner, node_details_path=os.path.join(ROOT_DIR, 'graph_out', 'node_details.json')):
         self.kg = kg
         self.reasoner = reasoner
         
-        # Load node details
+        # Node details: kho SQLite node_details.sqlite (dựng 1 lần từ .ndjson/.json nếu thiếu hoặc cũ) —
+        # không nạp gì theo số node lúc khởi động, bản ghi đọc khi cần + LRU giới hạn
         self.node_details = {}
-        import json
         try:
-            with open(node_details_path, 'r', encoding='utf-8') as f:
-                details_list = json.load(f)
-                for detail in details_list:
-                    title = detail.get('title', '')
-                    self.node_details[title] = detail
+            self.node_details = open_node_details(node_details_path, build=True)
             print(f"   📚 Đã load {len(self.node_details)} node details")
         except Exception as e:
             print(f"   ⚠️  Không thể load node_details.json: {e}")
@@ -290,9 +290,9 @@ class GraphRAGChatbot:
         for entity in entities:
             node_id = self.reasoner.kg.title_to_node.get(entity)
             if node_id:
-                # Lấy neighbors (liên kết trong graph)
-                neighbors = list(self.reasoner.kg.G.neighbors(node_id))[:5]  # Limit 5
-                relations = [self.reasoner.kg.G[node_id][nbr].get('relation', 'link') for nbr in neighbors]
+                # Lấy neighbors (liên kết trong graph, gồm cả cạnh clique ảo)
+                neighbors = self.reasoner.kg.neighbor_ids(node_id, undirected=False)[:5]  # Limit 5
+                relations = [(self.reasoner.kg.edge_relations(node_id, nbr) or [None])[0] or 'link' for nbr in neighbors]
                 neighbor_names = [self.reasoner.kg.node_to_title.get(nbr, nbr) for nbr in neighbors]
                 
                 context_info += f"\n{entity} có liên kết với: "
@@ -385,8 +385,7 @@ class GraphRAGChatbot:
                     # Chỉ tính cạnh alumni_of (ra và vào) để tránh nhiễu từ link_to
                     alumni |= {n['title'] for n in self.reasoner.kg.get_neighbors(node_id, 'alumni_of')}
                     alumni |= {self.reasoner.kg.node_to_title.get(nbr, nbr)
-                               for nbr in self.reasoner.kg.G.predecessors(node_id)
-                               if self.reasoner.kg.G[nbr][node_id].get('relation') == 'alumni_of'}
+                               for nbr in self.reasoner.kg.relation_neighbors(node_id, 'alumni_of', 'in')}
 
                 if any(self._normalize_text(uni) in self._normalize_text(a) for a in alumni):
                     answer_text = f"Có. {person} học tại {uni}."
@@ -461,6 +460,65 @@ class GraphRAGChatbot:
                 'answer': replace_thankyou(answer_text)
             }
 
+        # LOẠI 3a: TEMPORAL - Lọc theo năm tốt nghiệp (chỉ mục năm của KG, cạnh alumni_of có năm)
+        # "cựu sinh viên Harvard tốt nghiệp 1990-2000", "ai tốt nghiệp cùng năm với X (ở trường Y)"
+        years = [int(y) for y in re.findall(r'\b(?:19|20)\d{2}\b', norm_query)]
+        if 'tot nghiep' in norm_query and ('cung nam' in norm_query or 'cung khoa' in norm_query):
+            kg = self.reasoner.kg
+            persons = [e for e in entities if kg.node_types.get(kg.title_to_node.get(e)) == 'person']
+            unis = [e for e in entities if kg.node_types.get(kg.title_to_node.get(e)) == 'university']
+            if len(persons) == 1:
+                print(f"[LOG] Handling same graduation year for {persons[0]}", file=sys.stderr, flush=True)
+                res = self.reasoner.find_same_graduation_year(persons[0], unis[0] if unis else None, limit=200)
+                if res.get('missing'):
+                    answer = f"❌ Không tìm thấy node: {', '.join(res['missing'])}"
+                elif not res.get('years'):
+                    answer = f"Đồ thị không có năm tốt nghiệp của {persons[0]}."
+                elif res['people']:
+                    show = res['people'][:50]
+                    more = res['count'] - len(show)
+                    answer = (f"Những người tốt nghiệp cùng năm, cùng trường với {persons[0]}:\n- " + "\n- ".join(show)
+                              + (f" (và {more} người khác)" if more > 0 else ""))
+                else:
+                    answer = f"Không tìm thấy ai tốt nghiệp cùng năm, cùng trường với {persons[0]} trong đồ thị."
+                return {
+                    'query': query,
+                    'type': 'same_graduation_year',
+                    'context': '',
+                    'reasoning': None,
+                    'answer': answer
+                }
+        elif years and len(entities) == 0:
+            uni_hit = self._find_node_by_type_in_query(norm_query, 'university')
+            if uni_hit:
+                start, end = min(years), max(years)
+                if 'truoc nam' in norm_query:
+                    start = None
+                elif 'sau nam' in norm_query or ('tu nam' in norm_query and len(years) == 1):
+                    end = None
+                print(f"[LOG] Handling alumni of {uni_hit} graduated {start}-{end}", file=sys.stderr, flush=True)
+                agg = self.reasoner.find_people_by_university_and_years(uni_hit, start, end, limit=200)
+                if start is None or end is None:
+                    span = f"đến năm {end}" if start is None else f"từ năm {start}"
+                else:
+                    span = f"năm {start}" if start == end else f"{start}–{end}"
+                if agg.get('missing'):
+                    answer = f"❌ Không tìm thấy node trường: {', '.join(agg['missing'])}"
+                elif agg['people']:
+                    show = agg['people'][:50]
+                    more = agg['count'] - len(show)
+                    answer = (f"Cựu sinh viên {uni_hit} tốt nghiệp {span}:\n- " + "\n- ".join(show)
+                              + (f" (và {more} người khác)" if more > 0 else ""))
+                else:
+                    answer = f"Không tìm thấy cựu sinh viên {uni_hit} tốt nghiệp {span} trong đồ thị."
+                return {
+                    'query': query,
+                    'type': 'aggregate_university_alumni',
+                    'context': '',
+                    'reasoning': None,
+                    'answer': answer
+                }
+
         # LOẠI 3b: AGGREGATE - Liệt kê cựu sinh viên của một trường (ví dụ: "liệt kê sinh viên Harvard")
         # Ưu tiên dữ liệu đồ thị thay vì gọi LLM để tránh bịa.
         aggregate_list_trigger = any(kw in norm_query for kw in ['liet ke', 'danh sach', 'nhung', 'những', 'ai', 'ke', 'liệt kê', 'sinh vien', 'cuu sinh vien'])
@@ -836,6 +894,11 @@ class GraphRAGChatbot:
                 rel = self.reasoner.kg.G[node2][node1]['relation']
                 edges.append(f"🔗 {entities[1]} --[cạnh: {rel}]--> {entities[0]}")
                 connected_flag = True
+            # Cạnh clique ảo (vô hướng): same_birth_country / same_career / same_uni
+            if node1 and node2:
+                for rel in self.reasoner.kg.cliques.relations(node1, node2):
+                    edges.append(f"🔗 {entities[0]} --[cạnh: {rel}]-- {entities[1]}")
+                    connected_flag = True
 
             # Kiểm tra properties của mỗi node
             info1 = self.reasoner.kg.get_node_info(node1) if node1 else None
@@ -920,26 +983,8 @@ class GraphRAGChatbot:
             return 'general'
 
     def _normalize_text(self, text: str) -> str:
-        """Chuẩn hóa để so khớp tự do trong câu hỏi"""
-        import re
-        # Thay thế thủ công các ký tự tiếng Việt để tránh mất chữ Đ/đ
-        replacements = {
-            'đ': 'd', 'Đ': 'D',
-            'ă': 'a', 'Ă': 'A',
-            'â': 'a', 'Â': 'A',
-            'ê': 'e', 'Ê': 'E',
-            'ô': 'o', 'Ô': 'O',
-            'ơ': 'o', 'Ơ': 'O',
-            'ư': 'u', 'Ư': 'U'
-        }
-        for vn_char, latin_char in replacements.items():
-            text = text.replace(vn_char, latin_char)
-
-        s = unicodedata.normalize('NFD', text)
-        s = ''.join(ch for ch in s if unicodedata.category(ch) != 'Mn')
-        s = s.lower().replace('_', ' ').replace('-', ' ')
-        s = re.sub(r"[^a-z0-9 ]+", " ", s)
-        return " ".join(s.split())
+        """Chuẩn hóa để so khớp tự do trong câu hỏi (cùng khoá norm_title/props_text của kho node_details)"""
+        return normalize_key(text)
 
     def _find_node_by_type_in_query(self, norm_query: str, node_type: str) -> Optional[str]:
         """Tìm node theo loại nếu tiêu đề xuất hiện trong câu hỏi (lỏng)"""
@@ -1111,6 +1156,11 @@ class GraphRAGChatbot:
         }
         country_keys = country_aliases.get(norm_country, [norm_country])
 
+        # Kho SQLite: lọc ngay trên cột props_text đã chuẩn hoá, không giải mã từng bản ghi
+        if hasattr(self.node_details, 'search'):
+            return self.node_details.search('person', contains_all=[norm_uni], contains_any=country_keys,
+                                            limit=limit)
+
         people = []
 
         for title, detail in self.node_details.items():
@@ -1490,8 +1540,7 @@ class GraphRAGChatbot:
                 # Nếu vẫn chưa có, thử inbound (đề phòng dữ liệu một chiều)
                 if not alumni:
                     alumni |= {self.reasoner.kg.node_to_title.get(nbr, nbr)
-                               for nbr in self.reasoner.kg.G.predecessors(node_id)
-                               if self.reasoner.kg.G[nbr][node_id].get('relation') == 'alumni_of'}
+                               for nbr in self.reasoner.kg.relation_neighbors(node_id, 'alumni_of', 'in')}
                 
                 # Nếu câu hỏi hỏi danh sách
                 if not uni_hit and any(kw in norm_query for kw in ['nhung', 'nao']):
@@ -1751,6 +1800,9 @@ class GraphRAGChatbot:
                             rel = self.reasoner.kg.G[node2][node1].get('relation', 'connected')
                             relation_names.add(rel)
                             relations.append(f"{entities[1]} --[{rel}]--> {entities[0]}")
+                        for rel in self.reasoner.kg.cliques.relations(node1, node2):
+                            relation_names.add(rel)
+                            relations.append(f"{entities[0]} --[{rel}]-- {entities[1]}")
 
                     # Nếu có quan hệ same_birth_country, cố gắng nêu tên quốc gia
                     birth_rels = {'from_country', 'born_in'}
@@ -1859,8 +1911,7 @@ class GraphRAGChatbot:
                     alumni |= {n['title'] for n in self.reasoner.kg.get_neighbors(node_id, 'alumni_of')}
                     # inbound alumni_of (dữ liệu một chiều)
                     alumni |= {self.reasoner.kg.node_to_title.get(nbr, nbr)
-                               for nbr in self.reasoner.kg.G.predecessors(node_id)
-                               if self.reasoner.kg.G[nbr][node_id].get('relation') == 'alumni_of'}
+                               for nbr in self.reasoner.kg.relation_neighbors(node_id, 'alumni_of', 'in')}
                     # Fallback: bất kỳ cạnh nào nối tới node kiểu university (ví dụ relation link_to)
                     for nbr in self.reasoner.kg.G.successors(node_id):
                         if self.reasoner.kg.G.nodes[nbr].get('node_type') == 'university':
@@ -42,15 +42,10 @@ class VietnameseQuestionGenerator:
             p1 = self.kg.node_to_title[p1_id]
             p2 = self.kg.node_to_title[p2_id]
             
-            # Check connection
-            import networkx as nx
-            try:
-                path = nx.shortest_path(self.kg.G, p1_id, p2_id)
-                connected = True
-                hops = len(path) - 1
-            except:
-                connected = False
-                hops = 0
+            # Check connection — same search as the chatbot (check_connection): undirected, ≤ 3 hops, incl. virtual clique edges
+            found = self.kg.shortest_paths(p1_id, p2_id, k=1, max_hops=3, undirected=True, count=False)
+            connected = found['distance'] is not None
+            hops = found['distance'] if connected else 0
             
             # Generate question
             template = random.choice(templates)
@@ -82,11 +82,15 @@ def chat():
         if not user_message:
             return jsonify({'error': 'Vui lòng nhập câu hỏi'}), 400
         
+        # Áp các thay đổi mới trong changelog (rẻ: chỉ stat file khi không có gì mới)
+        kg.refresh()
+        
         # Gọi chatbot
         print(f"\n{'='*70}")
         print(f"🔍 USER QUERY: {user_message}")
         print(f"{'='*70}")
-        result = chatbot.answer(user_message)
+        with kg.reading():  # refresh() của request khác chờ câu trả lời này xong mới sửa đồ thị
+            result = chatbot.answer(user_message)
         bot_message = result['answer']
         
         print(f"📝 RESULT TYPE: {result.get('type', 'general')}")
@@ -162,11 +166,15 @@ def clear_history():
 def get_stats():
     """Lấy thống kê"""
     try:
-        return jsonify({
-            'graph': {
+        kg.refresh()
+        with kg.reading():
+            graph = {
                 'nodes': kg.G.number_of_nodes(),
-                'edges': kg.G.number_of_edges()
-            },
+                'edges': kg.number_of_edges(),
+                'version': kg.version
+            }
+        return jsonify({
+            'graph': graph,
             'chat_count': len(chat_history),
             'status': 'ready'
         })
@@ -0,0 +1,258 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Kiểm tra changelog tăng dần (graph_changelog.py + KnowledgeGraph.refresh / apply_delta) trên đồ thị tổng hợp:
+- sau mỗi lô, đồ thị đang chạy (refresh) == đồ thị nạp mới (CSV + phát lại changelog)
+- sau compact, đồ thị đang chạy (chưa nạp lại) == nạp CSV đã compact == nạp snapshot đã compact
+- refresh khi changelog đã compact vượt phiên bản đang chạy → nạp lại đúng phiên bản
+- nhiều thread đọc + refresh đồng thời trong khi ghi lô / compact: không lỗi, mỗi lô áp đúng 1 lần
+Chạy: python chatbot/test_changelog.py [--seed 0] [--batches 30]
+"""
+
+import os
+import sys
+import csv
+import io
+import json
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+import contextlib
+import importlib
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [HERE, os.path.dirname(HERE)]
+
+from graph_changelog import Changelog, compact
+from clique_groups import GROUPS_HEADER
+from graph_loader import EDGE_COLUMNS, NODE_COLUMNS
+
+KnowledgeGraph = importlib.import_module('1_knowledge_graph').KnowledgeGraph
+
+PERSONS = [f"Người {i}" for i in range(60)]
+UNIS = [f"Đại học {i}" for i in range(8)]
+COUNTRIES = [f"country_Nước {i}" for i in range(4)]
+CAREERS = [f"career_Nghề {i}" for i in range(4)]
+NEW_PER_BATCH = 200  # số nút mới mỗi lô trong kiểm tra đa luồng
+
+
+def write_graph(graph_dir, rng, legacy_pairs=False):
+    """nodes / edges (+ groups) CSV tổng hợp: năm tốt nghiệp, cặp trùng alumni_of + link_to, nút ngầm"""
+    nodes = [(p, p, 'person', json.dumps({'Sinh': str(1940 + i)}, ensure_ascii=False)) for i, p in enumerate(PERSONS)]
+    nodes += [(u, u, 'university', '') for u in UNIS]
+    nodes += [(c, c[len('country_'):], 'country', '') for c in COUNTRIES]
+    nodes += [(k, k[len('career_'):], 'career', '') for k in CAREERS]
+    edges, groups = [], []
+    for p in PERSONS:
+        for u in rng.sample(UNIS, rng.randint(0, 2)):
+            year = ';'.join(str(y) for y in sorted(rng.sample(range(1960, 2020), rng.randint(0, 2))))
+            edges.append((p, u, 'alumni_of', 1, year))
+            if rng.random() < 0.2:
+                edges.append((p, u, 'link_to', 1, ''))
+        for q in rng.sample(PERSONS + ['Nút ngầm A', 'Nút ngầm B'], 2):
+            if q != p:
+                edges.append((p, q, 'link_to', 1, ''))
+        country, career = rng.choice(COUNTRIES), rng.choice(CAREERS)
+        edges.append((p, country, 'born_in', 1, ''))
+        edges.append((p, career, 'has_career', 1, ''))
+        groups.append(('same_birth_country', country, 1, p))
+        groups.append(('same_career', career, 1, p))
+    with open(os.path.join(graph_dir, 'nodes_unified.csv'), 'w', encoding='utf-8', newline='') as f:
+        w = csv.writer(f)
+        w.writerow(NODE_COLUMNS)
+        w.writerows(nodes)
+    if legacy_pairs:
+        # Dạng cũ: cặp clique nằm trong file cạnh, không có groups_unified.csv
+        by_group = {}
+        for rel, group, _, member in groups:
+            by_group.setdefault((rel, group), []).append(member)
+        for (rel, _), members in by_group.items():
+            for i, a in enumerate(members):
+                for b in members[i + 1:]:
+                    edges.append((a, b, rel, 1, ''))
+    with open(os.path.join(graph_dir, 'edges_unified.csv'), 'w', encoding='utf-8', newline='') as f:
+        w = csv.writer(f)
+        w.writerow(EDGE_COLUMNS)
+        w.writerows(edges)
+    if not legacy_pairs:
+        with open(os.path.join(graph_dir, 'groups_unified.csv'), 'w', encoding='utf-8', newline='') as f:
+            w = csv.writer(f)
+            w.writerow(GROUPS_HEADER)
+            w.writerows(groups)
+
+
+def random_batch(rng, version):
+    """1 lô thao tác ngẫu nhiên gồm đủ 6 loại; id mới mang số phiên bản để title không trùng"""
+    people = PERSONS + [f"Người mới {v}" for v in range(version)]
+    ops = []
+    for _ in range(rng.randint(5, 25)):
+        kind = rng.choice(('upsert_node', 'upsert_node', 'delete_node', 'upsert_edge', 'upsert_edge',
+                           'upsert_edge', 'delete_edge', 'add_member', 'remove_member'))
+        p, q = rng.choice(people), rng.choice(people)
+        if kind == 'upsert_node':
+            op = {'op': kind, 'id': rng.choice([p, f"Người mới {version}"]), 'type': 'person'}
+            if rng.random() < 0.5:
+                op['title'] = f"{op['id']} (v{version})"
+            if rng.random() < 0.5:
+                op['properties'] = rng.choice([None, {'Nghề': f"Nghề {version}"}])
+        elif kind == 'delete_node':
+            op = {'op': kind, 'id': rng.choice([p, rng.choice(UNIS), 'Nút ngầm A'])}
+        elif kind == 'upsert_edge':
+            rel = rng.choice(('alumni_of', 'link_to', 'born_in'))
+            dst = {'alumni_of': rng.choice(UNIS), 'link_to': q, 'born_in': rng.choice(COUNTRIES)}[rel]
+            op = {'op': kind, 'from': p, 'to': dst, 'type': rel}
+            if rel == 'alumni_of' and rng.random() < 0.7:
+                op['year'] = rng.choice([None, rng.randint(1960, 2020), [1990, 1995]])
+        elif kind == 'delete_edge':
+            op = {'op': kind, 'from': p, 'to': rng.choice(UNIS + [q])}
+            if rng.random() < 0.5:
+                op['type'] = rng.choice(('alumni_of', 'link_to'))
+        else:
+            rel, groups = rng.choice((('same_birth_country', COUNTRIES), ('same_career', CAREERS)))
+            op = {'op': kind, 'relation': rel, 'group': rng.choice(groups), 'member': p}
+        ops.append(op)
+    return ops
+
+
+def load(graph_dir, snapshot=False):
+    snapshot_dir = os.path.join(graph_dir, 'snapshot' if snapshot else '_no_snapshot')
+    with contextlib.redirect_stdout(io.StringIO()):
+        return KnowledgeGraph(os.path.join(graph_dir, 'nodes_unified.csv'),
+                              os.path.join(graph_dir, 'edges_unified.csv'), snapshot_dir, cache_dir='')
+
+
+def state(kg):
+    """Trạng thái so sánh được (không phụ thuộc thứ tự chèn) của đồ thị + mọi chỉ mục phụ"""
+    rel_adj = {rel: tuple({n: sorted(nbrs) for n, nbrs in side.items() if nbrs} for side in sides)
+               for rel, sides in kg._rel_adj.items()}
+    return {
+        'nodes': sorted((n, d.get('title'), d.get('node_type'), json.dumps(d.get('properties'), sort_keys=True))
+                        for n, d in kg.G.nodes(data=True)),
+        'edges': sorted((a, b, d['relation'], d.get('years')) for a, b, d in kg.G.edges(data=True)),
+        'edge_types': sorted((k, sorted(v)) for k, v in kg._edge_types.items()),
+        'cliques': sorted((rel, min(a, b), max(a, b)) for a, b, rel, _ in kg.cliques.iter_pairs()),
+        'node_to_title': kg.node_to_title,
+        'title_to_node': kg.title_to_node,
+        'node_types': kg.node_types,
+        'rel_adj': {rel: sides for rel, sides in rel_adj.items() if any(sides)},
+        'search': [sorted(r['id'] for r in kg.search_nodes(q, limit=10 ** 6)) for q in ('nguoi', 'dai hoc', 'v3')],
+        'graduates': sorted((r['year'], r['id'], r['university']) for r in kg.graduates()),
+        'version': kg.version,
+    }
+
+
+def diff(a, b):
+    return [k for k in a if a[k] != b[k]]
+
+
+def check_replay(seed, batches, legacy_pairs):
+    rng = random.Random(seed)
+    graph_dir = tempfile.mkdtemp(prefix='test_changelog_')
+    failures = []
+    try:
+        write_graph(graph_dir, rng, legacy_pairs)
+        log = Changelog(graph_dir)
+        live = load(graph_dir)
+        for i in range(batches):
+            log.append(random_batch(rng, log.head_version() + 1))
+            with contextlib.redirect_stdout(io.StringIO()):
+                live.refresh()
+            bad = diff(state(live), state(load(graph_dir)))
+            if bad:
+                failures.append(f"lô {i + 1}: refresh ≠ phát lại ({', '.join(bad)})")
+            if i == batches // 2 or i == batches - 1:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    compact(graph_dir)
+                expected = state(live)  # đồ thị đang chạy chưa nạp lại
+                for name, kg in (('CSV', load(graph_dir)), ('snapshot', load(graph_dir, snapshot=True))):
+                    bad = diff(expected, state(kg))
+                    if bad:
+                        failures.append(f"compact sau lô {i + 1}: đồ thị đang chạy ≠ nạp {name} ({', '.join(bad)})")
+                with contextlib.redirect_stdout(io.StringIO()):
+                    log.append(random_batch(rng, log.head_version() + 1))
+                    live.refresh()  # changelog đã cắt → áp lô mới trên bản nạp lại
+                bad = diff(state(live), state(load(graph_dir)))
+                if bad:
+                    failures.append(f"refresh sau compact (lô {i + 1}) ≠ nạp mới ({', '.join(bad)})")
+    finally:
+        shutil.rmtree(graph_dir, ignore_errors=True)
+    return failures
+
+
+def check_threads(seed, batches=40, readers=6):
+    """Đọc + refresh từ nhiều thread trong khi ghi lô và compact giữa chừng"""
+    rng = random.Random(seed)
+    graph_dir = tempfile.mkdtemp(prefix='test_changelog_threads_')
+    errors, stop = [], threading.Event()
+    try:
+        write_graph(graph_dir, rng)
+        log = Changelog(graph_dir)
+        kg = load(graph_dir)
+        n_nodes = kg.G.number_of_nodes()
+
+        def reader():
+            while not stop.is_set():
+                try:
+                    kg.refresh()
+                    with kg.reading():
+                        if sum(1 for _ in kg.G.nodes) < n_nodes:
+                            errors.append('thấy đồ thị dựng dở')
+                        for n in kg.G.nodes:
+                            kg.neighbor_ids(n)
+                        kg.search_nodes('nguoi')
+                except Exception as e:
+                    errors.append(repr(e))
+
+        # redirect_stdout đổi sys.stdout của cả process → chỉ đặt 1 lần ở thread chính
+        with contextlib.redirect_stdout(io.StringIO()):
+            threads = [threading.Thread(target=reader) for _ in range(readers)]
+            for t in threads:
+                t.start()
+            for v in range(1, batches + 1):
+                # chỉ thêm nút / cạnh → số nút không giảm; mỗi lô đúng NEW_PER_BATCH nút mới
+                ops = []
+                for i in range(NEW_PER_BATCH):
+                    ops.append({'op': 'upsert_node', 'id': f"Luồng {v}-{i}", 'type': 'person'})
+                    ops.append({'op': 'upsert_edge', 'from': f"Luồng {v}-{i}", 'to': rng.choice(PERSONS),
+                                'type': 'link_to'})
+                log.append(ops)
+                if v == batches // 2:
+                    compact(graph_dir)
+            stop.set()
+            for t in threads:
+                t.join()
+            kg.refresh()
+        added = sum(1 for n in kg.G if n.startswith('Luồng '))
+        if kg.version != log.head_version() or added != NEW_PER_BATCH * batches:
+            errors.append(f"phiên bản {kg.version}/{log.head_version()}, {added}/{NEW_PER_BATCH * batches} nút mới")
+    finally:
+        shutil.rmtree(graph_dir, ignore_errors=True)
+    return errors
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Kiểm tra changelog: refresh / apply_delta / compact')
+    ap.add_argument('--seed', type=int, default=0)
+    ap.add_argument('--batches', type=int, default=30)
+    args = ap.parse_args()
+
+    ok = True
+    for legacy_pairs in (False, True):
+        label = 'cặp clique trong file cạnh' if legacy_pairs else 'groups_unified.csv'
+        failures = check_replay(args.seed, args.batches, legacy_pairs)
+        print(f"{'✅' if not failures else '❌'} Phát lại / compact ({label}): {args.batches} lô")
+        for f in failures[:10]:
+            print(f"   {f}")
+        ok &= not failures
+    errors = check_threads(args.seed)
+    print(f"{'✅' if not errors else '❌'} Đọc + refresh đồng thời: {len(errors)} lỗi")
+    for e in errors[:5]:
+        print(f"   {e}")
+    ok &= not errors
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Kiểm tra path_search.py (k_shortest_paths / count_paths) so với liệt kê vét cạn mọi đường đi đơn:
+- đồ thị ngẫu nhiên có nút hub, có hướng (neighbors + reverse_neighbors) và vô hướng, max_hops 2..4:
+  distance, num_shortest (đếm σ), các đường ngắn nhất đúng thứ tự DFS, k đường Yen (độ dài = k đường ngắn
+  nhất của vét cạn), count_paths chính xác khi đủ budget; budget nhỏ → truncated, không đường sai
+- (nếu có graph_out/) kg.shortest_paths so với kg.find_paths (DFS vét cạn) trên các cặp nút ngẫu nhiên,
+  có hướng và vô hướng; mặc định 2 bước (3 bước: find_paths qua nút hub mất ~15 giây / cặp)
+Chạy: python chatbot/test_path_search.py [--seed 0] [--graphs 40] [--pairs 100] [--graph-dir graph_out]
+      [--graph-hops 3]
+"""
+
+import os
+import sys
+import io
+import random
+import argparse
+import contextlib
+import importlib
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [HERE, os.path.dirname(HERE)]
+
+from path_search import count_paths, k_shortest_paths
+
+UNLIMITED = 10 ** 9
+
+
+def random_graph(rng, n):
+    """Danh sách kề có hướng {node: [láng giềng]} (thứ tự ngẫu nhiên, có khuyên + cạnh lặp) với 1 nút hub"""
+    succ = {v: [] for v in range(n)}
+    p = rng.uniform(0.05, 0.2)
+    for a in range(n):
+        for b in range(n):
+            if rng.random() < p:
+                succ[a].append(b)
+    hub = rng.randrange(n)
+    for v in rng.sample(range(n), n // 2):
+        succ[hub].append(v)
+        succ[v].append(hub)
+    for nbrs in succ.values():
+        rng.shuffle(nbrs)
+    return succ
+
+
+def reverse(succ):
+    pred = {v: [] for v in succ}
+    for a, nbrs in succ.items():
+        for b in nbrs:
+            pred[b].append(a)
+    return pred
+
+
+def undirected(succ):
+    pred = reverse(succ)
+    return {v: list(dict.fromkeys(succ[v] + pred[v])) for v in succ}
+
+
+def brute_paths(nbrs, src, dst, max_hops):
+    """Mọi đường đi đơn src → dst ≤ max_hops cạnh theo thứ tự DFS láng giềng (như nx.all_simple_paths)"""
+    out, path = [], [src]
+
+    def dfs(u):
+        for v in dict.fromkeys(nbrs(u)):
+            if v in path:
+                continue
+            if v == dst:
+                out.append(path + [v])
+            elif len(path) < max_hops:
+                path.append(v)
+                dfs(v)
+                path.pop()
+    if src != dst:
+        dfs(src)
+    return out
+
+
+def check_pair(nbrs, rev, src, dst, max_hops, k):
+    """→ [lỗi] khi so k_shortest_paths / count_paths với vét cạn"""
+    errors = []
+    every = brute_paths(nbrs, src, dst, max_hops)
+    r = k_shortest_paths(nbrs, src, dst, k=k, max_hops=max_hops, budget=UNLIMITED, reverse_neighbors=rev)
+    tag = f"{src}→{dst} hops={max_hops} k={k}"
+    if r['truncated']:
+        errors.append(f"{tag}: truncated với budget không giới hạn")
+    if not every:
+        if r['distance'] is not None or r['paths'] or r['num_shortest']:
+            errors.append(f"{tag}: không có đường nhưng trả về {r}")
+    else:
+        d = min(len(p) for p in every) - 1
+        shortest = [p for p in every if len(p) == d + 1]
+        if r['distance'] != d:
+            errors.append(f"{tag}: distance {r['distance']} ≠ {d}")
+        if r['num_shortest'] != len(shortest):
+            errors.append(f"{tag}: num_shortest {r['num_shortest']} ≠ {len(shortest)}")
+        head = r['paths'][:len(shortest)]
+        if head != shortest[:k]:
+            errors.append(f"{tag}: đường ngắn nhất khác thứ tự DFS")
+        known = {tuple(p) for p in every}
+        paths = [tuple(p) for p in r['paths']]
+        if len(set(paths)) != len(paths) or not set(paths) <= known:
+            errors.append(f"{tag}: có đường lặp hoặc không hợp lệ")
+        lengths = [len(p) for p in paths]
+        if lengths != sorted(lengths) or lengths != sorted(len(p) for p in every)[:k]:
+            errors.append(f"{tag}: độ dài {lengths} ≠ {k} đường ngắn nhất của vét cạn")
+    n, exact = count_paths(nbrs, src, dst, max_hops=max_hops, budget=UNLIMITED, reverse_neighbors=rev)
+    if (n, exact) != (len(every), True):
+        errors.append(f"{tag}: count_paths {(n, exact)} ≠ {len(every)}")
+    # Budget nhỏ: chỉ được dừng sớm (truncated / ước lượng), không trả đường sai
+    small = k_shortest_paths(nbrs, src, dst, k=k, max_hops=max_hops, budget=5, reverse_neighbors=rev)
+    if not {tuple(p) for p in small['paths']} <= {tuple(p) for p in every}:
+        errors.append(f"{tag}: budget nhỏ trả về đường không hợp lệ")
+    n, exact = count_paths(nbrs, src, dst, max_hops=max_hops, budget=5, reverse_neighbors=rev)
+    if exact and n != len(every):
+        errors.append(f"{tag}: budget nhỏ báo chính xác nhưng đếm {n} ≠ {len(every)}")
+    return errors
+
+
+def check_random(seed, graphs):
+    rng = random.Random(seed)
+    errors, checked = [], 0
+    for _ in range(graphs):
+        succ = random_graph(rng, rng.randint(12, 30))
+        pred, both = reverse(succ), undirected(succ)
+        for directed in (True, False):
+            nbrs = succ.__getitem__ if directed else both.__getitem__
+            rev = pred.__getitem__ if directed else None
+            for _ in range(10):
+                src, dst = rng.randrange(len(succ)), rng.randrange(len(succ))
+                max_hops, k = rng.randint(2, 4), rng.choice((1, 3, 5, 40))
+                errors += check_pair(nbrs, rev, src, dst, max_hops, k)
+                checked += 1
+    return checked, errors
+
+
+def check_graph(graph_dir, seed, pairs, max_hops=2):
+    """kg.shortest_paths (engine) so với kg.find_paths (DFS vét cạn) trên đồ thị thật"""
+    KnowledgeGraph = importlib.import_module('1_knowledge_graph').KnowledgeGraph
+    with contextlib.redirect_stdout(io.StringIO()):
+        kg = KnowledgeGraph(os.path.join(graph_dir, 'nodes_unified.csv'), os.path.join(graph_dir, 'edges_unified.csv'))
+    rng = random.Random(seed)
+    nodes = [n for n, t in kg.node_types.items() if t == 'person']
+    errors = []
+    for i in range(pairs):
+        src, dst = rng.sample(nodes, 2)
+        undirected_ = bool(i % 2)
+        every = kg.find_paths(src, dst, max_hops=max_hops, undirected=undirected_)
+        r = kg.shortest_paths(src, dst, k=5, max_hops=max_hops, undirected=undirected_, budget=UNLIMITED)
+        tag = f"{src} → {dst} hops={max_hops} undirected={undirected_}"
+        d = min((len(p) for p in every), default=0) - 1
+        shortest = [p for p in every if len(p) == d + 1]
+        if r['distance'] != (d if every else None) or r['num_shortest'] != len(shortest):
+            errors.append(f"{tag}: distance/num_shortest {r['distance']}/{r['num_shortest']} ≠ {d}/{len(shortest)}")
+        elif r['paths'][:len(shortest)] != shortest[:5]:
+            errors.append(f"{tag}: đường ngắn nhất khác find_paths")
+        if (r['num_paths'], r['num_paths_exact']) != (len(every), True):
+            errors.append(f"{tag}: num_paths {r['num_paths']} ≠ {len(every)}")
+    return errors
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Kiểm tra path_search.py so với liệt kê vét cạn')
+    ap.add_argument('--seed', type=int, default=0)
+    ap.add_argument('--graphs', type=int, default=40, help='Số đồ thị ngẫu nhiên (20 cặp / đồ thị)')
+    ap.add_argument('--pairs', type=int, default=100, help='Số cặp nút trên graph-dir')
+    ap.add_argument('--graph-dir', default=os.path.join(os.path.dirname(HERE), 'graph_out'),
+                    help="Đồ thị thật để so với kg.find_paths ('' = bỏ qua)")
+    ap.add_argument('--graph-hops', type=int, default=2, help='max_hops khi so trên graph-dir')
+    args = ap.parse_args()
+
+    checked, errors = check_random(args.seed, args.graphs)
+    print(f"{'✅' if not errors else '❌'} Đồ thị ngẫu nhiên: {checked} cặp, {len(errors)} lỗi")
+    for e in errors[:10]:
+        print(f"   {e}")
+    ok = not errors
+    if args.graph_dir and os.path.exists(os.path.join(args.graph_dir, 'nodes_unified.csv')):
+        errors = check_graph(args.graph_dir, args.seed, args.pairs, args.graph_hops)
+        print(f"{'✅' if not errors else '❌'} {args.graph_dir}: {args.pairs} cặp ({args.graph_hops} bước), {len(errors)} lỗi")
+        for e in errors[:10]:
+            print(f"   {e}")
+        ok &= not errors
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
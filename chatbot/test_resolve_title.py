@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Kiểm tra GraphRAGReasoner._resolve_title (tra tên → nút qua kg.search_index) và 3 handler dùng nó
+(find_people_by_country_and_university / find_people_by_university / find_people_by_country):
+- đồ thị tổng hợp: khớp đúng, hoa thường, bỏ dấu, gạch dưới, id nút, tiền tố country_ / career_
+- các điểm khác với bộ so khớp cũ (duyệt title_to_node, bỏ mọi ký tự ngoài [a-z0-9]):
+    * title khớp đúng thắng biến thể hoa thường đứng trước
+    * nhiều nút cùng khoá chuẩn hoá, không title nào trùng (không phân biệt hoa thường) → id nhỏ nhất
+    * country_<Tên> / id nút thô giải được ở cả find_people_by_university và find_people_by_country
+- (nếu có graph_out/) mỗi title + biến thể (thường, HOA, bỏ dấu, gạch dưới) giải về nút cùng khoá chuẩn hoá,
+  title đúng giải về chính nút của nó; handler trả cùng kết quả cho title và biến thể bỏ dấu
+Chạy: python chatbot/test_resolve_title.py [--graph-dir graph_out] [--titles 2000]
+"""
+
+import os
+import io
+import sys
+import csv
+import random
+import shutil
+import argparse
+import tempfile
+import contextlib
+import importlib
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [HERE, os.path.dirname(HERE)]
+
+from graph_loader import EDGE_COLUMNS, NODE_COLUMNS
+from node_details_store import normalize_key
+
+KnowledgeGraph = importlib.import_module('1_knowledge_graph').KnowledgeGraph
+GraphRAGReasoner = importlib.import_module('2_graphrag_reasoner').GraphRAGReasoner
+
+NODES = [
+    ('Q1', 'Đại học Quốc gia Hà Nội', 'university'),
+    ('Q2', 'Đại học Bách khoa', 'university'),
+    ('Q10', 'Trung Quốc', 'country'),
+    ('country_Nhat_Ban', 'Nhật Bản', 'country'),
+    ('P1', 'Nguyễn Văn A', 'person'),
+    ('P2', 'Trần Thị B', 'person'),
+    ('P3', 'Lê Văn C', 'person'),
+    # Biến thể hoa thường: nút đứng trước là 'ABC'
+    ('X1', 'ABC', 'career'),
+    ('X2', 'abc', 'career'),
+    # Cùng khoá 'ha noi', thêm id lớn trước
+    ('Z9', 'Ha Noi', 'country'),
+    ('Z1', 'Hà Nội', 'country'),
+]
+EDGES = [
+    ('P1', 'Q1', 'alumni_of'), ('P2', 'Q1', 'alumni_of'), ('P3', 'Q2', 'alumni_of'),
+    ('P1', 'Q10', 'born_in'), ('P2', 'country_Nhat_Ban', 'born_in'), ('P3', 'Q10', 'from_country'),
+]
+
+
+def write_graph(graph_dir):
+    with open(os.path.join(graph_dir, 'nodes_unified.csv'), 'w', encoding='utf-8', newline='') as f:
+        w = csv.writer(f)
+        w.writerow(NODE_COLUMNS)
+        w.writerows((n, t, k, '') for n, t, k in NODES)
+    with open(os.path.join(graph_dir, 'edges_unified.csv'), 'w', encoding='utf-8', newline='') as f:
+        w = csv.writer(f)
+        w.writerow(EDGE_COLUMNS)
+        w.writerows((a, b, rel, 1, '') for a, b, rel in EDGES)
+
+
+def load(nodes, edges):
+    graph_dir = os.path.dirname(nodes)
+    with contextlib.redirect_stdout(io.StringIO()):
+        return KnowledgeGraph(nodes, edges, os.path.join(graph_dir, '_no_snapshot'), cache_dir='')
+
+
+def check_synthetic():
+    """→ [lỗi] trên đồ thị nhỏ có đủ các trường hợp"""
+    graph_dir = tempfile.mkdtemp(prefix='test_resolve_title_')
+    try:
+        write_graph(graph_dir)
+        r = GraphRAGReasoner(load(os.path.join(graph_dir, 'nodes_unified.csv'),
+                                  os.path.join(graph_dir, 'edges_unified.csv')))
+        errors = []
+        resolve_cases = [
+            ('Đại học Quốc gia Hà Nội', 'Q1'),
+            ('đại học quốc gia hà nội', 'Q1'),
+            ('Dai hoc Quoc gia Ha Noi', 'Q1'),
+            ('Dai_hoc_Quoc_gia_Ha_Noi', 'Q1'),
+            ('Q1', 'Q1'),
+            ('country_Trung_Quoc', 'Q10'),
+            ('country_Nhat_Ban', 'country_Nhat_Ban'),
+            ('career_Trung_Quoc', 'Q10'),
+            ('abc', 'X2'),          # khớp đúng thắng 'ABC' đứng trước
+            ('ABC', 'X1'),
+            ('Abc', 'X1'),          # không khớp đúng → cùng khoá, hoà → id nhỏ nhất
+            ('ha-noi', 'Z1'),       # 'Ha Noi' (Z9) đứng trước nhưng id lớn hơn
+            ('HÀ NỘI', 'Z1'),       # trùng 'Hà Nội' không phân biệt hoa thường
+            ('HA NOI', 'Z9'),       # trùng 'Ha Noi' không phân biệt hoa thường
+            ('Không tồn tại', None),
+            ('', None),
+        ]
+        for query, expected in resolve_cases:
+            got = r._resolve_title(query)
+            if got != expected:
+                errors.append(f"_resolve_title({query!r}) = {got!r}, cần {expected!r}")
+
+        handler_cases = [
+            (r.find_people_by_university, ('Q1',), ['Nguyễn Văn A', 'Trần Thị B']),
+            (r.find_people_by_university, ('dai hoc bach khoa',), ['Lê Văn C']),
+            (r.find_people_by_country, ('country_Trung_Quoc',), ['Nguyễn Văn A', 'Lê Văn C']),
+            (r.find_people_by_country, ('nhat ban',), ['Trần Thị B']),
+            (r.find_people_by_country_and_university, ('country_Trung_Quoc', 'Dai hoc Quoc gia Ha Noi'),
+             ['Nguyễn Văn A']),
+            (r.find_people_by_country_and_university, ('Nhật Bản', 'Q1'), ['Trần Thị B']),
+        ]
+        for fn, args, expected in handler_cases:
+            got = fn(*args)
+            if sorted(got['people']) != sorted(expected) or got['missing']:
+                errors.append(f"{fn.__name__}{args} = {got}, cần people={expected}")
+        got = r.find_people_by_country_and_university('Atlantis', 'Q1')
+        if got != {'people': [], 'missing': ['Atlantis']}:
+            errors.append(f"find_people_by_country_and_university('Atlantis', 'Q1') = {got}")
+        return errors
+    finally:
+        shutil.rmtree(graph_dir, ignore_errors=True)
+
+
+def _unaccent(title):
+    return normalize_key(title).title()
+
+
+def check_graph(graph_dir, n_titles, seed=0):
+    """→ (số title đã thử, [lỗi]) trên đồ thị thật"""
+    kg = load(os.path.join(graph_dir, 'nodes_unified.csv'), os.path.join(graph_dir, 'edges_unified.csv'))
+    r = GraphRAGReasoner(kg)
+    titles = sorted(kg.title_to_node)
+    titles = random.Random(seed).sample(titles, min(n_titles, len(titles)))
+    errors = []
+    for title in titles:
+        if r._resolve_title(title) != kg.title_to_node[title]:
+            errors.append(f"{title!r} → {r._resolve_title(title)!r}, cần {kg.title_to_node[title]!r}")
+        key = normalize_key(title)
+        if not key:
+            continue
+        for variant in (title.lower(), title.upper(), _unaccent(title), title.replace(' ', '_')):
+            node = r._resolve_title(variant)
+            if node is None or normalize_key(kg.node_to_title.get(node, node)) != key:
+                errors.append(f"{variant!r} (từ {title!r}) → {node!r}")
+    for node, node_type in kg.node_types.items():
+        title = kg.node_to_title[node]
+        fn = {'university': r.find_people_by_university, 'country': r.find_people_by_country}.get(node_type)
+        variant = _unaccent(title)
+        if fn is None or r._resolve_title(variant) != node:
+            continue
+        if fn(title)['people'] != fn(variant)['people']:
+            errors.append(f"{fn.__name__}: {title!r} và {variant!r} khác kết quả")
+    return len(titles), errors
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Kiểm tra tra tên → nút (_resolve_title) của GraphRAGReasoner')
+    ap.add_argument('--graph-dir', default=os.path.join(os.path.dirname(HERE), 'graph_out'))
+    ap.add_argument('--titles', type=int, default=2000)
+    args = ap.parse_args()
+
+    errors = check_synthetic()
+    print(f"{'✅' if not errors else '❌'} Đồ thị tổng hợp: {len(errors)} lỗi")
+    for e in errors[:10]:
+        print(f"   {e}")
+    ok = not errors
+    if os.path.exists(os.path.join(args.graph_dir, 'nodes_unified.csv')):
+        n, errors = check_graph(args.graph_dir, args.titles)
+        print(f"{'✅' if not errors else '❌'} {args.graph_dir}: {n} title, {len(errors)} lỗi")
+        for e in errors[:10]:
+            print(f"   {e}")
+        ok &= not errors
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,346 @@
+# -*- coding: utf-8 -*-
+"""
+clique_groups.py — Quan hệ clique (same_birth_country / same_career / same_uni) lưu theo NHÓM thành viên
+
+Mỗi quan hệ clique = "cùng thuộc 1 nhóm" (người → quốc gia sinh / nghề / trường). Thay vì ghi mọi cặp
+(k thành viên → k(k-1)/2 cạnh) ta ghi k dòng thành viên và trả lời cạnh "ảo" khi truy vấn.
+
+File groups_*.csv (cạnh file edges_*.csv), mỗi dòng 1 thành viên, các dòng cùng nhóm liền nhau:
+    relation,group,weight,member
+    same_birth_country,country_Hoa Ky,1,Barack Obama
+- group: id nút đích của quan hệ thành viên (country_* / career_* / trường) nếu biết,
+  ngược lại id tổng hợp "<relation>#<k>" (nhóm suy ra từ danh sách cặp cũ bằng phủ clique)
+- mọi cặp thành viên trong 1 nhóm là 1 cạnh vô hướng loại `relation`, trọng số `weight`
+
+API:
+  groups_path(edges_file)            → đường dẫn groups_*.csv tương ứng edges_*.csv
+  read_groups(path) / write_groups(path, groups)   groups = [(relation, group, weight, [members])]
+  pairs_to_groups(pairs, min_size)   → phủ clique tham lam cho danh sách cặp (relation, a, b, weight)
+  expand_groups(groups)              → duyệt lại các cặp (a, b, relation, weight), mỗi cặp 1 lần
+  CliqueIndex                        → tra cứu láng giềng / has_edge / bậc / thống kê trên nhóm;
+                                       add_member / remove_member / remove_node cho cập nhật tăng dần
+
+CLI (chuyển đổi file cạnh đã có sẵn các cặp clique, hoặc xuất ngược lại dạng cặp):
+  py clique_groups.py graph_out/edges_unified.csv --compact out_dir/
+  py clique_groups.py out_dir/edges_unified.csv --expand edges_materialized.csv
+"""
+import os
+import csv
+import argparse
+from collections import defaultdict
+
+GROUP_RELATIONS = ('same_birth_country', 'same_career', 'same_uni')
+GROUPS_HEADER = ['relation', 'group', 'weight', 'member']
+
+def groups_path(edges_file):
+    """graph_out/edges_unified.csv → graph_out/groups_unified.csv"""
+    base, name = os.path.split(edges_file)
+    stem = os.path.splitext(name)[0]
+    if stem.startswith('edges_'):
+        stem = stem[len('edges_'):]
+    return os.path.join(base, f'groups_{stem}.csv')
+
+def _parse_weight(w):
+    try:
+        return int(w)
+    except (TypeError, ValueError):
+        try:
+            return float(w)
+        except (TypeError, ValueError):
+            return 1
+
+# ---------- read / write ----------
+def read_groups(path):
+    """[(relation, group, weight, [members])] theo thứ tự xuất hiện; file không tồn tại → []"""
+    if not path or not os.path.exists(path):
+        return []
+    groups, index = [], {}
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        for row in csv.DictReader(f):
+            relation, group, member = row.get('relation'), row.get('group'), row.get('member')
+            if not relation or not member:
+                continue
+            key = (relation, group)
+            gi = index.get(key)
+            if gi is None:
+                gi = index[key] = len(groups)
+                groups.append((relation, group, _parse_weight(row.get('weight', 1)), []))
+            groups[gi][3].append(member)
+    return groups
+
+def write_groups(path, groups):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(GROUPS_HEADER)
+        for relation, group, weight, members in groups:
+            writer.writerows([relation, group, weight, m] for m in members)
+
+# ---------- pairs <-> groups ----------
+def _clique_cover(pairs):
+    """Phủ tập cạnh vô hướng bằng các clique (tham lam, tất định). Nhóm rời nhau được khôi phục đúng."""
+    adj = defaultdict(set)
+    for a, b in pairs:
+        if a != b:
+            adj[a].add(b)
+            adj[b].add(a)
+    order = {n: i for i, n in enumerate(adj)}
+    rem = {n: set(nb) for n, nb in adj.items()}
+    rank = lambda n: (-len(rem[n]), order[n])
+    cliques = []
+    for u in sorted(adj, key=lambda n: (-len(adj[n]), order[n])):
+        while rem[u]:
+            v = min(rem[u], key=rank)
+            members = [u, v]
+            cand = adj[u] & adj[v]
+            for w in sorted(cand, key=rank):
+                if w in cand:
+                    members.append(w)
+                    cand &= adj[w]
+            member_set = set(members)
+            for x in members:
+                rem[x] -= member_set
+            cliques.append(members)
+    return cliques
+
+def pairs_to_groups(pairs, min_size=2):
+    """
+    pairs: iterable (relation, a, b, weight) → (groups, rest): groups phủ đúng tập cặp (theo từng
+    relation, weight); clique ít hơn min_size thành viên (chỉ có thể là 1 cặp) và khuyên (a == b)
+    trả lại trong rest dưới dạng (relation, a, b, weight) — với min_size=3, cặp lẻ giữ là cạnh rẻ hơn
+    1 nhóm 2 dòng.
+    """
+    buckets, rest = {}, []
+    for relation, a, b, weight in pairs:
+        if a == b:
+            rest.append((relation, a, b, weight))
+            continue
+        buckets.setdefault((relation, weight), []).append((a, b))
+    groups, counter = [], defaultdict(int)
+    for (relation, weight), bucket in buckets.items():
+        for members in _clique_cover(bucket):
+            if len(members) < min_size:
+                rest.append((relation, members[0], members[1], weight))
+                continue
+            groups.append((relation, f'{relation}#{counter[relation]}', weight, members))
+            counter[relation] += 1
+    return groups, rest
+
+def expand_groups(groups, relations=None):
+    """Các cặp (a, b, relation, weight) của mọi nhóm; cặp nằm trong nhiều nhóm chỉ ra 1 lần"""
+    seen = set()
+    for relation, _, weight, members in groups:
+        if relations is not None and relation not in relations:
+            continue
+        for i in range(len(members)):
+            for j in range(i + 1, len(members)):
+                a, b = members[i], members[j]
+                key = (a, b, relation) if a <= b else (b, a, relation)
+                if key not in seen:
+                    seen.add(key)
+                    yield a, b, relation, weight
+
+# ---------- query ----------
+class CliqueIndex:
+    """Cạnh clique ảo: node → các nhóm chứa nó; láng giềng = thành viên khác của các nhóm đó"""
+
+    def __init__(self, groups=()):
+        self.groups = []      # [(relation, group, weight, tuple(members))]
+        self._sets = []       # frozenset(members) song song với self.groups
+        self._member_of = {}  # node -> [chỉ số nhóm]
+        self._keys = {}       # (relation, group) -> chỉ số nhóm
+        for relation, group, weight, members in groups:
+            self.add(relation, group, weight, members)
+
+    def add(self, relation, group, weight, members, min_size=2, register=True):
+        """min_size=1: giữ cả nhóm 1 thành viên (nhóm đang được changelog cập nhật dần).
+        register=False: nhóm phủ suy ra từ cặp (id không ổn định giữa các lần nạp) — add_member /
+        remove_member theo (relation, group) không trỏ tới nhóm này."""
+        members = tuple(dict.fromkeys(members))
+        if len(members) < min_size:
+            return
+        gi = len(self.groups)
+        self.groups.append((relation, group, weight, members))
+        self._sets.append(frozenset(members))
+        if register:
+            self._keys[(relation, group)] = gi
+        for m in members:
+            self._member_of.setdefault(m, []).append(gi)
+
+    # ---------- cập nhật tăng dần (graph_changelog) — chi phí theo kích thước nhóm, không theo cả index ----------
+    def _set_members(self, gi, members):
+        relation, group, weight, _ = self.groups[gi]
+        self.groups[gi] = (relation, group, weight, members)
+        self._sets[gi] = frozenset(members)
+
+    def _unlink(self, member, gi):
+        gis = self._member_of.get(member)
+        if gis is not None and gi in gis:
+            gis.remove(gi)
+            if not gis:
+                del self._member_of[member]
+
+    def members(self, relation, group):
+        gi = self._keys.get((relation, group))
+        return () if gi is None else self.groups[gi][3]
+
+    def add_member(self, relation, group, weight, member):
+        """Thêm member vào nhóm (relation, group), tạo nhóm nếu chưa có → True nếu có thay đổi"""
+        gi = self._keys.get((relation, group))
+        if gi is None:
+            self.add(relation, group, weight, [member], min_size=1)
+            return True
+        if member in self._sets[gi]:
+            return False
+        self._set_members(gi, self.groups[gi][3] + (member,))
+        self._member_of.setdefault(member, []).append(gi)
+        return True
+
+    def remove_member(self, relation, group, member):
+        gi = self._keys.get((relation, group))
+        if gi is None or member not in self._sets[gi]:
+            return False
+        self._set_members(gi, tuple(m for m in self.groups[gi][3] if m != member))
+        self._unlink(member, gi)
+        return True
+
+    def remove_node(self, node):
+        """Rút node khỏi mọi nhóm → [(relation, group)] đã đổi"""
+        changed = []
+        for gi in list(self._member_of.get(node, ())):
+            relation, group, _, members = self.groups[gi]
+            self._set_members(gi, tuple(m for m in members if m != node))
+            changed.append((relation, group))
+        self._member_of.pop(node, None)
+        return changed
+
+    def __len__(self):
+        return len(self.groups)
+
+    def __contains__(self, node):
+        return node in self._member_of
+
+    def nodes(self):
+        """Các node thuộc ít nhất 1 nhóm"""
+        return self._member_of.keys()
+
+    def memberships(self, node):
+        """[(relation, group, weight)] của node"""
+        return [self.groups[gi][:3] for gi in self._member_of.get(node, ())]
+
+    def neighbors(self, node, relation=None):
+        """Duyệt (láng giềng, relation, weight), mỗi (láng giềng, relation) 1 lần"""
+        seen = set()
+        for gi in self._member_of.get(node, ()):
+            rel, _, weight, members = self.groups[gi]
+            if relation is not None and rel != relation:
+                continue
+            for m in members:
+                if m != node and (m, rel) not in seen:
+                    seen.add((m, rel))
+                    yield m, rel, weight
+
+    def neighbor_set(self, node):
+        out = set()
+        for gi in self._member_of.get(node, ()):
+            out |= self._sets[gi]
+        out.discard(node)
+        return out
+
+    def relations(self, a, b):
+        """Các relation clique giữa a và b (không trùng, theo thứ tự nhóm)"""
+        ga, gb = self._member_of.get(a), self._member_of.get(b)
+        if not ga or not gb or a == b:
+            return []
+        if len(gb) < len(ga):
+            ga, other = gb, a
+        else:
+            other = b
+        rels = []
+        for gi in ga:
+            rel = self.groups[gi][0]
+            if rel not in rels and other in self._sets[gi]:
+                rels.append(rel)
+        return rels
+
+    def has_edge(self, a, b, relation=None):
+        rels = self.relations(a, b)
+        return bool(rels) if relation is None else relation in rels
+
+    def degree(self, node):
+        """Số cạnh ảo (cặp (láng giềng, relation) khác nhau) của node"""
+        gis = self._member_of.get(node, ())
+        if len(gis) == 1:
+            return len(self.groups[gis[0]][3]) - 1
+        return sum(1 for _ in self.neighbors(node))
+
+    def pair_counts(self):
+        """{relation: số cặp không trùng} — bằng số cạnh nếu vật chất hoá"""
+        counts = defaultdict(int)
+        for node, gis in self._member_of.items():
+            by_rel = defaultdict(list)
+            for gi in gis:
+                by_rel[self.groups[gi][0]].append(gi)
+            for rel, rel_gis in by_rel.items():
+                if len(rel_gis) == 1:
+                    counts[rel] += len(self.groups[rel_gis[0]][3]) - 1
+                else:
+                    counts[rel] += len(set().union(*(self._sets[gi] for gi in rel_gis))) - 1
+        return {rel: n // 2 for rel, n in counts.items()}
+
+    def number_of_edges(self):
+        return sum(self.pair_counts().values())
+
+    def iter_pairs(self, relation=None):
+        return expand_groups(self.groups, None if relation is None else {relation})
+
+# ---------- CLI ----------
+def _read_edges(path):
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        return list(csv.DictReader(f))
+
+def _write_edges(path, rows):
+    # giữ cột của file nguồn (vd. year của alumni_of); cạnh vật chất hoá không có cột đó → ''
+    fields = list(rows[0]) if rows else ['from', 'to', 'type', 'weight']
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=fields, restval='')
+        writer.writeheader()
+        writer.writerows(rows)
+
+def compact_edges(edges_file, outdir):
+    """Tách cặp clique khỏi file cạnh → outdir/edges_*.csv (không còn cặp clique) + outdir/groups_*.csv"""
+    os.makedirs(outdir, exist_ok=True)
+    index = CliqueIndex(read_groups(groups_path(edges_file)))
+    rows = _read_edges(edges_file)
+    pairs = [(row['type'], row['from'], row['to'], _parse_weight(row.get('weight', 1))) for row in rows
+             if row['type'] in GROUP_RELATIONS and not index.has_edge(row['from'], row['to'], row['type'])]
+    groups, rest = pairs_to_groups(pairs, min_size=3)
+    single = {(rel, a, b) for rel, a, b, _ in rest} | {(rel, b, a) for rel, a, b, _ in rest}
+    kept = [row for row in rows
+            if row['type'] not in GROUP_RELATIONS or (row['type'], row['from'], row['to']) in single]
+    groups = index.groups + groups
+    out_edges = os.path.join(outdir, os.path.basename(edges_file))
+    _write_edges(out_edges, kept)
+    write_groups(groups_path(out_edges), groups)
+    return out_edges, len(kept), len(pairs) - len(rest), groups
+
+def main():
+    ap = argparse.ArgumentParser(description="Chuyển cạnh clique giữa dạng cặp và dạng nhóm thành viên.")
+    ap.add_argument("edges", help="File edges_*.csv (groups_*.csv cùng thư mục được đọc nếu có)")
+    g = ap.add_mutually_exclusive_group(required=True)
+    g.add_argument("--compact", metavar="OUTDIR", help="Ghi edges + groups dạng nhóm vào OUTDIR")
+    g.add_argument("--expand", metavar="CSV", help="Ghi file cạnh có đủ các cặp clique (vật chất hoá)")
+    args = ap.parse_args()
+
+    if args.compact:
+        out_edges, n_kept, n_pairs, groups = compact_edges(args.edges, args.compact)
+        members = sum(len(m) for _, _, _, m in groups)
+        print(f"✅ {out_edges}: {n_kept} cạnh; {n_pairs} cặp clique → {len(groups)} nhóm / {members} thành viên")
+    else:
+        rows = _read_edges(args.edges)
+        groups = read_groups(groups_path(args.edges))
+        rows += [{'from': a, 'to': b, 'type': rel, 'weight': w} for a, b, rel, w in expand_groups(groups)]
+        _write_edges(args.expand, rows)
+        print(f"✅ Đã vật chất hoá → {args.expand} ({len(rows)} cạnh)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,456 @@
+# -*- coding: utf-8 -*-
+"""
+crawl_cluster.py — Crawl Step 3 / Step 4 theo mô hình coordinator/worker (nhiều tiến trình, nhiều máy)
+Không cần dịch vụ ngoài: hàng đợi là 1 file SQLite trên volume dùng chung.
+
+- Tiêu đề được chia shard theo hash (crc32(normalize(title)) % --shards).
+- Worker "thuê" (lease) từng task với visibility timeout; worker chết → task tự hết hạn và được thuê lại.
+- Kết quả ghi vào segment riêng theo shard:  <outdir>/_cluster/segments/<stage>/shard-XX/<worker>.jsonl
+- Bước merge gom segment → đúng các file đầu ra của step3_bfs_expand.py / step4_enrich_full.py.
+
+Ví dụ (Step 3):
+  py crawl_cluster.py init   --stage step3 --outdir graph_out --seeds graph_out/seeds.csv \\
+                             --config config_example.json --roots-csv graph_out/root_nodes.csv --expand-from-university
+  py crawl_cluster.py run    --stage step3 --outdir graph_out --procs 4 --merge      # 4 worker cục bộ + merge
+  # hoặc trên máy khác cùng volume:  py crawl_cluster.py worker --stage step3 --outdir /mnt/shared/graph_out --shard 0 --shard 1
+  py crawl_cluster.py status --outdir graph_out
+  py crawl_cluster.py merge  --stage step3 --outdir graph_out
+
+Step 4: init --stage step4 (đọc nodes_persons.csv / nodes_universities.csv / root_nodes.csv) → run → merge.
+Lưu ý: ở chế độ cluster, trang trường được đối chiếu với tập tiêu đề person BAN ĐẦU (không chờ tiêu đề chuẩn
+sau khi crawl person như chế độ đơn tiến trình), vì hai loại trang được crawl song song.
+"""
+
+import os, json, time, socket, sqlite3, argparse, zlib
+from collections import defaultdict
+from multiprocessing import Process
+
+from utils_wiki import normalize, soup_from_html, extract_page_links
+from utils_titles import is_skippable
+import step3_bfs_expand as step3
+import step4_enrich_full as step4
+from entity_resolution import MERGE_MAP_FILE, load_merge_map
+
+DB_NAME = "queue.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks(
+    stage TEXT NOT NULL, key TEXT NOT NULL, title TEXT NOT NULL, kind TEXT NOT NULL,
+    depth INTEGER NOT NULL DEFAULT 0, shard INTEGER NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending', lease_until REAL NOT NULL DEFAULT 0,
+    worker TEXT, attempts INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY(stage, key)
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_pick ON tasks(stage, state, depth);
+CREATE TABLE IF NOT EXISTS meta(key TEXT PRIMARY KEY, value TEXT);
+"""
+
+# ---------- paths / db ----------
+def cluster_dir(outdir):
+    return os.path.join(outdir, "_cluster")
+
+def segment_dir(outdir, stage, shard=None):
+    d = os.path.join(cluster_dir(outdir), "segments", stage)
+    return d if shard is None else os.path.join(d, f"shard-{shard:02d}")
+
+def connect(outdir):
+    os.makedirs(cluster_dir(outdir), exist_ok=True)
+    # rollback journal (không WAL) để an toàn trên volume mạng; khoá do SQLite quản lý
+    conn = sqlite3.connect(os.path.join(cluster_dir(outdir), DB_NAME), timeout=60, isolation_level=None)
+    conn.executescript(SCHEMA)
+    return conn
+
+def meta_get(conn, key, default=None):
+    row = conn.execute("SELECT value FROM meta WHERE key=?", (key,)).fetchone()
+    return json.loads(row[0]) if row else default
+
+def meta_set(conn, key, value):
+    conn.execute("INSERT OR REPLACE INTO meta(key, value) VALUES (?, ?)", (key, json.dumps(value, ensure_ascii=False)))
+
+def shard_of(key, n_shards):
+    return zlib.crc32(key.encode("utf-8")) % max(1, n_shards)
+
+def enqueue(conn, stage, items, n_shards):
+    """items: [(title, kind, depth)] — INSERT OR IGNORE theo khoá chuẩn hoá (đóng vai trò visited). Trả về số task mới."""
+    before = conn.total_changes
+    conn.executemany(
+        "INSERT OR IGNORE INTO tasks(stage, key, title, kind, depth, shard) VALUES (?, ?, ?, ?, ?, ?)",
+        [(stage, normalize(t), t, kind, d, shard_of(normalize(t), n_shards)) for t, kind, d in items if normalize(t)]
+    )
+    return conn.total_changes - before
+
+# ---------- lease protocol ----------
+def lease_task(conn, stage, worker, visibility, shards=None, max_attempts=3):
+    now = time.time()
+    shard_sql = ""
+    params = [stage, now, max_attempts]
+    if shards:
+        shard_sql = f" AND shard IN ({','.join('?' * len(shards))})"
+        params += list(shards)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # worker chết khi giữ task ở lần thử cuối → lease hết hạn không ai thuê lại được → đánh dấu failed
+        conn.execute("UPDATE tasks SET state='failed', lease_until=0 WHERE stage=? AND state='leased' "
+                     "AND lease_until<? AND attempts>=?", (stage, now, max_attempts))
+        row = conn.execute(
+            "SELECT key, title, kind, depth, shard FROM tasks WHERE stage=? "
+            "AND (state='pending' OR (state='leased' AND lease_until<?)) AND attempts<?" + shard_sql +
+            " ORDER BY depth LIMIT 1", params
+        ).fetchone()
+        if row:
+            conn.execute(
+                "UPDATE tasks SET state='leased', lease_until=?, worker=?, attempts=attempts+1 WHERE stage=? AND key=?",
+                (now + visibility, worker, stage, row[0])
+            )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return row
+
+def complete_task(conn, stage, key):
+    conn.execute("UPDATE tasks SET state='done', lease_until=0 WHERE stage=? AND key=?", (stage, key))
+
+def fail_task(conn, stage, key, max_attempts=3):
+    """Trả task lỗi về hàng đợi ngay (không chờ lease hết hạn); hết --max-attempts lần → 'failed'."""
+    conn.execute("UPDATE tasks SET state=CASE WHEN attempts>=? THEN 'failed' ELSE 'pending' END, lease_until=0 "
+                 "WHERE stage=? AND key=?", (max_attempts, stage, key))
+
+def failed_tasks(conn, stage):
+    return conn.execute("SELECT key, title FROM tasks WHERE stage=? AND state='failed' ORDER BY key",
+                        (stage,)).fetchall()
+
+def print_failed(conn, stage, limit=20):
+    rows = failed_tasks(conn, stage)
+    if not rows:
+        return
+    print(f"[!] {len(rows)} task {stage} lỗi quá số lần thử (state='failed'), không có trong kết quả:")
+    for key, title in rows[:limit]:
+        print(f"   - {key}  ({title})")
+    if len(rows) > limit:
+        print(f"   ... và {len(rows) - limit} task khác")
+
+def in_flight(conn, stage, shards=None):
+    """Số task còn có thể được xử lý (pending hoặc đang được thuê; không tính 'failed')."""
+    shard_sql, params = "", [stage]
+    if shards:
+        shard_sql = f" AND shard IN ({','.join('?' * len(shards))})"
+        params += list(shards)
+    row = conn.execute("SELECT COUNT(*) FROM tasks WHERE stage=? AND state IN ('pending','leased')" + shard_sql,
+                       params).fetchone()
+    return row[0]
+
+# ---------- segments ----------
+class SegmentWriter:
+    """Mỗi worker ghi 1 file jsonl cho mỗi shard → không tranh chấp ghi giữa các worker."""
+    def __init__(self, outdir, stage, worker):
+        self.outdir, self.stage, self.worker = outdir, stage, worker
+        self.files = {}
+
+    def write(self, shard, record):
+        f = self.files.get(shard)
+        if f is None:
+            d = segment_dir(self.outdir, self.stage, shard)
+            os.makedirs(d, exist_ok=True)
+            f = open(os.path.join(d, f"{self.worker}.jsonl"), "a", encoding="utf-8")
+            self.files[shard] = f
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        f.flush()
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+
+def iter_segments(outdir, stage):
+    base = segment_dir(outdir, stage)
+    if not os.path.isdir(base):
+        return
+    for shard_name in sorted(os.listdir(base)):
+        d = os.path.join(base, shard_name)
+        for fn in sorted(os.listdir(d)):
+            if not fn.endswith(".jsonl"):
+                continue
+            with open(os.path.join(d, fn), "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue  # dòng cuối dở dang do worker chết giữa chừng
+
+# ---------- init ----------
+def init_step3(conn, args):
+    with open(args.config, "r", encoding="utf-8") as f:
+        cfg = json.load(f)
+    cfg = {
+        "max_person_nodes": int(cfg.get("max_person_nodes", 1300)),
+        "per_depth_limit":  int(cfg.get("per_depth_limit", 120)),
+        "max_depth":        int(cfg.get("max_depth", 3)),
+        "candidate_cap":    int(cfg.get("candidate_cap", 500)),
+        "sleep":            float(cfg.get("sleep", args.sleep)),
+        "uni_candidate_cap": args.uni_candidate_cap,
+    }
+    seeds = step3.load_seeds(args.seeds)
+    roots_p, roots_u = step4.load_roots(args.roots_csv) if args.roots_csv else ([], [])
+
+    meta_set(conn, "step3.config", cfg)
+    meta_set(conn, "step3.seeds", seeds)
+    meta_set(conn, "step3.roots_persons", roots_p)
+    meta_set(conn, "step3.roots_unis", roots_u)
+    meta_set(conn, "step3.accepted", 0)
+
+    items = [(s, "candidate", 1) for s in seeds]
+    if args.expand_from_university:
+        root_unis = args.root_university or roots_u
+        items += [(u, "root_university", 0) for u in root_unis]
+    return enqueue(conn, "step3", items, args.shards)
+
+def init_step4(conn, args):
+    persons_all, unis_all = step4.load_crawl_targets(
+        args.outdir, args.persons_csv, args.universities_csv, args.roots_csv_name)
+    items = [(p, "person", 0) for p in persons_all] + [(u, "university", 0) for u in unis_all]
+    return enqueue(conn, "step4", items, args.shards)
+
+# ---------- worker ----------
+def _step3_expand(conn, links, depth, cfg, limit, n_shards):
+    items = []
+    for lk in links:
+        if is_skippable(lk):
+            continue
+        items.append((lk, "candidate", depth))
+    # INSERT OR IGNORE từng phần để dừng đúng ở `limit` task MỚI (giống per_depth_limit của Step 3)
+    added = 0
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for it in items:
+            added += enqueue(conn, "step3", [it], n_shards)
+            if added >= limit:
+                break
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return added
+
+def process_step3(conn, task, cfg, args, n_shards):
+    key, title, kind, depth, shard = task
+    if kind == "root_university":
+        html, _ = step3.safe_fetch_html(title, sleep=cfg["sleep"], http_timeout=args.http_timeout)
+        sp = soup_from_html(html)
+        links = extract_page_links(sp)[:cfg["uni_candidate_cap"]] if sp else []
+        added = _step3_expand(conn, links, 2, cfg, cfg["per_depth_limit"], n_shards)
+        return {"kind": kind, "title": title, "seed_links": added}
+
+    res = step3.process_title(title, depth, args.http_timeout, cfg["sleep"])
+    if res["accepted"]:
+        conn.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key='step3.accepted'")
+    accepted = int(meta_get(conn, "step3.accepted", 0))
+    if depth < cfg["max_depth"] and res["expand_links"] and accepted < cfg["max_person_nodes"]:
+        _step3_expand(conn, res["expand_links"][:cfg["candidate_cap"]], depth + 1, cfg,
+                      cfg["per_depth_limit"], n_shards)
+    return {"kind": kind, "title": title, "depth": depth,
+            "accepted": res["accepted"], "edu_clean": res["edu_clean"]}
+
+def process_step4(task, ctx, args):
+    key, title, kind, depth, shard = task
+    if kind == "person":
+        r = step4.worker_person(title, ctx["people_norm"], ctx["uni_norm"], args.sleep, args.http_timeout)
+    else:
+        r = step4.worker_university(title, ctx["people_norm"], ctx["uni_norm"], args.sleep, args.http_timeout)
+    r["kind"] = kind
+    return r
+
+def worker_loop(args, worker_id=None):
+    worker = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    conn = connect(args.outdir)
+    n_shards = int(meta_get(conn, "shards", args.shards))
+    shards = args.shard or None
+    seg = SegmentWriter(args.outdir, args.stage, worker)
+
+    cfg, ctx = None, None
+    if args.stage == "step3":
+        cfg = meta_get(conn, "step3.config")
+        load_step3_merge_map(args.outdir)  # canonicalize_university của worker dùng map
+    else:
+        rows = conn.execute("SELECT title, kind FROM tasks WHERE stage='step4'").fetchall()
+        ctx = {"people_norm": {normalize(t) for t, k in rows if k == "person"},
+               "uni_norm":    {normalize(t) for t, k in rows if k == "university"}}
+
+    done = idle = 0
+    try:
+        while True:
+            if args.stage == "step3" and int(meta_get(conn, "step3.accepted", 0)) >= cfg["max_person_nodes"]:
+                break
+            task = lease_task(conn, args.stage, worker, args.visibility, shards, args.max_attempts)
+            if task is None:
+                # còn task đang được worker khác giữ (có thể sinh thêm task mới) → chờ
+                if in_flight(conn, args.stage, shards) == 0 or idle * args.poll >= args.idle_timeout:
+                    break
+                idle += 1
+                time.sleep(args.poll)
+                continue
+            idle = 0
+            try:
+                if args.stage == "step3":
+                    rec = process_step3(conn, task, cfg, args, n_shards)
+                else:
+                    rec = process_step4(task, ctx, args)
+            except Exception as e:
+                print(f"[{worker}] lỗi {task[1]}: {e}", flush=True)
+                fail_task(conn, args.stage, task[0], args.max_attempts)  # thuê lại ngay, tối đa --max-attempts lần
+                continue
+            seg.write(task[4], rec)
+            complete_task(conn, args.stage, task[0])
+            done += 1
+            if done % max(1, args.progress_every) == 0:
+                print(f"[{worker}] done={done}", flush=True)
+    finally:
+        seg.close()
+        conn.close()
+    print(f"[{worker}] ✅ kết thúc, xử lý {done} task", flush=True)
+
+def load_step3_merge_map(outdir):
+    """Nạp entity_merge_map.csv vào step3.MERGE_MAP như step3.main (mỗi process worker + bước merge)"""
+    step3.MERGE_MAP.update(load_merge_map(os.path.join(outdir, MERGE_MAP_FILE)))
+    if step3.MERGE_MAP:
+        print(f"[i] Merge map: {len(step3.MERGE_MAP)} alias → tên chuẩn", flush=True)
+
+# ---------- merge ----------
+def merge_step3(conn, outdir, flush_every=10000):
+    cfg = meta_get(conn, "step3.config")
+    seeds_set = set(meta_get(conn, "step3.seeds", []))
+    roots_persons = set(meta_get(conn, "step3.roots_persons", []))
+    roots_unis = set(meta_get(conn, "step3.roots_unis", []))
+    load_step3_merge_map(outdir)
+    merge_map = step3.MERGE_MAP
+
+    latest = {}
+    for rec in iter_segments(outdir, "step3"):
+        if rec.get("kind") == "candidate":
+            latest[rec["title"]] = rec  # task chạy lại sau khi lease hết hạn → giữ bản cuối
+
+    alumni_persons, universities = set(), set()
+    edu_map, person_depth, depth_stats = defaultdict(list), {}, defaultdict(int)
+    up_stream = step3.open_up_stream(outdir, flush_every)
+    for rec in sorted(latest.values(), key=lambda r: (r["depth"], r["title"])):
+        if not rec["accepted"] or len(alumni_persons) >= cfg["max_person_nodes"]:
+            continue
+        title, depth = merge_map.get(rec["title"], rec["title"]), rec["depth"]
+        if title in alumni_persons:
+            continue  # alias của người đã nhận (như step3.main)
+        alumni_persons.add(title)
+        person_depth[title] = depth
+        depth_stats[depth] += 1
+        for u, year in rec["edu_clean"]:
+            u = merge_map.get(u, u)  # segment ghi trước khi có map; map đã giải bắc cầu nên áp lại không đổi
+            universities.add(u)
+            edu_map[title].append((u, year))
+            up_stream.write((u, title, "ALUMNI_OF", year if year is not None else ""))
+
+    persons_out, universities, n_shared, n_same_grad = step3.finalize_outputs(
+        outdir, alumni_persons, seeds_set, roots_persons, roots_unis,
+        universities, edu_map, up_stream, person_depth, depth_stats, flush_every=flush_every
+    )
+    print(f"✅ MERGE step3. Persons(out)={len(persons_out)} | Alumni={len(alumni_persons)} | Universities={len(universities)}")
+    print(f"   UP={up_stream.count} | Shared={n_shared} | SameGrad={n_same_grad}")
+    print_failed(conn, "step3")
+
+def merge_step4(conn, outdir):
+    latest = {}
+    for rec in iter_segments(outdir, "step4"):
+        latest[(rec["kind"], rec["title_final"])] = rec
+    buckets = step4.new_buckets()
+    for (kind, _), rec in sorted(latest.items()):
+        if kind == "person":
+            step4.add_person_result(buckets, rec)
+    for (kind, _), rec in sorted(latest.items()):
+        if kind == "university":
+            step4.add_university_result(buckets, rec)
+    summary = step4.finalize_outputs(outdir, buckets)
+    print("✅ MERGE step4")
+    for k, v in summary.items():
+        print(f"  {k}: {v}")
+    print_failed(conn, "step4")
+
+def print_status(conn):
+    print(f"shards = {meta_get(conn, 'shards')}")
+    for stage, state, n in conn.execute("SELECT stage, state, COUNT(*) FROM tasks GROUP BY stage, state ORDER BY stage, state"):
+        print(f"  {stage:6s} {state:8s} {n}")
+    acc = meta_get(conn, "step3.accepted")
+    if acc is not None:
+        print(f"  step3 accepted persons = {acc}")
+
+# ---------- main ----------
+def main():
+    ap = argparse.ArgumentParser(description="Crawl Step 3/4 phân tán: hàng đợi SQLite dùng chung + worker + merge.")
+    ap.add_argument("command", choices=["init", "worker", "run", "merge", "status"])
+    ap.add_argument("--stage", choices=["step3", "step4"], default="step3")
+    ap.add_argument("--outdir", default="graph_out")
+
+    # init
+    ap.add_argument("--shards", type=int, default=16, help="Số shard (hash partition theo tiêu đề)")
+    ap.add_argument("--seeds", help="[step3] seeds.csv")
+    ap.add_argument("--config", help="[step3] config JSON")
+    ap.add_argument("--roots-csv", default=None, help="[step3] root_nodes.csv (title,type)")
+    ap.add_argument("--expand-from-university", action="store_true", help="[step3] seed depth=2 từ trang trường gốc")
+    ap.add_argument("--root-university", action="append", help="[step3] tên trường gốc (ghi đè roots-csv)")
+    ap.add_argument("--uni-candidate-cap", type=int, default=300)
+    ap.add_argument("--persons-csv", default="nodes_persons.csv", help="[step4]")
+    ap.add_argument("--universities-csv", default="nodes_universities.csv", help="[step4]")
+    ap.add_argument("--roots-csv-name", default="root_nodes.csv", help="[step4] tên file root trong outdir")
+
+    # worker
+    ap.add_argument("--shard", type=int, action="append", help="Chỉ nhận task của shard này (lặp lại được)")
+    ap.add_argument("--procs", type=int, default=4, help="[run] số worker cục bộ")
+    ap.add_argument("--merge", action="store_true", help="[run] merge sau khi các worker kết thúc")
+    ap.add_argument("--visibility", type=float, default=120.0, help="Visibility timeout của lease (giây)")
+    ap.add_argument("--max-attempts", type=int, default=3)
+    ap.add_argument("--poll", type=float, default=2.0)
+    ap.add_argument("--idle-timeout", type=float, default=600.0)
+    ap.add_argument("--http-timeout", type=float, default=6.0)
+    ap.add_argument("--sleep", type=float, default=0.06)
+    ap.add_argument("--progress-every", type=int, default=50)
+    args = ap.parse_args()
+
+    os.makedirs(args.outdir, exist_ok=True)
+
+    if args.command == "init":
+        conn = connect(args.outdir)
+        if meta_get(conn, "shards") is None:
+            meta_set(conn, "shards", args.shards)
+        args.shards = int(meta_get(conn, "shards"))
+        if args.stage == "step3":
+            if not (args.seeds and args.config):
+                raise SystemExit("step3 cần --seeds và --config")
+            n = init_step3(conn, args)
+        else:
+            n = init_step4(conn, args)
+        print(f"✅ init {args.stage}: +{n} task | shards={args.shards} | queue={os.path.join(cluster_dir(args.outdir), DB_NAME)}")
+        conn.close()
+
+    elif args.command == "worker":
+        worker_loop(args)
+
+    elif args.command == "run":
+        procs = [Process(target=worker_loop, args=(args, f"{socket.gethostname()}-w{i}")) for i in range(max(1, args.procs))]
+        for p in procs: p.start()
+        for p in procs: p.join()
+        if args.merge:
+            conn = connect(args.outdir)
+            (merge_step3 if args.stage == "step3" else merge_step4)(conn, args.outdir)
+            conn.close()
+
+    elif args.command == "merge":
+        conn = connect(args.outdir)
+        (merge_step3 if args.stage == "step3" else merge_step4)(conn, args.outdir)
+        conn.close()
+
+    else:
+        conn = connect(args.outdir)
+        print_status(conn)
+        conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -3,21 +3,61 @@
 """
 Integrate all edges into single comprehensive graph
 - Fix university node types
-- Merge original graph edges (alumni, same_uni, link_to mentions)
+- Merge original graph edges (alumni, same_uni, link_to mentions); alumni_of keeps the graduation
+  year(s) from edges_up in the `year` column ("1990" / "1990;1995", empty when unknown)
 - Merge enrichment v3 edges (career, country, relationships)
-- Output: single nodes + edges files
+- Output: single nodes + edges files (+ memory-mappable snapshot graph_out/snapshot/)
+- Clique relations (same_birth_country / same_career / same_uni) go to groups_unified.csv as
+  group memberships instead of one edge per pair, unless --materialize-cliques (see clique_groups.py)
+- Aliases in graph_out/entity_merge_map.csv (entity_resolution.py) are folded into their canonical
+  node: node ids, both edge endpoints and group members, unless --no-merge-map
 """
 
+import os
+import re
 import json
 import csv
+import heapq
+import struct
+import argparse
+import tempfile
+import itertools
 from collections import defaultdict
 from typing import List, Dict, Set
 
+from graph_snapshot import snapshot_from_csv
+from graph_loader import EDGE_COLUMNS, format_years
+from entity_resolution import MERGE_MAP_FILE, load_merge_map
+import graph_changelog
+from clique_groups import (GROUP_RELATIONS, CliqueIndex, expand_groups, pairs_to_groups,
+                           read_groups, write_groups)
+
+# Undirected relationship types (should deduplicate A→B and B→A)
+UNDIRECTED_TYPES = {'same_birth_country', 'same_career', 'same_uni', 'same_school'}
+
+# Nguồn cạnh theo thứ tự ưu tiên khi dedupe (bản xuất hiện trước được giữ)
+EDGE_SOURCES = ['alumni_of', 'same_uni', 'link_to', 'same_grad', 'enrichment v3']
+
+def _read_csv_rows(path, skip_header=True):
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.reader(f)
+        if skip_header:
+            next(reader, None)
+        return [row for row in reader]
+
 def load_original_graph():
-    """Load original graph.json"""
+    """Load original graph.json (full lists, or step3 manifest pointing at CSV files)"""
     print("[+] Loading original graph...")
     with open('graph_out/graph.json', 'r', encoding='utf-8') as f:
         graph = json.load(f)
+
+    if graph.get('format') == 'manifest':
+        files = graph.get('files', {})
+        base = 'graph_out'
+        graph['persons'] = [r[1] for r in _read_csv_rows(f"{base}/{files['persons']}") if len(r) > 1]
+        graph['universities'] = [r[1] for r in _read_csv_rows(f"{base}/{files['universities']}") if len(r) > 1]
+        for key in ('edges_up', 'edges_shared', 'edges_same_grad'):
+            graph[key] = _read_csv_rows(f"{base}/{files[key]}")
     
     print(f"  - Persons: {len(graph.get('persons', []))}")
     print(f"  - Universities: {len(graph.get('universities', []))}")
@@ -42,20 +82,61 @@ def load_enrichment_v3():
     
     return nodes, edges
 
-def load_mention_edges():
-    """Load mention edges from separate CSV files and convert to link_to"""
-    print("[+] Loading mention edges (as link_to)...")
-    
-    mention_edges = []
-    mention_files = [
-        'graph_out/edges_mentions_pp.csv',
-        'graph_out/edges_mentions_pu.csv',
-        'graph_out/edges_uni_mentions_p.csv',
-        'graph_out/edges_uni_mentions_u.csv',
-    ]
-    
+def load_enrichment_groups(path='graph_out/groups_vi_v3.csv'):
+    """Clique groups written by the enricher (absent for older runs → [])"""
+    groups = read_groups(path)
+    if groups:
+        print(f"  - Groups: {len(groups)} ({sum(len(m) for _, _, _, m in groups)} members)")
+    return groups
+
+def load_entity_merge_map(path=f'graph_out/{MERGE_MAP_FILE}'):
+    """alias → canonical (status auto/accept); no merge map yet → {}"""
+    merge_map = load_merge_map(path)
+    if merge_map:
+        print(f"  - Merge map: {len(merge_map)} aliases")
+    return merge_map
+
+def group_edges(groups):
+    """Materialize groups as enrichment-style edge dicts (one per pair)"""
+    for a, b, relation, weight in expand_groups(groups):
+        yield {'from': a, 'to': b, 'type': relation, 'weight': weight}
+
+def filter_groups(groups, valid_nodes, merge_map=None):
+    """Drop members that are not nodes (same rule as orphan edges); groups left with < 2 members vanish.
+    Aliases are replaced by their canonical node first (two aliases of one entity → one member)."""
+    merge_map = merge_map or {}
+    index = CliqueIndex()
+    for relation, group, weight, members in groups:
+        members = dict.fromkeys(merge_map.get(m, m) for m in members)
+        index.add(relation, group, weight, [m for m in members if m in valid_nodes])
+    return index
+
+def split_clique_edges(edges, index):
+    """Move pair-form clique edges out of `edges`: pairs already covered by `index` are dropped, the
+    rest are covered by new groups (a pair that is not part of any larger clique stays an edge).
+    Returns (remaining edges, all groups)."""
+    pairs = [(edge['type'], edge['from'], edge['to'], edge['weight']) for edge in edges
+             if edge['type'] in GROUP_RELATIONS and not index.has_edge(edge['from'], edge['to'], edge['type'])]
+    groups, rest = pairs_to_groups(pairs, min_size=3)
+    for group in groups:
+        index.add(*group)
+    single = {(rel, a, b) for rel, a, b, _ in rest} | {(rel, b, a) for rel, a, b, _ in rest}
+    kept = [edge for edge in edges
+            if edge['type'] not in GROUP_RELATIONS or (edge['type'], edge['from'], edge['to']) in single]
+    print(f"[OK] {len(edges) - len(kept)} clique edges → {len(index)} groups ({len(rest)} kept as edges)")
+    return kept, index.groups
+
+MENTION_FILES = [
+    'graph_out/edges_mentions_pp.csv',
+    'graph_out/edges_mentions_pu.csv',
+    'graph_out/edges_uni_mentions_p.csv',
+    'graph_out/edges_uni_mentions_u.csv',
+]
+
+def iter_mention_edges(stats=None):
+    """Stream mention edges from the separate CSV files as link_to"""
     total_count = 0
-    for filename in mention_files:
+    for filename in MENTION_FILES:
         try:
             with open(filename, 'r', encoding='utf-8') as f:
                 reader = csv.DictReader(f)
@@ -65,36 +146,58 @@ def load_mention_edges():
                     dst = row.get('dst_person') or row.get('dst_university', '')
                     
                     if src.strip() and dst.strip():
-                        mention_edges.append({
+                        total_count += 1
+                        yield {
                             'from': src.strip(),
                             'to': dst.strip(),
                             'type': 'link_to',
                             'weight': 1,
-                        })
-                        total_count += 1
+                        }
             print(f"  - {filename}: OK")
         except FileNotFoundError:
             print(f"  - {filename}: NOT FOUND (skipped)")
         except Exception as e:
             print(f"  - {filename}: ERROR - {e}")
-    
-    print(f"[OK] Loaded {total_count} mention edges as link_to")
+    if stats is not None:
+        stats['mention_edges'] = total_count
+
+def load_mention_edges():
+    """Load mention edges from separate CSV files and convert to link_to"""
+    print("[+] Loading mention edges (as link_to)...")
+    stats = {}
+    mention_edges = list(iter_mention_edges(stats))
+    print(f"[OK] Loaded {stats.get('mention_edges', 0)} mention edges as link_to")
     return mention_edges
 
-def create_unified_nodes(original_graph, enrichment_nodes):
-    """Create unified node list with correct types"""
+def create_unified_nodes(original_graph, enrichment_nodes, merge_map=None, enrichment_ids=None):
+    """Create unified node list with correct types
+
+    An alias node (merge_map) is dropped when its canonical node exists, otherwise it is renamed to it.
+    enrichment_ids: ids of enrichment_nodes, precomputed when enrichment_nodes is a one-shot iterator.
+    """
     print("[+] Creating unified nodes...")
     
     unified_nodes = []
     seen_ids = set()
+    merge_map = merge_map or {}
+    if enrichment_ids is None:
+        enrichment_ids = {node['id'] for node in enrichment_nodes} if merge_map else set()
+    merged = 0
     
     # Universities from original graph (as authoritative source for universities)
     universities_set = set(original_graph.get('universities', []))
+    universities_set |= {merge_map.get(u, u) for u in universities_set}
     
     # Process enrichment nodes
     for node in enrichment_nodes:
         node_id = node['id']
         node_title = node['title']
+        if node_id in merge_map:
+            merged += 1
+            canonical = merge_map[node_id]
+            if canonical in enrichment_ids:
+                continue
+            node_id = node_title = canonical
         
         # Fix type for universities
         if node_id in universities_set or node_title in universities_set:
@@ -115,172 +218,361 @@ def create_unified_nodes(original_graph, enrichment_nodes):
             })
             seen_ids.add(node_id)
     
-    print(f"[OK] Created {len(unified_nodes)} unified nodes")
+    print(f"[OK] Created {len(unified_nodes)} unified nodes" + (f" ({merged} aliases merged)" if merged else ""))
     
     return unified_nodes
 
-def create_unified_edges(original_graph, enrichment_edges, mention_edges, valid_nodes):
-    """Create unified edge list from all sources
-    
-    Args:
-        original_graph: Original graph data
-        enrichment_edges: Edges from enrichment v3
-        mention_edges: Link_to edges from mentions
-        valid_nodes: Set of valid node IDs to filter orphan edges
+def edge_key(src, dst, edge_type, undirected):
+    """Dedupe key: undirected → (sorted pair, type); directed → (src, dst, type)"""
+    if undirected:
+        return (tuple(sorted([src, dst])), edge_type)
+    return (src, dst, edge_type)
+
+def _grad_year(value):
+    """Year column of edges_up ('' / 2001 / '2001') → int or None"""
+    m = re.match(r'\s*(\d{4})\b', str(value or ''))
+    return int(m.group(1)) if m else None
+
+def iter_edge_candidates(original_graph, enrichment_edges, mention_edges, valid_nodes, stats, merge_map=None):
+    """Yield (source_idx, src, dst, type, weight, undirected, year) from all sources, in merge priority order.
+    year: graduation year of an alumni_of edge from edges_up (None elsewhere).
+
+    Dùng chung cho chế độ in-memory và streaming để luật gộp không bị lệch nhau.
+    merge_map: alias → tên chuẩn ở cả hai đầu cạnh (trước khi lọc orphan); cạnh thành tự nối sau khi
+    gộp bị bỏ, cạnh trùng do gộp để dedupe xử lý.
     """
-    print("[+] Creating unified edges...")
-    
-    unified_edges = []
-    edge_dedup = set()
-    orphan_count = 0
-    
+    merge_map = merge_map or {}
+    for source, src, dst, edge_type, weight, undirected, year in _iter_source_edges(
+            original_graph, enrichment_edges, mention_edges):
+        if merge_map and (src in merge_map or dst in merge_map):
+            src, dst = merge_map.get(src, src), merge_map.get(dst, dst)
+            if src == dst:
+                stats['merged'] = stats.get('merged', 0) + 1
+                continue
+        # VALIDATE: enrichment edges need both nodes to exist
+        if source == 4 and (src not in valid_nodes or dst not in valid_nodes):
+            stats['orphan'] += 1
+            continue
+        yield source, src, dst, edge_type, weight, undirected, year
+
+def _iter_source_edges(original_graph, enrichment_edges, mention_edges):
     # 1. Original graph edges - ALUMNI_OF (person -> university)
     # Format: [university, person, 'ALUMNI_OF', year]
-    print("  - Processing alumni_of edges...")
-    alumni_count = 0
     for edge in original_graph.get('edges_up', []):
         if isinstance(edge, list) and len(edge) >= 3:
             university = edge[0]
             person = edge[1]
-            
             if person and university:
-                edge_key = (person, university, 'alumni_of')
-                if edge_key not in edge_dedup:
-                    unified_edges.append({
-                        'from': person,
-                        'to': university,
-                        'type': 'alumni_of',
-                        'weight': 1,
-                    })
-                    edge_dedup.add(edge_key)
-                    alumni_count += 1
-    print(f"    Added {alumni_count} alumni_of edges")
+                year = _grad_year(edge[3]) if len(edge) > 3 else None
+                yield 0, person, university, 'alumni_of', 1, False, year
     
     # 2. Original graph - SAME_UNI (person -> person, same university)
     # Format: [src, dst, 'SHARED_UNI' (label), count]
-    print("  - Processing same_uni edges...")
-    same_uni_count = 0
     for edge in original_graph.get('edges_shared', []):
         if isinstance(edge, list) and len(edge) >= 3:
             src = edge[0]
             dst = edge[1]
             weight = int(edge[3]) if len(edge) > 3 and edge[3] else 1
-            
             if src and dst:
-                # For undirected relationships, normalize to avoid duplicates
-                normalized_key = tuple(sorted([src, dst]))
-                edge_key = (normalized_key, 'same_uni')
-                
-                if edge_key not in edge_dedup:
-                    unified_edges.append({
-                        'from': src,
-                        'to': dst,
-                        'type': 'same_uni',
-                        'weight': weight,
-                    })
-                    edge_dedup.add(edge_key)
-                    same_uni_count += 1
-    print(f"    Added {same_uni_count} same_uni edges")
+                yield 1, src, dst, 'same_uni', weight, True, None
     
     # 3. Link_to edges from mention CSV files
-    print("  - Processing link_to edges...")
-    link_to_count = 0
     for edge in mention_edges:
         src = edge['from']
         dst = edge['to']
-        
         if src and dst:
-            # For undirected relationships, normalize to avoid duplicates
-            normalized_key = tuple(sorted([src, dst]))
-            edge_key = (normalized_key, 'link_to')
-            
-            if edge_key not in edge_dedup:
-                unified_edges.append(edge)
-                edge_dedup.add(edge_key)
-                link_to_count += 1
-    print(f"    Added {link_to_count} link_to edges")
-    
-    # 4. Original graph - SAME_UNIVERSITY (person -> person)
-    # Format: [src, dst, 'SAME_GRAD', '']
-    print("  - Processing same_grad edges...")
-    same_grad_count = 0
+            yield 2, src, dst, 'link_to', edge.get('weight', 1), True, None
+    
+    # 4. Original graph - SAME_GRAD (person -> person), merged as same_uni
+    # Format: [src, dst, 'SAME_GRAD_YEAR', year]
     for edge in original_graph.get('edges_same_grad', []):
         if isinstance(edge, list) and len(edge) >= 2:
             src = edge[0]
             dst = edge[1]
-            
             if src and dst:
-                normalized_key = tuple(sorted([src, dst]))
-                edge_key = (normalized_key, 'same_uni')
-                if edge_key not in edge_dedup:
-                    unified_edges.append({
-                        'from': src,
-                        'to': dst,
-                        'type': 'same_uni',
-                        'weight': 1,
-                    })
-                    edge_dedup.add(edge_key)
-                    same_grad_count += 1
-    if same_grad_count > 0:
-        print(f"    Added {same_grad_count} same_grad edges")
+                yield 3, src, dst, 'same_uni', 1, True, None
     
     # 5. Enrichment v3 edges (career, country, relationships)
-    print("  - Processing enrichment v3 edges...")
-    
-    # Undirected relationship types (should deduplicate A→B and B→A)
-    undirected_types = {'same_birth_country', 'same_career', 'same_uni', 'same_school'}
-    
-    enrichment_count = 0
     for edge in enrichment_edges:
         src = edge.get('from', '')
         dst = edge.get('to', '')
         edge_type = edge.get('type', '')
-        
         if src and dst:
-            # VALIDATE: Both nodes must exist
-            if src not in valid_nodes or dst not in valid_nodes:
-                orphan_count += 1
-                continue
-            
-            # For undirected relationships, normalize to avoid A→B and B→A duplicates
-            if edge_type in undirected_types:
-                normalized_key = tuple(sorted([src, dst]))
-                edge_key = (normalized_key, edge_type)
-            else:
-                # Directed relationships (has_career, born_in, alumni_of, etc.)
-                edge_key = (src, dst, edge_type)
-            
-            if edge_key not in edge_dedup:
-                unified_edges.append({
-                    'from': src,
-                    'to': dst,
-                    'type': edge_type,
-                    'weight': edge.get('weight', 1),
-                })
-                edge_dedup.add(edge_key)
-                enrichment_count += 1
-    print(f"    Added {enrichment_count} enrichment v3 edges (filtered {orphan_count} orphan edges)")
-    
-    print(f"\n[OK] Created {len(unified_edges)} unified edges total (filtered {orphan_count} total orphan edges)")
+            yield 4, src, dst, edge_type, edge.get('weight', 1), edge_type in UNDIRECTED_TYPES, None
+
+def print_source_counts(counts, orphan_count, merged_count=0):
+    for idx, name in enumerate(EDGE_SOURCES):
+        extra = f" (filtered {orphan_count} orphan edges)" if idx == 4 else ""
+        print(f"    Added {counts.get(idx, 0)} {name} edges{extra}")
+    if merged_count:
+        print(f"    Dropped {merged_count} edges between aliases of one entity")
+
+def create_unified_edges(original_graph, enrichment_edges, mention_edges, valid_nodes, merge_map=None):
+    """Create unified edge list from all sources
+    
+    Args:
+        original_graph: Original graph data
+        enrichment_edges: Edges from enrichment v3
+        mention_edges: Link_to edges from mentions
+        valid_nodes: Set of valid node IDs to filter orphan edges
+        merge_map: alias → canonical node (entity_resolution.load_merge_map)
+    """
+    print("[+] Creating unified edges...")
+    
+    unified_edges = []
+    edge_dedup = {}  # key → index in unified_edges
+    grad_years = defaultdict(set)  # index → years of every duplicate (a degree per edges_up row)
+    stats = {'orphan': 0}
+    counts = defaultdict(int)
+    
+    for source, src, dst, edge_type, weight, undirected, year in iter_edge_candidates(
+            original_graph, enrichment_edges, mention_edges, valid_nodes, stats, merge_map):
+        key = edge_key(src, dst, edge_type, undirected)
+        i = edge_dedup.get(key)
+        if i is None:
+            i = edge_dedup[key] = len(unified_edges)
+            unified_edges.append({
+                'from': src,
+                'to': dst,
+                'type': edge_type,
+                'weight': weight,
+            })
+            counts[source] += 1
+        if year is not None:
+            grad_years[i].add(year)
+    for i, years in grad_years.items():
+        unified_edges[i]['year'] = format_years(years)
+    
+    print_source_counts(counts, stats['orphan'], stats.get('merged', 0))
+    print(f"\n[OK] Created {len(unified_edges)} unified edges total (filtered {stats['orphan']} total orphan edges)")
     
     return unified_edges
 
-def export_unified_graph(nodes, edges):
+def export_groups(groups, path='graph_out/groups_unified.csv'):
+    """groups=None (materialized run) → remove a stale groups file so consumers don't double count"""
+    if groups is None:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    write_groups(path, groups)
+    print(f"  [OK] {path} ({len(groups)} groups)")
+
+def export_unified_graph(nodes, edges, groups=None):
     """Export unified graph to JSON and CSV"""
     print("[+] Exporting unified graph...")
     
-    # Export JSON
-    nodes_file = 'graph_out/nodes_unified.json'
-    with open(nodes_file, 'w', encoding='utf-8') as f:
-        json.dump(nodes, f, ensure_ascii=False, indent=2)
-    print(f"  [OK] {nodes_file}")
+    export_unified_nodes(nodes)
+    export_groups(groups)
     
     edges_file = 'graph_out/edges_unified.json'
     with open(edges_file, 'w', encoding='utf-8') as f:
         json.dump(edges, f, ensure_ascii=False, indent=2)
     print(f"  [OK] {edges_file}")
     
-    # Export CSV
+    edges_csv = 'graph_out/edges_unified.csv'
+    with open(edges_csv, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=EDGE_COLUMNS, restval='')
+        writer.writeheader()
+        writer.writerows(edges)
+    print(f"  [OK] {edges_csv}")
+
+def export_version(graph_dir='graph_out'):
+    """Full rebuild = new graph version; the changelog (graph_changelog.py) restarts empty after it"""
+    version = graph_changelog.reset(graph_dir)
+    print(f"  [OK] {graph_dir}/{graph_changelog.VERSION_FILE} (version {version})")
+    return version
+
+def export_snapshot(outdir='graph_out/snapshot', version=None):
+    """Snapshot nhị phân (CSR .npy, mmap được) dựng lại từ CSV vừa ghi — xem graph_snapshot.py"""
+    meta = snapshot_from_csv('graph_out/nodes_unified.csv', 'graph_out/edges_unified.csv', outdir, version=version)
+    print(f"  [OK] {outdir}/ ({meta['n_nodes']} nodes, {meta['n_edges']} edges)")
+
+# ============ Streaming merge (bounded memory) ============
+# Bản ghi cố định: seq, src_id, dst_id, type_id, source, flags (bit0 undirected, bit1 weight int), weight,
+# year (0 = không có)
+EDGE_REC = struct.Struct('<QIIHBBdH')
+
+def _iter_csv_lists(path):
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        yield from reader
+
+def stream_original_graph(path='graph_out/graph.json'):
+    """graph.json: manifest → iterate CSV rows lazily; legacy full JSON → loaded (no streaming possible)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        graph = json.load(f)
+    if graph.get('format') == 'manifest':
+        files = graph.get('files', {})
+        base = os.path.dirname(path)
+        graph['universities'] = [r[1] for r in _iter_csv_lists(os.path.join(base, files['universities'])) if len(r) > 1]
+        for key in ('edges_up', 'edges_shared', 'edges_same_grad'):
+            graph[key] = _iter_csv_lists(os.path.join(base, files[key]))
+    return graph
+
+def iter_json_array(path, chunk=1 << 20):
+    """Phần tử của 1 mảng JSON đọc theo khối (RAM theo 1 phần tử, không theo cả file)"""
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buf, pos, eof = '', 0, False
+
+        def fill():
+            nonlocal buf, pos, eof
+            data = f.read(chunk)
+            eof = not data
+            buf, pos = buf[pos:] + data, 0
+
+        def skip_ws():
+            nonlocal pos
+            while True:
+                while pos < len(buf) and buf[pos] in ' \t\r\n':
+                    pos += 1
+                if pos < len(buf) or eof:
+                    return
+                fill()
+
+        fill()
+        skip_ws()
+        if buf[pos:pos + 1] != '[':
+            raise ValueError(f"{path}: không phải mảng JSON")
+        pos += 1
+        skip_ws()
+        if buf[pos:pos + 1] == ']':
+            return
+        while True:
+            while True:
+                try:
+                    item, end = decoder.raw_decode(buf, pos)
+                    break
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                    fill()  # phần tử bị cắt ở cuối khối → đọc thêm rồi giải mã lại
+            # Số ở cuối khối có thể bị cắt ("12|3", "1.|5"): chỉ nhận khi ngay sau nó là ký tự phân cách
+            if not eof and (end == len(buf) or buf[end] not in ' \t\r\n,]'):
+                fill()
+                continue
+            yield item
+            pos = end
+            skip_ws()
+            sep = buf[pos:pos + 1]
+            pos += 1
+            if sep == ']':
+                return
+            if sep != ',':
+                raise ValueError(f"{path}: mảng JSON hỏng ở vị trí gần {f.tell()}")
+            skip_ws()
+
+def _parse_weight(w):
+    if isinstance(w, str):
+        try:
+            return int(w)
+        except ValueError:
+            try:
+                return float(w)
+            except ValueError:
+                return 1
+    return w
+
+def stream_enrichment_edges(prefix='graph_out/edges_vi_v3'):
+    """edges_vi_v3.csv (streamed) if present, else edges_vi_v3.json"""
+    if os.path.exists(prefix + '.csv'):
+        with open(prefix + '.csv', 'r', encoding='utf-8', newline='') as f:
+            for row in csv.DictReader(f):
+                row['weight'] = _parse_weight(row.get('weight', 1))
+                yield row
+    else:
+        yield from iter_json_array(prefix + '.json')
+
+class _Interner:
+    def __init__(self):
+        self.ids, self.values = {}, []
+
+    def __call__(self, value):
+        i = self.ids.get(value)
+        if i is None:
+            i = self.ids[value] = len(self.values)
+            self.values.append(value)
+        return i
+
+def _iter_records(path, chunk=4096):
+    size = EDGE_REC.size
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(size * chunk)
+            if not data:
+                break
+            yield from EDGE_REC.iter_unpack(data)
+
+def streaming_dedupe(candidates, partitions=64, tmpdir=None):
+    """Dedupe giữ bản xuất hiện đầu tiên, đúng thứ tự nguồn, với RAM giới hạn.
+
+    1) Chuẩn hoá mỗi cạnh thành bản ghi cố định (id nguyên cho tiêu đề/loại) và băm theo khoá
+       (cặp không hướng đã sắp xếp) vào `partitions` file tạm.
+    2) Dedupe từng partition (chỉ 1 partition trong RAM); bản ghi trong partition vốn đã theo seq.
+       Năm tốt nghiệp của các bản trùng gộp vào bản được giữ (RAM theo số cạnh có năm, không theo số cạnh).
+    3) Trộn k-đường các partition theo seq → yield (source, from, to, type, weight, year).
+    """
+    titles, types = _Interner(), _Interner()
+    grad_years = defaultdict(set)  # seq của bản được giữ → năm
+    with tempfile.TemporaryDirectory(prefix='_unified_', dir=tmpdir) as td:
+        parts = [open(os.path.join(td, f'p{i:03d}.bin'), 'wb', buffering=1 << 16) for i in range(partitions)]
+        try:
+            for seq, (source, src, dst, edge_type, weight, undirected, year) in enumerate(candidates):
+                a, b, t = titles(src), titles(dst), types(edge_type)
+                k1, k2 = (min(a, b), max(a, b)) if undirected else (a, b)
+                flags = (1 if undirected else 0) | (2 if isinstance(weight, int) else 0)
+                part = hash((k1, k2, t, undirected)) % partitions
+                parts[part].write(EDGE_REC.pack(seq, a, b, t, source, flags, float(weight), year or 0))
+        finally:
+            for f in parts:
+                f.close()
+
+        runs = []
+        for i in range(partitions):
+            src_path = os.path.join(td, f'p{i:03d}.bin')
+            run_path = os.path.join(td, f'r{i:03d}.bin')
+            seen = {}
+            with open(run_path, 'wb', buffering=1 << 16) as out:
+                for rec in _iter_records(src_path):
+                    seq, a, b, t, source, flags, w, year = rec
+                    key = (min(a, b), max(a, b), t, 1) if flags & 1 else (a, b, t, 0)
+                    kept = seen.get(key)
+                    if kept is None:
+                        kept = seen[key] = seq
+                        out.write(EDGE_REC.pack(*rec))
+                    if year:
+                        grad_years[kept].add(year)
+            os.remove(src_path)
+            runs.append(run_path)
+
+        for seq, a, b, t, source, flags, w, _ in heapq.merge(*(_iter_records(p) for p in runs)):
+            years = grad_years.get(seq)
+            yield (source, titles.values[a], titles.values[b], types.values[t], (int(w) if flags & 2 else w),
+                   format_years(years) if years else '')
+
+class _JsonArrayWriter:
+    """Ghi mảng JSON giống json.dump(list, indent=2) nhưng từng phần tử"""
+    def __init__(self, path):
+        self.f = open(path, 'w', encoding='utf-8')
+        self.f.write('[')
+        self.first = True
+
+    def write(self, item):
+        self.f.write('\n' if self.first else ',\n')
+        self.first = False
+        self.f.write('\n'.join('  ' + ln for ln in json.dumps(item, ensure_ascii=False, indent=2).split('\n')))
+
+    def close(self):
+        self.f.write('\n]' if not self.first else ']')
+        self.f.close()
+
+def export_unified_nodes(nodes):
+    nodes_file = 'graph_out/nodes_unified.json'
+    with open(nodes_file, 'w', encoding='utf-8') as f:
+        json.dump(nodes, f, ensure_ascii=False, indent=2)
+    print(f"  [OK] {nodes_file}")
+    
     nodes_csv = 'graph_out/nodes_unified.csv'
     with open(nodes_csv, 'w', newline='', encoding='utf-8') as f:
         writer = csv.DictWriter(f, fieldnames=['id', 'title', 'type'])
@@ -292,15 +584,74 @@ def export_unified_graph(nodes, edges):
                 'type': node['type'],
             })
     print(f"  [OK] {nodes_csv}")
+
+def streaming_main(partitions=64, tmpdir=None, snapshot=True, materialize_cliques=False, merge_map=None):
+    """Gộp đồ thị với RAM giới hạn theo số node (không theo số cạnh).
+
+    Với --materialize-cliques, đầu ra giống hệt chế độ thường. Ở chế độ nhóm (mặc định) thì KHÔNG giống hệt:
+    nhóm clique của enricher được ghi thẳng ra groups_unified.csv, còn cặp clique dạng cạnh (graph.json
+    edges_shared / edges_same_grad, hoặc file enrichment cũ) vẫn nằm trong edges_unified.csv, kể cả cặp đã
+    thuộc 1 nhóm. Chế độ thường thì gom chúng vào nhóm (split_clique_edges), nhưng việc gom cần toàn bộ cặp
+    trong RAM, trái với mục đích của chế độ này. Đồ thị sau khi nạp vẫn như nhau: KnowledgeGraph tự gom
+    cặp thành nhóm, graph_snapshot.to_adjacency gộp cặp trùng.
+    """
+    print("[+] Streaming merge mode")
+    original_graph = stream_original_graph()
+    nodes_path = 'graph_out/nodes_vi_v3.json'
+    # 2 lượt đọc stream thay vì giữ cả danh sách node enrichment trong RAM
+    enrichment_ids = {node['id'] for node in iter_json_array(nodes_path)} if merge_map else set()
+    unified_nodes = create_unified_nodes(original_graph, iter_json_array(nodes_path), merge_map, enrichment_ids)
+    valid_nodes = set(node['id'] for node in unified_nodes)
     
-    edges_csv = 'graph_out/edges_unified.csv'
-    with open(edges_csv, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=['from', 'to', 'type', 'weight'])
+    print("[+] Exporting unified graph...")
+    export_unified_nodes(unified_nodes)
+    enrichment_groups = load_enrichment_groups()
+    enrichment_edges = stream_enrichment_edges()
+    if materialize_cliques:
+        enrichment_edges = itertools.chain(enrichment_edges, group_edges(enrichment_groups))
+        export_groups(None)
+    else:
+        export_groups(filter_groups(enrichment_groups, valid_nodes, merge_map).groups)
+    
+    stats = {'orphan': 0}
+    candidates = iter_edge_candidates(original_graph, enrichment_edges,
+                                      iter_mention_edges(), valid_nodes, stats, merge_map)
+    
+    edges_json = _JsonArrayWriter('graph_out/edges_unified.json')
+    counts, type_counts, total = defaultdict(int), defaultdict(int), 0
+    with open('graph_out/edges_unified.csv', 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=EDGE_COLUMNS, restval='')
         writer.writeheader()
-        writer.writerows(edges)
-    print(f"  [OK] {edges_csv}")
+        for source, src, dst, edge_type, weight, years in streaming_dedupe(candidates, partitions, tmpdir):
+            edge = {'from': src, 'to': dst, 'type': edge_type, 'weight': weight}
+            if years:
+                edge['year'] = years
+            writer.writerow(edge)
+            edges_json.write(edge)
+            counts[source] += 1
+            type_counts[edge_type] += 1
+            total += 1
+    edges_json.close()
+    print("  [OK] graph_out/edges_unified.json")
+    print("  [OK] graph_out/edges_unified.csv")
+    version = export_version()
+    if snapshot:
+        export_snapshot(version=version)
+    
+    print_source_counts(counts, stats['orphan'], stats.get('merged', 0))
+    print(f"\n[OK] Created {total} unified edges total (filtered {stats['orphan']} total orphan edges)")
+    
+    node_types = defaultdict(int)
+    for node in unified_nodes:
+        node_types[node['type']] += 1
+    print(f"\nNodes: {len(unified_nodes)}")
+    for node_type, count in sorted(node_types.items()):
+        print(f"  {node_type}: {count}")
+    print(f"\nEdges: {total}")
+    for edge_type, count in sorted(type_counts.items(), key=lambda x: -x[1]):
+        print(f"  {edge_type}: {count}")
 
-def print_statistics(nodes, edges):
+def print_statistics(nodes, edges, groups=None):
     """Print graph statistics"""
     print("\n" + "=" * 80)
     print("UNIFIED GRAPH STATISTICS")
@@ -323,27 +674,65 @@ def print_statistics(nodes, edges):
     print(f"\nEdges: {len(edges)}")
     for edge_type, count in sorted(edge_types.items(), key=lambda x: -x[1]):
         print(f"  {edge_type}: {count}")
+    
+    if groups:
+        index = CliqueIndex(groups)
+        print(f"\nClique groups: {len(groups)} ({index.number_of_edges()} virtual edges)")
+        for relation, count in sorted(index.pair_counts().items(), key=lambda x: -x[1]):
+            print(f"  {relation}: {count}")
 
 def main():
+    ap = argparse.ArgumentParser(description="Integrate all edges into single unified graph")
+    ap.add_argument("--streaming", action="store_true",
+                    help="Gộp streaming: dedupe bằng hash-partition trên đĩa, RAM không tăng theo số cạnh")
+    ap.add_argument("--partitions", type=int, default=64, help="Số partition tạm (chế độ streaming)")
+    ap.add_argument("--tmpdir", default=None, help="Thư mục tạm (mặc định: thư mục tạm của hệ thống)")
+    ap.add_argument("--no-snapshot", action="store_true",
+                    help="Không ghi snapshot nhị phân graph_out/snapshot/")
+    ap.add_argument("--materialize-cliques", action="store_true",
+                    help="Ghi mọi cặp same_birth_country / same_career / same_uni vào file cạnh "
+                         "(mặc định: groups_unified.csv dạng nhóm thành viên)")
+    ap.add_argument("--no-merge-map", action="store_true",
+                    help=f"Không gộp alias theo graph_out/{MERGE_MAP_FILE} (entity_resolution.py)")
+    args = ap.parse_args()
+    
     print("=" * 80)
     print("UNIFIED GRAPH INTEGRATION")
     print("=" * 80)
     
+    merge_map = {} if args.no_merge_map else load_entity_merge_map()
+    if args.streaming:
+        streaming_main(args.partitions, args.tmpdir, snapshot=not args.no_snapshot,
+                       materialize_cliques=args.materialize_cliques, merge_map=merge_map)
+        print("\n" + "=" * 80)
+        print("INTEGRATION COMPLETE")
+        print("=" * 80)
+        return
+    
     # Load data
     original_graph = load_original_graph()
     enrichment_nodes, enrichment_edges = load_enrichment_v3()
+    enrichment_groups = load_enrichment_groups()
+    if args.materialize_cliques:
+        enrichment_edges = enrichment_edges + list(group_edges(enrichment_groups))
     mention_edges = load_mention_edges()
     
     # Create unified graph
-    unified_nodes = create_unified_nodes(original_graph, enrichment_nodes)
+    unified_nodes = create_unified_nodes(original_graph, enrichment_nodes, merge_map)
     valid_nodes = set(node['id'] for node in unified_nodes)
-    unified_edges = create_unified_edges(original_graph, enrichment_edges, mention_edges, valid_nodes)
+    unified_edges = create_unified_edges(original_graph, enrichment_edges, mention_edges, valid_nodes, merge_map)
+    groups = None
+    if not args.materialize_cliques:
+        unified_edges, groups = split_clique_edges(unified_edges, filter_groups(enrichment_groups, valid_nodes, merge_map))
     
     # Export
-    export_unified_graph(unified_nodes, unified_edges)
+    export_unified_graph(unified_nodes, unified_edges, groups)
+    version = export_version()
+    if not args.no_snapshot:
+        export_snapshot(version=version)
     
     # Statistics
-    print_statistics(unified_nodes, unified_edges)
+    print_statistics(unified_nodes, unified_edges, groups)
     
     print("\n" + "=" * 80)
     print("INTEGRATION COMPLETE")
@@ -7,14 +7,25 @@ Vietnamese Data Enrichment Module v3 - IMPROVED
 - MULTI-FIELD extraction: Sinh, Mat, Quoc tich, Vi tri, Location, etc.
 """
 
+import io
+import os
 import json
 import re
 import csv
+import hashlib
+import argparse
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from typing import List, Dict, Tuple, Set, Optional
 from pathlib import Path
 import warnings
 
+from utils_titles import UNIVERSITY_KEYWORDS, is_university_keyword
+from node_details_store import iter_node_details, ndjson_source
+from utils_matcher import AhoCorasick, is_word_boundary
+from clique_groups import write_groups
+
 try:
     from pyvi import ViTokenizer
     from underthesea import word_tokenize
@@ -50,10 +61,7 @@ class VietnameseNormalizer:
     @staticmethod
     def remove_diacritics(text: str) -> str:
         """Loai bo dau tieng Viet"""
-        result = []
-        for char in text:
-            result.append(VietnameseNormalizer.DIACRITICS_MAP.get(char, char))
-        return ''.join(result)
+        return text.translate(_DIACRITICS_TABLE)
     
     @staticmethod
     def normalize_vietnamese(text: str) -> str:
@@ -68,6 +76,9 @@ class VietnameseNormalizer:
         return text
 
 
+_DIACRITICS_TABLE = str.maketrans(VietnameseNormalizer.DIACRITICS_MAP)
+
+
 # ============ Vietnamese Career Database ============
 
 class CareerDatabaseVI:
@@ -120,42 +131,10 @@ class CareerDatabaseVI:
     
     @staticmethod
     def extract_careers_from_text(text: str) -> Set[str]:
-        """Trich xuat nghe nghiep tu text - IMPROVED"""
+        """Trich xuat nghe nghiep tu text - IMPROVED (1 luot quet Aho-Corasick)"""
         if not text:
             return set()
-        
-        careers = set()
-        text_normalized = VietnameseNormalizer.remove_diacritics(text).lower()
-        
-        # Sort by length DESC to match longer phrases first (e.g., "Pho Thu tuong" before "Thu tuong" or "Tuong")
-        sorted_careers = sorted(CareerDatabaseVI.CAREERS.keys(), key=lambda x: -len(x))
-        
-        # Track matched positions to avoid overlapping matches
-        matched_ranges = []
-        
-        for career in sorted_careers:
-            # Don't match single letters like "Y" which could be "Yes"
-            if len(career) <= 1:
-                continue
-            
-            career_normalized = VietnameseNormalizer.remove_diacritics(career).lower()
-            pattern = r'\b' + re.escape(career_normalized) + r'\b'
-            
-            for match in re.finditer(pattern, text_normalized):
-                # Check if this match overlaps with any previous match
-                match_start, match_end = match.span()
-                is_overlapping = False
-                
-                for prev_start, prev_end in matched_ranges:
-                    if (match_start < prev_end and match_end > prev_start):
-                        is_overlapping = True
-                        break
-                
-                if not is_overlapping:
-                    careers.add(career)
-                    matched_ranges.append((match_start, match_end))
-        
-        return careers
+        return set(_careers_in(VietnameseNormalizer.remove_diacritics(text).lower()))
     
     @staticmethod
     def get_career_category(career: str) -> Optional[str]:
@@ -301,6 +280,7 @@ class CountryDatabaseVI:
         3. Check India states
         4. Check historical names
         5. Check country names
+        Moi chien luoc / muc tu dien co 1 do uu tien; text duoc quet 1 lan, lay muc khop uu tien cao nhat.
         """
         if not text:
             return None
@@ -309,49 +289,8 @@ class CountryDatabaseVI:
         if isinstance(text, list):
             text = ' '.join(str(x) for x in text)
         
-        text = str(text).lower()
-        
         # Normalize diacritics for matching
-        text_normalized = VietnameseNormalizer.remove_diacritics(text)
-        
-        # Strategy 1: Check Chinese provinces FIRST (most specific)
-        for province, country in CountryDatabaseVI.PROVINCES_CHINA.items():
-            province_normalized = VietnameseNormalizer.remove_diacritics(province.lower())
-            # Use word boundary to avoid false matches
-            if re.search(r'\b' + re.escape(province_normalized) + r'\b', text_normalized):
-                return country
-        
-        # Strategy 2: Check Vietnamese provinces
-        for province, country in CountryDatabaseVI.PROVINCES_VN.items():
-            province_normalized = VietnameseNormalizer.remove_diacritics(province.lower())
-            if re.search(r'\b' + re.escape(province_normalized) + r'\b', text_normalized):
-                return country
-        
-        # Strategy 3: Check Indian states
-        for state, country in CountryDatabaseVI.INDIA_STATES.items():
-            state_normalized = VietnameseNormalizer.remove_diacritics(state.lower())
-            if re.search(r'\b' + re.escape(state_normalized) + r'\b', text_normalized):
-                return country
-        
-        # Strategy 4: Check historical names (e.g., "An Do thuoc Anh" -> "An Do")
-        for hist_name, country in CountryDatabaseVI.HISTORICAL_NAMES.items():
-            hist_normalized = VietnameseNormalizer.remove_diacritics(hist_name.lower())
-            if hist_normalized in text_normalized:
-                return country
-        
-        # Strategy 5: Check country names
-        for country_name in CountryDatabaseVI.COUNTRIES.keys():
-            country_normalized = VietnameseNormalizer.remove_diacritics(country_name.lower())
-            # Use word boundary for single-letter countries to avoid false matches
-            if len(country_name) == 1:
-                pattern = r'\b' + re.escape(country_normalized) + r'\b'
-            else:
-                pattern = r'\b' + re.escape(country_normalized)
-            
-            if re.search(pattern, text_normalized):
-                return country_name
-        
-        return None
+        return _country_in(VietnameseNormalizer.remove_diacritics(str(text).lower()))
     
     @staticmethod
     def extract_countries_from_text(text: str) -> Set[str]:
@@ -363,20 +302,7 @@ class CountryDatabaseVI:
         if isinstance(text, list):
             text = ' '.join(str(x) for x in text)
         
-        text = str(text).lower()
-        text_normalized = VietnameseNormalizer.remove_diacritics(text)
-        
-        found_countries = set()
-        
-        # Check all country names
-        for country_name in CountryDatabaseVI.COUNTRIES.keys():
-            country_normalized = VietnameseNormalizer.remove_diacritics(country_name.lower())
-            if country_name == "Y":  # Skip single-letter abbreviations
-                continue
-            if re.search(r'\b' + re.escape(country_normalized) + r'\b', text_normalized):
-                found_countries.add(country_name)
-        
-        return found_countries
+        return set(_countries_in(VietnameseNormalizer.remove_diacritics(str(text).lower())))
     
     @staticmethod
     def get_country_code(country: str) -> Optional[str]:
@@ -384,16 +310,259 @@ class CountryDatabaseVI:
         return CountryDatabaseVI.COUNTRIES.get(country)
 
 
+# ============ Dictionary matchers (Aho-Corasick) ============
+# Tu dien duoc bien dich 1 lan thanh automaton tren dang da bo dau; ranh gioi tu kiem tra theo dung
+# ngu nghia `\b` cua re. Ket qua giong het vong lap re.search cu (cung thu tu uu tien).
+
+@lru_cache(maxsize=None)
+def _career_matcher():
+    # Uu tien: cum dai truoc (sort theo do dai giam dan, on dinh theo thu tu tu dien)
+    careers = sorted(CareerDatabaseVI.CAREERS.keys(), key=lambda x: -len(x))
+    patterns = [(VietnameseNormalizer.remove_diacritics(c).lower(), (rank, c))
+                for rank, c in enumerate(careers) if len(c) > 1]  # bo mau 1 ky tu (vd "Y")
+    return AhoCorasick(patterns)
+
+@lru_cache(maxsize=1 << 16)
+def _careers_in(text_normalized: str) -> frozenset:
+    by_rank = defaultdict(list)
+    for start, end, (rank, career) in _career_matcher().finditer(text_normalized):
+        if is_word_boundary(text_normalized, start) and is_word_boundary(text_normalized, end):
+            by_rank[rank].append((start, end, career))
+    
+    careers, matched_ranges = set(), []
+    for rank in sorted(by_rank):
+        last_end = -1
+        for start, end, career in sorted(by_rank[rank]):
+            if start < last_end:  # re.finditer khong tra ve cac lan khop chong lan cua cung mau
+                continue
+            last_end = end
+            if not any(start < prev_end and end > prev_start for prev_start, prev_end in matched_ranges):
+                careers.add(career)
+                matched_ranges.append((start, end))
+    return frozenset(careers)
+
+# Kieu ranh gioi: 2 = \b ca hai dau, 1 = chi \b dau, 0 = chuoi con
+def _boundary_ok(text, start, end, mode):
+    if mode and not is_word_boundary(text, start):
+        return False
+    return mode < 2 or is_word_boundary(text, end)
+
+@lru_cache(maxsize=None)
+def _country_matcher():
+    db = CountryDatabaseVI
+    entries = []  # (pattern, (priority, result, mode))
+    for table in (db.PROVINCES_CHINA, db.PROVINCES_VN, db.INDIA_STATES):
+        for key, country in table.items():
+            entries.append((key, country, 2))
+    for key, country in db.HISTORICAL_NAMES.items():
+        entries.append((key, country, 0))
+    for key in db.COUNTRIES.keys():
+        entries.append((key, key, 2 if len(key) == 1 else 1))
+    first = AhoCorasick((VietnameseNormalizer.remove_diacritics(k.lower()), (prio, result, mode))
+                        for prio, (k, result, mode) in enumerate(entries))
+    # extract_countries_from_text: moi ten quoc gia (tru "Y"), \b ca hai dau
+    every = AhoCorasick((VietnameseNormalizer.remove_diacritics(k.lower()), k)
+                        for k in db.COUNTRIES.keys() if k != "Y")
+    return first, every
+
+@lru_cache(maxsize=1 << 16)
+def _country_in(text_normalized: str) -> Optional[str]:
+    best = None
+    for start, end, (prio, result, mode) in _country_matcher()[0].finditer(text_normalized):
+        if (best is None or prio < best[0]) and _boundary_ok(text_normalized, start, end, mode):
+            best = (prio, result)
+    return best[1] if best else None
+
+@lru_cache(maxsize=1 << 16)
+def _countries_in(text_normalized: str) -> frozenset:
+    return frozenset(name for start, end, name in _country_matcher()[1].finditer(text_normalized)
+                     if _boundary_ok(text_normalized, start, end, 2))
+
+
+# ============ Per-person extraction ============
+
+EXTRACTOR_VERSION = 1  # tang khi doi logic extract_person_enrichment
+
+# Truong khong chua nghe nghiep
+SKIP_CAREER_FIELDS = {
+    "Sinh", "Mất", "Nơi an nghỉ", "Con cái", "Phối ngẫu", "Website", 
+    "Chữ ký", "Tôn giáo", "Alma mater", "Giáo dục", "Trường học", "Học vấn",
+    "Tiền nhiệm", "Kế nhiệm", "Bổ nhiệm", "Nhiệm kỳ", "Đảng chính trị",
+    "Quốc tịch", "Quốc gia", "Vị trí", "Location", "Nơi cư trú"
+}
+COUNTRY_FIELDS = ["Quốc gia", "Vị trí", "Location", "Nơi cư trú", "Nơi cư ngụ", "Cư trú", "Khu vực"]
+EDUCATION_FIELDS = ["Alma mater", "Giáo dục", "Trường học", "Học vấn"]
+
+def properties_hash(props) -> str:
+    """Khoa cache: sha1 cua properties (JSON sort_keys)"""
+    data = json.dumps(props, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+def extractor_fingerprint() -> str:
+    """Thay doi khi tu dien / luat trich xuat thay doi → cache incremental cu bi bo"""
+    db = CountryDatabaseVI
+    rules = [EXTRACTOR_VERSION, CareerDatabaseVI.CAREERS, db.COUNTRIES, db.PROVINCES_CHINA,
+             db.PROVINCES_VN, db.HISTORICAL_NAMES, db.INDIA_STATES, sorted(SKIP_CAREER_FIELDS),
+             COUNTRY_FIELDS, EDUCATION_FIELDS]
+    return hashlib.sha1(json.dumps(rules, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def extract_person_enrichment(props) -> Optional[Dict]:
+    """
+    Ket qua trich xuat cua 1 nguoi (chi phu thuoc properties):
+    {'careers': [...], 'countries': [...], 'birth_country', 'death_country', 'education': [...]}
+    None neu vong lap cu khong tao ban ghi nao cho nguoi nay.
+    """
+    if not props:
+        return None
+    
+    touched = False
+    careers, countries, education = set(), set(), []
+    birth_country = death_country = None
+    
+    # ===== CAREER EXTRACTION =====
+    # Extract careers from ALL fields (except skip fields)
+    for field, value in props.items():
+        if field not in SKIP_CAREER_FIELDS:
+            touched = True
+            # The field name itself might be a career (e.g., "Tổng thống", "Thủ tướng")
+            careers.update(CareerDatabaseVI.extract_careers_from_text(field))
+            # Also check the value
+            careers.update(CareerDatabaseVI.extract_careers_from_text(str(value)))
+    
+    # ===== COUNTRY/LOCATION EXTRACTION =====
+    # Priority: Sinh -> Mat -> Quoc tich -> Quoc gia -> Vi tri -> Location
+    if "Sinh" in props:
+        birth_country = CountryDatabaseVI.extract_country_from_text(props["Sinh"])
+        touched = touched or bool(birth_country)
+    
+    if "Mat" in props:
+        death_country = CountryDatabaseVI.extract_country_from_text(props["Mat"])
+        touched = touched or bool(death_country)
+    
+    # Nationality
+    if "Quốc tịch" in props:
+        touched = True
+        countries.update(CountryDatabaseVI.extract_countries_from_text(props["Quốc tịch"]))
+    
+    # Country (from multiple fields) - using actual Vietnamese keys
+    for field in COUNTRY_FIELDS:
+        if field in props:
+            touched = True
+            countries.update(CountryDatabaseVI.extract_countries_from_text(str(props[field])))
+    
+    # Education
+    for field in EDUCATION_FIELDS:
+        if field in props:
+            alma_mater = props[field]
+            if isinstance(alma_mater, str):
+                touched = True
+                education.append(alma_mater)
+            elif isinstance(alma_mater, list):
+                touched = True
+                education.extend(alma_mater)
+    
+    if not touched:
+        return None
+    return {
+        'careers': sorted(careers),
+        'countries': sorted(countries),
+        'birth_country': birth_country,
+        'death_country': death_country,
+        'education': education,
+    }
+
+def _extract_chunk(props_list: List) -> List[Optional[Dict]]:
+    return [extract_person_enrichment(props) for props in props_list]
+
+def _extract_many(props_list: List, workers: int = 1, chunk_size: int = 256) -> List[Optional[Dict]]:
+    """Trich xuat theo lo; workers > 1 → ProcessPoolExecutor, ket qua giu dung thu tu dau vao"""
+    if workers <= 1 or len(props_list) <= chunk_size:
+        return _extract_chunk(props_list)
+    chunks = [props_list[i:i + chunk_size] for i in range(0, len(props_list), chunk_size)]
+    out = []
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        for part in ex.map(_extract_chunk, chunks):
+            out.extend(part)
+    return out
+
+
+# ============ Incremental cache & writers ============
+
+def load_enrich_cache(path: str) -> Dict:
+    """Cache incremental; bo qua (tao moi) neu khong co file hoac tu dien / luat da doi"""
+    fingerprint = extractor_fingerprint()
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get("fingerprint") == fingerprint:
+                return state
+            print(f"[!] Extraction rules changed, ignoring cache: {path}")
+        except (OSError, ValueError):
+            print(f"[!] Unreadable cache, ignoring: {path}")
+    return {"fingerprint": fingerprint, "records": {}}
+
+def save_enrich_cache(path: str, state: Dict):
+    tmp = path + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(state, ensure_ascii=False, separators=(",", ":")))  # dumps: bo ma hoa C (dump thi khong)
+    os.replace(tmp, path)
+
+def _file_sizes(*paths) -> List:
+    """[size, mtime_ns] tung file — file canh bi sua ngoai pipeline thi khong dung lai offset cu"""
+    out = []
+    for p in paths:
+        st = os.stat(p) if os.path.exists(p) else None
+        out.append([st.st_size, st.st_mtime_ns] if st else None)
+    return out
+
+_encode_str = json.encoder.encode_basestring
+CSV_HEADER = b"from,to,type,weight\r\n"
+
+def _record_json(rec: Dict) -> str:
+    """1 phan tu cua json.dump(list, ensure_ascii=False, indent=2); duong nhanh cho dict phang str/int"""
+    if rec and all(type(v) in (str, int) for v in rec.values()):
+        return "  {\n" + ",\n".join(
+            "    " + _encode_str(k) + ": " + (_encode_str(v) if type(v) is str else int.__repr__(v))
+            for k, v in rec.items()) + "\n  }"
+    return "\n".join("  " + ln for ln in json.dumps(rec, ensure_ascii=False, indent=2).split("\n"))
+
+def write_records_json(path: str, records: List[Dict]):
+    """
+    Giong het json.dump(records, ensure_ascii=False, indent=2) nhung nhanh hon nhieu voi dict phang
+    (bo ma hoa thuan Python ma indent bat buoc chi dung cho phan tu long nhau).
+    """
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("[\n" + ",\n".join(_record_json(r) for r in records) + "\n]" if records else "[]")
+
+class _LineRef:
+    """Node doc tu 1 dong node_details.ndjson (che do incremental): sha1 dong + vi tri trong file.
+    props = None khi dong khong doi so voi lan chay truoc (khong json.loads lai)."""
+    __slots__ = ("line", "offset", "length", "props")
+    
+    def __init__(self, line: str, offset: int, length: int, props=None):
+        self.line, self.offset, self.length, self.props = line, offset, length, props
+
+def _property_entry(title: str, props) -> bytes:
+    """1 muc '  "title": {...}' cua json.dump(properties_dict, ensure_ascii=False, indent=2)"""
+    return json.dumps({title: props}, ensure_ascii=False, indent=2)[2:-2].encode("utf-8")
+
+def _csv_rows(edges: List[Dict], header: bool = False) -> str:
+    """Cac dong CSV from,to,type,weight (giong csv.DictWriter)"""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    if header:
+        writer.writerow(['from', 'to', 'type', 'weight'])
+    writer.writerows((e['from'], e['to'], e['type'], e['weight']) for e in edges)
+    return buf.getvalue()
+
+
 # ============ Graph Enricher v3 ============
 
 class GraphEnricherVIv3:
     """Lam giau du lieu do thi tieng Viet - Phien ban 3 (Improved)"""
     
-    UNIVERSITY_KEYWORDS = {
-        'dai hoc', 'university', 'truong dai hoc', 'hoc vien', 'college',
-        'institute', 'academy', 'school', 'technical', 'polytechnic',
-        'high school', 'trung hoc', 'secondary'
-    }
+    UNIVERSITY_KEYWORDS = UNIVERSITY_KEYWORDS  # luat chung: utils_titles.py
     
     def __init__(self, input_file: str = "graph_out/node_details.json"):
         """Khoi tao enricher"""
@@ -403,15 +572,13 @@ class GraphEnricherVIv3:
         """Tai va loc nodes"""
         print("[+] Loading nodes...")
         
-        with open(self.input_file, 'r', encoding='utf-8') as f:
-            nodes = json.load(f)
-        
-        print(f"[+] Total nodes: {len(nodes)}")
-        
         person_nodes = []
         university_nodes = []
+        total = 0
         
-        for node in nodes:
+        # Doc stream (node_details.ndjson neu co, khong thi JSON cu)
+        for node in iter_node_details(self.input_file):
+            total += 1
             node_type = node.get("type", "").lower()
             
             if node_type == "person":
@@ -420,19 +587,70 @@ class GraphEnricherVIv3:
                 university_nodes.append(node)
             else:
                 title = str(node.get("title", "")).lower()
-                if any(kw in title for kw in self.UNIVERSITY_KEYWORDS):
+                if is_university_keyword(title):
                     university_nodes.append(node)
         
+        print(f"[+] Total nodes: {total}")
         print(f"[OK] Filtered: {len(person_nodes)} persons, {len(university_nodes)} universities")
         
         return person_nodes, university_nodes
     
-    def extract_enrichments(self, person_nodes: List[Dict]) -> Dict:
+    def load_nodes_incremental(self, state: Dict, nd_path: str) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Nhu load_and_filter_nodes nhung doc tung dong node_details.ndjson: dong da gap o lan chay truoc
+        (sha1 dong co trong state["lines"]) khong can json.loads — node chi mang title, khoa properties
+        (_props_key) va _LineRef; properties cua no duoc chep tu file properties cu khi ghi.
+        """
+        print("[+] Loading nodes (incremental)...")
+        
+        person_nodes, university_nodes = [], []
+        old_lines, lines = state.get("lines", {}), {}
+        records = state["records"]
+        total = parsed = 0
+        with open(nd_path, 'rb') as f:
+            offset = 0
+            for raw in f:
+                start, offset = offset, offset + len(raw)
+                if not raw.strip():
+                    continue
+                total += 1
+                line = hashlib.sha1(raw).hexdigest()
+                cached = old_lines.get(line)
+                if cached is not None and (cached[0] != "person" or cached[2] in records):
+                    kind, title, props_key = cached
+                    props = None
+                else:
+                    parsed += 1
+                    node = json.loads(raw)
+                    title = node.get("title", "")
+                    props = node.get("properties", {})
+                    props_key = properties_hash(props)
+                    kind = node.get("type", "").lower()
+                    if kind not in ("person", "university"):
+                        kind = "university" if is_university_keyword(str(title).lower()) else None
+                lines[line] = [kind, title, props_key]
+                if kind is not None:
+                    node = {"title": title, "_props_key": props_key,
+                            "_ref": _LineRef(line, start, offset - start, props)}
+                    if props is not None:
+                        node["properties"] = props
+                    (person_nodes if kind == "person" else university_nodes).append(node)
+        state["lines"] = lines
+        
+        print(f"[+] Total nodes: {total} ({parsed} new/changed lines parsed)")
+        print(f"[OK] Filtered: {len(person_nodes)} persons, {len(university_nodes)} universities")
+        
+        return person_nodes, university_nodes
+    
+    def extract_enrichments(self, person_nodes: List[Dict], workers: int = 1,
+                            cache: Optional[Dict] = None) -> Dict:
         """
         Trich xuat du lieu tu nguoi - IMPROVED
         - Sinh, Mat: extract birth/death country
         - Quoc tich, Quoc gia: extract nationality/country
         - Chuc vu, Nghe, etc: extract careers
+        workers > 1: chia chunk cho process pool; ket qua gop theo dung thu tu person_nodes.
+        cache: {hash(properties): ket qua} — nguoi co properties khong doi duoc bo qua (che do incremental).
         """
         enrichments = defaultdict(lambda: {
             'careers': set(),
@@ -445,80 +663,36 @@ class GraphEnricherVIv3:
         })
         
         print("[+] Extracting enrichments...")
-        total = len(person_nodes)
-        
-        for idx, node in enumerate(person_nodes):
-            if (idx + 1) % max(1, total // 10) == 0:
-                print(f"   {((idx + 1) * 100 // total)}%", end='\r')
-            
-            title = node.get("title", "")
-            props = node.get("properties", {})
-            
-            if not props:
+        if cache is None:
+            per_person = _extract_many([node.get("properties", {}) for node in person_nodes], workers)
+        else:
+            # Chi trich xuat properties chua co trong cache (moi gia tri 1 lan)
+            keys = [node.get("_props_key") or properties_hash(node.get("properties", {})) for node in person_nodes]
+            pending = {}
+            for key, node in zip(keys, person_nodes):
+                if key not in cache and key not in pending:
+                    pending[key] = node.get("properties", {})
+            print(f"   cache: {len(person_nodes) - len(pending)} hit, {len(pending)} miss")
+            results = dict(zip(pending, _extract_many(list(pending.values()), workers)))
+            per_person = [cache[key] if key in cache else results[key] for key in keys]
+            # Cache chi giu cac properties hien tai (khong phinh theo thoi gian)
+            cache.clear()
+            cache.update(zip(keys, per_person))
+        
+        # Gop theo thu tu person_nodes (title trung → hop nhat nhu vong lap tuan tu)
+        for node, record in zip(person_nodes, per_person):
+            if record is None:
                 continue
-            
-            # ===== CAREER EXTRACTION =====
-            # Look for position/career in ALL properties fields
-            # Skip non-career fields
-            skip_fields = {
-                "Sinh", "Mất", "Nơi an nghỉ", "Con cái", "Phối ngẫu", "Website", 
-                "Chữ ký", "Tôn giáo", "Alma mater", "Giáo dục", "Trường học", "Học vấn",
-                "Tiền nhiệm", "Kế nhiệm", "Bổ nhiệm", "Nhiệm kỳ", "Đảng chính trị",
-                "Quốc tịch", "Quốc gia", "Vị trí", "Location", "Nơi cư trú"
-            }
-            
-            # Extract careers from ALL fields (except skip_fields)
-            for field, value in props.items():
-                if field not in skip_fields:
-                    # The field name itself might be a career (e.g., "Tổng thống", "Thủ tướng")
-                    field_careers = CareerDatabaseVI.extract_careers_from_text(field)
-                    enrichments[title]['careers'].update(field_careers)
-                    
-                    # Also check the value
-                    text = str(value)
-                    value_careers = CareerDatabaseVI.extract_careers_from_text(text)
-                    enrichments[title]['careers'].update(value_careers)
-            
-            # ===== COUNTRY/LOCATION EXTRACTION =====
-            # Priority: Sinh -> Mat -> Quoc tich -> Quoc gia -> Vi tri -> Location
-            
-            # Birth location
-            if "Sinh" in props:
-                birth_data = props["Sinh"]
-                birth_country = CountryDatabaseVI.extract_country_from_text(birth_data)
-                if birth_country:
-                    enrichments[title]['birth_country'] = birth_country
-            
-            # Death location
-            if "Mat" in props:
-                death_data = props["Mat"]
-                death_country = CountryDatabaseVI.extract_country_from_text(death_data)
-                if death_country:
-                    enrichments[title]['death_country'] = death_country
-            
-            # Nationality
-            if "Quốc tịch" in props:
-                nationality = props["Quốc tịch"]
-                countries = CountryDatabaseVI.extract_countries_from_text(nationality)
-                enrichments[title]['countries'].update(countries)
-            
-            # Country (from multiple fields) - using actual Vietnamese keys
-            for field in ["Quốc gia", "Vị trí", "Location", "Nơi cư trú", "Nơi cư ngụ", "Cư trú", "Khu vực"]:
-                if field in props:
-                    text = str(props[field])
-                    countries = CountryDatabaseVI.extract_countries_from_text(text)
-                    enrichments[title]['countries'].update(countries)
-            
-            # Education
-            for field in ["Alma mater", "Giáo dục", "Trường học", "Học vấn"]:
-                if field in props:
-                    alma_mater = props[field]
-                    if isinstance(alma_mater, str):
-                        enrichments[title]['education'].append(alma_mater)
-                    elif isinstance(alma_mater, list):
-                        enrichments[title]['education'].extend(alma_mater)
+            enrich = enrichments[node.get("title", "")]
+            enrich['careers'].update(record['careers'])
+            enrich['countries'].update(record['countries'])
+            if record['birth_country']:
+                enrich['birth_country'] = record['birth_country']
+            if record['death_country']:
+                enrich['death_country'] = record['death_country']
+            enrich['education'].extend(record['education'])
         
-        print(f"\n[OK] Extraction done")
+        print(f"[OK] Extraction done")
         
         return enrichments
     
@@ -542,7 +716,7 @@ class GraphEnricherVIv3:
                 "link": f"https://vi.wikipedia.org/wiki/{title.replace(' ', '_')}",
             }
             enriched_nodes.append(new_node)
-            properties_dict[title] = node.get("properties", {})
+            properties_dict[title] = node.get("_ref") or node.get("properties", {})
         
         # Add career nodes
         print("  - Adding career nodes...")
@@ -550,7 +724,7 @@ class GraphEnricherVIv3:
         for enrich in enrichments.values():
             all_careers.update(enrich['careers'])
         
-        for career in all_careers:
+        for career in sorted(all_careers):
             category = CareerDatabaseVI.get_career_category(career)
             node = {
                 "id": f"career_{career}",
@@ -572,7 +746,7 @@ class GraphEnricherVIv3:
             if enrich['death_country']:
                 all_countries.add(enrich['death_country'])
         
-        for country in all_countries:
+        for country in sorted(all_countries):
             code = CountryDatabaseVI.get_country_code(country)
             node = {
                 "id": f"country_{country}",
@@ -595,128 +769,227 @@ class GraphEnricherVIv3:
                 "link": f"https://vi.wikipedia.org/wiki/{title.replace(' ', '_')}",
             }
             enriched_nodes.append(new_node)
-            properties_dict[title] = node.get("properties", {})
+            properties_dict[title] = node.get("_ref") or node.get("properties", {})
         
         print(f"[OK] Created: {len(enriched_nodes)} nodes")
         
         return enriched_nodes, properties_dict
     
+    # Thu tu block trong file canh: 4 loai canh theo nguoi, sau do 2 loai canh clique
+    PERSON_EDGE_TYPES = ("has_career", "born_in", "died_in", "from_country")
+    CLIQUE_EDGE_TYPES = ("same_birth_country", "same_career")
+    
+    def iter_edge_blocks(self, enrichments: Dict, kinds=None):
+        """
+        Duyet (kind, key, members) theo dung thu tu file canh. Canh cua 1 block chi phu thuoc bo ba nay
+        → che do incremental chi dung lai block co members doi.
+        """
+        kinds = kinds or self.PERSON_EDGE_TYPES + self.CLIQUE_EDGE_TYPES
+        for kind in kinds:
+            if kind == "has_career":
+                for person_title, enrich in enrichments.items():
+                    yield kind, person_title, sorted(enrich['careers'])
+            elif kind == "born_in":
+                for person_title, enrich in enrichments.items():
+                    yield kind, person_title, [enrich['birth_country']] if enrich['birth_country'] else []
+            elif kind == "died_in":
+                for person_title, enrich in enrichments.items():
+                    yield kind, person_title, [enrich['death_country']] if enrich['death_country'] else []
+            elif kind == "from_country":
+                for person_title, enrich in enrichments.items():
+                    yield kind, person_title, sorted(enrich['countries'])
+            elif kind == "same_birth_country":
+                country_to_persons = defaultdict(list)
+                for person_title, enrich in enrichments.items():
+                    if enrich['birth_country']:
+                        country_to_persons[enrich['birth_country']].append(person_title)
+                for country, persons in country_to_persons.items():
+                    yield kind, country, persons
+            elif kind == "same_career":
+                career_to_persons = defaultdict(list)
+                for person_title, enrich in enrichments.items():
+                    for career in sorted(enrich['careers']):
+                        career_to_persons[career].append(person_title)
+                for career, persons in career_to_persons.items():
+                    yield kind, career, persons
+    
+    @staticmethod
+    def block_edges(kind: str, key: str, members: List[str]) -> List[Dict]:
+        """Canh cua 1 block (kind, key, members)"""
+        if kind in GraphEnricherVIv3.CLIQUE_EDGE_TYPES:
+            return [{"from": members[i], "to": members[j], "type": kind, "weight": 1}
+                    for i in range(len(members)) for j in range(i + 1, len(members))]
+        if kind == "has_career":
+            return [{"from": key, "to": f"career_{career}", "type": kind, "weight": 1} for career in members]
+        return [{"from": key, "to": country, "type": kind, "weight": 1} for country in members]
+    
+    def create_clique_groups(self, enrichments: Dict) -> List[Tuple]:
+        """
+        Nhom thanh vien cho same_birth_country / same_career (xem clique_groups.py): 1 dong / nguoi thay vi
+        1 canh / cap. group = id nut dich (country_* / career_*).
+        """
+        groups = []
+        for kind, key, members in self.iter_edge_blocks(enrichments, self.CLIQUE_EDGE_TYPES):
+            if len(members) < 2:
+                continue
+            group = f"country_{key}" if kind == "same_birth_country" else f"career_{key}"
+            groups.append((kind, group, 1, members))
+        return groups
+    
     def create_enriched_edges(self, person_nodes: List[Dict],
                              enrichments: Dict) -> List[Dict]:
-        """Tao edges giau du lieu"""
-        edges = []
-        
+        """Tao edges giau du lieu: has_career, born_in, died_in, from_country"""
         print("[+] Creating edges...")
-        
-        # 1. Career edges
-        print("  - Career edges...")
-        for person_title, enrich in enrichments.items():
-            for career in enrich['careers']:
-                edges.append({
-                    "from": person_title,
-                    "to": f"career_{career}",
-                    "type": "has_career",
-                    "weight": 1,
-                })
-        
-        # 2. Birth country edges
-        print("  - Birth location edges...")
-        for person_title, enrich in enrichments.items():
-            if enrich['birth_country']:
-                edges.append({
-                    "from": person_title,
-                    "to": enrich['birth_country'],
-                    "type": "born_in",
-                    "weight": 1,
-                })
-        
-        # 3. Death country edges
-        print("  - Death location edges...")
-        for person_title, enrich in enrichments.items():
-            if enrich['death_country']:
-                edges.append({
-                    "from": person_title,
-                    "to": enrich['death_country'],
-                    "type": "died_in",
-                    "weight": 1,
-                })
-        
-        # 4. Country edges (from Quoc tich, etc)
-        print("  - Country edges...")
-        for person_title, enrich in enrichments.items():
-            for country in enrich['countries']:
-                edges.append({
-                    "from": person_title,
-                    "to": country,
-                    "type": "from_country",
-                    "weight": 1,
-                })
-        
+        edges = []
+        for kind, key, members in self.iter_edge_blocks(enrichments, self.PERSON_EDGE_TYPES):
+            edges.extend(self.block_edges(kind, key, members))
         print(f"[OK] Created: {len(edges)} edges")
-        
         return edges
     
     def create_relationship_edges(self, person_nodes: List[Dict],
                                  university_nodes: List[Dict],
                                  enrichments: Dict) -> List[Dict]:
-        """Tao relationship edges: same_country, same_career, same_school"""
-        edges = []
-        
+        """Tao relationship edges: same_birth_country, same_career"""
         print("[+] Creating relationship edges...")
-        
-        # Get all person titles
-        person_titles = set(node.get("title", "") for node in person_nodes)
-        university_titles = set(node.get("title", "") for node in university_nodes)
-        
-        # 1. Same country edges
-        print("  - Same country relationships...")
-        country_to_persons = defaultdict(list)
-        for person_title, enrich in enrichments.items():
-            if enrich['birth_country']:
-                country_to_persons[enrich['birth_country']].append(person_title)
-        
-        for country, persons in country_to_persons.items():
-            for i in range(len(persons)):
-                for j in range(i + 1, len(persons)):
-                    edges.append({
-                        "from": persons[i],
-                        "to": persons[j],
-                        "type": "same_birth_country",
-                        "weight": 1,
-                    })
-        
-        # 2. Same career edges
-        print("  - Same career relationships...")
-        career_to_persons = defaultdict(list)
-        for person_title, enrich in enrichments.items():
-            for career in enrich['careers']:
-                career_to_persons[career].append(person_title)
-        
-        for career, persons in career_to_persons.items():
-            for i in range(len(persons)):
-                for j in range(i + 1, len(persons)):
-                    edges.append({
-                        "from": persons[i],
-                        "to": persons[j],
-                        "type": "same_career",
-                        "weight": 1,
-                    })
-        
+        edges = []
+        for kind, key, members in self.iter_edge_blocks(enrichments, self.CLIQUE_EDGE_TYPES):
+            edges.extend(self.block_edges(kind, key, members))
         print(f"[OK] Created: {len(edges)} relationship edges")
-        
         return edges
     
-    def enrich_and_export(self, output_prefix: str = "enriched_vi"):
-        """Main orchestration function"""
+    def export_properties_incremental(self, properties_dict: Dict, properties_file: str, state: Dict,
+                                      nd_path: Optional[str] = None):
+        """
+        Ghi lai properties_<prefix>.json (giong het json.dump indent=2): muc cua node doc tu dong
+        node_details.ndjson khong doi → chep nguyen byte tu file cu (offset theo sha1 dong trong cache);
+        muc moi / career / country → render lai.
+        """
+        old_blocks = {}
+        if state.get("properties_file") == _file_sizes(properties_file):
+            old_blocks = state.get("properties_blocks", {})
+        old = b""
+        if old_blocks:
+            with open(properties_file, 'rb') as f:
+                old = f.read()
+        
+        parts, blocks, pos, rebuilt = [], {}, 2, 0   # sau "{\n"
+        nd = None
+        try:
+            for title, value in properties_dict.items():
+                if not isinstance(value, _LineRef):
+                    entry = _property_entry(title, value)
+                elif value.line in old_blocks:
+                    o, n = old_blocks[value.line]
+                    entry = old[o:o + n]
+                else:
+                    props = value.props
+                    if props is None:  # dong khong doi nhung file properties cu khong dung duoc → doc lai dong
+                        nd = nd or open(nd_path, 'rb')
+                        nd.seek(value.offset)
+                        props = json.loads(nd.read(value.length)).get("properties", {})
+                    entry = _property_entry(title, props)
+                    rebuilt += 1
+                if parts:
+                    pos += 2   # ",\n"
+                if isinstance(value, _LineRef):
+                    blocks[value.line] = [pos, len(entry)]
+                parts.append(entry)
+                pos += len(entry)
+        finally:
+            if nd:
+                nd.close()
+        
+        with open(properties_file, 'wb') as f:
+            f.write(b"{\n" + b",\n".join(parts) + b"\n}" if parts else b"{}")
+        state["properties_blocks"] = blocks
+        state["properties_file"] = _file_sizes(properties_file)
+        print(f"  [OK] Saved: {properties_file} ({rebuilt} node(s) rebuilt, {len(blocks) - rebuilt} reused)")
+    
+    def export_edges_incremental(self, enrichments: Dict, edges_file: str, edges_csv: str,
+                                 state: Dict, kinds=None) -> Dict:
+        """
+        Ghi lai file canh JSON/CSV: block khong doi → chep nguyen byte tu file cu (theo offset luu trong
+        cache), chi dung lai block co members doi. Tra ve so canh theo loai.
+        """
+        old_blocks = {}
+        if state.get("edge_files") == _file_sizes(edges_file, edges_csv):
+            old_blocks = state.get("edge_blocks", {})
+        old_json = old_csv = b""
+        if old_blocks:
+            with open(edges_file, 'rb') as f:
+                old_json = f.read()
+            with open(edges_csv, 'rb') as f:
+                old_csv = f.read()
+        
+        json_parts, csv_parts, blocks = [], [], {}
+        json_pos, csv_pos = 2, len(CSV_HEADER)   # sau "[\n" / dong header
+        edge_types, rebuilt = defaultdict(int), 0
+        for kind, key, members in self.iter_edge_blocks(enrichments, kinds):
+            if not members or (kind in self.CLIQUE_EDGE_TYPES and len(members) < 2):
+                continue
+            digest = hashlib.sha1(json.dumps([kind, key, members], ensure_ascii=False).encode("utf-8")).hexdigest()
+            old = old_blocks.get(digest)
+            if old:
+                n, jo, jl, co, cl = old
+                jb, cb = old_json[jo:jo + jl], old_csv[co:co + cl]
+            else:
+                edges = self.block_edges(kind, key, members)
+                n = len(edges)
+                jb = ",\n".join(_record_json(e) for e in edges).encode("utf-8")
+                cb = _csv_rows(edges).encode("utf-8")
+                rebuilt += 1
+            if json_parts:
+                json_pos += 2   # ",\n"
+            blocks[digest] = [n, json_pos, len(jb), csv_pos, len(cb)]
+            json_parts.append(jb)
+            csv_parts.append(cb)
+            json_pos += len(jb)
+            csv_pos += len(cb)
+            edge_types[kind] += n
+        
+        with open(edges_file, 'wb') as f:
+            f.write(b"[\n" + b",\n".join(json_parts) + b"\n]" if json_parts else b"[]")
+        with open(edges_csv, 'wb') as f:
+            f.write(CSV_HEADER + b"".join(csv_parts))
+        if not json_parts:
+            blocks = {}
+        state["edge_blocks"] = blocks
+        state["edge_files"] = _file_sizes(edges_file, edges_csv)
+        print(f"  [OK] Saved: {edges_file}, {edges_csv} ({rebuilt} block(s) rebuilt, {len(blocks) - rebuilt} reused)")
+        return edge_types
+    
+    def enrich_and_export(self, output_prefix: str = "enriched_vi", workers: int = 1,
+                          incremental: bool = False, materialize_cliques: bool = False):
+        """
+        Main orchestration function
+        incremental=True: dung cache graph_out/enrich_cache_<prefix>.json — chi trich xuat nguoi co
+        properties moi/doi (khoa = hash properties) va chi dung lai cac block canh bi anh huong;
+        khi do gia tri tra ve all_edges = None (canh nam trong file). Dau vao la node_details.ndjson:
+        chi json.loads dong moi/doi, properties_<prefix>.json chep lai muc cua dong khong doi.
+        same_birth_country / same_career luon ghi dang nhom vao graph_out/groups_<prefix>.csv;
+        materialize_cliques=True: ghi them tung cap vao file canh (dang cu).
+        """
         print("=" * 80)
         print("Vietnamese Data Enrichment Pipeline v3")
         print("=" * 80)
         
+        cache_file = f"graph_out/enrich_cache_{output_prefix}.json"
+        edges_file = f"graph_out/edges_{output_prefix}.json"
+        edges_csv = f"graph_out/edges_{output_prefix}.csv"
+        groups_csv = f"graph_out/groups_{output_prefix}.csv"
+        edge_kinds = self.PERSON_EDGE_TYPES + (self.CLIQUE_EDGE_TYPES if materialize_cliques else ())
+        state = load_enrich_cache(cache_file) if incremental else None
+        
         # Load and filter
-        person_nodes, university_nodes = self.load_and_filter_nodes()
+        nd_path = ndjson_source(self.input_file) if state is not None else None
+        if nd_path:
+            person_nodes, university_nodes = self.load_nodes_incremental(state, nd_path)
+        else:
+            person_nodes, university_nodes = self.load_and_filter_nodes()
         
         # Extract
-        enrichments = self.extract_enrichments(person_nodes)
+        records = state["records"] if state is not None else None
+        enrichments = self.extract_enrichments(person_nodes, workers=workers, cache=records)
         
         # Create nodes
         enriched_nodes, properties_dict = self.create_enriched_nodes(
@@ -724,38 +997,46 @@ class GraphEnricherVIv3:
         )
         
         # Create edges
-        enrichment_edges = self.create_enriched_edges(person_nodes, enrichments)
-        relationship_edges = self.create_relationship_edges(
-            person_nodes, university_nodes, enrichments
-        )
-        
-        all_edges = enrichment_edges + relationship_edges
+        all_edges = None
+        if state is None:
+            all_edges = self.create_enriched_edges(person_nodes, enrichments)
+            if materialize_cliques:
+                all_edges += self.create_relationship_edges(person_nodes, university_nodes, enrichments)
+        groups = self.create_clique_groups(enrichments)
         
         # Export JSON
         print("[+] Exporting...")
         
         nodes_file = f"graph_out/nodes_{output_prefix}.json"
-        with open(nodes_file, 'w', encoding='utf-8') as f:
-            json.dump(enriched_nodes, f, ensure_ascii=False, indent=2)
+        write_records_json(nodes_file, enriched_nodes)
         print(f"  [OK] Saved: {nodes_file}")
         
         properties_file = f"graph_out/properties_{output_prefix}.json"
-        with open(properties_file, 'w', encoding='utf-8') as f:
-            json.dump(properties_dict, f, ensure_ascii=False, indent=2)
-        print(f"  [OK] Saved: {properties_file}")
-        
-        edges_file = f"graph_out/edges_{output_prefix}.json"
-        with open(edges_file, 'w', encoding='utf-8') as f:
-            json.dump(all_edges, f, ensure_ascii=False, indent=2)
-        print(f"  [OK] Saved: {edges_file}")
+        if nd_path:
+            self.export_properties_incremental(properties_dict, properties_file, state, nd_path)
+        else:
+            with open(properties_file, 'w', encoding='utf-8') as f:
+                json.dump(properties_dict, f, ensure_ascii=False, indent=2)
+            print(f"  [OK] Saved: {properties_file}")
+        
+        if all_edges is None:
+            edge_types = self.export_edges_incremental(enrichments, edges_file, edges_csv, state, edge_kinds)
+        else:
+            write_records_json(edges_file, all_edges)
+            print(f"  [OK] Saved: {edges_file}")
+            
+            # Export CSV
+            with open(edges_csv, 'w', newline='', encoding='utf-8') as f:
+                f.write(_csv_rows(all_edges, header=True))
+            print(f"  [OK] Saved: {edges_csv}")
+            
+            # Count edge types
+            edge_types = defaultdict(int)
+            for edge in all_edges:
+                edge_types[edge['type']] += 1
         
-        # Export CSV
-        edges_csv = f"graph_out/edges_{output_prefix}.csv"
-        with open(edges_csv, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=['from', 'to', 'type', 'weight'])
-            writer.writeheader()
-            writer.writerows(all_edges)
-        print(f"  [OK] Saved: {edges_csv}")
+        write_groups(groups_csv, groups)
+        print(f"  [OK] Saved: {groups_csv}")
         
         nodes_csv = f"graph_out/nodes_{output_prefix}.csv"
         with open(nodes_csv, 'w', newline='', encoding='utf-8') as f:
@@ -769,25 +1050,47 @@ class GraphEnricherVIv3:
                 })
         print(f"  [OK] Saved: {nodes_csv}")
         
+        if state is not None:
+            save_enrich_cache(cache_file, state)
+            print(f"  [OK] Saved: {cache_file}")
+        
         # Print statistics
         print("\n" + "=" * 80)
         print("STATISTICS")
         print("=" * 80)
         print(f"Nodes: {len(enriched_nodes)}")
-        print(f"Edges: {len(all_edges)}")
-        
-        # Count edge types
-        edge_types = defaultdict(int)
-        for edge in all_edges:
-            edge_types[edge['type']] += 1
+        print(f"Edges: {sum(edge_types.values())}")
         
         print("\nEdge types:")
         for edge_type, count in sorted(edge_types.items(), key=lambda x: -x[1]):
             print(f"  {edge_type}: {count}")
         
+        print("\nClique groups:")
+        group_stats = defaultdict(lambda: [0, 0])
+        for kind, _, _, members in groups:
+            group_stats[kind][0] += 1
+            group_stats[kind][1] += len(members)
+        for kind, (n_groups, n_members) in sorted(group_stats.items()):
+            print(f"  {kind}: {n_groups} groups / {n_members} members")
+        
         return enriched_nodes, all_edges
 
 
+def main():
+    ap = argparse.ArgumentParser(description="Vietnamese Data Enrichment Pipeline v3")
+    ap.add_argument("--input", default="graph_out/node_details.json", help="node_details (.json/.ndjson)")
+    ap.add_argument("--prefix", default="enriched_vi", help="Hau to file output graph_out/*_<prefix>.json")
+    ap.add_argument("--workers", type=int, default=1, help="So process trich xuat song song")
+    ap.add_argument("--incremental", action="store_true",
+                    help="Chi trich xuat nguoi co properties moi/doi (cache theo hash properties)")
+    ap.add_argument("--materialize-cliques", action="store_true",
+                    help="Ghi them tung cap same_birth_country / same_career vao file canh (ngoai groups_<prefix>.csv)")
+    args = ap.parse_args()
+    
+    enricher = GraphEnricherVIv3(args.input)
+    enricher.enrich_and_export(args.prefix, workers=args.workers, incremental=args.incremental,
+                               materialize_cliques=args.materialize_cliques)
+
+
 if __name__ == "__main__":
-    enricher = GraphEnricherVIv3()
-    enricher.enrich_and_export()
+    main()
@@ -0,0 +1,493 @@
+# -*- coding: utf-8 -*-
+"""
+entity_resolution.py — Gộp bí danh trường / người (entity resolution) theo lô, chạy trước create_unified_graph.py
+
+Cùng một trường (hay một người) xuất hiện dưới nhiều tên: "University of Chicago" / "Đại học Chicago",
+"Đại học California tại Berkeley" / "University of California, Berkeley", "Trường kinh tế London" /
+"Trường Kinh tế London"... Module này tìm các cặp đó và ghi ra một merge map có thể duyệt tay:
+
+    graph_out/entity_merge_map.csv   cột: kind, alias, canonical, score, method, status, evidence
+        status = auto    : gộp tự động (áp dụng)
+                 review  : nghi trùng, chờ người duyệt (KHÔNG áp dụng)
+                 accept  : người duyệt đồng ý (áp dụng)
+                 reject  : người duyệt bác bỏ (không áp dụng; lần chạy sau không đề xuất lại cặp này)
+
+Quy trình (gần tuyến tính theo số tên — không so mọi cặp):
+  1. Chuẩn hoá: bỏ dấu (normalize_key), dịch thuật ngữ VI↔EN về một dạng ("đại học"/"university" → loại
+     cơ sở, "nam"/"southern" → south, "bang" → state, "luân đôn" → london...), bỏ hư từ (of/the/tại/của).
+     Phần còn lại là "lõi" tên; số La Mã / chữ số giữ riêng (Paris I ≠ Paris II).
+  2. Sinh ứng viên bằng blocking:
+       - khoá lõi trùng nhau (bucket chính xác)
+       - MinHash trên shingle 3 ký tự của lõi + LSH (băng × hàng) → các tên gần giống (lỗi chính tả, dịch lệch)
+       - lõi chứa lõi, lệch đúng 1 từ (qua từ hiếm nhất) và cùng website
+  3. So khớp từng cặp ứng viên, dùng thêm tín hiệu infobox (năm thành lập, website; năm sinh / năm mất):
+     tín hiệu mâu thuẫn → không gộp; lõi trùng / website trùng / Jaccard shingle cao → auto; còn lại → review.
+  4. Gom cụm bằng union-find (không nối hai cụm có tín hiệu mâu thuẫn); tên chuẩn của cụm là tên có
+     infobox đầy đủ nhất, rồi nhiều cạnh nhất, ưu tiên tên tiếng Việt.
+
+Quyết định accept/reject (và dòng thêm tay) trong file cũ được giữ nguyên khi chạy lại.
+
+Áp dụng: load_merge_map(path) → {alias: canonical} (chỉ status auto/accept, đã giải bắc cầu), dùng bởi
+step3_bfs_expand.py (canonicalize_university, tên người được chấp nhận) và create_unified_graph.py
+(id node, hai đầu cạnh, thành viên nhóm clique).
+
+Chạy:
+  py entity_resolution.py                                    (đọc graph_out/, ghi graph_out/entity_merge_map.csv)
+  py entity_resolution.py --graph-dir out --kinds university
+"""
+import os
+import re
+import csv
+import zlib
+import argparse
+from collections import Counter, defaultdict, namedtuple
+
+import numpy as np
+
+from node_details_store import iter_node_details, normalize_key
+
+KINDS = ('university', 'person')
+MERGE_MAP_FILE = 'entity_merge_map.csv'
+MERGE_MAP_HEADER = ['kind', 'alias', 'canonical', 'score', 'method', 'status', 'evidence']
+APPLY_STATUSES = ('auto', 'accept')
+DECISION_STATUSES = ('accept', 'reject')
+
+AUTO_JACCARD = 0.85     # shingle Jaccard ≥ → auto (trường) / cần thêm tín hiệu khớp (người)
+REVIEW_JACCARD = 0.6    # shingle Jaccard ≥ → review
+CONTAINMENT_JACCARD = 0.4  # lõi chứa lõi (lệch 1 từ) chỉ đề xuất review khi Jaccard ≥ ngưỡng này
+NUM_PERM = 100          # MinHash: số hàm băm
+BANDS = 20              # LSH: 20 băng × 5 hàng → P(ứng viên) ≈ 0.8 ở Jaccard 0.6, ≈ 1 ở 0.85, < 0.05 ở 0.3
+MAX_BUCKET = 50         # bucket LSH / khoá lớn hơn → tên quá chung chung, bỏ qua
+MAX_TOKEN_BLOCK = 200   # block theo từ hiếm (lõi chứa lõi): từ xuất hiện nhiều hơn → bỏ qua
+
+# ============ Chuẩn hoá tên ============
+# Cụm từ (đã bỏ dấu) → dạng chung. Giá trị bắt đầu bằng '#' là loại cơ sở: không thuộc lõi tên.
+UNI_TERMS = {
+    'truong dai hoc': '#univ', 'vien dai hoc': '#univ', 'dai hoc': '#univ', 'university': '#univ',
+    'universite': '#univ', 'universitat': '#univ', 'universidad': '#univ', 'universita': '#univ',
+    'universidade': '#univ', 'universiteit': '#univ', 'uniwersytet': '#univ',
+    'hoc vien': '#inst', 'vien': '#inst', 'institute': '#inst', 'institut': '#inst', 'instituto': '#inst',
+    'academy': '#inst', 'akademie': '#inst',
+    'truong': '#school', 'school': '#school', 'ecole': '#school', 'schule': '#school',
+    'cao dang': '#college', 'college': '#college', 'colegio': '#college',
+    'cong nghe': 'technology', 'ky thuat': 'technology', 'technological': 'technology',
+    'bach khoa': 'polytechnic', 'polytechnique': 'polytechnic',
+    'quoc gia': 'national', 'quoc te': 'international', 'hoang gia': 'royal', 'bang': 'state',
+    'kinh te': 'economics', 'economic': 'economics', 'luat': 'law', 'khoa hoc': 'science',
+    'sciences': 'science', 'chinh tri': 'political', 'politics': 'political', 'nghe thuat': 'arts',
+    'art': 'arts', 'nong nghiep': 'agriculture', 'agricultural': 'agriculture', 'su pham': 'education',
+    'than hoc': 'theology', 'theological': 'theology', 'y khoa': 'medicine', 'medical': 'medicine',
+    'nam': 'south', 'southern': 'south', 'bac': 'north', 'northern': 'north',
+    'dong': 'east', 'eastern': 'east', 'tay': 'west', 'western': 'west',
+    # tên riêng khác nhau giữa tiếng Việt và tiếng Anh
+    'moskva': 'moscow', 'mat xco va': 'moscow', 'bac kinh': 'beijing', 'peking': 'beijing',
+    'thanh hoa': 'tsinghua', 'luan don': 'london', 'thuong hai': 'shanghai', 'dong kinh': 'tokyo',
+    'nam kinh': 'nanjing', 'phuc dan': 'fudan', 'ba le': 'paris', 'ha noi': 'hanoi', 'viet nam': 'vietnam',
+    'tay ban nha': 'spain', 'nam phi': 'south africa', 'hoa ky': 'usa',
+}
+STOPWORDS = {'of', 'the', 'at', 'in', 'and', 'for', 'tai', 'cua', 'o', 'va', 'de', 'du', 'des', 'la',
+             'le', 'di', 'del', 'der', 'von'}
+_NUMERAL = re.compile(r"^(?:\d+|[ivx]{1,5})$")
+_ROMAN = re.compile(r"^(?:x{0,3})(?:ix|iv|v?i{0,3})$")
+_TERM_RE = re.compile(r"\b(?:" + "|".join(re.escape(t) for t in sorted(UNI_TERMS, key=len, reverse=True)) + r")\b")
+_YEAR = re.compile(r"\b(1[0-9]{3}|20[0-9]{2})\b")
+
+Entity = namedtuple('Entity', 'kind name key core tags numerals signals shingles rank')
+
+def _is_numeral(tok):
+    return tok.isdigit() or bool(_ROMAN.match(tok))
+
+def name_tokens(kind, name):
+    """(lõi, loại cơ sở, số hiệu) của một tên — lõi/loại/số là frozenset"""
+    text = normalize_key(name)
+    if kind == 'university':
+        text = _TERM_RE.sub(lambda m: " " + UNI_TERMS[m.group(0)] + " ", text)
+        roman = None
+    else:
+        # tên người: "Vĩ", "Xi" là tên riêng — chỉ coi là số hiệu khi viết hoa kiểu La Mã (Elizabeth II)
+        roman = {t.lower() for t in re.findall(r"\b[IVX]+\b", name)}
+    core, tags, numerals = set(), set(), set()
+    for tok in text.split():
+        if tok.startswith('#'):
+            tags.add(tok)
+        elif tok in STOPWORDS and kind == 'university':
+            continue
+        elif (_NUMERAL.match(tok) and _is_numeral(tok)
+              and (roman is None or tok.isdigit() or tok in roman)):
+            numerals.add(tok)
+        else:
+            core.add(tok)
+    return frozenset(core), frozenset(tags), frozenset(numerals)
+
+def shingles(text, k=3):
+    padded = f" {text} "
+    return frozenset(padded[i:i + k] for i in range(max(1, len(padded) - k + 1)))
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+# ============ Tín hiệu infobox ============
+def _prop_text(value):
+    if isinstance(value, list):
+        return " ".join(str(x) for x in value if x)
+    return str(value or "")
+
+def _first_year(value):
+    m = _YEAR.search(_prop_text(value))
+    return m.group(1) if m else None
+
+def _website(value):
+    host = re.sub(r"\s+", "", _prop_text(value)).lower()
+    host = re.sub(r"^[a-z]+://", "", host)
+    host = host.split('/')[0]
+    if host.startswith('www.'):
+        host = host[4:]
+    return host if '.' in host else None
+
+def extract_signals(kind, props):
+    """Tín hiệu so khớp từ infobox: {tên tín hiệu: giá trị} (chỉ giá trị đọc được)"""
+    props = props or {}
+    if kind == 'university':
+        found = {'founded': _first_year(props.get('Thành lập')), 'website': _website(props.get('Website'))}
+    else:
+        found = {'born': _first_year(props.get('Sinh')), 'died': _first_year(props.get('Mất'))}
+    return {k: v for k, v in found.items() if v}
+
+def _is_vietnamese(name):
+    return normalize_key(name) != name.lower() or name.startswith(('Đại học', 'Trường', 'Học viện'))
+
+def make_entity(kind, name, props=None, refs=0):
+    core, tags, numerals = name_tokens(kind, name)
+    signals = extract_signals(kind, props)
+    rank = (-len(props or {}), -refs, not _is_vietnamese(name), len(name), name)
+    return Entity(kind, name, (core, numerals), core, tags, numerals, signals,
+                  shingles(" ".join(sorted(core))), rank)
+
+# ============ Sinh ứng viên ============
+def minhash_signatures(shingle_sets, num_perm=NUM_PERM, seed=1, chunk=16):
+    """Chữ ký MinHash (n × num_perm, uint32) — băm tuyến tính (a·x + b) mod p trên crc32 của shingle"""
+    n = len(shingle_sets)
+    sizes = np.fromiter((len(s) for s in shingle_sets), dtype=np.int64, count=n)
+    values = np.fromiter((zlib.crc32(sh.encode('utf-8')) for s in shingle_sets for sh in s),
+                         dtype=np.uint64, count=int(sizes.sum()))
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1])).astype(np.int64)
+    prime = np.uint64((1 << 61) - 1)
+    rng = np.random.RandomState(seed)
+    a = rng.randint(1, 1 << 31, size=num_perm).astype(np.uint64)
+    b = rng.randint(0, 1 << 31, size=num_perm).astype(np.uint64)
+    out = np.empty((n, num_perm), dtype=np.uint32)
+    if n == 0:
+        return out
+    for lo in range(0, num_perm, chunk):
+        hashed = (values[:, None] * a[None, lo:lo + chunk] + b[None, lo:lo + chunk]) % prime
+        out[:, lo:lo + chunk] = (np.minimum.reduceat(hashed, starts, axis=0) & np.uint64(0xFFFFFFFF))
+    return out
+
+def lsh_pairs(signatures, bands=BANDS, max_bucket=MAX_BUCKET):
+    """Cặp (i, j), i < j, trùng ít nhất một băng LSH (bucket quá lớn bị bỏ qua)"""
+    n, num_perm = signatures.shape
+    rows = num_perm // bands
+    pairs = set()
+    for band in range(bands):
+        block = np.ascontiguousarray(signatures[:, band * rows:(band + 1) * rows])
+        _, inverse = np.unique(block.view(np.dtype((np.void, block.dtype.itemsize * rows))).ravel(),
+                               return_inverse=True)
+        order = np.argsort(inverse, kind='stable')
+        bounds = np.flatnonzero(np.diff(inverse[order])) + 1
+        for bucket in np.split(order, bounds):
+            if 1 < len(bucket) <= max_bucket:
+                members = bucket.tolist()
+                for x in range(len(members)):
+                    for y in range(x + 1, len(members)):
+                        pairs.add((members[x], members[y]))
+    return pairs
+
+def containment_pairs(keys, max_block=MAX_TOKEN_BLOCK):
+    """Cặp khoá (i, j) mà lõi i ⊂ lõi j, lệch đúng 1 từ, cùng số hiệu — tìm qua từ hiếm nhất của lõi i"""
+    by_token = defaultdict(list)
+    for idx, (core, _) in enumerate(keys):
+        for tok in core:
+            by_token[tok].append(idx)
+    pairs = set()
+    for idx, (core, numerals) in enumerate(keys):
+        if not core:
+            continue
+        block = min((by_token[t] for t in core), key=len)
+        if len(block) > max_block:
+            continue
+        for other in block:
+            other_core, other_numerals = keys[other]
+            if (other != idx and other_numerals == numerals and len(other_core) == len(core) + 1
+                    and core < other_core):
+                pairs.add((min(idx, other), max(idx, other)))
+    return pairs
+
+def candidate_pairs(entities):
+    """Cặp chỉ số entity cần so khớp (cùng kind)"""
+    buckets = defaultdict(list)
+    for idx, ent in enumerate(entities):
+        if ent.core:
+            buckets[ent.key].append(idx)
+    keys = list(buckets)
+    pairs = set()
+
+    # 1. khoá lõi trùng: so với tối đa MAX_BUCKET tên đứng trước trong bucket
+    for members in buckets.values():
+        for x in range(1, len(members)):
+            for y in range(max(0, x - MAX_BUCKET), x):
+                pairs.add((members[y], members[x]))
+
+    def expand(key_pairs):
+        for i, j in key_pairs:
+            for a in buckets[keys[i]][:MAX_BUCKET]:
+                for b in buckets[keys[j]][:MAX_BUCKET]:
+                    pairs.add((min(a, b), max(a, b)))
+
+    # 2. MinHash + LSH trên lõi (mỗi khoá một chữ ký)
+    signatures = minhash_signatures([entities[buckets[k][0]].shingles for k in keys])
+    expand(lsh_pairs(signatures))
+    # 3. lõi chứa lõi
+    expand(containment_pairs(keys))
+    # 4. cùng website / cùng năm sinh + họ tên gần giống đã nằm trong (2); website thì gom riêng
+    by_site = defaultdict(list)
+    for idx, ent in enumerate(entities):
+        site = ent.signals.get('website')
+        if site:
+            by_site[site].append(idx)
+    for members in by_site.values():
+        if len(members) <= MAX_BUCKET:
+            for x in range(len(members)):
+                for y in range(x + 1, len(members)):
+                    pairs.add((members[x], members[y]))
+    return pairs
+
+# ============ So khớp ============
+def signal_conflicts(a, b):
+    return sorted(k for k in a.keys() & b.keys() if a[k] != b[k])
+
+def compare(a, b):
+    """(score, method, status, evidence) cho một cặp entity, hoặc None nếu không phải cùng thực thể"""
+    if a.numerals != b.numerals or signal_conflicts(a.signals, b.signals):
+        return None
+    agree = sorted(k for k in a.signals.keys() & b.signals.keys() if a.signals[k] == b.signals[k])
+    evidence = ";".join(f"{k}={a.signals[k]}" for k in agree)
+    score = round(jaccard(a.shingles, b.shingles), 3)
+    # "University College Dublin" ≠ "Đại học Dublin": loại cơ sở khác nhau thì chỉ đề xuất review
+    same_type = not a.tags or not b.tags or a.tags == b.tags
+    if a.core == b.core:
+        if not same_type:
+            return 1.0, 'core_type', 'review', evidence or "type=" + "/".join(sorted(a.tags ^ b.tags))
+        return 1.0, 'core', 'auto', evidence
+    if 'website' in agree:
+        return max(score, 0.9), 'website', 'auto', evidence
+    if score >= AUTO_JACCARD:
+        status = 'auto' if same_type and (a.kind == 'university' or agree) else 'review'
+        return score, 'shingle', status, evidence
+    if a.core < b.core or b.core < a.core:
+        if abs(len(a.core) - len(b.core)) == 1 and score >= CONTAINMENT_JACCARD:
+            return score, 'containment', 'review', evidence
+    if score >= REVIEW_JACCARD:
+        return score, 'shingle', 'review', evidence
+    return None
+
+class _Clusters:
+    """Union-find; mỗi cụm giữ tín hiệu đã gộp để không nối hai cụm mâu thuẫn (a≈b, b≈c nhưng a≠c)"""
+
+    def __init__(self, entities):
+        self.parent = list(range(len(entities)))
+        self.signals = [dict(ent.signals) for ent in entities]
+
+    def find(self, x):
+        root = x
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[x] != root:
+            self.parent[x], x = root, self.parent[x]
+        return root
+
+    def union(self, a, b, force=False):
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return True
+        if not force and signal_conflicts(self.signals[ra], self.signals[rb]):
+            return False
+        self.parent[rb] = ra
+        for k, v in self.signals[rb].items():
+            self.signals[ra].setdefault(k, v)
+        return True
+
+def _pair(a, b):
+    return (a, b) if a <= b else (b, a)
+
+def resolve(entities, decisions=None):
+    """Các dòng merge map cho một kind. decisions: {(tên, tên) đã sắp xếp: dòng accept/reject cũ}"""
+    decisions = decisions or {}
+    index = {ent.name: i for i, ent in enumerate(entities)}
+    clusters = _Clusters(entities)
+    reviews = []
+
+    for i, j in sorted(candidate_pairs(entities)):
+        a, b = entities[i], entities[j]
+        if _pair(a.name, b.name) in decisions:
+            continue
+        result = compare(a, b)
+        if result is None:
+            continue
+        if result[2] == 'auto' and clusters.union(i, j):
+            continue
+        reviews.append((i, j, result))
+
+    # accept cũ: nối bất kể tín hiệu (người duyệt đã xem); alias của accept không làm tên chuẩn
+    reviewed_alias, reviewed_canonical = set(), set()
+    for (x, y), row in decisions.items():
+        if row['status'] == 'accept' and x in index and y in index:
+            clusters.union(index[x], index[y], force=True)
+            reviewed_alias.add(row['alias'])
+            reviewed_canonical.add(row['canonical'])
+
+    members = defaultdict(list)
+    for i in range(len(entities)):
+        members[clusters.find(i)].append(i)
+    canonical = {}
+    for root, group in members.items():
+        pool = [i for i in group if entities[i].name not in reviewed_alias] or group
+        best = min(pool, key=lambda i: (entities[i].name not in reviewed_canonical, entities[i].rank))
+        for i in group:
+            canonical[i] = best
+
+    rows = []
+    decided_alias = {row['alias'] for row in decisions.values()}
+    for i, best in canonical.items():
+        a, c = entities[i], entities[best]
+        if i == best or a.name in decided_alias or _pair(a.name, c.name) in decisions:
+            continue
+        result = compare(a, c) or (None, 'transitive', 'auto', "")
+        score = result[0] if result[0] is not None else ""
+        rows.append(_row(a.kind, a.name, c.name, score, result[1], 'auto', result[3]))
+
+    seen = set()
+    for i, j, (score, method, _, evidence) in sorted(reviews, key=lambda r: -r[2][0]):
+        ci, cj = canonical[i], canonical[j]
+        if ci == cj:
+            continue
+        alias, target = sorted((entities[ci], entities[cj]), key=lambda e: e.rank)[::-1]
+        key = _pair(alias.name, target.name)
+        if key in seen or key in decisions:
+            continue
+        seen.add(key)
+        rows.append(_row(alias.kind, alias.name, target.name, score, method, 'review', evidence))
+    return rows
+
+def _row(kind, alias, canonical, score, method, status, evidence):
+    return {'kind': kind, 'alias': alias, 'canonical': canonical, 'score': score,
+            'method': method, 'status': status, 'evidence': evidence}
+
+# ============ Đọc dữ liệu đồ thị ============
+def _read_titles(path):
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        return [(r.get('title') or '').strip() for r in csv.DictReader(f)]
+
+def collect_names(graph_dir):
+    """{kind: [title]} — từ đầu ra step3 (nodes_persons/universities.csv) hoặc nodes_unified.csv"""
+    persons = os.path.join(graph_dir, 'nodes_persons.csv')
+    unis = os.path.join(graph_dir, 'nodes_universities.csv')
+    if os.path.exists(persons) and os.path.exists(unis):
+        names = {'person': _read_titles(persons), 'university': _read_titles(unis)}
+    else:
+        names = defaultdict(list)
+        with open(os.path.join(graph_dir, 'nodes_unified.csv'), 'r', encoding='utf-8', newline='') as f:
+            for r in csv.DictReader(f):
+                if r.get('type') in KINDS:
+                    names[r['type']].append((r.get('title') or r.get('id') or '').strip())
+    return {kind: list(dict.fromkeys(t for t in names.get(kind, []) if t)) for kind in KINDS}
+
+def count_refs(graph_dir):
+    """Số cạnh chạm vào mỗi tên (edges_up.csv của step3, không có thì edges_unified.csv)"""
+    refs = Counter()
+    for name in ('edges_up.csv', 'edges_unified.csv'):
+        path = os.path.join(graph_dir, name)
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8', newline='') as f:
+                reader = csv.reader(f)
+                next(reader, None)
+                for row in reader:
+                    refs.update(row[:2])
+            break
+    return refs
+
+def collect_properties(details_path, names):
+    props = {}
+    if details_path and os.path.exists(details_path):
+        for rec in iter_node_details(details_path):
+            title = rec.get('title')
+            if title in names:
+                props[title] = rec.get('properties') or {}
+    return props
+
+# ============ Merge map ============
+def read_merge_map(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        return [{k: (r.get(k) or '').strip() for k in MERGE_MAP_HEADER} for r in csv.DictReader(f)]
+
+def write_merge_map(path, rows):
+    order = {'accept': 0, 'reject': 1, 'auto': 2, 'review': 3}
+    rows = sorted(rows, key=lambda r: (r['kind'], order.get(r['status'], 4), r['canonical'], r['alias']))
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=MERGE_MAP_HEADER)
+        writer.writeheader()
+        writer.writerows(rows)
+
+def load_merge_map(path, statuses=APPLY_STATUSES):
+    """{alias: canonical} từ các dòng được áp dụng, giải bắc cầu (a→b, b→c ⇒ a→c); chuỗi vòng bị bỏ"""
+    direct = {}
+    for row in read_merge_map(path):
+        if row['status'] in statuses and row['alias'] and row['canonical'] and row['alias'] != row['canonical']:
+            direct.setdefault(row['alias'], row['canonical'])
+    resolved = {}
+    for alias in direct:
+        seen, target = {alias}, direct[alias]
+        while target in direct and target not in seen:
+            seen.add(target)
+            target = direct[target]
+        if target in seen:
+            print(f"[WARN] merge map: vòng gộp tại '{alias}' — bỏ qua")
+            continue
+        resolved[alias] = target
+    return resolved
+
+def run(graph_dir, details_path=None, out_path=None, kinds=KINDS):
+    out_path = out_path or os.path.join(graph_dir, MERGE_MAP_FILE)
+    details_path = details_path or os.path.join(graph_dir, 'node_details.json')
+    previous = read_merge_map(out_path)
+    names = collect_names(graph_dir)
+    refs = count_refs(graph_dir)
+    props = collect_properties(details_path, {n for kind in kinds for n in names[kind]})
+
+    rows = [r for r in previous if r['status'] in DECISION_STATUSES]
+    for kind in kinds:
+        decisions = {_pair(r['alias'], r['canonical']): r for r in rows if r['kind'] == kind}
+        entities = [make_entity(kind, name, props.get(name), refs[name]) for name in names[kind]]
+        kind_rows = resolve(entities, decisions)
+        status = Counter(r['status'] for r in kind_rows)
+        print(f"[OK] {kind}: {len(entities)} tên → {status['auto']} auto, {status['review']} review"
+              f" ({len(decisions)} quyết định cũ giữ nguyên)")
+        rows.extend(kind_rows)
+    write_merge_map(out_path, rows)
+    print(f"[OK] {out_path} ({len(rows)} dòng)")
+    return rows
+
+def main():
+    ap = argparse.ArgumentParser(description="Gộp bí danh trường / người → merge map có thể duyệt tay")
+    ap.add_argument("--graph-dir", default="graph_out", help="Thư mục đầu ra step3 / create_unified_graph")
+    ap.add_argument("--details", default=None, help="node_details (.json/.ndjson); mặc định <graph-dir>/node_details.json")
+    ap.add_argument("--out", default=None, help=f"Merge map; mặc định <graph-dir>/{MERGE_MAP_FILE}")
+    ap.add_argument("--kinds", nargs="+", choices=KINDS, default=list(KINDS))
+    args = ap.parse_args()
+    run(args.graph_dir, args.details, args.out, args.kinds)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+graph_cache.py — Cache khởi động của KnowledgeGraph đã dựng xong (đồ thị + các chỉ mục)
+
+Dựng KnowledgeGraph từ CSV (kiểm tra dòng, gom cặp clique thành nhóm, tạo chỉ mục) tốn vài giây với đồ
+thị lớn và lặp lại ở mỗi lần khởi động app.py / 6_chatbot_interactive.py / run_pipeline.py / script đánh
+giá. Cache lưu trạng thái đã dựng (pickle) vào <thư mục đồ thị>/kg_cache/kg-<key>.pickle, với key là
+sha256 của:
+    - kích thước + mtime_ns của các file nguồn (nodes, edges, groups_*.csv, graph_version.json nếu có)
+    - nội dung các file mã quyết định kết quả dựng (chatbot/1_knowledge_graph.py, clique_groups.py, ...)
+    - phiên bản Python / networkx / pandas và định dạng cache
+Nguồn hoặc mã đổi → key đổi → dựng lại và ghi cache mới (file cache cũ bị xoá). Changelog chưa compact
+không nằm trong key: cache giữ đồ thị ở phiên bản CSV, các lô changelog vẫn được áp sau khi nạp.
+
+API:
+    cache_key(sources, code_files)   → chuỗi hex (file nguồn không tồn tại cũng được tính vào key)
+    cache_path(cache_dir, key)       → đường dẫn file cache
+    load_cache(path)                 → dict trạng thái, hoặc None nếu chưa có / hỏng
+    save_cache(path, state)          → ghi nguyên tử (file tạm + os.replace), xoá cache cũ cùng thư mục
+
+Xoá cache bằng tay: xoá thư mục graph_out/kg_cache/ (lần khởi động sau sẽ dựng lại).
+"""
+import os, sys, gc, glob, pickle, hashlib
+
+FORMAT = "kg-cache/1"
+CACHE_DIR = "kg_cache"
+
+def _library_versions():
+    versions = [sys.version.split()[0]]
+    for name in ("networkx", "pandas", "numpy"):
+        module = sys.modules.get(name)
+        versions.append(getattr(module, "__version__", ""))
+    return versions
+
+def cache_key(sources, code_files):
+    h = hashlib.sha256()
+    h.update(repr([FORMAT, pickle.HIGHEST_PROTOCOL] + _library_versions()).encode("utf-8"))
+    for p in sources:
+        try:
+            st = os.stat(p)
+            stamp = [os.path.abspath(p), st.st_size, st.st_mtime_ns]
+        except OSError:
+            stamp = [os.path.abspath(p), None]
+        h.update(repr(stamp).encode("utf-8"))
+    for p in code_files:
+        with open(p, "rb") as f:
+            h.update(hashlib.sha256(f.read()).digest())
+    return h.hexdigest()[:32]
+
+def cache_path(cache_dir, key):
+    return os.path.join(cache_dir, f"kg-{key}.pickle")
+
+def load_cache(path):
+    if not os.path.exists(path):
+        return None
+    gc.disable()  # unpickle tạo hàng triệu object → tắt GC vòng tạm thời (nhanh gần gấp đôi)
+    try:
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+    except Exception as e:  # file dở dang / mã đã đổi lớp → coi như chưa có cache
+        print(f"[!] Bỏ qua cache hỏng {path}: {e}")
+        return None
+    finally:
+        gc.enable()
+    return state if isinstance(state, dict) and state.get("format") == FORMAT else None
+
+def save_cache(path, state):
+    cache_dir = os.path.dirname(path) or "."
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                pickle.dump(dict(state, format=FORMAT), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+    except OSError as e:  # thư mục chỉ đọc, hết chỗ... → chạy tiếp không cache
+        print(f"[!] Không ghi được cache {path}: {e}")
+        return False
+    for old in glob.glob(os.path.join(cache_dir, "kg-*.pickle")):
+        if os.path.abspath(old) != os.path.abspath(path):
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+    return True
@@ -0,0 +1,386 @@
+# -*- coding: utf-8 -*-
+"""
+graph_changelog.py — Changelog append-only cho đồ thị hợp nhất, đánh số phiên bản, compaction định kỳ
+
+Trong graph_out/ (cạnh nodes_unified.csv / edges_unified.csv / groups_unified.csv):
+    graph_version.json : {"version": V} — phiên bản mà các CSV (+ snapshot/) đang phản ánh
+    changelog.ndjson   : mỗi dòng 1 thao tác {"version": v, "op": ..., ...}, v > V; các dòng cùng v = 1 lô
+Phiên bản hiện tại của đồ thị = version của lô cuối trong changelog (hoặc V nếu changelog rỗng).
+
+Thao tác (mọi thao tác đều idempotent — áp lại lần 2 không đổi kết quả):
+    {"op": "upsert_node", "id", "type", ["title"], ["properties": {...} | null]}
+    {"op": "delete_node", "id"}                         — xoá kèm mọi cạnh và tư cách thành viên nhóm của nút
+    {"op": "upsert_edge", "from", "to", "type", ["weight"], ["year": 1995 | [1990, 1995] | "1990;1995" | null]}
+    {"op": "delete_edge", "from", "to", ["type"]}       — không có type: mọi cạnh from→to (trừ quan hệ clique)
+    {"op": "add_member", "relation", "group", "member", ["weight"]}   — quan hệ clique, xem clique_groups.py
+    {"op": "remove_member", "relation", "group", "member"}
+Trường không ghi trong upsert_node / upsert_edge (properties, year) giữ giá trị cũ; null → xoá. Cặp clique chỉ xoá được qua remove_member / delete_node.
+
+Luồng dùng:
+    Changelog(graph_dir).append(ops)      → version mới (1 writer; cả lô ghi bằng 1 lần write O_APPEND)
+    KnowledgeGraph nạp CSV/snapshot rồi áp các lô > V; kg.refresh() áp lô mới trên đồ thị đang chạy,
+    kg.version để cache phía sau vô hiệu hoá đúng lúc
+    compact(graph_dir)                    → áp changelog vào CSV, ghi lại snapshot, nâng V, cắt changelog
+    reset(graph_dir)                      → sau khi create_unified_graph.py dựng lại toàn bộ: V mới, changelog rỗng
+
+CLI:
+  py graph_changelog.py status graph_out
+  py graph_changelog.py append graph_out ops.ndjson            (mỗi dòng 1 thao tác, cả file = 1 phiên bản)
+  py graph_changelog.py compact graph_out [--min-entries 1000]  (chạy định kỳ, vd. cron hằng ngày)
+"""
+import os, sys, csv, json, argparse
+
+from graph_loader import NODE_TYPES, RELATION_TYPES, EDGE_COLUMNS, format_years
+from clique_groups import GROUP_RELATIONS, GROUPS_HEADER, read_groups
+
+CHANGELOG_FILE = "changelog.ndjson"
+VERSION_FILE = "graph_version.json"
+NODE_OPS = ("upsert_node", "delete_node")
+EDGE_OPS = ("upsert_edge", "delete_edge")
+MEMBER_OPS = ("add_member", "remove_member")
+
+csv.field_size_limit(min(sys.maxsize, 2 ** 31 - 1))
+
+def _require(op, *fields):
+    for f in fields:
+        if not isinstance(op.get(f), str) or not op[f].strip():
+            raise ValueError(f"{op.get('op')}: thiếu trường '{f}': {op}")
+
+def _weight(w):
+    if w is None or w == "":
+        return 1
+    if isinstance(w, bool) or not isinstance(w, (int, float, str)):
+        raise ValueError(f"weight không hợp lệ: {w!r}")
+    w = float(w)
+    return int(w) if w == int(w) else w
+
+def _years(y):
+    """Năm tốt nghiệp của upsert_edge → chuỗi cột year ('1990;1995')"""
+    items = y.split(";") if isinstance(y, str) else y if isinstance(y, (list, tuple)) else [y]
+    try:
+        years = {int(v) for v in items if not isinstance(v, bool) and str(v).strip()}
+    except (TypeError, ValueError):
+        years = set()
+    if not years or not all(1000 <= v <= 9999 for v in years):
+        raise ValueError(f"year không hợp lệ: {y!r}")
+    return format_years(years)
+
+def validate_op(op):
+    """Chuẩn hoá 1 thao tác (strip, weight số, type thuộc từ vựng của graph_loader) hoặc ValueError"""
+    kind = op.get("op")
+    if kind == "upsert_node":
+        _require(op, "id", "type")
+        if op["type"].strip() not in NODE_TYPES:
+            raise ValueError(f"upsert_node: type '{op['type']}' không thuộc {NODE_TYPES}")
+        out = {"op": kind, "id": op["id"].strip(), "type": op["type"].strip()}
+        if op.get("title") is not None:
+            out["title"] = str(op["title"]).strip() or out["id"]
+        if "properties" in op:
+            props = op["properties"]
+            if isinstance(props, str):
+                props = json.loads(props) if props.strip() else None
+            out["properties"] = props
+        return out
+    if kind == "delete_node":
+        _require(op, "id")
+        return {"op": kind, "id": op["id"].strip()}
+    if kind in EDGE_OPS:
+        _require(op, "from", "to")
+        out = {"op": kind, "from": op["from"].strip(), "to": op["to"].strip()}
+        rel = (op.get("type") or "").strip()
+        if rel and rel not in RELATION_TYPES:
+            raise ValueError(f"{kind}: type '{rel}' không thuộc {RELATION_TYPES}")
+        if kind == "upsert_edge":
+            if not rel:
+                raise ValueError(f"upsert_edge: thiếu type: {op}")
+            out["type"], out["weight"] = rel, _weight(op.get("weight"))
+            if "year" in op:
+                out["year"] = "" if op["year"] in (None, "") else _years(op["year"])
+        elif rel:
+            if rel in GROUP_RELATIONS:
+                raise ValueError(f"delete_edge: cặp {rel} nằm trong nhóm — dùng remove_member")
+            out["type"] = rel
+        return out
+    if kind in MEMBER_OPS:
+        _require(op, "relation", "group", "member")
+        if op["relation"] not in GROUP_RELATIONS:
+            raise ValueError(f"{kind}: relation '{op['relation']}' không thuộc {GROUP_RELATIONS}")
+        out = {"op": kind, "relation": op["relation"], "group": op["group"].strip(), "member": op["member"].strip()}
+        if kind == "add_member":
+            out["weight"] = _weight(op.get("weight"))
+        return out
+    raise ValueError(f"Thao tác không hỗ trợ: {kind!r}")
+
+class Changelog:
+    def __init__(self, graph_dir):
+        self.graph_dir = graph_dir
+        self.path = os.path.join(graph_dir, CHANGELOG_FILE)
+        self.version_path = os.path.join(graph_dir, VERSION_FILE)
+
+    def base_version(self):
+        try:
+            with open(self.version_path, "r", encoding="utf-8") as f:
+                return int(json.load(f).get("version", 0))
+        except (OSError, ValueError):
+            return 0
+
+    def _write_base(self, version):
+        tmp = self.version_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": version}, f)
+        os.replace(tmp, self.version_path)
+
+    def size(self):
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def read(self, since=0, offset=0):
+        """→ ([(version, [ops])] có version > since, offset byte sau dòng hoàn chỉnh cuối cùng).
+        Truyền lại offset lần sau để chỉ đọc phần mới ghi (chi phí theo delta, không theo cả changelog)."""
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            return [], 0
+        end = data.rfind(b"\n") + 1  # dòng cuối chưa ghi xong → để lần đọc sau
+        batches = []
+        for line in data[:end].splitlines():
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+                version = int(entry.pop("version"))
+            except (ValueError, KeyError) as e:
+                print(f"[WARN] {self.path}: bỏ qua dòng hỏng ({e})")
+                continue
+            if version <= since:
+                continue
+            if batches and batches[-1][0] == version:
+                batches[-1][1].append(entry)
+            else:
+                batches.append((version, [entry]))
+        return batches, offset + end
+
+    def head_version(self):
+        batches, _ = self.read(since=self.base_version())
+        return batches[-1][0] if batches else self.base_version()
+
+    def append(self, ops):
+        """Ghi 1 lô thao tác (đã kiểm tra) thành 1 phiên bản mới → version"""
+        ops = [validate_op(op) for op in ops]
+        if not ops:
+            return self.head_version()
+        version = self.head_version() + 1
+        data = "".join(json.dumps({"version": version, **op}, ensure_ascii=False) + "\n" for op in ops)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        return version
+
+    def truncate(self, version):
+        """Bỏ các lô <= version (đã nằm trong CSV sau compaction)"""
+        batches, _ = self.read(since=version)
+        if not batches:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            return
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for v, ops in batches:
+                for op in ops:
+                    f.write(json.dumps({"version": v, **op}, ensure_ascii=False) + "\n")
+        os.replace(tmp, self.path)
+
+def reset(graph_dir):
+    """CSV vừa được dựng lại toàn bộ → phiên bản mới, changelog cũ bị bỏ → version"""
+    log = Changelog(graph_dir)
+    batches, _ = log.read(since=log.base_version())
+    if batches:
+        print(f"[WARN] Bỏ {len(batches)} lô changelog chưa compact (bản dựng đầy đủ lấy dữ liệu từ nguồn)")
+    version = log.head_version() + 1
+    log._write_base(version)
+    log.truncate(version)
+    return version
+
+# ---------- compaction: áp changelog vào các bảng CSV ----------
+class _Tables:
+    """nodes_unified.csv / edges_unified.csv / groups_unified.csv trong RAM, có chỉ mục để áp thao tác"""
+
+    def __init__(self, graph_dir):
+        self.nodes_csv = os.path.join(graph_dir, "nodes_unified.csv")
+        self.edges_csv = os.path.join(graph_dir, "edges_unified.csv")
+        self.groups_csv = os.path.join(graph_dir, "groups_unified.csv")
+        self.node_fields, self.nodes = self._read(self.nodes_csv, ["id", "title", "type", "properties"])
+        self.edge_fields, self.edges = self._read(self.edges_csv, EDGE_COLUMNS)
+        if "properties" not in self.node_fields:
+            self.node_fields.append("properties")
+        self.node_index = {}
+        for i, row in enumerate(self.nodes):
+            nid = (row.get("id") or "").strip() or (row.get("title") or "").strip()
+            if nid:
+                self.node_index[nid] = i
+        self.edge_index, self.incident = {}, {}
+        for i, row in enumerate(self.edges):
+            self._index_edge(i, row)
+        self.groups = {(rel, group): [weight, members] for rel, group, weight, members in read_groups(self.groups_csv)}
+
+    @staticmethod
+    def _read(path, default_fields):
+        if not os.path.exists(path):
+            return list(default_fields), []
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            reader = csv.DictReader(f)
+            rows = list(reader)
+            return list(reader.fieldnames or default_fields), rows
+
+    def _index_edge(self, i, row):
+        a, b, rel = (row.get("from") or "").strip(), (row.get("to") or "").strip(), (row.get("type") or "").strip()
+        self.edge_index[(a, b, rel)] = i
+        self.incident.setdefault(a, set()).add(i)
+        self.incident.setdefault(b, set()).add(i)
+
+    def _drop_edge(self, i):
+        row = self.edges[i]
+        if row is None:
+            return
+        a, b, rel = (row.get("from") or "").strip(), (row.get("to") or "").strip(), (row.get("type") or "").strip()
+        self.edge_index.pop((a, b, rel), None)
+        self.incident.get(a, set()).discard(i)
+        self.incident.get(b, set()).discard(i)
+        self.edges[i] = None
+
+    def apply(self, op):
+        kind = op["op"]
+        if kind == "upsert_node":
+            i = self.node_index.get(op["id"])
+            if i is None:
+                row = dict.fromkeys(self.node_fields, "")
+                row.update(id=op["id"], title=op["id"])
+                self.node_index[op["id"]] = len(self.nodes)
+                self.nodes.append(row)
+            else:
+                row = self.nodes[i]
+            row["type"] = op["type"]
+            if "title" in op:
+                row["title"] = op["title"]
+            if "properties" in op:
+                props = op["properties"]
+                row["properties"] = "" if props is None else json.dumps(props, ensure_ascii=False)
+        elif kind == "delete_node":
+            i = self.node_index.pop(op["id"], None)
+            if i is not None:
+                self.nodes[i] = None
+            for j in list(self.incident.pop(op["id"], ())):
+                self._drop_edge(j)
+            for weight_members in self.groups.values():
+                if op["id"] in weight_members[1]:
+                    weight_members[1].remove(op["id"])
+        elif kind == "upsert_edge":
+            key = (op["from"], op["to"], op["type"])
+            i = self.edge_index.get(key)
+            if i is None:
+                row = {"from": op["from"], "to": op["to"], "type": op["type"], "weight": op["weight"]}
+                self.edges.append(row)
+                self._index_edge(len(self.edges) - 1, row)
+            else:
+                self.edges[i]["weight"] = op["weight"]
+            if "year" in op:
+                if "year" not in self.edge_fields:
+                    self.edge_fields.append("year")
+                self.edges[self.edge_index[key]]["year"] = op["year"]
+        elif kind == "delete_edge":
+            for j in list(self.incident.get(op["from"], ())):
+                row = self.edges[j]
+                rel = (row.get("type") or "").strip()
+                if ((row.get("to") or "").strip() == op["to"] and (row.get("from") or "").strip() == op["from"]
+                        and rel not in GROUP_RELATIONS and op.get("type", rel) == rel):
+                    self._drop_edge(j)
+        elif kind == "add_member":
+            weight_members = self.groups.setdefault((op["relation"], op["group"]), [op["weight"], []])
+            if op["member"] not in weight_members[1]:
+                weight_members[1].append(op["member"])
+        elif kind == "remove_member":
+            weight_members = self.groups.get((op["relation"], op["group"]))
+            if weight_members and op["member"] in weight_members[1]:
+                weight_members[1].remove(op["member"])
+
+    @staticmethod
+    def _write(path, fields, rows):
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(r for r in rows if r is not None)
+        os.replace(tmp, path)
+
+    def save(self):
+        self._write(self.nodes_csv, self.node_fields, self.nodes)
+        self._write(self.edges_csv, self.edge_fields, self.edges)
+        if self.groups or os.path.exists(self.groups_csv):
+            tmp = self.groups_csv + ".tmp"
+            with open(tmp, "w", encoding="utf-8", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(GROUPS_HEADER)
+                for (relation, group), (weight, members) in self.groups.items():
+                    writer.writerows([relation, group, weight, m] for m in members)
+            os.replace(tmp, self.groups_csv)
+
+def compact(graph_dir, min_entries=0, snapshot=True):
+    """Áp mọi lô trong changelog vào CSV (+ snapshot) rồi cắt changelog → version (None nếu chưa tới ngưỡng).
+    Dừng giữa chừng cũng an toàn: thao tác idempotent, chạy lại sẽ áp lại đúng kết quả."""
+    log = Changelog(graph_dir)
+    base = log.base_version()
+    batches, _ = log.read(since=base)
+    n_ops = sum(len(ops) for _, ops in batches)
+    if not batches or n_ops < min_entries:
+        return None
+    version = batches[-1][0]
+    tables = _Tables(graph_dir)
+    for _, ops in batches:
+        for op in ops:
+            tables.apply(op)
+    tables.save()
+    if snapshot:
+        from graph_snapshot import SNAPSHOT_DIR, snapshot_from_csv
+        snapshot_from_csv(tables.nodes_csv, tables.edges_csv, os.path.join(graph_dir, SNAPSHOT_DIR), version=version)
+    log._write_base(version)
+    log.truncate(version)
+    print(f"[OK] Compact {len(batches)} lô / {n_ops} thao tác → phiên bản {version}")
+    return version
+
+# ---------- CLI ----------
+def _read_ops(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def main():
+    ap = argparse.ArgumentParser(description="Changelog tăng dần cho graph_out/ (xem docstring)")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("status", help="phiên bản CSV, phiên bản hiện tại, số lô chờ compact")
+    p.add_argument("graph_dir")
+    p = sub.add_parser("append", help="ghi 1 lô thao tác (file NDJSON) thành 1 phiên bản")
+    p.add_argument("graph_dir")
+    p.add_argument("ops_file")
+    p = sub.add_parser("compact", help="áp changelog vào CSV + snapshot, cắt changelog")
+    p.add_argument("graph_dir")
+    p.add_argument("--min-entries", type=int, default=0, help="chỉ compact khi changelog có ít nhất N thao tác")
+    p.add_argument("--no-snapshot", action="store_true", help="không ghi lại graph_out/snapshot/")
+    args = ap.parse_args()
+
+    log = Changelog(args.graph_dir)
+    if args.cmd == "status":
+        batches, _ = log.read(since=log.base_version())
+        print(f"CSV: v{log.base_version()} | hiện tại: v{log.head_version()} | "
+              f"{len(batches)} lô / {sum(len(ops) for _, ops in batches)} thao tác chờ compact")
+    elif args.cmd == "append":
+        print(f"[OK] Phiên bản {log.append(_read_ops(args.ops_file))}")
+    elif args.cmd == "compact":
+        if compact(args.graph_dir, args.min_entries, snapshot=not args.no_snapshot) is None:
+            print("Không có gì để compact")
+
+if __name__ == "__main__":
+    main()
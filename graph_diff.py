@@ -0,0 +1,329 @@
+# -*- coding: utf-8 -*-
+"""
+graph_diff.py — Diff cấu trúc giữa 2 bản build đồ thị hợp nhất (vd. graph_out cũ và graph_out vừa dựng lại)
+
+So sánh nodes_unified.csv / edges_unified.csv / groups_unified.csv của 2 thư mục (nút + cạnh đọc từ snapshot/
+nếu snapshot còn khớp CSV), đếm theo type nút / quan hệ:
+    nút   (khoá id)                     : thêm / xoá / đổi (title, type, properties)
+    cạnh  (khoá from, to, type)         : thêm / xoá / đổi trọng số (weight hoặc năm tốt nghiệp)
+    nhóm  (khoá relation, group, member): thành viên thêm / xoá, nhóm đổi weight
+Chỉ so phiên bản CSV của mỗi thư mục — lô changelog chưa compact không được tính.
+
+Tuyến tính, RAM giới hạn: mỗi bên được băm (crc32 của khoá) vào N partition trên đĩa tạm rồi so từng cặp
+partition — trong RAM chỉ có 1 partition (cũ + mới), không bao giờ cả đồ thị.
+
+--ops ghi 1 lô thao tác graph_changelog (NDJSON) biến bản cũ thành bản mới, theo thứ tự
+    delete_node → delete_edge → remove_member → upsert_node → upsert_edge → add_member
+nên dùng thẳng làm delta cho phía tiêu thụ tăng dần (`py graph_changelog.py append graph_out ops.ndjson`,
+kg.refresh()). Cạnh / thành viên không đổi nhưng chạm nút bị xoá khỏi file nút (vẫn còn là nút ngầm) được
+upsert lại ("reattached") vì delete_node xoá kèm chúng. Thay đổi mà changelog không biểu diễn được (type ngoài
+từ vựng graph_loader, xoá cặp clique kiểu cũ trong file cạnh, đổi weight của nhóm) chỉ được đếm vào "skipped".
+
+CLI:
+  py graph_diff.py graph_out_old graph_out
+  py graph_diff.py graph_out_old graph_out --ops delta.ndjson --summary diff.json [--source csv] [--partitions 64]
+"""
+import os, sys, csv, json, zlib, marshal, shutil, argparse, tempfile
+from collections import Counter, defaultdict
+
+from graph_loader import format_years, parse_years
+from graph_snapshot import SNAPSHOT_DIR, UNKNOWN_TYPE, load_snapshot, snapshot_is_fresh
+from graph_changelog import validate_op
+from clique_groups import GROUP_RELATIONS, groups_path
+
+NODES_CSV = "nodes_unified.csv"
+EDGES_CSV = "edges_unified.csv"
+PARTITIONS = 32
+# Thứ tự ghi các pha trong lô --ops (xem docstring)
+PHASES = ("delete_node", "delete_edge", "remove_member", "upsert_node", "upsert_edge", "add_member")
+
+csv.field_size_limit(min(sys.maxsize, 2 ** 31 - 1))
+
+def _weight(w):
+    try:
+        w = float(w)
+    except (TypeError, ValueError):
+        return 1
+    return int(w) if w == int(w) else w
+
+def _years(text):
+    try:
+        return format_years(parse_years(text))
+    except ValueError:
+        return ""
+
+def _csv_rows(path):
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        yield from csv.DictReader(f)
+
+# ---------- đọc 1 bản build (CSV hoặc snapshot) ----------
+class Build:
+    """Một thư mục graph_out: nút / cạnh từ snapshot (nếu chọn hoặc còn khớp CSV) hay CSV, nhóm từ groups_*.csv"""
+
+    def __init__(self, graph_dir, source="auto"):
+        self.graph_dir = graph_dir
+        self.nodes_csv = os.path.join(graph_dir, NODES_CSV)
+        self.edges_csv = os.path.join(graph_dir, EDGES_CSV)
+        snap_dir = os.path.join(graph_dir, SNAPSHOT_DIR)
+        self.snap = None
+        if source == "snapshot" or (source == "auto" and snapshot_is_fresh(snap_dir, self.nodes_csv, self.edges_csv)):
+            self.snap = load_snapshot(snap_dir)
+        elif not os.path.exists(self.edges_csv):
+            raise FileNotFoundError(self.edges_csv)
+
+    @property
+    def source(self):
+        return "snapshot" if self.snap is not None else "csv"
+
+    def nodes(self):
+        """(id, (title, type, properties thô)) — như snapshot: id trống thì dùng title, type trống → unknown"""
+        if self.snap is not None:
+            s = self.snap
+            rows = zip(s.ids(), s.titles(), s.types(), s.properties_raw())
+            for i, (nid, title, node_type, props) in enumerate(rows):
+                if i >= s.n_explicit:
+                    break
+                yield nid, (title or nid, node_type or UNKNOWN_TYPE, props or "")
+            return
+        for row in _csv_rows(self.nodes_csv):
+            title = (row.get("title") or "").strip()
+            nid = (row.get("id") or "").strip() or title
+            if nid:
+                yield nid, (title or nid, (row.get("type") or "").strip() or UNKNOWN_TYPE, row.get("properties") or "")
+
+    def edges(self):
+        """((from, to, type), (weight, năm '1990;1995'))"""
+        if self.snap is not None:
+            s = self.snap
+            ids, rels = s.ids(), [r.strip() for r in s.relation_types]
+            years = s.edge_years()
+            src, dst, rel, w = s.edge_arrays(file_order=True)
+            for e, (a, b, r, x) in enumerate(zip(src.tolist(), dst.tolist(), rel.tolist(), w.tolist())):
+                yield (ids[a], ids[b], rels[r]), (_weight(x), format_years(years.get(e, ())))
+            return
+        for row in _csv_rows(self.edges_csv):
+            a, b = (row.get("from") or "").strip(), (row.get("to") or "").strip()
+            if a and b:
+                yield (a, b, (row.get("type") or "").strip()), (_weight(row.get("weight")), _years(row.get("year")))
+
+    def groups(self):
+        """((relation, group), (weight, member))"""
+        for row in _csv_rows(groups_path(self.edges_csv)):
+            relation, member = row.get("relation"), row.get("member")
+            if relation and member:
+                yield (relation, row.get("group") or ""), (_weight(row.get("weight", 1)), member)
+
+# ---------- hash partition ----------
+def _bucket(key, partitions):
+    text = key if isinstance(key, str) else "\x1f".join(key)
+    return zlib.crc32(text.encode("utf-8")) % partitions
+
+def _partition(records, tmpdir, tag, partitions):
+    files = [open(os.path.join(tmpdir, f"{tag}.{i}"), "wb", buffering=1 << 16) for i in range(partitions)]
+    try:
+        for rec in records:
+            marshal.dump(rec, files[_bucket(rec[0], partitions)])
+    finally:
+        for f in files:
+            f.close()
+
+def _read_partition(tmpdir, tag, i):
+    path = os.path.join(tmpdir, f"{tag}.{i}")
+    with open(path, "rb", buffering=1 << 16) as f:
+        while True:
+            try:
+                yield marshal.load(f)
+            except EOFError:
+                break
+    os.remove(path)
+
+def _paired_partitions(old_records, new_records, tmpdir, kind, partitions, merge):
+    """Băm 2 bên rồi yield (dict cũ, dict mới) của từng partition; merge(d, key, value) gộp bản ghi trùng khoá"""
+    _partition(old_records, tmpdir, f"{kind}.old", partitions)
+    _partition(new_records, tmpdir, f"{kind}.new", partitions)
+    for i in range(partitions):
+        sides = []
+        for side in ("old", "new"):
+            d = {}
+            for key, value in _read_partition(tmpdir, f"{kind}.{side}", i):
+                merge(d, key, value)
+            sides.append(d)
+        yield sides
+
+def _merge_node(d, key, value):
+    # id trùng → bản sau ghi đè title/type, properties chỉ khi có (như graph_snapshot)
+    old = d.get(key)
+    d[key] = value if old is None or value[2] else (value[0], value[1], old[2])
+
+def _merge_edge(d, key, value):
+    d.setdefault(key, value)  # trùng (from, to, type) → giữ dòng đầu
+
+def _merge_group(d, key, value):
+    weight, members = d.setdefault(key, (value[0], {}))
+    members[value[1]] = None
+
+# ---------- diff ----------
+def _props(raw):
+    if not raw:
+        return None
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return raw
+
+class _Ops:
+    """Thao tác changelog theo pha (mỗi pha 1 file tạm, nối theo PHASES khi close)"""
+
+    def __init__(self, path, tmpdir):
+        self.path, self.skipped = path, Counter()
+        self.files = {p: open(os.path.join(tmpdir, f"ops.{p}"), "w", encoding="utf-8") for p in PHASES} if path else {}
+
+    def write(self, op):
+        try:
+            op = validate_op(op)
+        except ValueError:
+            self.skipped[op["op"]] += 1
+            return
+        if self.files:
+            self.files[op["op"]].write(json.dumps(op, ensure_ascii=False) + "\n")
+
+    def close(self):
+        if not self.path:
+            return
+        with open(self.path, "w", encoding="utf-8") as out:
+            for phase in PHASES:
+                f = self.files[phase]
+                f.close()
+                with open(f.name, "r", encoding="utf-8") as src:
+                    shutil.copyfileobj(src, out)
+
+def diff_builds(old, new, ops_path=None, partitions=PARTITIONS, tmpdir=None):
+    """So 2 Build → summary dict; ops_path: ghi lô thao tác changelog (xem docstring)"""
+    counts = {kind: defaultdict(Counter) for kind in ("nodes", "edges", "groups")}
+    reattached = Counter()
+    work = tempfile.mkdtemp(prefix="graph_diff_", dir=tmpdir)
+    ops = _Ops(ops_path, work)
+    try:
+        # 1) Nút
+        removed_nodes = set()
+        for before, after in _paired_partitions(old.nodes(), new.nodes(), work, "nodes", partitions, _merge_node):
+            for nid, (title, node_type, props) in after.items():
+                prev = before.pop(nid, None)
+                if prev is None:
+                    change = "added"
+                elif prev[:2] == (title, node_type) and (prev[2] == props or _props(prev[2]) == _props(props)):
+                    continue
+                else:
+                    change = "changed"
+                counts["nodes"][node_type][change] += 1
+                op = {"op": "upsert_node", "id": nid, "type": node_type, "title": title}
+                parsed = _props(props)
+                if not isinstance(parsed, str):
+                    op["properties"] = parsed
+                ops.write(op)
+            for nid, (_, node_type, _) in before.items():
+                counts["nodes"][node_type]["removed"] += 1
+                removed_nodes.add(nid)
+                ops.write({"op": "delete_node", "id": nid})
+
+        # 2) Cạnh
+        for before, after in _paired_partitions(old.edges(), new.edges(), work, "edges", partitions, _merge_edge):
+            for (a, b, rel), (weight, years) in after.items():
+                prev = before.pop((a, b, rel), None)
+                if prev is None:
+                    change = "added"
+                elif prev != (weight, years):
+                    change = "reweighted"
+                elif a in removed_nodes or b in removed_nodes:
+                    change = None
+                    reattached["edges"] += 1
+                else:
+                    continue
+                if change:
+                    counts["edges"][rel][change] += 1
+                op = {"op": "upsert_edge", "from": a, "to": b, "type": rel, "weight": weight}
+                if years or (prev and prev[1]):
+                    op["year"] = years or None
+                ops.write(op)
+            for (a, b, rel) in before:
+                counts["edges"][rel]["removed"] += 1
+                if rel in GROUP_RELATIONS and (a in removed_nodes or b in removed_nodes):
+                    continue  # delete_node đã xoá kèm cặp clique này
+                ops.write({"op": "delete_edge", "from": a, "to": b, "type": rel})
+
+        # 3) Thành viên nhóm
+        for before, after in _paired_partitions(old.groups(), new.groups(), work, "groups", partitions, _merge_group):
+            for (rel, group), (weight, members) in after.items():
+                prev_weight, prev_members = before.pop((rel, group), (weight, {}))
+                if prev_weight != weight:
+                    counts["groups"][rel]["reweighted"] += 1
+                    ops.skipped["group_weight"] += 1
+                for m in members:
+                    if m in prev_members:
+                        if m not in removed_nodes:
+                            continue
+                        reattached["members"] += 1
+                    else:
+                        counts["groups"][rel]["members_added"] += 1
+                    ops.write({"op": "add_member", "relation": rel, "group": group, "member": m, "weight": weight})
+                for m in prev_members:
+                    if m not in members:
+                        counts["groups"][rel]["members_removed"] += 1
+                        ops.write({"op": "remove_member", "relation": rel, "group": group, "member": m})
+            for (rel, group), (_, prev_members) in before.items():
+                for m in prev_members:
+                    counts["groups"][rel]["members_removed"] += 1
+                    ops.write({"op": "remove_member", "relation": rel, "group": group, "member": m})
+        ops.close()
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+    summary = {"old": old.graph_dir, "new": new.graph_dir, "source": [old.source, new.source]}
+    for kind, by in counts.items():
+        total = Counter()
+        for c in by.values():
+            total.update(c)
+        summary[kind] = dict(total, by_type={k: dict(v) for k, v in sorted(by.items())})
+    summary["reattached"] = dict(reattached)
+    summary["skipped"] = dict(ops.skipped)
+    return summary
+
+def print_summary(summary):
+    print(f"=== {summary['old']} → {summary['new']} ({' / '.join(summary['source'])}) ===")
+    columns = {"nodes": ("added", "removed", "changed"), "edges": ("added", "removed", "reweighted"),
+               "groups": ("members_added", "members_removed", "reweighted")}
+    for kind, cols in columns.items():
+        part = summary[kind]
+        print(f"{kind:<26}" + "".join(f"{c:>17}" for c in cols))
+        for name, c in [("TỔNG", part)] + list(part["by_type"].items()):
+            print(f"  {name[:22]:<24}" + "".join(f"{c.get(col, 0):>17}" for col in cols))
+    if summary["reattached"]:
+        print(f"Upsert lại (chạm nút bị xoá khỏi file nút): {summary['reattached']}")
+    if summary["skipped"]:
+        print(f"⚠️  Không biểu diễn được bằng changelog (chỉ đếm): {summary['skipped']}")
+
+def main():
+    ap = argparse.ArgumentParser(description="Diff cấu trúc giữa 2 bản build graph_out (xem docstring)")
+    ap.add_argument("old_dir")
+    ap.add_argument("new_dir")
+    ap.add_argument("--ops", default=None, help="ghi lô thao tác graph_changelog (NDJSON) biến bản cũ thành bản mới")
+    ap.add_argument("--summary", default=None, help="ghi số lượng theo quan hệ ra file JSON")
+    ap.add_argument("--source", choices=["auto", "csv", "snapshot"], default="auto",
+                    help="auto: snapshot nếu còn khớp CSV, không thì CSV")
+    ap.add_argument("--partitions", type=int, default=PARTITIONS, help="số partition băm (RAM ~ 1/N đồ thị)")
+    ap.add_argument("--tmpdir", default=None, help="thư mục tạm cho partition (mặc định TMPDIR)")
+    args = ap.parse_args()
+
+    old, new = Build(args.old_dir, args.source), Build(args.new_dir, args.source)
+    summary = diff_builds(old, new, ops_path=args.ops, partitions=max(1, args.partitions), tmpdir=args.tmpdir)
+    print_summary(summary)
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+    if args.ops:
+        print(f"[OK] Lô thao tác → {args.ops}")
+
+if __name__ == "__main__":
+    main()
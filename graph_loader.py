@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+"""
+graph_loader.py — Nạp nodes_unified.csv / edges_unified.csv có kiểm tra, cách ly dòng hỏng
+
+Parse bằng csv (strict=True, quoting chuẩn RFC 4180) rồi kiểm tra theo cột bằng pandas:
+    nút  : đủ số trường, có id/title, type thuộc NODE_TYPES
+    cạnh : đủ số trường, from/to không rỗng, type (đã strip) thuộc RELATION_TYPES, weight là số,
+           year (cột tuỳ chọn, năm tốt nghiệp của alumni_of) trống hoặc dạng "1990" / "1990;1995"
+Dòng hỏng không bị nuốt im lặng mà ghi vào <file>.quarantine.csv (line, reason, raw) + in thống kê lý do.
+
+Lỗi hay gặp nhất là title có dấu phẩy không được quote ("Theodore Roosevelt, Jr.") làm lệch cột,
+sinh ra type rác kiểu " Jr.". Với cạnh, nếu biết tập id nút thì thử ghép lại các trường bị tách:
+chỉ sửa khi có ĐÚNG MỘT cách ghép cho ra from/to đều là nút đã biết và type hợp lệ.
+
+API:
+    load_nodes(nodes_csv, quarantine=True)                              → (DataFrame, report)
+    load_edges(edges_csv, node_ids=None, quarantine=True, strict_nodes=False) → (DataFrame, report)
+    print_report(report)
+    parse_years(text) / format_years(years)                              → cột year ⇄ tuple năm
+
+DataFrame trả về: nút (id, title, type, properties) kiểu str, '' = trống; cạnh (from, to, type, weight, year),
+weight là int64 nếu mọi giá trị nguyên, year giữ dạng chuỗi ('' nếu file không có cột này).
+Endpoint không có trong node_ids vẫn hợp lệ (nút ngầm như country_Hoa_Ky) và chỉ được đếm, trừ khi strict_nodes=True.
+
+Kiểm tra một file:
+  py graph_loader.py graph_out/nodes_unified.csv graph_out/edges_unified.csv
+"""
+import os, re, sys, csv, argparse
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+NODE_TYPES = ('person', 'university', 'country', 'career')
+RELATION_TYPES = ('alumni_of', 'same_uni', 'link_to', 'has_career', 'born_in', 'died_in',
+                  'from_country', 'same_birth_country', 'same_career', 'same_school')
+NODE_COLUMNS = ['id', 'title', 'type', 'properties']
+EDGE_COLUMNS = ['from', 'to', 'type', 'weight', 'year']
+YEAR_SEP = ';'
+_YEARS = re.compile(r'^\d{4}(?:;\d{4})*$')
+QUARANTINE_HEADER = ['line', 'reason', 'raw']
+
+csv.field_size_limit(min(sys.maxsize, 2 ** 31 - 1))
+
+def parse_years(text):
+    """'1995;1990' → (1990, 1995); '' → ()"""
+    if not text:
+        return ()
+    return tuple(sorted({int(y) for y in str(text).split(YEAR_SEP) if y.strip()}))
+
+def format_years(years):
+    """Tập năm → chuỗi cột year (tăng dần, không trùng); rỗng → ''"""
+    return YEAR_SEP.join(str(y) for y in sorted(set(years)))
+
+def quarantine_path(path):
+    root, _ = os.path.splitext(path)
+    return root + '.quarantine.csv'
+
+class _LineTap:
+    """Iterator dòng cho csv.reader, giữ lại văn bản thô của bản ghi đang đọc (bản ghi quote nhiều dòng)"""
+
+    def __init__(self, f):
+        self.f = f
+        self.buf = []
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = next(self.f)
+        self.buf.append(line)
+        return line
+
+    def take(self):
+        raw = ''.join(self.buf).rstrip('\r\n')
+        self.buf.clear()
+        return raw
+
+def _read_records(path):
+    """→ (header, records, errors). records[i] = list trường của bản ghi thứ i sau header ([] = dòng trống,
+    () = lỗi csv, thông điệp trong errors[i]). Đọc cả file bằng reader C (list.extend), không lặp Python."""
+    records, errors = [], {}
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.reader(f, strict=True)
+        try:
+            header = [h.strip() for h in next(reader)]
+        except StopIteration:
+            return [], records, errors
+        while True:
+            try:
+                records.extend(reader)
+                break
+            except csv.Error as e:
+                # extend giữ các bản ghi trước lỗi; reader đọc tiếp từ dòng sau
+                errors[len(records)] = str(e)
+                records.append(())
+    return header, records, errors
+
+def _locate(path, indices):
+    """Lượt đọc thứ hai (chỉ khi có dòng hỏng): {chỉ số bản ghi: (số dòng trong file, văn bản thô)}"""
+    want, out = set(indices), {}
+    if not want:
+        return out
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        tap = _LineTap(f)
+        reader = csv.reader(tap, strict=True)
+        next(reader, None)
+        tap.take()
+        i, line = -1, reader.line_num
+        while len(out) < len(want):
+            i, start = i + 1, line + 1
+            try:
+                next(reader)
+            except StopIteration:
+                break
+            except csv.Error:
+                pass
+            line = reader.line_num
+            raw = tap.take()
+            if i in want:
+                out[i] = (start, raw)
+    return out
+
+def _frame(records, keep, header, columns):
+    """Bản ghi được giữ → DataFrame theo columns (đã strip; cột thiếu trong header = ''), index = chỉ số bản ghi"""
+    rows = records if len(keep) == len(records) else [records[i] for i in keep]
+    cols = list(zip(*rows)) or [()] * len(header)
+    pos = {h: i for i, h in enumerate(header)}
+    data = {c: list(map(str.strip, cols[pos[c]])) if c in pos else [''] * len(keep) for c in columns}
+    return pd.DataFrame(data, index=pd.Index(keep, name='record'), dtype=object)
+
+def _apply_reasons(df, checks, detail=None):
+    """checks: [(reason, mask)] theo thứ tự ưu tiên → (df sạch, {record: reason} của dòng hỏng)
+    detail: cột ghi kèm giá trị vào lý do của check cùng tên (vd. unknown_relation: ' Jr.')"""
+    reason = np.select([np.asarray(m, dtype=bool) for _, m in checks], [r for r, _ in checks], default='')
+    bad = reason != ''
+    out = {}
+    for rec, r, i in zip(df.index[bad], reason[bad], np.flatnonzero(bad)):
+        col = (detail or {}).get(r)
+        out[rec] = f'{r}: {df[col].iat[i]!r}' if col else r
+    return df[~bad], out
+
+def _new_report(path, kind):
+    return {'file': path, 'kind': kind, 'rows': 0, 'clean': 0, 'repaired': 0,
+            'quarantined': Counter(), 'implicit_nodes': 0, 'quarantine_file': None}
+
+def _write_quarantine(path, report, bad):
+    """bad: [(line, reason, raw)]; không có dòng hỏng → xoá file quarantine cũ"""
+    qpath = quarantine_path(path)
+    try:
+        if not bad:
+            if os.path.exists(qpath):
+                os.remove(qpath)
+            return
+        with open(qpath, 'w', encoding='utf-8', newline='') as f:
+            w = csv.writer(f)
+            w.writerow(QUARANTINE_HEADER)
+            w.writerows(bad)
+        report['quarantine_file'] = qpath
+    except OSError as e:
+        print(f"    [WARN] Không ghi được {qpath}: {e}")
+
+def _finish(path, report, bad, quarantine):
+    """bad: {record: reason} → đếm lý do, ghi quarantine (line, reason, raw) theo thứ tự file"""
+    report['quarantined'] = Counter(reason.split(':')[0] for reason in bad.values())
+    if quarantine:
+        where = _locate(path, bad)
+        rows = [(*where.get(i, ('', '')), reason) for i, reason in sorted(bad.items())]
+        _write_quarantine(path, report, [(line, reason, raw) for line, raw, reason in rows])
+    return report
+
+def _split_records(records, errors, width):
+    """→ (chỉ số bản ghi đủ số trường, {record: reason} lỗi csv / sai số trường); bỏ qua dòng trống"""
+    widths = np.fromiter(map(len, records), dtype=np.int64, count=len(records))
+    bad = {i: f'csv_error: {e}' for i, e in errors.items()}
+    for i in np.flatnonzero((widths != width) & (widths != 0)).tolist():
+        bad[i] = f'field_count: {widths[i]} != {width}'
+    return np.flatnonzero(widths == width).tolist(), bad
+
+def load_nodes(nodes_csv, quarantine=True, node_types=NODE_TYPES):
+    header, records, errors = _read_records(nodes_csv)
+    report = _new_report(nodes_csv, 'nodes')
+    keep, bad = _split_records(records, errors, len(header))
+    report['rows'] = len(keep) + len(bad)
+
+    df = _frame(records, keep, header, NODE_COLUMNS)
+    del records
+    # id trống → dùng title (và ngược lại), như write_snapshot
+    df['id'] = df['id'].mask(df['id'] == '', df['title'])
+    df['title'] = df['title'].mask(df['title'] == '', df['id'])
+    checks = [('empty_id', df['id'] == '')]
+    if node_types:
+        checks.append(('unknown_node_type', ~df['type'].isin(node_types)))
+    df, reasons = _apply_reasons(df, checks, detail={'unknown_node_type': 'type'})
+    bad.update(reasons)
+
+    report['clean'] = len(df)
+    return df.reset_index(drop=True), _finish(nodes_csv, report, bad, quarantine)
+
+def _repair_spill(fields, node_ids, relations, width):
+    """from/to bị tách vì dấu phẩy không quote → ghép lại nếu chỉ có đúng một cách hợp lệ"""
+    extra = len(fields) - width
+    span, tail = fields[:2 + extra], fields[2 + extra:]
+    if tail[0].strip() not in relations:
+        return None
+    found = []
+    for k in range(1, len(span)):
+        src, dst = ','.join(span[:k]).strip(), ','.join(span[k:]).strip()
+        if src in node_ids and dst in node_ids:
+            found.append([src, dst] + tail)
+    return found[0] if len(found) == 1 else None
+
+def load_edges(edges_csv, node_ids=None, quarantine=True, strict_nodes=False, relations=RELATION_TYPES):
+    """
+    node_ids: tập id nút đã biết — dùng để sửa dòng lệch cột và (strict_nodes) loại cạnh tới nút lạ.
+    relations: tập type hợp lệ (None = chấp nhận mọi type không rỗng).
+    """
+    header, records, errors = _read_records(edges_csv)
+    report = _new_report(edges_csv, 'edges')
+    keep, bad = _split_records(records, errors, len(header))
+    report['rows'] = len(keep) + len(bad)
+    if node_ids is not None and header in (EDGE_COLUMNS, EDGE_COLUMNS[:4]) and relations:
+        for i, reason in list(bad.items()):
+            if reason.startswith('field_count') and len(records[i]) > len(header):
+                repaired = _repair_spill(records[i], node_ids, relations, len(header))
+                if repaired is not None:
+                    records[i] = repaired
+                    keep.append(i)
+                    del bad[i]
+                    report['repaired'] += 1
+        keep.sort()
+
+    df = _frame(records, keep, header, EDGE_COLUMNS)
+    del records
+    weight = pd.to_numeric(df['weight'].mask(df['weight'] == '', '1'), errors='coerce').astype(float)
+    checks = [('empty_endpoint', (df['from'] == '') | (df['to'] == ''))]
+    checks.append(('unknown_relation', ~df['type'].isin(relations) if relations else df['type'] == ''))
+    checks.append(('bad_weight', ~np.isfinite(weight.to_numpy())))
+    checks.append(('bad_year', (df['year'] != '') & ~df['year'].str.match(_YEARS).astype(bool)))
+    if node_ids is not None and strict_nodes:
+        checks.append(('unknown_node', ~(df['from'].isin(node_ids) & df['to'].isin(node_ids))))
+    df['_w'] = weight
+    detail = {'unknown_relation': 'type', 'bad_weight': 'weight', 'bad_year': 'year'}
+    df, reasons = _apply_reasons(df, checks, detail=detail)
+    bad.update(reasons)
+
+    w = df.pop('_w')
+    df['weight'] = w.astype(np.int64) if (w == np.floor(w)).all() else w
+    if node_ids is not None:
+        endpoints = pd.unique(np.concatenate([df['from'].to_numpy(), df['to'].to_numpy()]))
+        report['implicit_nodes'] = int((~pd.Index(endpoints).isin(node_ids)).sum())
+
+    report['clean'] = len(df)
+    return df.reset_index(drop=True), _finish(edges_csv, report, bad, quarantine)
+
+def print_report(report):
+    name = os.path.basename(report['file'])
+    n_bad = sum(report['quarantined'].values())
+    line = f"    {name}: {report['clean']}/{report['rows']} dòng hợp lệ"
+    if report['repaired']:
+        line += f", {report['repaired']} dòng lệch cột đã ghép lại"
+    if report['implicit_nodes']:
+        line += f", {report['implicit_nodes']} nút ngầm"
+    print(line)
+    if n_bad:
+        reasons = ', '.join(f'{r}={c}' for r, c in report['quarantined'].most_common())
+        print(f"    [WARN] {n_bad} dòng hỏng bị cách ly ({reasons}) → {report['quarantine_file'] or '(không ghi file)'}")
+
+def main():
+    ap = argparse.ArgumentParser(description='Kiểm tra nodes/edges CSV, ghi dòng hỏng ra *.quarantine.csv')
+    ap.add_argument('nodes_csv')
+    ap.add_argument('edges_csv')
+    ap.add_argument('--strict-nodes', action='store_true', help='cạnh tới nút không có trong file nút cũng bị cách ly')
+    ap.add_argument('--no-quarantine', action='store_true', help='chỉ in thống kê, không ghi file')
+    args = ap.parse_args()
+    nodes, nrep = load_nodes(args.nodes_csv, quarantine=not args.no_quarantine)
+    _, erep = load_edges(args.edges_csv, node_ids=set(nodes['id']), quarantine=not args.no_quarantine,
+                         strict_nodes=args.strict_nodes)
+    print_report(nrep)
+    print_report(erep)
+    if sum(nrep['quarantined'].values()) or sum(erep['quarantined'].values()):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
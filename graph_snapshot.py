@@ -0,0 +1,421 @@
+# -*- coding: utf-8 -*-
+"""
+graph_snapshot.py — Snapshot nhị phân (memory-mappable) của đồ thị hợp nhất
+
+create_unified_graph.py ghi kèm graph_out/snapshot/ bên cạnh nodes_unified.csv / edges_unified.csv:
+    meta.json            : {"format", "n_nodes", "n_explicit", "n_edges", "node_types", "relation_types",
+                            "has_properties", "has_years", "sources": {file: [size, mtime_ns]}, ["graph_version"]}
+    strings.bin          : bảng chuỗi UTF-8 nối liền (id node 0..n-1, sau đó các title khác id)
+    string_offsets.npy   : int64[n_strings + 1] — byte offset của từng chuỗi
+    node_title.npy       : int32[n_nodes]  — chỉ số chuỗi của title (-1 = không có title)
+    node_type.npy        : uint16[n_nodes] — chỉ số trong meta["node_types"]
+    props.bin / props_offsets.npy : cột properties (JSON thô, rỗng = không có) — chỉ khi CSV có cột này
+    csr_offsets.npy      : int64[n_nodes + 1] — cạnh ra của node i nằm trong [off[i], off[i+1])
+    csr_targets.npy      : int32[n_edges]
+    csr_relation.npy     : uint16[n_edges] — chỉ số trong meta["relation_types"]
+    csr_weight.npy       : float64[n_edges]
+    csr_edge_id.npy      : int32[n_edges]  — số thứ tự cạnh hợp lệ trong edges_unified.csv (giữ thứ tự gốc)
+    year_edge.npy / year_offsets.npy / year_value.npy : năm tốt nghiệp (cột year) dạng thưa — cạnh thứ
+                           year_edge[k] (thứ tự file) có các năm year_value[off[k]:off[k+1]]; chỉ khi có năm
+    group_strings.bin / group_string_offsets.npy : nhóm clique của groups_unified.csv (clique_groups.py) —
+                           chuỗi của nhóm g là [tên nhóm, thành viên...] = chuỗi group_offsets[g]..group_offsets[g+1]-1
+    group_offsets.npy    : int64[n_groups + 1];  group_relation.npy : uint16[n_groups] — chỉ số trong
+                           meta["group_relations"];  group_weight.npy : float64[n_groups] — chỉ khi có nhóm
+
+Node 0..n_explicit-1 theo thứ tự nodes_unified.csv; node n_explicit.. là id chỉ xuất hiện trong cạnh
+(theo thứ tự xuất hiện đầu tiên) — giống hệt thứ tự nút mà networkx tạo khi dựng từ CSV. Cặp clique lưu
+dạng nhóm không nằm trong CSR: to_adjacency / edges_dataframe trải nhóm thành cặp (expand_groups).
+
+API:
+    write_snapshot(outdir, nodes, edges, sources=(), version=None, groups=()) → meta (nodes/edges: iterable
+                                                       dict như CSV; groups như clique_groups.read_groups)
+    snapshot_from_csv(nodes_csv, edges_csv, outdir, version=None, groups_csv=None) → meta (CSV kiểm tra qua
+                                                       graph_loader; nhóm mặc định groups_path(edges_csv) nếu có)
+    load_snapshot(path)                                → GraphSnapshot (mảng mở bằng numpy mmap)
+    snapshot_is_fresh(path, *sources)                  → snapshot còn khớp kích thước/mtime của CSV nguồn?
+    GraphSnapshot.groups()                             → [(relation, group, weight, [members])]
+    to_adjacency(snap)                                 → dict-of-dicts vô hướng như shortest_path_demo (kể cả cặp trong nhóm)
+    nodes_dataframe(snap) / edges_dataframe(snap)      → DataFrame như pd.read_csv (cho notebook phân tích);
+                                                         edges_dataframe nối thêm các cặp trong nhóm sau cạnh của file
+
+Tạo snapshot từ CSV có sẵn:
+  py graph_snapshot.py graph_out/nodes_unified.csv graph_out/edges_unified.csv graph_out/snapshot
+"""
+import os, sys, json, itertools
+from array import array
+
+import numpy as np
+
+from graph_loader import load_edges, load_nodes, parse_years, print_report
+from clique_groups import expand_groups, groups_path, read_groups
+
+FORMAT = "graph-snapshot/2"  # /2: thêm nhóm clique (snapshot /1 không có nhóm → bị coi là cũ, dựng lại)
+SNAPSHOT_DIR = "snapshot"
+UNKNOWN_TYPE = "unknown"
+
+# ---------- write ----------
+def _write_strings(outdir, stem, strings):
+    offsets = np.zeros(len(strings) + 1, dtype=np.int64)
+    with open(os.path.join(outdir, stem + ".bin"), "wb") as f:
+        pos = 0
+        for i, s in enumerate(strings):
+            b = s.encode("utf-8")
+            f.write(b)
+            pos += len(b)
+            offsets[i + 1] = pos
+    return offsets
+
+def _parse_weight(w):
+    try:
+        return float(w)
+    except (TypeError, ValueError):
+        return 1.0
+
+def _file_stamp(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+def write_snapshot(outdir, nodes, edges, sources=(), version=None, groups=()):
+    """
+    nodes: iterable {"id","title","type"[,"properties"]}; edges: iterable {"from","to","type","weight"[,"year"]}
+    (cùng dạng hàng của nodes_unified.csv / edges_unified.csv). Trùng id → bản ghi sau ghi đè, như networkx.
+    groups: [(relation, group, weight, [members])] của groups_unified.csv (thành viên không thêm vào bảng nút).
+    version: phiên bản đồ thị (graph_changelog.py) mà snapshot phản ánh, ghi vào meta["graph_version"].
+    """
+    os.makedirs(outdir, exist_ok=True)
+    index, ids, titles, types, props = {}, [], [], [], []
+    has_props = False
+    type_ids, rel_ids = {}, {}
+
+    for row in nodes:
+        nid = (row.get("id") or "").strip() or (row.get("title") or "").strip()
+        if not nid:
+            continue
+        title = row.get("title") or nid
+        t = type_ids.setdefault(row.get("type") or UNKNOWN_TYPE, len(type_ids))
+        p = row.get("properties")
+        has_props = has_props or "properties" in row
+        if nid in index:
+            i = index[nid]
+            titles[i], types[i] = title, t
+            if p:
+                props[i] = p
+            continue
+        index[nid] = len(ids)
+        ids.append(nid)
+        titles.append(title)
+        types.append(t)
+        props.append(p or "")
+    n_explicit = len(ids)
+
+    src, dst, rel, weight = array("i"), array("i"), array("H"), array("d")
+    year_edge, year_count, year_value = array("i"), array("q"), array("h")
+    unknown = None
+    for row in edges:
+        a, b = row.get("from") or "", row.get("to") or ""
+        if not a or not b:
+            continue
+        for x in (a, b):
+            if x not in index:
+                if unknown is None:
+                    unknown = type_ids.setdefault(UNKNOWN_TYPE, len(type_ids))
+                index[x] = len(ids)
+                ids.append(x)
+                titles.append(x)
+                types.append(unknown)
+                props.append("")
+        src.append(index[a])
+        dst.append(index[b])
+        rel.append(rel_ids.setdefault(row.get("type") or "", len(rel_ids)))
+        weight.append(_parse_weight(row.get("weight")))
+        years = parse_years(row.get("year"))
+        if years:
+            year_edge.append(len(src) - 1)
+            year_count.append(len(years))
+            year_value.extend(years)
+    del index
+
+    n = len(ids)
+    # Bảng chuỗi: id trước, title khác id nối phía sau
+    strings = list(ids)
+    title_ref = np.empty(n, dtype=np.int32)
+    for i, (nid, title) in enumerate(zip(ids, titles)):
+        if title == nid:
+            title_ref[i] = i
+        else:
+            title_ref[i] = len(strings)
+            strings.append(title)
+    np.save(os.path.join(outdir, "string_offsets.npy"), _write_strings(outdir, "strings", strings))
+    np.save(os.path.join(outdir, "node_title.npy"), title_ref)
+    np.save(os.path.join(outdir, "node_type.npy"), np.asarray(types, dtype=np.uint16))
+    if has_props:
+        np.save(os.path.join(outdir, "props_offsets.npy"), _write_strings(outdir, "props", props))
+    del strings, titles, props
+
+    # CSR theo nút nguồn; sort ổn định để cạnh ra của mỗi nút giữ thứ tự dòng gốc
+    src_a = np.frombuffer(src, dtype=np.int32)
+    order = np.argsort(src_a, kind="stable").astype(np.int32)
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src_a, minlength=n), out=offsets[1:])
+    np.save(os.path.join(outdir, "csr_offsets.npy"), offsets)
+    np.save(os.path.join(outdir, "csr_targets.npy"), np.frombuffer(dst, dtype=np.int32)[order])
+    np.save(os.path.join(outdir, "csr_relation.npy"), np.frombuffer(rel, dtype=np.uint16)[order])
+    np.save(os.path.join(outdir, "csr_weight.npy"), np.frombuffer(weight, dtype=np.float64)[order])
+    np.save(os.path.join(outdir, "csr_edge_id.npy"), order)
+    if year_edge:
+        np.save(os.path.join(outdir, "year_edge.npy"), np.frombuffer(year_edge, dtype=np.int32))
+        year_offsets = np.zeros(len(year_edge) + 1, dtype=np.int64)
+        np.cumsum(np.frombuffer(year_count, dtype=np.int64), out=year_offsets[1:])
+        np.save(os.path.join(outdir, "year_offsets.npy"), year_offsets)
+        np.save(os.path.join(outdir, "year_value.npy"), np.frombuffer(year_value, dtype=np.int16))
+
+    group_rel_ids, group_strings, group_count, group_rel, group_weight = {}, [], [], [], []
+    for relation, group, w, members in groups:
+        group_rel.append(group_rel_ids.setdefault(relation, len(group_rel_ids)))
+        group_weight.append(_parse_weight(w))
+        group_strings.append(group or "")
+        group_strings.extend(members)
+        group_count.append(len(members) + 1)
+    if group_count:
+        np.save(os.path.join(outdir, "group_string_offsets.npy"), _write_strings(outdir, "group_strings", group_strings))
+        group_offsets = np.zeros(len(group_count) + 1, dtype=np.int64)
+        np.cumsum(np.asarray(group_count, dtype=np.int64), out=group_offsets[1:])
+        np.save(os.path.join(outdir, "group_offsets.npy"), group_offsets)
+        np.save(os.path.join(outdir, "group_relation.npy"), np.asarray(group_rel, dtype=np.uint16))
+        np.save(os.path.join(outdir, "group_weight.npy"), np.asarray(group_weight, dtype=np.float64))
+
+    meta = {
+        "format": FORMAT,
+        "n_nodes": n,
+        "n_explicit": n_explicit,
+        "n_edges": len(order),
+        "node_types": sorted(type_ids, key=type_ids.get),
+        "relation_types": sorted(rel_ids, key=rel_ids.get),
+        "has_properties": has_props,
+        "has_years": bool(year_edge),
+        "n_groups": len(group_count),
+        "group_relations": sorted(group_rel_ids, key=group_rel_ids.get),
+        "sources": {os.path.basename(p): _file_stamp(p) for p in sources if os.path.exists(p)},
+    }
+    if version is not None:
+        meta["graph_version"] = version
+    # meta.json ghi sau cùng: snapshot dở dang không có meta → không bao giờ được nạp
+    with open(os.path.join(outdir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    return meta
+
+def _records(df):
+    cols = list(df.columns)
+    return (dict(zip(cols, row)) for row in zip(*(df[c].tolist() for c in cols)))
+
+def snapshot_from_csv(nodes_csv, edges_csv, outdir, version=None, groups_csv=None):
+    """CSV đọc qua graph_loader — dòng hỏng bị cách ly giống hệt khi KnowledgeGraph nạp CSV.
+    groups_csv mặc định groups_path(edges_csv) (graph_out/groups_unified.csv); không có file → không có nhóm."""
+    nodes, node_report = load_nodes(nodes_csv)
+    edges, edge_report = load_edges(edges_csv, node_ids=set(nodes['id']))
+    for report in (node_report, edge_report):
+        if report['quarantined']:
+            print_report(report)
+    groups_csv = groups_csv or groups_path(edges_csv)
+    return write_snapshot(outdir, _records(nodes), _records(edges), sources=(nodes_csv, edges_csv, groups_csv),
+                          version=version, groups=read_groups(groups_csv))
+
+# ---------- read ----------
+class GraphSnapshot:
+    """Đồ thị CSR chỉ đọc; mảng .npy được mmap nên mở snapshot gần như không tốn thời gian."""
+
+    def __init__(self, path, mmap=True):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("format") != FORMAT:
+            raise ValueError(f"Không phải snapshot {FORMAT}: {path}")
+        mode = "r" if mmap else None
+        load = lambda name: np.load(os.path.join(path, name), mmap_mode=mode)
+        self.n_nodes = self.meta["n_nodes"]
+        self.n_explicit = self.meta["n_explicit"]
+        self.n_edges = self.meta["n_edges"]
+        self.node_types = self.meta["node_types"]
+        self.relation_types = self.meta["relation_types"]
+        self.string_offsets = load("string_offsets.npy")
+        self.node_title = load("node_title.npy")
+        self.node_type = load("node_type.npy")
+        self.offsets = load("csr_offsets.npy")
+        self.targets = load("csr_targets.npy")
+        self.relation = load("csr_relation.npy")
+        self.weight = load("csr_weight.npy")
+        self.edge_id = load("csr_edge_id.npy")
+        self._strings = self._blob("strings.bin")
+        self._props = None
+        if self.meta.get("has_properties"):
+            self.props_offsets = load("props_offsets.npy")
+            self._props = self._blob("props.bin")
+        self.has_years = bool(self.meta.get("has_years"))
+        if self.has_years:
+            self.year_edge = load("year_edge.npy")
+            self.year_offsets = load("year_offsets.npy")
+            self.year_value = load("year_value.npy")
+        self.n_groups = self.meta.get("n_groups", 0)
+        self.group_relations = self.meta.get("group_relations", [])
+        if self.n_groups:
+            self.group_string_offsets = load("group_string_offsets.npy")
+            self.group_offsets = load("group_offsets.npy")
+            self.group_relation = load("group_relation.npy")
+            self.group_weight = load("group_weight.npy")
+            self._group_strings = self._blob("group_strings.bin")
+        self._ids = self._index = None
+
+    def _blob(self, name):
+        p = os.path.join(self.path, name)
+        if os.path.getsize(p) == 0:
+            return np.zeros(0, dtype=np.uint8)
+        return np.memmap(p, dtype=np.uint8, mode="r")
+
+    @staticmethod
+    def _decode_all(blob, offsets):
+        data = blob.tobytes()
+        off = offsets.tolist()
+        return [data[a:b].decode("utf-8") for a, b in zip(off, off[1:])]
+
+    def string(self, k):
+        a, b = int(self.string_offsets[k]), int(self.string_offsets[k + 1])
+        return self._strings[a:b].tobytes().decode("utf-8")
+
+    # --- nodes ---
+    def ids(self):
+        """Danh sách id theo chỉ số node (giải mã một lần, dùng lại)."""
+        if self._ids is None:
+            self._ids = self._decode_all(self._strings, self.string_offsets[:self.n_nodes + 1])
+        return self._ids
+
+    def titles(self):
+        strings = self._decode_all(self._strings, self.string_offsets)
+        return [strings[k] if k >= 0 else None for k in self.node_title.tolist()]
+
+    def types(self):
+        return [self.node_types[t] for t in self.node_type.tolist()]
+
+    def properties_raw(self):
+        """Chuỗi JSON properties thô theo node (None nếu snapshot không có cột / node không có giá trị)."""
+        if self._props is None:
+            return [None] * self.n_nodes
+        return [p or None for p in self._decode_all(self._props, self.props_offsets)]
+
+    def index_of(self, node_id):
+        if self._index is None:
+            self._index = {nid: i for i, nid in enumerate(self.ids())}
+        return self._index.get(node_id)
+
+    def node_id(self, i):
+        return self.string(i)
+
+    # --- edges ---
+    def out_edges(self, i):
+        """(targets, relation ids, weights) của cạnh ra node i — view trên mmap, không sao chép."""
+        a, b = int(self.offsets[i]), int(self.offsets[i + 1])
+        return self.targets[a:b], self.relation[a:b], self.weight[a:b]
+
+    def degree_out(self):
+        return np.diff(self.offsets)
+
+    def edge_arrays(self, file_order=True):
+        """(src, dst, relation, weight) dạng numpy; file_order=True → đúng thứ tự dòng edges_unified.csv."""
+        src = np.repeat(np.arange(self.n_nodes, dtype=np.int32), np.diff(self.offsets))
+        dst, rel, w = self.targets, self.relation, self.weight
+        if file_order:
+            pos = np.empty(self.n_edges, dtype=np.int64)
+            pos[self.edge_id] = np.arange(self.n_edges)
+            return src[pos], dst[pos], rel[pos], w[pos]
+        return src, np.asarray(dst), np.asarray(rel), np.asarray(w)
+
+    def edge_years(self):
+        """{số thứ tự cạnh theo file: tuple năm} — chỉ các cạnh có cột year"""
+        if not self.has_years:
+            return {}
+        values, off = self.year_value.tolist(), self.year_offsets.tolist()
+        return {e: tuple(values[a:b]) for e, a, b in zip(self.year_edge.tolist(), off, off[1:])}
+
+    # --- groups ---
+    def groups(self):
+        """[(relation, group, weight, [members])] như clique_groups.read_groups (trọng số nguyên nếu là số nguyên)"""
+        if not self.n_groups:
+            return []
+        strings = self._decode_all(self._group_strings, self.group_string_offsets)
+        off = self.group_offsets.tolist()
+        return [(self.group_relations[r], strings[a], int(w) if w == int(w) else w, strings[a + 1:b])
+                for r, w, a, b in zip(self.group_relation.tolist(), self.group_weight.tolist(), off, off[1:])]
+
+    def iter_edges(self, file_order=True):
+        """Duyệt (from_id, to_id, relation, weight) bằng chuỗi."""
+        ids, rels = self.ids(), self.relation_types
+        src, dst, rel, w = self.edge_arrays(file_order)
+        for s, d, r, x in zip(src.tolist(), dst.tolist(), rel.tolist(), w.tolist()):
+            yield ids[s], ids[d], rels[r], x
+
+def load_snapshot(path, mmap=True):
+    return GraphSnapshot(path, mmap=mmap)
+
+def snapshot_is_fresh(path, *sources):
+    """True nếu có meta.json và mọi file nguồn còn đúng kích thước + mtime lúc ghi snapshot."""
+    meta_path = os.path.join(path, "meta.json")
+    if not os.path.exists(meta_path):
+        return False
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return False
+    if meta.get("format") != FORMAT:
+        return False
+    stamps = meta.get("sources", {})
+    for p in sources:
+        if not os.path.exists(p) or stamps.get(os.path.basename(p)) != _file_stamp(p):
+            return False
+    return True
+
+# ---------- in-memory structures ----------
+def to_adjacency(snap):
+    """dict-of-dicts vô hướng {a: {b: weight}} (trùng cạnh → giữ trọng số nhỏ nhất), như shortest_path_demo.
+    Gồm cả các cặp trong nhóm clique (thành viên không có trong bảng nút được thêm vào)."""
+    ids = snap.ids()
+    graph = {nid: {} for nid in ids}
+    src, dst, _, w = snap.edge_arrays(file_order=False)
+    pairs = zip((ids[s] for s in src.tolist()), (ids[d] for d in dst.tolist()), w.tolist())
+    group_pairs = ((a, b, x) for a, b, _, x in expand_groups(snap.groups()))
+    for a, b, x in itertools.chain(pairs, group_pairs):
+        if a == b:
+            continue
+        if x < graph.setdefault(a, {}).get(b, float("inf")):
+            graph[a][b] = x
+            graph.setdefault(b, {})[a] = x
+    return graph
+
+def nodes_dataframe(snap):
+    import pandas as pd
+    df = pd.DataFrame({"id": snap.ids(), "title": snap.titles(), "type": snap.types()})
+    if snap.meta.get("has_properties"):
+        df["properties"] = snap.properties_raw()
+    return df.iloc[:snap.n_explicit].reset_index(drop=True)
+
+def edges_dataframe(snap, groups=True):
+    """Cạnh theo thứ tự file; groups=True → nối thêm mỗi cặp trong nhóm clique 1 dòng (như --materialize-cliques)"""
+    import pandas as pd
+    ids = np.asarray(snap.ids(), dtype=object)
+    rels = np.asarray(snap.relation_types, dtype=object)
+    src, dst, rel, w = snap.edge_arrays(file_order=True)
+    df = pd.DataFrame({"from": ids[src], "to": ids[dst], "type": rels[rel], "weight": w})
+    if groups and snap.n_groups:
+        pairs = pd.DataFrame(list(expand_groups(snap.groups())), columns=["from", "to", "type", "weight"])
+        df = pd.concat([df, pairs.astype({"weight": np.float64})], ignore_index=True)
+    return df
+
+def main():
+    if len(sys.argv) < 3:
+        raise SystemExit("Dùng: py graph_snapshot.py <nodes.csv> <edges.csv> [<outdir>]")
+    nodes_csv, edges_csv = sys.argv[1], sys.argv[2]
+    outdir = sys.argv[3] if len(sys.argv) > 3 else os.path.join(os.path.dirname(nodes_csv), SNAPSHOT_DIR)
+    meta = snapshot_from_csv(nodes_csv, edges_csv, outdir)
+    print(f"✅ Snapshot {meta['n_nodes']} nút, {meta['n_edges']} cạnh → {outdir}")
+
+if __name__ == "__main__":
+    main()
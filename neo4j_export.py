@@ -0,0 +1,419 @@
+# -*- coding: utf-8 -*-
+"""
+neo4j_export.py — Xuất đồ thị hợp nhất sang định dạng `neo4j-admin database import` (bulk import offline)
+
+Đọc stream graph_out/nodes_unified.csv, edges_unified.csv, groups_unified.csv và ghi vào <out>/ (mặc định
+graph_out/neo4j/) 1 bộ file cho mỗi nhãn nút / loại quan hệ, header tách riêng để các part ghi song song:
+    nodes_<Label>.header.csv      id:ID,title,properties,:LABEL         (Person / University / Country / Career,
+    nodes_<Label>.part0000.csv    ...                                    nút chỉ có trong cạnh → Entity)
+    rels_<TYPE>.header.csv        :START_ID,:END_ID,:TYPE,weight:float[,year:int]
+    rels_<TYPE>.part0000.csv      ...
+    import.json                   manifest: file theo nhãn / loại, số dòng
+    import.sh                     lệnh neo4j-admin tương ứng (--id-type=string, --array-delimiter=";")
+Mỗi part tối đa --chunk-rows dòng; part đầy được giao cho --workers tiến trình ghi song song (RAM ~ workers ×
+chunk). ALUMNI_OF: 1 quan hệ cho mỗi năm tốt nghiệp (cột year "1990;1995" → 2 quan hệ year:int), không năm →
+year trống (= không có thuộc tính). Quan hệ clique (groups_unified.csv + cặp kiểu cũ trong file cạnh):
+    --cliques pairs  : bung thành cặp SAME_UNI / SAME_CAREER / SAME_BIRTH_COUNTRY (mặc định, như đồ thị gốc)
+    --cliques groups : nút Group (id group:<relation>:<group>) + quan hệ MEMBER_OF — tuyến tính theo thành viên
+
+validate kiểm tra thư mục xuất mà không cần Neo4j đang chạy: header có kiểu hợp lệ (đúng 1 :ID / có :START_ID
+:END_ID), số trường mỗi dòng, giá trị int / float / mảng parse được, nhãn / type là định danh, không có xuống
+dòng trong ô (không dùng --multiline-fields), id nút không trùng, mọi quan hệ trỏ tới nút có thật.
+
+CLI:
+  py neo4j_export.py export [--graph-dir graph_out] [--out graph_out/neo4j] [--cliques pairs|groups]
+                            [--chunk-rows 1000000] [--workers 4]
+  py neo4j_export.py validate graph_out/neo4j
+  (cd graph_out/neo4j && sh import.sh)        # neo4j-admin database import full ... neo4j
+"""
+import os, re, sys, csv, json, glob, shutil, argparse
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from graph_loader import NODE_TYPES, parse_years
+from clique_groups import GROUP_RELATIONS, expand_groups, groups_path, read_groups, CliqueIndex
+
+NODE_LABELS = {t: t.capitalize() for t in NODE_TYPES}
+UNKNOWN_LABEL = "Entity"
+GROUP_LABEL = "Group"
+MEMBER_TYPE = "MEMBER_OF"
+NODE_HEADER = ["id:ID", "title", "properties", ":LABEL"]
+REL_HEADER = [":START_ID", ":END_ID", ":TYPE", "weight:float"]
+ALUMNI_HEADER = REL_HEADER + ["year:int"]
+ARRAY_DELIMITER = ";"
+CHUNK_ROWS = 1_000_000
+MANIFEST = "import.json"
+
+_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+# Kiểu cột neo4j-admin (phần sau dấu ':' của header), thêm [] cho mảng
+SCALAR_TYPES = {"int", "long", "short", "byte", "float", "double", "boolean", "char", "string",
+                "point", "date", "localtime", "time", "localdatetime", "datetime", "duration"}
+_FIELD = re.compile(r"^(?P<name>[^:]*)(?::(?P<type>[A-Za-z_]+(?:\[\])?)(?:\((?P<space>[^)]*)\))?)?$")
+
+csv.field_size_limit(min(sys.maxsize, 2 ** 31 - 1))
+
+def rel_type(relation):
+    return relation.strip().upper()
+
+def _csv_rows(path):
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        yield from csv.DictReader(f)
+
+def _weight(w):
+    try:
+        return float(w)
+    except (TypeError, ValueError):
+        return 1.0
+
+def _one_line(s):
+    # neo4j-admin mặc định không cho xuống dòng trong ô
+    return s.replace("\r", " ").replace("\n", " ") if s and ("\n" in s or "\r" in s) else s
+
+# ---------- ghi theo chunk ----------
+def _write_part(path, rows):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        csv.writer(f, lineterminator="\n").writerows(rows)
+    return len(rows)
+
+class _Parts:
+    """Header + các part của 1 nhãn / loại quan hệ; part đầy → giao cho pool (hoặc ghi ngay nếu pool None)"""
+
+    def __init__(self, exporter, stem, header):
+        self.exporter, self.stem, self.header = exporter, stem, header
+        self.rows, self.files, self.count = [], [], 0
+        _write_part(os.path.join(exporter.out, f"{stem}.header.csv"), [header])
+
+    def add(self, row):
+        self.rows.append(row)
+        self.count += 1
+        if len(self.rows) >= self.exporter.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            name = f"{self.stem}.part{len(self.files):04d}.csv"
+            self.files.append(name)
+            self.exporter.submit(os.path.join(self.exporter.out, name), self.rows)
+            self.rows = []
+
+class Neo4jExporter:
+    def __init__(self, out, chunk_rows=CHUNK_ROWS, workers=1):
+        self.out, self.chunk_rows = out, max(1, chunk_rows)
+        self.pool = ProcessPoolExecutor(workers) if workers > 1 else None
+        self.max_pending = 2 * workers
+        self.pending = set()
+        self.nodes, self.rels = {}, {}
+        self.skipped = {}
+
+    def submit(self, path, rows):
+        if self.pool is None:
+            _write_part(path, rows)
+            return
+        if len(self.pending) >= self.max_pending:
+            done, self.pending = wait(self.pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                fut.result()
+        self.pending.add(self.pool.submit(_write_part, path, rows))
+
+    def node(self, label, node_id, title, props):
+        parts = self.nodes.get(label)
+        if parts is None:
+            parts = self.nodes[label] = _Parts(self, f"nodes_{label}", NODE_HEADER)
+        parts.add([node_id, _one_line(title), _one_line(props), label])
+
+    def rel(self, rtype, a, b, weight, year=None):
+        parts = self.rels.get(rtype)
+        if parts is None:
+            parts = self.rels[rtype] = _Parts(self, f"rels_{rtype}", ALUMNI_HEADER if rtype == "ALUMNI_OF" else REL_HEADER)
+        row = [a, b, rtype, weight]
+        if rtype == "ALUMNI_OF":
+            row.append("" if year is None else year)
+        parts.add(row)
+
+    def skip(self, reason):
+        self.skipped[reason] = self.skipped.get(reason, 0) + 1
+
+    def close(self):
+        for parts in list(self.nodes.values()) + list(self.rels.values()):
+            parts.flush()
+        if self.pool is not None:
+            for fut in wait(self.pending).done:
+                fut.result()
+            self.pool.shutdown()
+
+    def manifest(self):
+        def files(parts):
+            return {k: {"header": f"{p.stem}.header.csv", "parts": p.files, "rows": p.count}
+                    for k, p in sorted(parts.items())}
+        return {"format": "neo4j-admin-import", "id_type": "string", "array_delimiter": ARRAY_DELIMITER,
+                "nodes": files(self.nodes), "relationships": files(self.rels), "skipped": self.skipped}
+
+def import_command(manifest, database="neo4j"):
+    args = ["neo4j-admin database import full", "--overwrite-destination", "--id-type=string",
+            f"--array-delimiter='{manifest['array_delimiter']}'"]
+    for flag, section in (("--nodes", "nodes"), ("--relationships", "relationships")):
+        for spec in manifest[section].values():
+            args.append(f"{flag}=" + ",".join([spec["header"]] + spec["parts"]))
+    return " \\\n  ".join(args + [database])
+
+def export(graph_dir="graph_out", out=None, cliques="pairs", chunk_rows=CHUNK_ROWS, workers=1):
+    """Stream CSV hợp nhất → thư mục import; trả về manifest"""
+    out = out or os.path.join(graph_dir, "neo4j")
+    if os.path.isdir(out) and os.listdir(out):
+        # chỉ xoá thư mục xuất cũ (có manifest), không xoá nhầm thư mục khác
+        if not os.path.exists(os.path.join(out, MANIFEST)):
+            raise FileExistsError(f"{out} không rỗng và không phải thư mục neo4j_export")
+        shutil.rmtree(out)
+    os.makedirs(out, exist_ok=True)
+    nodes_csv = os.path.join(graph_dir, "nodes_unified.csv")
+    edges_csv = os.path.join(graph_dir, "edges_unified.csv")
+    ex = Neo4jExporter(out, chunk_rows, workers)
+
+    # 1) Nút trong file nút (id trùng → giữ dòng đầu; import không chấp nhận id trùng)
+    seen = set()
+    for row in _csv_rows(nodes_csv):
+        title = (row.get("title") or "").strip()
+        nid = (row.get("id") or "").strip() or title
+        if not nid:
+            continue
+        if nid in seen:
+            ex.skip("duplicate_node")
+            continue
+        seen.add(nid)
+        ex.node(NODE_LABELS.get((row.get("type") or "").strip(), UNKNOWN_LABEL), nid, title or nid,
+                row.get("properties") or "")
+
+    def endpoint(x):
+        # nút chỉ xuất hiện trong cạnh / nhóm (vd. country_Hoa_Ky) → nhãn Entity
+        if x not in seen:
+            seen.add(x)
+            ex.node(UNKNOWN_LABEL, x, x, "")
+
+    # 2) Cạnh; cặp clique kiểu cũ xử lý cùng nhóm ở bước 3
+    groups = read_groups(groups_path(edges_csv))
+    index = CliqueIndex(groups) if cliques == "groups" else None
+    clique_pairs = []
+    for row in _csv_rows(edges_csv):
+        a, b = (row.get("from") or "").strip(), (row.get("to") or "").strip()
+        relation = (row.get("type") or "").strip()
+        if not a or not b:
+            continue
+        if not _NAME.match(relation):
+            ex.skip("bad_type")
+            continue
+        if relation in GROUP_RELATIONS:
+            # chế độ groups: cặp đã nằm trong nhóm thì bỏ (như KnowledgeGraph khi nạp)
+            if index is None or not index.has_edge(a, b, relation):
+                clique_pairs.append((a, b, relation, _weight(row.get("weight"))))
+            continue
+        endpoint(a)
+        endpoint(b)
+        weight = _weight(row.get("weight"))
+        if relation == "alumni_of":
+            try:
+                years = parse_years(row.get("year")) or (None,)
+            except ValueError:
+                years = (None,)
+            for y in years:
+                ex.rel("ALUMNI_OF", a, b, weight, y)
+        else:
+            ex.rel(rel_type(relation), a, b, weight)
+
+    # 3) Quan hệ clique
+    if cliques == "groups":
+        for relation, group, weight, members in groups:
+            gid = f"group:{relation}:{group}"
+            ex.node(GROUP_LABEL, gid, relation, json.dumps({"relation": relation, "weight": weight}))
+            for m in members:
+                endpoint(m)
+                ex.rel(MEMBER_TYPE, m, gid, weight)
+        for a, b, relation, weight in clique_pairs:
+            endpoint(a)
+            endpoint(b)
+            ex.rel(rel_type(relation), a, b, weight)
+    else:
+        for a, b, relation, weight in expand_groups(groups + [(r, None, w, [a, b]) for a, b, r, w in clique_pairs]):
+            endpoint(a)
+            endpoint(b)
+            ex.rel(rel_type(relation), a, b, weight)
+
+    ex.close()
+    manifest = ex.manifest()
+    with open(os.path.join(out, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    with open(os.path.join(out, "import.sh"), "w", encoding="utf-8", newline="\n") as f:
+        f.write("#!/bin/sh\n# Chạy trong thư mục này; Neo4j phải dừng (import offline)\n")
+        f.write(import_command(manifest) + "\n")
+    return manifest
+
+# ---------- validate ----------
+def parse_header(fields):
+    """[(tên, kiểu, id_space)] hoặc ValueError — kiểu: ID/START_ID/END_ID/TYPE/LABEL/IGNORE hoặc kiểu dữ liệu"""
+    out = []
+    for field in fields:
+        m = _FIELD.match(field)
+        if not m:
+            raise ValueError(f"cột không hợp lệ: {field!r}")
+        name, ftype = m.group("name"), m.group("type") or "string"
+        base = ftype[:-2] if ftype.endswith("[]") else ftype
+        if ftype not in ("ID", "START_ID", "END_ID", "TYPE", "LABEL", "IGNORE") and base.lower() not in SCALAR_TYPES:
+            raise ValueError(f"kiểu không hỗ trợ: {field!r}")
+        if m.group("space") is not None and ftype not in ("ID", "START_ID", "END_ID"):
+            raise ValueError(f"id space chỉ dùng cho :ID / :START_ID / :END_ID: {field!r}")
+        out.append((name, ftype, m.group("space") or ""))
+    names = [n for n, t, _ in out if n and t not in ("START_ID", "END_ID", "TYPE", "LABEL", "IGNORE")]
+    if len(names) != len(set(names)):
+        raise ValueError(f"trùng tên thuộc tính: {fields}")
+    return out
+
+_CHECKS = {
+    "int": int, "long": int, "short": int, "byte": int,
+    "float": float, "double": float,
+    "boolean": lambda v: {"true": True, "false": False}[v.lower()],
+}
+
+def _check_value(ftype, value):
+    if ftype.endswith("[]"):
+        check = _CHECKS.get(ftype[:-2].lower())
+        if check:
+            for v in value.split(ARRAY_DELIMITER):
+                check(v.strip())
+    else:
+        check = _CHECKS.get(ftype.lower())
+        if check:
+            check(value.strip())
+
+def _file_sets(outdir):
+    """{'nodes'|'relationships': [(tên, [header, part...])]} theo manifest, không có thì theo tên file"""
+    path = os.path.join(outdir, MANIFEST)
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        return {s: [(k, [v["header"]] + v["parts"]) for k, v in manifest[s].items()] for s in ("nodes", "relationships")}
+    sets = {"nodes": [], "relationships": []}
+    for header in sorted(glob.glob(os.path.join(outdir, "*.header.csv"))):
+        stem = os.path.basename(header)[:-len(".header.csv")]
+        parts = sorted(os.path.basename(p) for p in glob.glob(os.path.join(outdir, f"{stem}.part*.csv")))
+        sets["relationships" if stem.startswith("rels_") else "nodes"].append((stem, [os.path.basename(header)] + parts))
+    return sets
+
+def validate(outdir, max_errors=50):
+    """Kiểm tra thư mục xuất theo quy tắc neo4j-admin import → report {'errors': [...], 'nodes': n, 'relationships': n}"""
+    errors = []
+    def error(msg):
+        if len(errors) < max_errors:
+            errors.append(msg)
+        report["n_errors"] += 1
+
+    report = {"nodes": 0, "relationships": 0, "n_errors": 0, "errors": errors}
+    ids = {}            # id space → set(id)
+    rel_files = []
+    for section, file_sets in _file_sets(outdir).items():
+        for name, files in file_sets:
+            header_path = os.path.join(outdir, files[0])
+            try:
+                with open(header_path, "r", encoding="utf-8", newline="") as f:
+                    header = parse_header(next(csv.reader(f)))
+            except (OSError, StopIteration, ValueError) as e:
+                error(f"{files[0]}: header: {e}")
+                continue
+            kinds = [t for _, t, _ in header]
+            if section == "nodes" and kinds.count("ID") != 1:
+                error(f"{files[0]}: header nút cần đúng 1 cột :ID")
+                continue
+            if section == "relationships" and (kinds.count("START_ID") != 1 or kinds.count("END_ID") != 1):
+                error(f"{files[0]}: header quan hệ cần :START_ID và :END_ID")
+                continue
+            if section == "relationships":
+                rel_files.append((header, files))
+                continue
+            for part in files[1:]:
+                for line, row in _iter_part(outdir, part, header, error):
+                    report["nodes"] += 1
+                    for (fname, ftype, space), value in zip(header, row):
+                        if ftype == "ID":
+                            seen = ids.setdefault(space, set())
+                            if not value:
+                                error(f"{part}:{line}: id trống")
+                            elif value in seen:
+                                error(f"{part}:{line}: id trùng {value!r}")
+                            seen.add(value)
+                        elif ftype == "LABEL" and value and not all(_NAME.match(v) for v in value.split(ARRAY_DELIMITER)):
+                            error(f"{part}:{line}: nhãn không hợp lệ {value!r}")
+    # Quan hệ sau cùng: cần đủ id nút
+    for header, files in rel_files:
+        has_type = any(t == "TYPE" for _, t, _ in header)
+        for part in files[1:]:
+            for line, row in _iter_part(outdir, part, header, error):
+                report["relationships"] += 1
+                for (fname, ftype, space), value in zip(header, row):
+                    if ftype in ("START_ID", "END_ID") and value not in ids.get(space, ()):
+                        error(f"{part}:{line}: {ftype} {value!r} không có trong nút")
+                    elif ftype == "TYPE" and not _NAME.match(value):
+                        error(f"{part}:{line}: type không hợp lệ {value!r}")
+        if not has_type:
+            error(f"{files[0]}: không có cột :TYPE (phải truyền type trong lệnh import)")
+    return report
+
+def _iter_part(outdir, part, header, error):
+    path = os.path.join(outdir, part)
+    if not os.path.exists(path):
+        error(f"{part}: thiếu file")
+        return
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for line, row in enumerate(csv.reader(f), 1):
+            if len(row) != len(header):
+                error(f"{part}:{line}: {len(row)} trường, header có {len(header)}")
+                continue
+            bad = False
+            for (fname, ftype, _), value in zip(header, row):
+                if "\n" in value or "\r" in value:
+                    error(f"{part}:{line}: xuống dòng trong ô {fname or ftype}")
+                    bad = True
+                elif value:
+                    try:
+                        _check_value(ftype, value)
+                    except (ValueError, KeyError):
+                        error(f"{part}:{line}: {fname}:{ftype} không parse được {value!r}")
+                        bad = True
+            if not bad:
+                yield line, row
+
+def main():
+    ap = argparse.ArgumentParser(description="Xuất / kiểm tra file neo4j-admin import (xem docstring)")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("export", help="CSV hợp nhất → file bulk import")
+    p.add_argument("--graph-dir", default="graph_out")
+    p.add_argument("--out", default=None, help="mặc định <graph-dir>/neo4j")
+    p.add_argument("--cliques", choices=["pairs", "groups"], default="pairs",
+                   help="pairs: bung nhóm clique thành cặp; groups: nút Group + MEMBER_OF")
+    p.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="số dòng tối đa mỗi part")
+    p.add_argument("--workers", type=int, default=1, help="số tiến trình ghi part song song")
+    p.add_argument("--no-validate", action="store_true", help="bỏ bước kiểm tra sau khi xuất")
+    p = sub.add_parser("validate", help="kiểm tra thư mục xuất (không cần Neo4j)")
+    p.add_argument("outdir")
+    args = ap.parse_args()
+
+    if args.cmd == "export":
+        out = args.out or os.path.join(args.graph_dir, "neo4j")
+        manifest = export(args.graph_dir, out, args.cliques, args.chunk_rows, args.workers)
+        for section in ("nodes", "relationships"):
+            print(f"{section}:")
+            for name, spec in manifest[section].items():
+                print(f"  {name:<22}{spec['rows']:>10} dòng  {len(spec['parts'])} part")
+        if manifest["skipped"]:
+            print(f"⚠️  Bỏ qua: {manifest['skipped']}")
+        print(f"[OK] → {out} (lệnh import: {os.path.join(out, 'import.sh')})")
+        if args.no_validate:
+            return
+        args.outdir = out
+    report = validate(args.outdir)
+    print(f"Kiểm tra {args.outdir}: {report['nodes']} nút, {report['relationships']} quan hệ, {report['n_errors']} lỗi")
+    for e in report["errors"]:
+        print("  ✗", e)
+    if report["n_errors"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
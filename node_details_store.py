@@ -0,0 +1,362 @@
+# -*- coding: utf-8 -*-
+"""
+node_details_store.py — Đọc/ghi node_details dạng NDJSON + chỉ mục offset, và kho SQLite có chỉ mục
+    node_details.ndjson    : mỗi dòng 1 bản ghi JSON gọn {"title","type","link","related","properties"}
+    node_details.idx.json  : {title: [byte_offset, byte_length]} (trùng title → giữ bản ghi cuối, như dict cũ)
+    node_details.sqlite    : bảng details(title khoá chính, norm_title có index, type, props_text, record)
+                             — mở không phải nạp chỉ mục nào vào RAM; bản ghi đọc khi cần + LRU giới hạn
+
+API:
+    write_node_details(ndjson_path, records)  → số bản ghi (ghi kèm file chỉ mục)
+    write_node_details_sqlite(path, records)  → số bản ghi (ghi node_details.sqlite)
+    iter_node_details(path)                   → duyệt stream từng bản ghi (không nạp cả file)
+    ndjson_source(path)                       → đường dẫn .ndjson ứng với path nếu có (đọc từng dòng thô), không thì None
+    open_node_details(path, build=False)      → SqliteNodeDetailsStore nếu có .sqlite còn khớp nguồn
+                                                (build=True: tự dựng khi thiếu/cũ), không thì NodeDetailsStore
+                                                (tra 1 title = 1 lần seek), không thì dict từ JSON cũ
+    normalize_key(text)                       → khoá chuẩn hoá (bỏ dấu, chữ thường) dùng cho norm_title
+
+`path` có thể là .ndjson hoặc đường dẫn node_details.json cũ: nếu có .ndjson cùng tên thì dùng nó,
+không thì đọc JSON cũ (tương thích ngược).
+
+Chuyển file cũ sang định dạng mới:
+  py node_details_store.py graph_out/node_details.json            (→ .ndjson + .idx.json)
+  py node_details_store.py graph_out/node_details.json --sqlite   (→ .sqlite)
+"""
+import os, re, json, sqlite3, argparse, threading, unicodedata
+from collections import OrderedDict
+
+NDJSON_EXT = ".ndjson"
+INDEX_EXT = ".idx.json"
+SQLITE_EXT = ".sqlite"
+SQLITE_FORMAT = "node-details-sqlite/1"
+DEFAULT_CACHE_SIZE = 512
+
+def _paths(path):
+    base = path[:-len(NDJSON_EXT)] if path.endswith(NDJSON_EXT) else os.path.splitext(path)[0]
+    return base + NDJSON_EXT, base + INDEX_EXT, base + ".json"
+
+def _sqlite_path(path):
+    return _paths(path)[0][:-len(NDJSON_EXT)] + SQLITE_EXT
+
+def _source_path(path):
+    """File nguồn của kho SQLite: .ndjson nếu có, không thì JSON cũ"""
+    nd_path, _, json_path = _paths(path)
+    for p in (nd_path, json_path, path):
+        if os.path.exists(p) and not p.endswith(SQLITE_EXT):
+            return p
+    return None
+
+def _file_sig(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+_VI_REPLACEMENTS = str.maketrans({'đ': 'd', 'Đ': 'D', 'ă': 'a', 'Ă': 'A', 'â': 'a', 'Â': 'A', 'ê': 'e', 'Ê': 'E',
+                                  'ô': 'o', 'Ô': 'O', 'ơ': 'o', 'Ơ': 'O', 'ư': 'u', 'Ư': 'U'})
+_NON_KEY = re.compile(r"[^a-z0-9 ]+")
+
+def normalize_key(text):
+    """Bỏ dấu tiếng Việt (cả Đ/đ), chữ thường, chỉ giữ [a-z0-9] + 1 khoảng trắng"""
+    s = unicodedata.normalize('NFD', str(text or '').translate(_VI_REPLACEMENTS))
+    s = ''.join(ch for ch in s if unicodedata.category(ch) != 'Mn')
+    s = s.lower().replace('_', ' ').replace('-', ' ')
+    return " ".join(_NON_KEY.sub(" ", s).split())
+
+def _props_text(props):
+    """Mọi giá trị properties ghép lại (list → nối bằng khoảng trắng), đã chuẩn hoá — để lọc bằng SQL"""
+    if not isinstance(props, dict):
+        return ""
+    values = []
+    for v in props.values():
+        if isinstance(v, list):
+            values.append(' '.join(str(x) for x in v if x))
+        else:
+            values.append(str(v))
+    return normalize_key(' '.join(values))
+
+def write_node_details(ndjson_path, records):
+    nd_path, idx_path, _ = _paths(ndjson_path)
+    index, n = {}, 0
+    with open(nd_path, "wb") as f:
+        for rec in records:
+            line = (json.dumps(rec, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+            index[rec.get("title", "")] = [f.tell(), len(line)]
+            f.write(line)
+            n += 1
+    with open(idx_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, separators=(",", ":"))
+    return n
+
+def write_node_details_sqlite(sqlite_path, records, source=None):
+    """
+    Ghi kho SQLite (ghi file tạm rồi đổi tên). Trùng title → bản ghi sau thắng nhưng giữ vị trí bản đầu
+    (như dict cũ). source: file nguồn để open_node_details kiểm tra còn khớp.
+    """
+    tmp = sqlite_path + ".tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    con = sqlite3.connect(tmp)
+    try:
+        con.executescript("""
+            PRAGMA journal_mode=OFF;
+            PRAGMA synchronous=OFF;
+            CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE details (id INTEGER PRIMARY KEY, title TEXT NOT NULL UNIQUE, norm_title TEXT,
+                                  type TEXT, props_text TEXT, record BLOB);
+        """)
+        rows = ((rec.get("title", ""), normalize_key(rec.get("title", "")), rec.get("type"),
+                 _props_text(rec.get("properties")),
+                 json.dumps(rec, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+                for rec in records)
+        con.executemany("""
+            INSERT INTO details (title, norm_title, type, props_text, record) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(title) DO UPDATE SET norm_title=excluded.norm_title, type=excluded.type,
+                props_text=excluded.props_text, record=excluded.record
+        """, rows)
+        con.execute("CREATE INDEX details_norm ON details(norm_title)")
+        n = con.execute("SELECT COUNT(*) FROM details").fetchone()[0]
+        meta = {"format": SQLITE_FORMAT, "count": n,
+                "source": [os.path.basename(source)] + _file_sig(source) if source else None}
+        con.executemany("INSERT INTO meta VALUES (?, ?)", ((k, json.dumps(v)) for k, v in meta.items()))
+        con.commit()
+    finally:
+        con.close()
+    os.replace(tmp, sqlite_path)
+    return n
+
+def _sqlite_meta(sqlite_path):
+    try:
+        con = sqlite3.connect(f"file:{sqlite_path}?mode=ro", uri=True)
+        try:
+            return {k: json.loads(v) for k, v in con.execute("SELECT key, value FROM meta")}
+        finally:
+            con.close()
+    except sqlite3.Error:
+        return None
+
+def sqlite_is_fresh(path):
+    """node_details.sqlite tồn tại, đúng định dạng và (nếu còn file nguồn) khớp kích thước/mtime nguồn"""
+    sqlite_path = _sqlite_path(path)
+    if not os.path.exists(sqlite_path):
+        return False
+    meta = _sqlite_meta(sqlite_path)
+    if not meta or meta.get("format") != SQLITE_FORMAT:
+        return False
+    source = _source_path(path)
+    if source is None:
+        return True
+    sig = meta.get("source")
+    return bool(sig) and sig[0] == os.path.basename(source) and sig[1:] == _file_sig(source)
+
+def build_sqlite(path):
+    """Dựng node_details.sqlite từ nguồn (.ndjson hoặc JSON cũ) → số bản ghi"""
+    source = _source_path(path)
+    return write_node_details_sqlite(_sqlite_path(path), iter_node_details(source), source=source)
+
+def ndjson_source(path):
+    nd_path = _paths(path)[0]
+    return nd_path if os.path.exists(nd_path) else None
+
+def iter_node_details(path):
+    nd_path, _, json_path = _paths(path)
+    if os.path.exists(nd_path):
+        with open(nd_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        with open(json_path if os.path.exists(json_path) else path, "r", encoding="utf-8") as f:
+            yield from json.load(f)
+
+class NodeDetailsStore:
+    """Mapping chỉ đọc title → bản ghi; chỉ giữ chỉ mục trong RAM, bản ghi đọc bằng seek khi cần.
+    An toàn khi dùng chung giữa các thread (Flask): seek + read trên file chung nằm trong khoá."""
+
+    def __init__(self, path):
+        self.path, idx_path, _ = _paths(path)
+        with open(idx_path, "r", encoding="utf-8") as f:
+            self.index = json.load(f)
+        self._f = open(self.path, "rb")
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, title):
+        return title in self.index
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def __getitem__(self, title):
+        off, length = self.index[title]
+        with self._lock:
+            self._f.seek(off)
+            raw = self._f.read(length)
+        return json.loads(raw.decode("utf-8"))
+
+    def get(self, title, default=None):
+        return self[title] if title in self.index else default
+
+    def keys(self):
+        return self.index.keys()
+
+    def values(self):
+        for _, v in self.items():
+            yield v
+
+    def items(self):
+        # stream theo thứ tự file; bỏ qua bản ghi bị bản sau cùng title ghi đè
+        with open(self.path, "rb") as f:
+            off = 0
+            for line in f:
+                if line.strip():
+                    rec = json.loads(line.decode("utf-8"))
+                    t = rec.get("title", "")
+                    if self.index.get(t, [None])[0] == off:
+                        yield t, rec
+                off += len(line)
+
+    def close(self):
+        self._f.close()
+
+_MISSING = object()
+
+class SqliteNodeDetailsStore:
+    """
+    Mapping chỉ đọc title → bản ghi trên node_details.sqlite. Không giữ chỉ mục trong RAM: mỗi tra cứu là
+    1 truy vấn theo khoá chính; cache_size bản ghi gần nhất (kể cả "không có") giữ trong LRU.
+    An toàn khi dùng chung giữa các thread (Flask): 1 kết nối + khoá.
+    """
+
+    def __init__(self, path, cache_size=DEFAULT_CACHE_SIZE):
+        self.path = path
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._con = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self._len = json.loads(self._query_one("SELECT value FROM meta WHERE key = 'count'")[0])
+
+    def _query_one(self, sql, args=()):
+        with self._lock:
+            return self._con.execute(sql, args).fetchone()
+
+    def _iter_query(self, sql, args=()):
+        # Kết nối riêng cho duyệt dài để không giữ khoá của kết nối chung
+        con = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        try:
+            yield from con.execute(sql, args)
+        finally:
+            con.close()
+
+    def _lookup(self, title):
+        cache = self._cache
+        with self._lock:
+            if title in cache:
+                cache.move_to_end(title)
+                return cache[title]
+            row = self._con.execute("SELECT record FROM details WHERE title = ?", (title,)).fetchone()
+            rec = json.loads(row[0]) if row else _MISSING
+            cache[title] = rec
+            if len(cache) > self.cache_size:
+                cache.popitem(last=False)
+            return rec
+
+    def __len__(self):
+        return self._len
+
+    def __contains__(self, title):
+        return isinstance(title, str) and self._lookup(title) is not _MISSING
+
+    def __iter__(self):
+        return self.keys()
+
+    def __getitem__(self, title):
+        rec = self._lookup(title) if isinstance(title, str) else _MISSING
+        if rec is _MISSING:
+            raise KeyError(title)
+        return rec
+
+    def get(self, title, default=None):
+        rec = self._lookup(title) if isinstance(title, str) else _MISSING
+        return default if rec is _MISSING else rec
+
+    def get_normalized(self, text, default=None):
+        """Bản ghi theo title đã chuẩn hoá (bỏ dấu/hoa thường) — bản đầu tiên nếu trùng"""
+        row = self._query_one("SELECT title FROM details WHERE norm_title = ? ORDER BY id LIMIT 1",
+                              (normalize_key(text),))
+        return self.get(row[0], default) if row else default
+
+    def keys(self):
+        for (title,) in self._iter_query("SELECT title FROM details ORDER BY id"):
+            yield title
+
+    def values(self):
+        for _, v in self.items():
+            yield v
+
+    def items(self, node_type=None):
+        # stream theo thứ tự nguồn, không đưa vào LRU
+        sql, args = "SELECT title, record FROM details", ()
+        if node_type is not None:
+            sql, args = sql + " WHERE type = ?", (node_type,)
+        for title, record in self._iter_query(sql + " ORDER BY id", args):
+            yield title, json.loads(record)
+
+    def search(self, node_type=None, contains_all=(), contains_any=(), limit=None):
+        """
+        Title có văn bản properties (đã normalize_key) chứa MỌI chuỗi contains_all và ÍT NHẤT 1 chuỗi
+        contains_any (các chuỗi cũng phải đã chuẩn hoá) — lọc trong SQLite, không giải mã bản ghi.
+        """
+        where, args = [], []
+        if node_type is not None:
+            where.append("type = ?")
+            args.append(node_type)
+        for sub in contains_all:
+            where.append("instr(props_text, ?) > 0")
+            args.append(sub)
+        if contains_any:
+            where.append("(" + " OR ".join("instr(props_text, ?) > 0" for _ in contains_any) + ")")
+            args.extend(contains_any)
+        sql = "SELECT title FROM details" + (" WHERE " + " AND ".join(where) if where else "") + " ORDER BY id"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        return [title for (title,) in self._iter_query(sql, args)]
+
+    def close(self):
+        self._con.close()
+
+def open_node_details(path, build=False, cache_size=DEFAULT_CACHE_SIZE):
+    """
+    SqliteNodeDetailsStore nếu node_details.sqlite còn khớp nguồn (build=True: dựng khi thiếu/cũ);
+    không thì NodeDetailsStore nếu đã có .ndjson + chỉ mục; không thì dict {title: record} từ JSON cũ.
+    """
+    if build and not sqlite_is_fresh(path) and _source_path(path):
+        try:
+            build_sqlite(path)
+        except (OSError, sqlite3.Error) as e:   # vd thư mục chỉ đọc → dùng định dạng sẵn có
+            print(f"[WARN] Không dựng được {_sqlite_path(path)}: {e}")
+    if sqlite_is_fresh(path):
+        return SqliteNodeDetailsStore(_sqlite_path(path), cache_size=cache_size)
+    nd_path, idx_path, _ = _paths(path)
+    if os.path.exists(nd_path) and os.path.exists(idx_path):
+        return NodeDetailsStore(nd_path)
+    return {rec.get("title", ""): rec for rec in iter_node_details(path)}
+
+def main():
+    ap = argparse.ArgumentParser(description="Chuyển node_details.json sang NDJSON + chỉ mục, hoặc kho SQLite.")
+    ap.add_argument("src", help="node_details.json (hoặc .ndjson với --sqlite)")
+    ap.add_argument("out", nargs="?", help="File .ndjson đích (mặc định cạnh src)")
+    ap.add_argument("--sqlite", action="store_true", help="Dựng node_details.sqlite cạnh src")
+    args = ap.parse_args()
+    if args.sqlite:
+        n = build_sqlite(args.src)
+        print(f"✅ {n} bản ghi → {_sqlite_path(args.src)}")
+        return
+    out = args.out or _paths(args.src)[0]
+    with open(args.src, "r", encoding="utf-8") as f:
+        n = write_node_details(out, json.load(f))
+    print(f"✅ {n} bản ghi → {out} (+ {_paths(out)[1]})")
+
+if __name__ == "__main__":
+    main()
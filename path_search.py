@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+"""
+path_search.py — Tìm k đường đi đơn ngắn nhất có giới hạn chi phí (thay cho liệt kê mọi đường đi đơn)
+
+Liệt kê mọi đường đi đơn ≤ max_hops (nx.all_simple_paths / DFS) bùng nổ tổ hợp khi đi qua nút hub: 2 người
+cùng 1 nhóm same_birth_country ~1000 thành viên có ~10⁶ đường 3 bước. Module này chỉ làm phần cần thiết:
+    1. BFS 2 chiều (mở rộng phía frontier nhỏ hơn) → khoảng cách ngắn nhất d + số đường ngắn nhất
+       (đếm σ theo lớp BFS, không liệt kê)
+    2. Liệt kê lười các đường dài d: DFS trên DAG đường ngắn nhất theo thứ tự láng giềng — cùng thứ tự với
+       lọc đường ngắn nhất từ DFS đầy đủ; cần thêm đường (k > số đường ngắn nhất) → spur kiểu Yen
+       (BFS từ từng nút của đường đã có, cấm gốc chung + cạnh rẽ đã dùng) cho các đường dài hơn
+    3. Đếm mọi đường đi đơn ≤ max_hops: đếm chính xác bằng DFS (không giữ đường) nếu đủ budget, không thì
+       ước lượng Knuth (trung bình các lần dò ngẫu nhiên, tích hệ số rẽ nhánh — không chệch)
+Mọi bước tính chi phí theo số lượt xét láng giềng (Budget; danh sách láng giềng được memo nên đọc lại không
+tốn thêm phí tạo danh sách nhưng vẫn tính lượt duyệt); hết budget → dừng, đánh dấu truncated / ước lượng.
+
+neighbors(node) → iterable láng giềng (cạnh ra); reverse_neighbors(node) → láng giềng theo cạnh vào (mặc
+định = neighbors, đồ thị vô hướng). Khuyên (node → chính nó) bị bỏ qua.
+
+API:
+    k_shortest_paths(neighbors, src, dst, k=5, max_hops=3, budget=DEFAULT_BUDGET, reverse_neighbors=None)
+        → {'distance', 'paths', 'num_shortest', 'truncated'}
+    count_paths(neighbors, src, dst, max_hops=3, budget=DEFAULT_BUDGET, reverse_neighbors=None)
+        → (số đường đi đơn ≤ max_hops, exact)
+"""
+import heapq
+import random
+
+DEFAULT_BUDGET = 200_000  # số lượt xét láng giềng tối đa cho 1 bước (BFS + liệt kê, hoặc đếm)
+PROBES = 256              # số lần dò ngẫu nhiên khi ước lượng số đường đi
+
+class Budget:
+    def __init__(self, limit):
+        self.left = limit
+
+    def spend(self, n=1):
+        self.left -= n
+        return self.left >= 0
+
+    @property
+    def exhausted(self):
+        return self.left < 0
+
+class _Adjacency:
+    """Láng giềng đã đọc (memo) — mỗi nút chỉ tính phí budget 1 lần"""
+    def __init__(self, neighbors, budget):
+        self._neighbors, self._memo, self.budget = neighbors, {}, budget
+
+    def __call__(self, node):
+        nbrs = self._memo.get(node)
+        if nbrs is None:
+            nbrs = [n for n in dict.fromkeys(self._neighbors(node)) if n != node]
+            self._memo[node] = nbrs
+            self.budget.spend(len(nbrs) + 1)
+        return nbrs
+
+def _bidirectional_bfs(fwd, bwd, src, dst, max_hops):
+    """→ (d, ds, dt, σs, σt, a) với a = số lớp phía src; d None nếu > max_hops hoặc hết budget"""
+    ds, dt, sigma_s, sigma_t = {src: 0}, {dst: 0}, {src: 1}, {dst: 1}
+    frontier_s, frontier_t = [src], [dst]
+    depth_s = depth_t = 0
+    while frontier_s and frontier_t and depth_s + depth_t < max_hops:
+        # Mở rộng phía có frontier nhỏ hơn (hub ở 1 đầu không kéo cả 2 phía)
+        forward = len(frontier_s) <= len(frontier_t)
+        adj, dist, sigma, other = (fwd, ds, sigma_s, dt) if forward else (bwd, dt, sigma_t, ds)
+        depth = (depth_s if forward else depth_t) + 1
+        nxt, met = [], False
+        for u in (frontier_s if forward else frontier_t):
+            for v in adj(u):
+                if v not in dist:
+                    dist[v], sigma[v] = depth, sigma[u]
+                    nxt.append(v)
+                    met = met or v in other
+                elif dist[v] == depth:
+                    sigma[v] += sigma[u]
+            if adj.budget.exhausted:
+                return None, ds, dt, sigma_s, sigma_t, 0
+        if forward:
+            frontier_s, depth_s = nxt, depth
+        else:
+            frontier_t, depth_t = nxt, depth
+        if met:
+            # Lớp vừa mở chạm phía kia: d = min qua các nút gặp (lớp phía kia đã hoàn chỉnh)
+            d = min(ds[v] + dt[v] for v in nxt if v in ds and v in dt)
+            return d, ds, dt, sigma_s, sigma_t, depth_s if forward else d - depth_t
+    return None, ds, dt, sigma_s, sigma_t, 0
+
+def _shortest_dag_paths(fwd, src, dst, d, a, ds, dt):
+    """Đường dài d theo thứ tự DFS của láng giềng: vị trí i ≤ a đi theo ds, vị trí i ≥ a theo dt"""
+    # Nút phía src thực sự dẫn tới lớp gặp (tỉa nhánh cụt trước khi DFS)
+    alive = {v for v, i in ds.items() if i == a and dt.get(v) == d - a}
+    layers = {a: alive}
+    for i in range(a - 1, -1, -1):
+        layers[i] = alive = {u for u, j in ds.items() if j == i and any(v in alive for v in fwd(u))}
+
+    def ok(v, i):
+        return v in layers[i] if i <= a else dt.get(v) == d - i
+
+    path = [src]
+    stack = [iter(fwd(src))]
+    while stack:
+        i = len(path)
+        v = next(stack[-1], None)
+        if v is None:
+            stack.pop()
+            path.pop()
+            continue
+        if v in path or not ok(v, i):
+            continue
+        if i == d:
+            yield path + [v]
+            continue
+        path.append(v)
+        stack.append(iter(fwd(v)))
+        fwd.budget.spend(len(fwd(v)))
+        if fwd.budget.exhausted:
+            return
+
+def _spur_bfs(fwd, spur, dst, banned_nodes, banned_edges, max_len):
+    """Đường ngắn nhất spur → dst tránh banned_nodes / banned_edges (cạnh (a, b) có hướng), ≤ max_len cạnh"""
+    parent = {spur: None}
+    frontier = [spur]
+    for _ in range(max_len):
+        nxt = []
+        for u in frontier:
+            nbrs = fwd(u)
+            fwd.budget.spend(len(nbrs))
+            for v in nbrs:
+                if v in parent or v in banned_nodes or (u, v) in banned_edges:
+                    continue
+                parent[v] = u
+                if v == dst:
+                    path = [v]
+                    while parent[path[-1]] is not None:
+                        path.append(parent[path[-1]])
+                    return path[::-1]
+                nxt.append(v)
+            if fwd.budget.exhausted:
+                return None
+        frontier = nxt
+        if not frontier:
+            break
+    return None
+
+def k_shortest_paths(neighbors, src, dst, k=5, max_hops=3, budget=DEFAULT_BUDGET, reverse_neighbors=None):
+    """
+    Tối đa k đường đi đơn src → dst (≤ max_hops cạnh), ngắn trước. Trả về dict:
+        distance     : số cạnh của đường ngắn nhất (None nếu không có trong max_hops / hết budget trước khi gặp)
+        paths        : [[node, ...]] — các đường dài distance đứng đầu, theo thứ tự DFS láng giềng
+        num_shortest : số đường ngắn nhất (đếm chính xác, kể cả khi chỉ trả về k đường)
+        truncated    : hết budget — kết quả có thể thiếu
+    """
+    cost = Budget(budget)
+    fwd = _Adjacency(neighbors, cost)
+    bwd = fwd if reverse_neighbors is None else _Adjacency(reverse_neighbors, cost)
+    result = {'distance': None, 'paths': [], 'num_shortest': 0, 'truncated': False}
+    if src == dst or k <= 0 or max_hops is None or max_hops < 1:
+        return result
+    d, ds, dt, sigma_s, sigma_t, a = _bidirectional_bfs(fwd, bwd, src, dst, max_hops)
+    result['truncated'] = cost.exhausted
+    if d is None:
+        return result
+    result['distance'] = d
+    result['num_shortest'] = sum(sigma_s[v] * sigma_t[v] for v, i in ds.items()
+                                 if i == a and dt.get(v) == d - a)
+    paths = result['paths']
+    for p in _shortest_dag_paths(fwd, src, dst, d, a, ds, dt):
+        paths.append(p)
+        if len(paths) >= k:
+            break
+    # Cần đường dài hơn: spur kiểu Yen từ mọi đường đã có (ứng viên trong heap theo (độ dài, thứ tự sinh))
+    known = {tuple(p) for p in paths}
+    candidates, order = [], 0
+    expanded = 0
+    while len(paths) < k and not cost.exhausted:
+        for prev in paths[expanded:]:
+            for j in range(len(prev) - 1):
+                root = prev[:j + 1]
+                banned_edges = {(p[j], p[j + 1]) for p in paths if p[:j + 1] == root}
+                spur = _spur_bfs(fwd, prev[j], dst, set(root[:-1]), banned_edges, max_hops - j)
+                if spur is not None:
+                    cand = tuple(root[:-1] + spur)
+                    if cand not in known:
+                        known.add(cand)
+                        heapq.heappush(candidates, (len(cand), order, cand))
+                        order += 1
+        expanded = len(paths)
+        if not candidates:
+            break
+        paths.append(list(heapq.heappop(candidates)[2]))
+    result['truncated'] = cost.exhausted
+    return result
+
+def count_paths(neighbors, src, dst, max_hops=3, budget=DEFAULT_BUDGET, reverse_neighbors=None,
+                probes=PROBES, seed=0):
+    """Số đường đi đơn src → dst ≤ max_hops cạnh → (count, exact). Hết budget khi đếm DFS → ước lượng Knuth
+    (seed cố định: cùng truy vấn cho cùng kết quả), không nhỏ hơn số đã đếm được."""
+    if src == dst or max_hops is None or max_hops < 1:
+        return 0, True
+    cost = Budget(budget)
+    fwd = _Adjacency(neighbors, cost)
+    # Nút có cạnh tới dst: đường kết thúc ở u → dst đếm bằng tra tập, không cần bước vào dst
+    last = set((_Adjacency(reverse_neighbors, cost) if reverse_neighbors else fwd)(dst))
+
+    count, visited = 0, {src}
+    stack = [(src, 0)]
+    path = []
+    while stack:
+        u, h = stack.pop()
+        if u is None:
+            visited.discard(path.pop())
+            continue
+        count += u in last
+        if h + 1 < max_hops:
+            path.append(u)
+            stack.append((None, 0))
+            visited.add(u)
+            nbrs = fwd(u)
+            cost.spend(len(nbrs))
+            stack.extend((v, h + 1) for v in reversed(nbrs) if v not in visited and v != dst)
+        if cost.exhausted:
+            break
+    else:
+        return count, True
+
+    rng, total = random.Random(seed), 0.0
+    for _ in range(probes):
+        u, weight, seen = src, 1.0, {src}
+        for h in range(max_hops):
+            total += weight * (u in last)
+            if h + 1 >= max_hops:
+                break
+            children = [v for v in fwd(u) if v not in seen and v != dst]
+            if not children:
+                break
+            weight *= len(children)
+            u = rng.choice(children)
+            seen.add(u)
+    return max(count, round(total / probes)), False
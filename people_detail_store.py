@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+people_detail_store.py — nodes_people_detail.json dạng GỌN (tham chiếu id) + đọc tương thích dạng cũ
+
+Dạng gọn (Step 3 ghi):
+{
+  "format": "people-detail-compact/1",
+  "wiki_base": "https://vi.wikipedia.org/wiki/",
+  "people":       [{"id": 1, "name": "...", "depth": 1, "edu": [[uni_id, year|null], ...]}, ...],
+  "universities": [{"id": 1, "name": "..."}, ...],
+  "groups": {
+    "same_university": [{"university": uni_id, "members": [person_id, ...]}, ...],
+    "same_grad_year":  [{"year": 2004, "members": [person_id, ...]}, ...]
+  }
+}
+- id person / university trùng với cột id của nodes_persons.csv / nodes_universities.csv
+  (người chỉ có trong edu_edges.csv mà không thuộc nodes_persons.csv được cấp id tiếp theo, "listed": false)
+- Quan hệ same_university / same_grad_year là clique → lưu 1 lần theo nhóm, URL suy ra khi đọc.
+
+Dạng cũ (list bản ghi {"depth","name","link","Học vấn","relations",...}) vẫn đọc được:
+  load_people_detail(path)       → dict dạng gọn (chuyển đổi nếu file là dạng cũ thì giữ nguyên list)
+  iter_legacy_records(doc)       → duyệt các bản ghi dạng cũ, mở rộng khi cần
+  legacy_record(doc, name)       → 1 bản ghi dạng cũ theo tên (chỉ mục theo tên dựng 1 lần cho mỗi doc)
+
+CLI (xuất lại file dạng cũ):
+  py people_detail_store.py graph_out/nodes_people_detail.json --expand nodes_people_detail_legacy.json
+"""
+import json, argparse, urllib.parse
+
+FORMAT = "people-detail-compact/1"
+WIKI_BASE = "https://vi.wikipedia.org/wiki/"
+
+def wiki_url(title, base=WIKI_BASE):
+    return base + urllib.parse.quote((title or "").replace(" ", "_"))
+
+# ---------- write ----------
+def build_compact(persons_out, universities, edu_map, depth_of, inv_unis, inv_grad_year):
+    """
+    persons_out / universities: tập tên (id = thứ tự sort, bắt đầu từ 1 như nodes_*.csv)
+    edu_map: person -> [(uni, year)]; depth_of(p) -> depth; inv_*: uni/year -> set(person)
+    """
+    names = sorted(persons_out)
+    extra = sorted(set(edu_map) - set(persons_out))
+    pid = {p: i for i, p in enumerate(names + extra, start=1)}
+    uni_names = sorted(set(universities) | {u for pairs in edu_map.values() for u, _ in pairs})
+    uid = {u: i for i, u in enumerate(uni_names, start=1)}
+
+    people = []
+    for p in names + extra:
+        rec = {"id": pid[p], "name": p, "depth": depth_of(p) if p in persons_out else None,
+               "edu": [[uid[u], y] for u, y in edu_map.get(p, [])]}
+        if p not in persons_out:
+            rec["listed"] = False
+        people.append(rec)
+
+    def groups(inv, key, to_key):
+        out = []
+        for k in sorted(inv):
+            members = inv[k]
+            if len(members) >= 2:
+                out.append({key: to_key(k), "members": sorted(pid[m] for m in members)})
+        return out
+
+    return {
+        "format": FORMAT,
+        "wiki_base": WIKI_BASE,
+        "people": people,
+        "universities": [{"id": uid[u], "name": u} for u in uni_names],
+        "groups": {
+            "same_university": groups(inv_unis, "university", lambda u: uid[u]),
+            "same_grad_year":  groups(inv_grad_year, "year", lambda y: y),
+        },
+    }
+
+def write_people_detail(path, doc):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(doc, f, ensure_ascii=False, separators=(",", ":"))
+
+def write_json_array(path, items):
+    """json.dump(list, indent=2) nhưng ghi từng phần tử (không dựng chuỗi JSON khổng lồ trong RAM)."""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("[")
+        first = True
+        for it in items:
+            f.write("\n" if first else ",\n")
+            first = False
+            f.write("\n".join("  " + ln for ln in json.dumps(it, ensure_ascii=False, indent=2).split("\n")))
+        f.write("\n]" if not first else "]")
+
+# ---------- read ----------
+def load_people_detail(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def is_compact(doc):
+    return isinstance(doc, dict) and doc.get("format") == FORMAT
+
+class _Expander:
+    def __init__(self, doc):
+        self.base = doc.get("wiki_base", WIKI_BASE)
+        self.people = {r["id"]: r for r in doc["people"]}
+        self.by_name = {r["name"]: r for r in doc["people"]}
+        self.unis = {r["id"]: r["name"] for r in doc["universities"]}
+        self.uni_groups, self.year_groups = {}, {}   # person_id -> [members lists]
+        for g in doc["groups"]["same_university"]:
+            for m in g["members"]:
+                self.uni_groups.setdefault(m, []).append(g["members"])
+        for g in doc["groups"]["same_grad_year"]:
+            for m in g["members"]:
+                self.year_groups.setdefault(m, []).append(g["members"])
+
+    def _peers(self, groups, pid):
+        ids = set()
+        for members in groups.get(pid, ()):
+            ids.update(members)
+        ids.discard(pid)
+        return sorted(self.people[i]["name"] for i in ids)
+
+    def record(self, rec):
+        su = self._peers(self.uni_groups, rec["id"])
+        sy = self._peers(self.year_groups, rec["id"])
+        rels = [{"person_title": q, "person_link": wiki_url(q, self.base), "type": "same_university"} for q in su]
+        rels += [{"person_title": q, "person_link": wiki_url(q, self.base), "type": "same_grad_year"} for q in sy]
+        return {
+            "depth": rec["depth"],
+            "name": rec["name"],
+            "link": wiki_url(rec["name"], self.base),
+            "Học vấn": [{"trường": self.unis[u], "năm": y} for u, y in rec["edu"]],
+            "relations": rels,
+            "same_university_persons": [wiki_url(q, self.base) for q in su],
+            "same_grad_year_persons": [wiki_url(q, self.base) for q in sy],
+        }
+
+def iter_legacy_records(doc):
+    """Bản ghi dạng cũ (chỉ người thuộc nodes_persons.csv, thứ tự theo tên)."""
+    if not is_compact(doc):
+        yield from doc
+        return
+    ex = _Expander(doc)
+    for rec in doc["people"]:
+        if rec.get("listed", True):
+            yield ex.record(rec)
+
+# Chỉ mục của doc gần nhất (so theo identity): gọi legacy_record lặp lại trên cùng doc không dựng lại
+# _Expander / không duyệt lại list dạng cũ. Doc được coi là chỉ đọc sau khi load.
+_last_index = (None, None)
+
+def _index(doc):
+    global _last_index
+    cached_doc, index = _last_index
+    if cached_doc is not doc:
+        if is_compact(doc):
+            index = _Expander(doc)
+        else:
+            index = {}
+            for r in doc:
+                index.setdefault(r.get("name"), r)
+        _last_index = (doc, index)
+    return index
+
+def legacy_record(doc, name):
+    index = _index(doc)
+    if not is_compact(doc):
+        return index.get(name)
+    rec = index.by_name.get(name)
+    return index.record(rec) if rec and rec.get("listed", True) else None
+
+def main():
+    ap = argparse.ArgumentParser(description="Đọc nodes_people_detail.json (gọn) và xuất lại dạng cũ.")
+    ap.add_argument("path")
+    ap.add_argument("--expand", required=True, help="File JSON dạng cũ cần ghi")
+    args = ap.parse_args()
+    doc = load_people_detail(args.path)
+    write_json_array(args.expand, iter_legacy_records(doc))
+    print(f"✅ Đã mở rộng → {args.expand}")
+
+if __name__ == "__main__":
+    main()
@@ -76,7 +76,7 @@ def main():
     # Summary
     print("\n" + "🎉 HOÀN THÀNH CHUẨN BỊ CHATBOT ".center(70, "="))
     print("\n📁 Thư mục chatbot tạo được:")
-    print("   • chatbot/graph_out/ (Knowledge Graph)")
+    print("   • graph_out/ (Knowledge Graph + node_details.sqlite)")
     print("   • chatbot/*.py (Tất cả modules)")
     print("   • chatbot/eval_dataset_2000.json (1631 câu hỏi)")
     print("\n🚀 Bước tiếp theo:")
@@ -11,6 +11,7 @@ run_pipeline_clean.py
 import os, sys, subprocess, json, tempfile, shutil
 import pandas as pd
 from utils_wiki import normalize
+from utils_titles import is_university_root
 
 # =============================
 # ===== GLOBAL CONFIG =========
@@ -34,24 +35,6 @@ STEP4_WORKERS = os.cpu_count() or 8
 STEP4_SLEEP   = "0.06"
 STEP4_TIMEOUT = "6.0"
 
-# Chỉ giữ lại các file này sau Step 5
-KEEP_FILES = {
-    # edges
-    "edges_alumni_pu.csv",
-    "edges_mentions_pp.csv",
-    "edges_mentions_pu.csv",
-    "edges_shared_uni_pp.csv",
-    "edges_uni_mentions_p.csv",
-    "edges_uni_mentions_u.csv",
-    # graph + node details
-    "graph.json",
-    "node_details.csv",
-    "node_details.json",
-    # node props
-    "nodes_persons_props.csv",
-    "nodes_universities_props.csv",
-}
-
 # =============================
 # ====== ENV SETTINGS =========
 # =============================
@@ -154,7 +137,7 @@ for i, title in enumerate(ROOTS, 1):
     tmp_links_fp = os.path.join(tmpdir, "links.csv")
     root_links.to_csv(tmp_links_fp, index=False, encoding="utf-8")
 
-    is_uni = any(k.lower() in title.lower() for k in ["đại học","university","học viện","institute","college"])
+    is_uni = is_university_root(title)
     print(f"  [{i}/{len(ROOTS)}] Step2: {title} → {'UNI' if is_uni else 'PERSON'}")
 
     args2 = [sys.executable, "-u", "step2_build_seeds.py",
@@ -252,7 +235,7 @@ for fn in [
     "edges_alumni_pu.csv",
     "edges_mentions_pp.csv", "edges_mentions_pu.csv",
     "edges_shared_uni_pp.csv", "edges_uni_mentions_p.csv", "edges_uni_mentions_u.csv",
-    "node_details.csv", "node_details.json",
+    "node_details.csv", "node_details.ndjson", "node_details.idx.json",
     "nodes_persons_props.csv", "nodes_universities_props.csv",
 ]:
     p = os.path.join(OUT, fn)
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+search_index.py — Chỉ mục tìm nút theo tên, không phân biệt dấu / hoa thường (cho KnowledgeGraph.search_nodes)
+
+Mỗi nút được lưu theo khoá chuẩn hoá của title (node_details_store.normalize_key: bỏ dấu tiếng Việt cả Đ/đ,
+chữ thường, chỉ giữ [a-z0-9] + 1 khoảng trắng):
+    trigram → {nút}        : truy vấn ≥ 3 ký tự = giao các tập trigram của truy vấn rồi kiểm tra chuỗi con
+    token   → {nút}        : + danh sách token đã sắp xếp (bisect) cho truy vấn 1–2 ký tự = tiền tố của từ
+    type    → {nút}        : phân vùng theo node_type (lọc bằng giao tập, không duyệt từng nút)
+Kết quả xếp theo chất lượng khớp (trùng hẳn < tiền tố tên < tiền tố 1 từ < chuỗi con) rồi bậc nút giảm dần
+(hàm degree do KnowledgeGraph truyền vào, tính lúc truy vấn nên không cần cập nhật khi cạnh đổi).
+
+API:
+    NodeSearchIndex(entries)          → entries: iterable (node, title, node_type)
+    index.add(node, title, node_type) → thêm / cập nhật 1 nút (changelog upsert_node)
+    index.remove(node)                → gỡ 1 nút (changelog delete_node)
+    index.search(query, node_type=None, limit=10, degree=None) → [node] đã xếp hạng
+    index.exact(query)                → {node} có khoá chuẩn hoá trùng hẳn khoá của query (tra tên → nút)
+"""
+import heapq
+from bisect import bisect_left
+
+from node_details_store import normalize_key
+
+def _grams(key):
+    return {key[i:i + 3] for i in range(len(key) - 2)}
+
+class NodeSearchIndex:
+    def __init__(self, entries=()):
+        self._key = {}     # node -> (khoá chuẩn hoá, node_type)
+        self._grams = {}   # trigram -> set(node)
+        self._tokens = {}  # token -> set(node)
+        self._by_type = {} # node_type -> set(node)
+        for node, title, node_type in entries:
+            self._insert(node, title, node_type)
+        self._sorted_tokens = sorted(self._tokens)
+
+    def __len__(self):
+        return len(self._key)
+
+    def _insert(self, node, title, node_type):
+        key = normalize_key(title)
+        self._key[node] = (key, node_type)
+        for g in _grams(key):
+            self._grams.setdefault(g, set()).add(node)
+        for t in set(key.split()):
+            self._tokens.setdefault(t, set()).add(node)
+        self._by_type.setdefault(node_type, set()).add(node)
+
+    # ---------- cập nhật tăng dần — chi phí theo độ dài title, không theo cả index ----------
+    def add(self, node, title, node_type):
+        self.remove(node)
+        self._insert(node, title, node_type)
+        for t in set(self._key[node][0].split()):
+            i = bisect_left(self._sorted_tokens, t)
+            if i == len(self._sorted_tokens) or self._sorted_tokens[i] != t:
+                self._sorted_tokens.insert(i, t)
+
+    def remove(self, node):
+        entry = self._key.pop(node, None)
+        if entry is None:
+            return
+        key, node_type = entry
+        for index, names in ((self._grams, _grams(key)), (self._tokens, set(key.split())),
+                             (self._by_type, (node_type,))):
+            for name in names:
+                nodes = index[name]
+                nodes.discard(node)
+                if not nodes:
+                    del index[name]
+                    if index is self._tokens:
+                        del self._sorted_tokens[bisect_left(self._sorted_tokens, name)]
+
+    # ---------- truy vấn ----------
+    def _candidates(self, q):
+        if len(q) >= 3:
+            postings = sorted((self._grams.get(g, set()) for g in _grams(q)), key=len)
+            found = set(postings[0]).intersection(*postings[1:])
+            return {n for n in found if q in self._key[n][0]}
+        # 1–2 ký tự: trigram không dùng được → các từ bắt đầu bằng q
+        found = set()
+        i = bisect_left(self._sorted_tokens, q)
+        while i < len(self._sorted_tokens) and self._sorted_tokens[i].startswith(q):
+            found |= self._tokens[self._sorted_tokens[i]]
+            i += 1
+        return found
+
+    def exact(self, query):
+        q = normalize_key(query)
+        if not q:
+            return set()
+        return {n for n in self._candidates(q) if self._key[n][0] == q}
+
+    def _quality(self, key, q):
+        if key == q:
+            return 0
+        if key.startswith(q):
+            return 1
+        return 2 if (' ' + q) in key else 3
+
+    def search(self, query, node_type=None, limit=10, degree=None):
+        q = normalize_key(query)
+        if not q or limit <= 0:
+            return []
+        found = self._candidates(q)
+        if node_type is not None:
+            found &= self._by_type.get(node_type, set())
+        degree = degree or (lambda n: 0)
+        rank = lambda n: (self._quality(self._key[n][0], q), -degree(n), len(self._key[n][0]), n)
+        return heapq.nsmallest(limit, found, key=rank)
@@ -143,6 +143,22 @@ def build_graph(graph_dir):
     return graph
 
 
+def build_graph_from_snapshot(snapshot_dir):
+    """Đồ thị hợp nhất từ snapshot nhị phân (graph_snapshot.py) — không parse CSV.
+    Cạnh clique lưu dạng nhóm nằm trong snapshot, to_adjacency trải lại thành cặp."""
+    from graph_snapshot import load_snapshot, to_adjacency
+
+    print(f"[INFO] Load SNAPSHOT: {snapshot_dir}")
+    graph = to_adjacency(load_snapshot(snapshot_dir))
+
+    print("\n========== SUMMARY ==========")
+    print(f"[INFO] Tổng số node: {len(graph)}")
+    total_edges = sum(len(v) for v in graph.values()) // 2
+    print(f"[INFO] Tổng số cạnh (vô hướng): {total_edges}")
+
+    return graph
+
+
 # ======================== SHORTEST PATH ===========================
 
 def find_node(graph, name):
@@ -242,6 +258,11 @@ def main():
     parser.add_argument("--src", required=True, help="Tên node nguồn")
     parser.add_argument("--dst", required=True, help="Tên node đích")
     parser.add_argument("--graph-dir", default=GRAPH_DIR, help="Thư mục graph_out")
+    parser.add_argument(
+        "--snapshot",
+        default=None,
+        help="Dùng snapshot nhị phân của đồ thị hợp nhất (vd graph_out/snapshot) thay cho các file CSV."
+    )
     parser.add_argument(
         "--weighted",
         action="store_true",
@@ -258,7 +279,10 @@ def main():
     print(f"GRAPH_DIR = {args.graph_dir}")
     print(f"WEIGHTED  = {args.weighted}")
 
-    graph = build_graph(args.graph_dir)
+    if args.snapshot:
+        graph = build_graph_from_snapshot(args.snapshot)
+    else:
+        graph = build_graph(args.graph_dir)
 
     if not graph:
         print("[ERROR] Đồ thị rỗng. Kiểm tra lại graph_out/ và các file CSV.")
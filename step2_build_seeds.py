@@ -3,8 +3,9 @@ import csv, argparse, json, os, re
 from collections import defaultdict
 from utils_wiki import (
     fetch_parse_html, soup_from_html, is_person_page,
-    extract_person_education, normalize
+    extract_person_education, normalize, fetch_category_members
 )
+from utils_titles import is_university_title
 
 # ========== tqdm ==========
 try:
@@ -67,18 +68,7 @@ def load_existing_pairs_norm(path, cols):
 
 
 # ========== Heuristics: xác định 'university' ==========
-def looks_like_university_title(txt: str) -> bool:
-    if not txt:
-        return False
-    t = (txt or "").strip().lower()
-
-    keywords = [
-        "đại học", "học viện", "trường ", " viện ", "khoa ",
-        "university", "college", "institute", "academy", "faculty", "school", "law school", "business school"
-    ]
-    return any(k in t for k in keywords)
-
-
+# (luật theo tiêu đề: utils_titles.is_university_title)
 def looks_like_university_infobox(soup) -> bool:
     """
     Suy luận 'trang tổ chức/đại học' dựa trên các khóa thường gặp trong infobox.
@@ -104,6 +94,47 @@ def looks_like_university_infobox(soup) -> bool:
         return False
 
 
+# ========== Category-driven alumni seeding ==========
+# Thể loại cựu sinh viên thường gặp trên viwiki; {root} = tiêu đề trường
+ALUMNI_CATEGORY_PATTERNS = [
+    "Cựu sinh viên {root}",
+    "Cựu học sinh {root}",
+]
+
+
+def enumerate_alumni_categories(root_title, extra_categories=None, depth=1, max_members=0):
+    """
+    Duyệt thể loại cựu sinh viên của trường (kèm thể loại con tới `depth` cấp) bằng list=categorymembers.
+    Trả về (members, categories_found, n_calls) — members: bài viết (ns=0), đã khử trùng, giữ thứ tự.
+    """
+    start = [p.format(root=root_title) for p in ALUMNI_CATEGORY_PATTERNS] + list(extra_categories or [])
+    frontier = [(c, 0) for c in start]
+    seen_cats, members, seen_members = set(), [], set()
+    found, n_calls = [], 0
+    while frontier:
+        cat, level = frontier.pop(0)
+        if normalize(cat) in seen_cats:
+            continue
+        seen_cats.add(normalize(cat))
+        try:
+            pages, subcats, calls = fetch_category_members(cat)
+        except Exception:
+            continue
+        n_calls += calls
+        if pages or subcats:
+            found.append(cat)
+        for t in pages:
+            k = normalize(t)
+            if k not in seen_members:
+                seen_members.add(k)
+                members.append(t)
+                if max_members and len(members) >= max_members:
+                    return members, found, n_calls
+        if level < depth:
+            frontier.extend((sc, level + 1) for sc in subcats)
+    return members, found, n_calls
+
+
 # ========== MAIN ==========
 def main():
     ap = argparse.ArgumentParser(
@@ -120,6 +151,14 @@ def main():
                     help="Bật chế độ bổ sung (append) vào các file seeds/person_edges/edu_edges hiện có")
     ap.add_argument("--dedupe", action="store_true",
                     help="Khử trùng khi append (đọc file hiện có để loại bỏ bản ghi trùng)")
+    ap.add_argument("--alumni-categories", action="store_true",
+                    help="Root là trường: lấy seed từ thể loại 'Cựu sinh viên <trường>' thay vì quét mọi link")
+    ap.add_argument("--alumni-category", action="append", default=[],
+                    help="Tên thể loại bổ sung (có thể truyền nhiều lần)")
+    ap.add_argument("--category-depth", type=int, default=1,
+                    help="Số cấp thể loại con được duyệt")
+    ap.add_argument("--category-max-members", type=int, default=0,
+                    help="Giới hạn số thành viên lấy từ thể loại (0 = không giới hạn)")
     ap.add_argument("--progress-every", type=int, default=50,
                     help="(fallback) In tiến độ mỗi N trang khi không có tqdm")
     args = ap.parse_args()
@@ -136,6 +175,12 @@ def main():
     f_pedges, w_pedges = open_csv_writer(p_edges_path, ["src_root","dst_person","relation"], append=args.append)
     f_uedges, w_uedges = open_csv_writer(u_edges_path, ["src_university","dst_person","relation","year"], append=args.append)
     f_roots,  w_roots  = open_csv_writer(roots_path,   ["title","type"], append=args.append)
+    f_catrep = w_catrep = None
+    if args.alumni_categories:
+        f_catrep, w_catrep = open_csv_writer(
+            os.path.join(args.outdir, "category_seed_report.csv"),
+            ["root","categories","list_calls","members","link_candidates","fetches_category","fetches_saved"],
+            append=args.append)
 
     # Dedupe sets (dùng bản chuẩn hoá để so sánh)
     if args.dedupe:
@@ -177,11 +222,11 @@ def main():
             root_type = "person"
         else:
             # Heuristic: tiêu đề + infobox
-            if looks_like_university_title(root_title) or (soup0 and looks_like_university_infobox(soup0)):
+            if is_university_title(root_title) or (soup0 and looks_like_university_infobox(soup0)):
                 root_type = "university"
             else:
                 # fallback cuối cùng
-                root_type = "university" if looks_like_university_title(root_title) else "person"
+                root_type = "university" if is_university_title(root_title) else "person"
 
         row_root = (root_title, root_type)
         k_root = _norm_tuple(*row_root)
@@ -216,6 +261,23 @@ def main():
             except Exception:
                 pass
 
+        # --- Chế độ thể loại: thay danh sách link bằng thành viên thể loại cựu sinh viên ---
+        from_category = False
+        if args.alumni_categories and root_type == "university" and not root_is_person:
+            members, cats, n_calls = enumerate_alumni_categories(
+                root_title, args.alumni_category, args.category_depth, args.category_max_members)
+            if members:
+                from_category = True
+                fetches_cat = len(members) + n_calls
+                saved = len(candidates) - fetches_cat
+                print(f"    ↳ category seeding: {len(cats)} thể loại, {len(members)} thành viên, {n_calls} lượt list "
+                      f"| link-scan={len(candidates)} fetch → category={fetches_cat} fetch (tiết kiệm {saved})")
+                w_catrep.writerow([root_title, "|".join(cats), n_calls, len(members),
+                                   len(candidates), fetches_cat, saved])
+                candidates = members
+            else:
+                print("    ↳ category seeding: không tìm thấy thể loại cựu sinh viên → quét link như cũ")
+
         # --- Duyệt các candidate link của root ---
         processed = 0
         ok_people = 0
@@ -235,7 +297,7 @@ def main():
                     continue
 
                 edu = extract_person_education(ch_soup) or []
-                if not edu:
+                if not edu and not from_category:
                     if not HAS_TQDM and processed % args.progress_every == 0:
                         print(f"  [{processed}/{len(candidates)}] seeds={ok_people} edu={made_edu_edges} err={errors}")
                     continue
@@ -247,23 +309,28 @@ def main():
                     w_seeds.writerow([cand]); seen_seed.add(k_seed)
                 ok_people += 1
 
-                # cạnh root -> person (LINK_FROM_START)
-                row_pe = (root_title, cand, "LINK_FROM_START")
-                k_pe = _norm_tuple(*row_pe)
-                if (not args.dedupe) or (k_pe not in seen_pedge):
-                    w_pedges.writerow(list(row_pe)); seen_pedge.add(k_pe)
+                # cạnh root -> person (LINK_FROM_START) — chỉ khi root thực sự link tới person;
+                # thành viên thể loại không có link từ root, ALUMNI_OF bên dưới đã ghi nhận quan hệ.
+                if not from_category:
+                    row_pe = (root_title, cand, "LINK_FROM_START")
+                    k_pe = _norm_tuple(*row_pe)
+                    if (not args.dedupe) or (k_pe not in seen_pedge):
+                        w_pedges.writerow(list(row_pe)); seen_pedge.add(k_pe)
 
                 # nếu chọn assume_university và root là trường → tạo ALUMNI_OF nếu phù hợp
-                if args.assume_university and (root_type == "university") and (not root_is_person):
+                if (args.assume_university or from_category) and (root_type == "university") and (not root_is_person):
                     added = 0
                     root_norm = normalize(root_title)
-                    for uni, year in edu:
-                        if normalize(uni) == root_norm:
-                            row = (uni, cand, "ALUMNI_OF", str(year) if year is not None else "")
-                            k_ue = _norm_tuple(*row)
-                            if (not args.dedupe) or (k_ue not in seen_uedge):
-                                w_uedges.writerow(list(row)); seen_uedge.add(k_ue)
-                                added += 1
+                    matched = [(uni, year) for uni, year in edu if normalize(uni) == root_norm]
+                    if from_category and not matched:
+                        # thành viên thể loại cựu sinh viên ⇒ chắc chắn là alumni; năm chưa rõ
+                        matched = [(root_title, None)]
+                    for uni, year in matched:
+                        row = (uni, cand, "ALUMNI_OF", str(year) if year is not None else "")
+                        k_ue = _norm_tuple(*row)
+                        if (not args.dedupe) or (k_ue not in seen_uedge):
+                            w_uedges.writerow(list(row)); seen_uedge.add(k_ue)
+                            added += 1
                     made_edu_edges += added
 
                 if HAS_TQDM:
@@ -284,14 +351,17 @@ def main():
         print(f"  ✅ root done: seeds+={ok_people}, edu_edges+={made_edu_edges}, errors={errors}")
 
     # đóng file
-    for fh in (f_seeds, f_pedges, f_uedges, f_roots):
-        fh.close()
+    for fh in (f_seeds, f_pedges, f_uedges, f_roots, f_catrep):
+        if fh is not None:
+            fh.close()
 
     print("\n🎉 Done. Đầu ra DUY NHẤT tại:", args.outdir)
     print("  - root_nodes.csv       (root + type; phục vụ Step 3 set depth 0)")
     print("  - seeds.csv            (depth 1)")
     print("  - person_edges.csv     (LINK_FROM_START)")
     print("  - edu_edges.csv")
+    if args.alumni_categories:
+        print("  - category_seed_report.csv (số fetch tiết kiệm so với quét link, theo root)")
 
 
 if __name__ == "__main__":
@@ -7,14 +7,18 @@ Step 3 — BFS mở rộng (nhanh, đa luồng)
     nodes_universities.csv   (bao gồm universities BFS + root universities)
     edges_up.csv             (UNI -> PERSON, ALUMNI_OF {year?})
     edges_shared.csv         (P <-> P, SHARED_UNI {count})
-    edges_same_grad.csv      (P <-> P, SAME_GRAD_YEAR {year})
-    nodes_people_detail.json (depth + học vấn + quan hệ same_*)
+    edges_same_grad.csv      (P <-> P, SAME_GRAD_YEAR {year}; mặc định chỉ header — năm đã nằm ở edges_up,
+                              truy vấn "cùng năm" dùng chỉ mục năm của KG; --same-grad-pairs để sinh cặp như cũ)
+    nodes_people_detail.json (dạng gọn: id + nhóm same_university / same_grad_year; xem people_detail_store.py)
+    graph.json               (manifest: tên file + số lượng, KHÔNG nhúng danh sách cạnh)
+    graph_edges.ndjson       (tuỳ chọn --edges-ndjson: mọi cạnh, mỗi dòng 1 JSON)
 
 Tối ưu / Sửa lỗi:
 - ĐÃ SỬA: không tăng depth quá sớm; quét hết node của depth hiện tại trước khi sang depth+1.
 - ThreadPoolExecutor với --workers N
 - visited được chuẩn hoá normalize để tránh crawl trùng
 - Option bật/tắt expand-from-university
+- Ghi cạnh dạng stream (--flush-every): RAM không tăng theo số cạnh, crash vẫn còn CSV dùng được
 """
 
 import csv, json, argparse, os
@@ -27,6 +31,9 @@ from utils_wiki import (
     fetch_parse_html, soup_from_html, is_person_page,
     extract_person_education, extract_page_links, normalize
 )
+from utils_titles import DEGREE_KEYWORDS, is_university as looks_like_university, is_skippable
+from people_detail_store import build_compact, write_people_detail
+from entity_resolution import MERGE_MAP_FILE, load_merge_map
 
 # tqdm
 try:
@@ -38,33 +45,10 @@ except Exception:
 # =========================
 # ---- Filtering rules ----
 # =========================
-UNI_PREFIXES = (
-    "Đại học", "Trường", "Học viện", "Viện",                     # VI
-    "University", "College", "Institute", "Academy", "Faculty",  # EN
-    "School", "Law School", "Business School",
-    "École", "Universität", "Universidade", "Università", "Universidad", "Polytechnic"
-)
-
-UNI_SUFFIXES = (
-    "University", "College", "Institute", "Academy",
-    "School", "Law School", "Business School", "Faculty",
-    "Đại học", "Học viện", "Viện", "Trường", "Khoa"
-)
-
-DEGREE_KEYWORDS = {
-    "Cử nhân", "Cử nhân Nghệ thuật", "Cử nhân Khoa học",
-    "Bachelor", "Bachelor of Arts", "Bachelor of Science", "B.A.", "BA", "BSc", "B.Sc.",
-    "Master", "Thạc sĩ", "M.A.", "MA", "MSc", "M.Sc.",
-    "Doctor", "Tiến sĩ", "PhD", "Ph.D.", "JD", "LLB", "LLM",
-    "Alma mater"
-}
-
-NS_BLACKLIST = re.compile(
-    r"^(Danh sách|Thể loại|Wikipedia|Trợ giúp|Bản mẫu|Portal|Chủ đề|Tập tin|File)\b",
-    flags=re.I
-)
+# Luật phân loại tiêu đề (trường / trang hệ thống / ngày-năm) nằm ở utils_titles.py
 
 YEAR_RE = re.compile(r"\b(19|20)\d{2}\b")
+EDGES_NDJSON = "graph_edges.ndjson"
 NONEXIST_SUFFIX = re.compile(r"\s*\(trang không tồn tại\)\s*$", re.I)
 
 MAX_DEBUG = 80
@@ -78,41 +62,6 @@ LOCK = Lock()  # bảo vệ visited trong môi trường đa luồng
 def clean_wiki_title(t: str) -> str:
     return NONEXIST_SUFFIX.sub("", t or "").strip()
 
-def looks_like_university(title: str) -> bool:
-    if not title:
-        return False
-    t = title.strip()
-    if t in DEGREE_KEYWORDS:
-        return False
-    if t.startswith(UNI_PREFIXES):
-        return True
-    for suf in UNI_SUFFIXES:
-        if t.endswith(suf):
-            return True
-    if re.search(r"\b(University|College|Institute|Academy|École|Universit[aä]t|Universidad|Universidade|Polytechnic)\b", t, re.I):
-        return True
-    if "Đại học" in t:
-        return True
-    return False
-
-def looks_like_system(title: str) -> bool:
-    if not title:
-        return True
-    if ":" in title:
-        return True
-    if NS_BLACKLIST.match(title):
-        return True
-    return False
-
-def looks_like_date_or_year(title: str) -> bool:
-    if not title:
-        return True
-    if re.fullmatch(r"\d{4}", title):
-        return True
-    if re.fullmatch(r"\d{1,2}\s+tháng\s+\d{1,2}", title, flags=re.I):
-        return True
-    return False
-
 # ===========================
 # ---- Canonicalize unis ----
 # ===========================
@@ -129,14 +78,18 @@ CANON_RULES = [
     (r".*\bYale\b.*", "Đại học Yale"),
 ]
 
+# alias → tên chuẩn từ entity_merge_map.csv của lần chạy trước (entity_resolution.py), nạp trong main()
+MERGE_MAP = {}
+
 def canonicalize_university(u: str) -> str:
     if not u:
         return u
     s = u.strip()
     for pat, rep in CANON_RULES:
         if re.search(pat, s, flags=re.I):
-            return rep
-    return s
+            s = rep
+            break
+    return MERGE_MAP.get(s, s)
 
 def infer_year_from_text(val):
     if isinstance(val, str):
@@ -267,13 +220,53 @@ def write_edges(filename, header, rows):
         for r in rows:
             w.writerow(list(r))
 
-def save_checkpoint(outdir, persons, universities, edges_up, edges_shared, edges_same_grad):
+class EdgeStream:
+    """
+    Ghi cạnh dạng stream: mỗi cạnh được append ngay vào CSV (và NDJSON nếu bật), flush sau mỗi
+    `flush_every` dòng → RAM chỉ giữ bộ đếm; crash giữa chừng vẫn để lại file CSV dùng được.
+    """
+    def __init__(self, path, header, flush_every=0, ndjson=None):
+        self.header = header
+        self.flush_every = max(0, int(flush_every or 0))
+        self.ndjson = ndjson
+        self.count = 0
+        self.f = open(path, "w", encoding="utf-8", newline="")
+        self.w = csv.writer(self.f)
+        self.w.writerow(header)
+        self.f.flush()
+
+    def write(self, row):
+        row = list(row)
+        self.w.writerow(row)
+        if self.ndjson is not None:
+            self.ndjson.write(json.dumps(dict(zip(self.header, row)), ensure_ascii=False) + "\n")
+        self.count += 1
+        if self.flush_every and self.count % self.flush_every == 0:
+            self.flush()
+
+    def flush(self):
+        self.f.flush()
+        if self.ndjson is not None:
+            self.ndjson.flush()
+
+    def close(self):
+        if not self.f.closed:
+            self.f.close()
+
+def open_ndjson(outdir, enabled):
+    return open(os.path.join(outdir, EDGES_NDJSON), "w", encoding="utf-8") if enabled else None
+
+def open_up_stream(outdir, flush_every=0, ndjson=None):
+    return EdgeStream(os.path.join(outdir, "edges_up.csv"),
+                      ["src_university","dst_person","relation","year"], flush_every, ndjson)
+
+def save_checkpoint(outdir, persons, universities, n_up, n_shared=0, n_same_grad=0):
     ck = {
         "persons": len(persons),
         "universities": len(universities),
-        "edges_up": len(edges_up),
-        "edges_shared": len(edges_shared),
-        "edges_same_grad": len(edges_same_grad)
+        "edges_up": n_up,
+        "edges_shared": n_shared,
+        "edges_same_grad": n_same_grad
     }
     with open(os.path.join(outdir, "_bfs_checkpoint.json"), "w", encoding="utf-8") as f:
         json.dump(ck, f, ensure_ascii=False, indent=2)
@@ -301,7 +294,7 @@ def process_title(title, depth, http_timeout, sleep):
         "expand_links": []         # list link để mở rộng
     }
     try:
-        if looks_like_system(title) or looks_like_date_or_year(title):
+        if is_skippable(title):
             return result
 
         html, _ = safe_fetch_html(title, sleep=sleep, http_timeout=http_timeout)
@@ -360,6 +353,125 @@ def process_title(title, depth, http_timeout, sleep):
     except Exception:
         return result
 
+# ===========================
+# ------ Finalize outputs ----
+# ===========================
+def finalize_outputs(outdir, alumni_persons, seeds_set, roots_persons, roots_unis,
+                     universities, edu_map, up_stream, person_depth, depth_stats,
+                     flush_every=0, ndjson=None, same_grad_pairs=False):
+    """
+    Hậu xử lý sau BFS (dùng chung cho BFS đơn tiến trình và merge của crawl_cluster):
+    bổ sung edu_map từ edu_edges.csv, sinh SHARED_UNI (+ SAME_GRAD_YEAR nếu same_grad_pairs) và ghi toàn bộ
+    file đầu ra. Cạnh cặp được sinh và ghi stream (không giữ list cạnh trong RAM); up_stream được đóng tại đây.
+    SAME_GRAD_YEAR là O(n²) theo số người mỗi năm và trùng thông tin với cột year của edges_up (KnowledgeGraph
+    trả lời "tốt nghiệp cùng năm / trong khoảng năm" bằng chỉ mục năm) nên mặc định chỉ ghi header.
+    Trả về (persons_out, universities, n_shared, n_same_grad).
+    """
+    # ===== AUGMENT edu_map từ Step 2 (edu_edges.csv) để root-person/seeds cũng có học vấn =====
+    ee_fp = os.path.join(outdir, "edu_edges.csv")
+    if os.path.exists(ee_fp):
+        with open(ee_fp, "r", encoding="utf-8") as f:
+            rdr = csv.DictReader(f)
+            for r in rdr:
+                if (r.get("relation") or "").strip().upper() != "ALUMNI_OF":
+                    continue
+                u = (r.get("src_university") or "").strip()
+                p = (r.get("dst_person") or "").strip()
+                y = (r.get("year") or "").strip()
+                if not p or not u:
+                    continue
+                try:
+                    y_val = int(y) if y and y.isdigit() else None
+                except Exception:
+                    y_val = None
+                edu_map[p].append((u, y_val))
+                universities.add(u)
+
+    # ===== Chỉ mục ngược từ edu_map (O(persons), không phụ thuộc số cạnh) =====
+    inv_unis = defaultdict(set)       # uni -> set(person)
+    inv_grad_year = defaultdict(set)  # year -> set(person)
+    uni_sets, year_sets = {}, {}
+    for p, pairs in edu_map.items():
+        uni_sets[p] = set(u for u,_ in pairs)
+        year_sets[p] = set(y for _,y in pairs if y is not None)
+        for u in uni_sets[p]:
+            inv_unis[u].add(p)
+        for y in year_sets[p]:
+            inv_grad_year[y].add(p)
+
+    up_stream.close()
+
+    # shared_uni: 1 dòng cho mỗi (cặp, trường chung) như trước, count = số trường chung
+    shared = EdgeStream(os.path.join(outdir, "edges_shared.csv"),
+                        ["src_person","dst_person","relation","count"], flush_every, ndjson)
+    for uni, plist in inv_unis.items():
+        plist = sorted(plist)
+        n = len(plist)
+        for i in range(n):
+            a = plist[i]
+            for j in range(i+1, n):
+                b = plist[j]
+                shared.write((a, b, "SHARED_UNI", len(uni_sets[a] & uni_sets[b])))
+    shared.close()
+
+    # same_grad_year (tuỳ chọn, xem docstring)
+    same_grad = EdgeStream(os.path.join(outdir, "edges_same_grad.csv"),
+                           ["src_person","dst_person","relation","year"], flush_every, ndjson)
+    for y, plist in (inv_grad_year.items() if same_grad_pairs else ()):
+        plist = sorted(plist)
+        n = len(plist)
+        for i in range(n):
+            for j in range(i+1, n):
+                same_grad.write((plist[i], plist[j], "SAME_GRAD_YEAR", y))
+    same_grad.close()
+    if ndjson is not None:
+        ndjson.close()
+
+    # ===== Ghi file =====
+    # persons_out = alumni + seeds + root-person (đúng depth 0/1)
+    persons_out = set(alumni_persons) | set(seeds_set) | set(roots_persons)
+    universities |= set(roots_unis)
+
+    write_nodes_people(persons_out, os.path.join(outdir, "nodes_persons.csv"))
+    write_nodes_unis(universities, os.path.join(outdir, "nodes_universities.csv"))
+
+    # graph.json: manifest gọn (đếm + tên file), không nhúng danh sách cạnh
+    graph = {
+        "format": "manifest",
+        "files": {
+            "persons": "nodes_persons.csv",
+            "universities": "nodes_universities.csv",
+            "edges_up": "edges_up.csv",
+            "edges_shared": "edges_shared.csv",
+            "edges_same_grad": "edges_same_grad.csv",
+            "edges_ndjson": EDGES_NDJSON if ndjson is not None else None,
+        },
+        "counts": {
+            "persons": len(persons_out),
+            "universities": len(universities),
+            "edges_up": up_stream.count,
+            "edges_shared": shared.count,
+            "edges_same_grad": same_grad.count,
+        },
+        "depth_stats": dict(sorted(depth_stats.items()))
+    }
+    with open(os.path.join(outdir, "graph.json"), "w", encoding="utf-8") as f:
+        json.dump(graph, f, ensure_ascii=False, indent=2)
+
+    # nodes_people_detail.json dạng gọn: người/trường tham chiếu bằng id, clique same_* lưu theo nhóm
+    def depth_of(p):
+        # depth: root-person =0; seed=1; còn lại lấy từ BFS
+        if p in roots_persons:
+            return 0
+        if p in seeds_set:
+            return 1
+        return person_depth.get(p)
+
+    write_people_detail(os.path.join(outdir, "nodes_people_detail.json"),
+                        build_compact(persons_out, universities, edu_map, depth_of, inv_unis, inv_grad_year))
+
+    return persons_out, universities, shared.count, same_grad.count
+
 # ===========================
 # ---------- Main -----------
 # ===========================
@@ -382,7 +494,12 @@ def main():
                     help="Giới hạn số liên kết lấy từ mỗi trang TRƯỜNG khi expand")
     ap.add_argument("--progress-every", type=int, default=100)
     ap.add_argument("--checkpoint-every", type=int, default=0)
-    ap.add_argument("--flush-every", type=int, default=0)
+    ap.add_argument("--flush-every", type=int, default=0,
+                    help="Flush file cạnh xuống đĩa sau mỗi N dòng (0 = chỉ flush ở checkpoint/cuối)")
+    ap.add_argument("--edges-ndjson", action="store_true",
+                    help=f"Ghi thêm mọi cạnh vào {EDGES_NDJSON} (mỗi dòng 1 JSON object)")
+    ap.add_argument("--same-grad-pairs", action="store_true",
+                    help="Sinh cặp SAME_GRAD_YEAR vào edges_same_grad.csv như cũ (O(n²) mỗi năm; mặc định chỉ header)")
 
     # tốc độ & song song
     ap.add_argument("--workers", type=int, default=8, help="Số luồng song song (khuyến nghị 8–16)")
@@ -394,6 +511,9 @@ def main():
 
     args = ap.parse_args()
     os.makedirs(args.outdir, exist_ok=True)
+    MERGE_MAP.update(load_merge_map(os.path.join(args.outdir, MERGE_MAP_FILE)))
+    if MERGE_MAP:
+        print(f"[i] Merge map: {len(MERGE_MAP)} alias → tên chuẩn")
 
     # đọc config
     with open(args.config, "r", encoding="utf-8") as f:
@@ -425,9 +545,9 @@ def main():
     universities     = set()
     edu_map          = defaultdict(list)    # person -> list[(university, year)]
 
-    edges_up         = []                   # (uni, person, "ALUMNI_OF", year)
-    edges_shared     = []                   # (p1, p2, "SHARED_UNI", count)
-    edges_same_grad  = []                   # (p1, p2, "SAME_GRAD_YEAR", year)
+    # cạnh UNI -> PERSON được ghi stream ngay khi node được chấp nhận
+    ndjson           = open_ndjson(args.outdir, args.edges_ndjson)
+    up_stream        = open_up_stream(args.outdir, args.flush_every, ndjson)
 
     person_depth     = {}                   # depth theo BFS
     stats            = defaultdict(int)
@@ -473,7 +593,7 @@ def main():
                 links = extract_page_links(sp)[:args.uni_candidate_cap]
                 take = 0
                 for lk in links:
-                    if looks_like_system(lk) or looks_like_date_or_year(lk):
+                    if is_skippable(lk):
                         continue
                     lk_norm = normalize(lk)
                     if lk_norm in visited:
@@ -529,7 +649,7 @@ def main():
                 futures = [ex.submit(process_title, t, d, args.http_timeout, sleep) for (t, d) in batch]
                 for fut in as_completed(futures):
                     res = fut.result()
-                    title = res["title"]
+                    title = MERGE_MAP.get(res["title"], res["title"])
                     depth = res["depth"]
 
                     # alumni node?
@@ -541,7 +661,7 @@ def main():
                         for u, year in res["edu_clean"]:
                             universities.add(u)
                             edu_map[title].append((u, year))
-                            edges_up.append((u, title, "ALUMNI_OF", year if year is not None else ""))
+                            up_stream.write((u, title, "ALUMNI_OF", year if year is not None else ""))
 
                         if HAS_TQDM:
                             progress_bar.update(1)
@@ -551,7 +671,7 @@ def main():
                     if depth < max_depth and res["expand_links"]:
                         added = 0
                         for lk in res["expand_links"][:candidate_cap]:
-                            if looks_like_system(lk) or looks_like_date_or_year(lk):
+                            if is_skippable(lk):
                                 continue
                             lk_norm = normalize(lk)
                             with LOCK:
@@ -564,147 +684,20 @@ def main():
                                 break
 
             if args.checkpoint_every > 0 and processed > 0 and (processed % args.checkpoint_every == 0):
-                save_checkpoint(args.outdir, alumni_persons, universities, edges_up, edges_shared, edges_same_grad)
+                up_stream.flush()
+                save_checkpoint(args.outdir, alumni_persons, universities, up_stream.count)
 
             if not HAS_TQDM and (processed % max(1, args.progress_every) == 0):
-                print(f"[BFS] alumni={len(alumni_persons)} depth={current_depth} | UP={len(edges_up)}", flush=True)
+                print(f"[BFS] alumni={len(alumni_persons)} depth={current_depth} | UP={up_stream.count}", flush=True)
 
         # xong toàn bộ depth hiện tại → sang depth kế tiếp
         current_depth += 1
 
-    # ===== AUGMENT edu_map từ Step 2 (edu_edges.csv) để root-person/seeds cũng có học vấn =====
-    ee_fp = os.path.join(args.outdir, "edu_edges.csv")
-    if os.path.exists(ee_fp):
-        with open(ee_fp, "r", encoding="utf-8") as f:
-            rdr = csv.DictReader(f)
-            for r in rdr:
-                if (r.get("relation") or "").strip().upper() != "ALUMNI_OF":
-                    continue
-                u = (r.get("src_university") or "").strip()
-                p = (r.get("dst_person") or "").strip()
-                y = (r.get("year") or "").strip()
-                if not p or not u:
-                    continue
-                try:
-                    y_val = int(y) if y and y.isdigit() else None
-                except Exception:
-                    y_val = None
-                edu_map[p].append((u, y_val))
-                universities.add(u)
-
-    # ===== Hậu xử lý edges_shared / same_grad chỉ dựa vào edu_map =====
-    inv_unis = defaultdict(set)       # uni -> set(person)
-    inv_grad_year = defaultdict(set)  # year -> set(person)
-    for p, pairs in edu_map.items():
-        yrs = set()
-        for u,y in pairs:
-            inv_unis[u].add(p)
-            if y is not None:
-                yrs.add(y)
-        for y in yrs:
-            inv_grad_year[y].add(p)
-
-    # shared_uni
-    seen_pairs = set()
-    for uni, plist in inv_unis.items():
-        plist = list(plist)
-        n = len(plist)
-        for i in range(n):
-            for j in range(i+1, n):
-                a, b = sorted((plist[i], plist[j]))
-                key = (a,b,uni)
-                if key in seen_pairs:
-                    continue
-                seen_pairs.add(key)
-                set_a = set(u for u,_ in edu_map[a])
-                set_b = set(u for u,_ in edu_map[b])
-                cnt = len(set_a & set_b)
-                if cnt > 0:
-                    edges_shared.append((a,b,"SHARED_UNI",cnt))
-
-    # same_grad_year
-    seen_year_pairs = set()
-    for y, plist in inv_grad_year.items():
-        plist = list(plist)
-        n = len(plist)
-        for i in range(n):
-            for j in range(i+1, n):
-                a, b = sorted((plist[i], plist[j]))
-                key = (a,b,y)
-                if key in seen_year_pairs:
-                    continue
-                seen_year_pairs.add(key)
-                edges_same_grad.append((a,b,"SAME_GRAD_YEAR",y))
-
-    # ===== Ghi file =====
-    # persons_out = alumni + seeds + root-person (đúng depth 0/1)
-    persons_out = set(alumni_persons) | set(seeds_set) | set(roots_persons)
-    universities |= set(roots_unis)
-
-    write_nodes_people(persons_out, os.path.join(args.outdir, "nodes_persons.csv"))
-    write_nodes_unis(universities, os.path.join(args.outdir, "nodes_universities.csv"))
-
-    write_edges(os.path.join(args.outdir, "edges_up.csv"),
-                ["src_university","dst_person","relation","year"], edges_up)
-    write_edges(os.path.join(args.outdir, "edges_shared.csv"),
-                ["src_person","dst_person","relation","count"], edges_shared)
-    write_edges(os.path.join(args.outdir, "edges_same_grad.csv"),
-                ["src_person","dst_person","relation","year"], edges_same_grad)
-
-    # graph.json (thông tin tóm tắt)
-    graph = {
-        "persons": sorted(list(persons_out)),
-        "universities": sorted(list(universities)),
-        "edges_up": edges_up,
-        "edges_shared": edges_shared,
-        "edges_same_grad": edges_same_grad,
-        "depth_stats": dict(sorted(depth_stats.items()))
-    }
-    with open(os.path.join(args.outdir, "graph.json"), "w", encoding="utf-8") as f:
-        json.dump(graph, f, ensure_ascii=False, indent=2)
-
-    # nodes_people_detail.json (depth + học vấn + quan hệ)
-    same_uni_map = defaultdict(set)
-    for a,b,rel,cnt in edges_shared:
-        if rel == "SHARED_UNI":
-            same_uni_map[a].add(b)
-            same_uni_map[b].add(a)
-
-    same_year_map = defaultdict(set)
-    for a,b,rel,y in edges_same_grad:
-        if rel == "SAME_GRAD_YEAR":
-            same_year_map[a].add(b)
-            same_year_map[b].add(a)
-
-    person_json = []
-    for p in sorted(persons_out):
-        # depth: root-person =0; seed=1; còn lại lấy từ BFS
-        if p in roots_persons:
-            d = 0
-        elif p in seeds_set:
-            d = 1
-        else:
-            d = person_depth.get(p)
-
-        hv = [{"trường": u, "năm": y} for (u,y) in edu_map.get(p, [])]
-        base = {
-            "depth": d,
-            "name": p,
-            "link": to_wiki_url(p),
-            "Học vấn": hv,
-        }
-        rels = []
-        for q in sorted(same_uni_map.get(p, [])):
-            rels.append({"person_title": q, "person_link": to_wiki_url(q), "type": "same_university"})
-        for q in sorted(same_year_map.get(p, [])):
-            rels.append({"person_title": q, "person_link": to_wiki_url(q), "type": "same_grad_year"})
-        base["relations"] = rels
-        base["same_university_persons"] = [to_wiki_url(q) for q in sorted(same_uni_map.get(p, []))]
-        base["same_grad_year_persons"]  = [to_wiki_url(q) for q in sorted(same_year_map.get(p, []))]
-        person_json.append(base)
-
-    with open(os.path.join(args.outdir, "nodes_people_detail.json"), "w", encoding="utf-8") as f:
-        json.dump(person_json, f, ensure_ascii=False, indent=2)
+    persons_out, universities, n_shared, n_same_grad = finalize_outputs(
+        args.outdir, alumni_persons, seeds_set, roots_persons, roots_unis,
+        universities, edu_map, up_stream, person_depth, depth_stats,
+        flush_every=args.flush_every, ndjson=ndjson, same_grad_pairs=args.same_grad_pairs
+    )
 
     if HAS_TQDM and progress_bar is not None:
         try:
@@ -713,7 +706,7 @@ def main():
             pass
 
     print(f"✅ BFS done. Persons(out)={len(persons_out)} | Alumni={len(alumni_persons)} | Universities={len(universities)}")
-    print(f"   UP={len(edges_up)} | Shared={len(edges_shared)} | SameGrad={len(edges_same_grad)}")
+    print(f"   UP={up_stream.count} | Shared={n_shared} | SameGrad={n_same_grad}")
     print(f"ℹ️ Depth stats: {dict(sorted(depth_stats.items()))}")
     print(f"ℹ️ Counters: {dict(stats)}")
 
@@ -1,8 +1,10 @@
 # -*- coding: utf-8 -*-
 """
 Step 4 — Enrich (include roots) + Node Details export
-- Node details (merged persons + universities) → node_details.csv / node_details.json
+- Node details (merged persons + universities) → node_details.csv / node_details.ndjson (+ node_details.idx.json,
+  node_details.sqlite cho chatbot)
   Fields: title, type, link, related, properties
+  (node_details.json dạng mảng JSON cũ chỉ ghi khi bật --legacy-json; đọc bằng node_details_store.py)
 - Edges (no LINKS_TO):
     1) Person -> Person : MENTIONS_PERSON
     2) Person -> Univ.  : MENTIONS_UNIVERSITY
@@ -20,6 +22,7 @@ from utils_wiki import (
     fetch_parse_html, soup_from_html, extract_page_links,
     extract_person_education, is_person_page, normalize
 )
+from node_details_store import write_node_details, write_node_details_sqlite
 
 try:
     from tqdm import tqdm
@@ -77,6 +80,23 @@ def load_roots(path, limit_persons=None, limit_unis=None):
     if limit_unis:    unis    = unis[:limit_unis]
     return persons, unis
 
+def load_crawl_targets(odir, persons_csv, universities_csv, roots_csv):
+    """nodes_persons/nodes_universities + root_nodes → (persons_all, unis_all), giữ thứ tự, bỏ trùng."""
+    persons_nodes = load_titles_from_csv(os.path.join(odir, persons_csv), "title")
+    unis_nodes    = load_titles_from_csv(os.path.join(odir, universities_csv), "title")
+    roots_p, roots_u = load_roots(os.path.join(odir, roots_csv))
+
+    persons_all = []
+    persons_all.extend(persons_nodes)
+    persons_all.extend(roots_p)
+    seen = set(); persons_all = [x for x in persons_all if not (x in seen or seen.add(x))]
+
+    unis_all = []
+    unis_all.extend(unis_nodes)
+    unis_all.extend(roots_u)
+    seen = set(); unis_all = [x for x in unis_all if not (x in seen or seen.add(x))]
+    return persons_all, unis_all
+
 def dedupe_norm(rows):
     seen, out = set(), []
     for r in rows:
@@ -203,119 +223,61 @@ def worker_university(seed_title, people_norm, uni_norm, sleep, http_timeout):
     except Exception:
         return out
 
-# ---------- main ----------
-def main():
-    ap = argparse.ArgumentParser(description="Step 4 — Re-crawl to add edges, node details (include roots).")
-    ap.add_argument("--outdir", default="graph_out")
-    ap.add_argument("--workers", type=int, default=12)
-    ap.add_argument("--http-timeout", type=float, default=6.0)
-    ap.add_argument("--sleep", type=float, default=0.06)
-
-    ap.add_argument("--limit-persons", type=int, default=None)
-    ap.add_argument("--limit-universities", type=int, default=None)
-
-    ap.add_argument("--persons-csv", default="nodes_persons.csv")
-    ap.add_argument("--universities-csv", default="nodes_universities.csv")
-    ap.add_argument("--roots-csv", default="root_nodes.csv")
-    args = ap.parse_args()
-
-    odir = args.outdir
-    os.makedirs(odir, exist_ok=True)
-
-    # 1) Load nodes + roots
-    persons_nodes = load_titles_from_csv(os.path.join(odir, args.persons_csv), "title")
-    unis_nodes    = load_titles_from_csv(os.path.join(odir, args.universities_csv), "title")
-    roots_p, roots_u = load_roots(os.path.join(odir, args.roots_csv))
-
-    persons_all = []
-    persons_all.extend(persons_nodes)
-    persons_all.extend(roots_p)
-    seen = set(); persons_all = [x for x in persons_all if not (x in seen or seen.add(x))]
-
-    unis_all = []
-    unis_all.extend(unis_nodes)
-    unis_all.extend(roots_u)
-    seen = set(); unis_all = [x for x in unis_all if not (x in seen or seen.add(x))]
-
-    if args.limit_persons:      persons_all = persons_all[:args.limit_persons]
-    if args.limit_universities: unis_all    = unis_all[:args.limit_universities]
-
-    print(f"Persons to crawl     : {len(persons_all)}")
-    print(f"Universities to crawl: {len(unis_all)}")
-
-    # seed normalization (before canonical titles)
-    people_norm_seed = {normalize(t) for t in persons_all}
-    uni_norm_seed    = {normalize(t) for t in unis_all}
-
-    # Edge buckets (NO LINKS_TO)
-    mentions_pp, mentions_pu = [], []
-    uni_mentions_p, uni_mentions_u = [], []
-    alumni_pu = []
-    person_props, uni_props = [], []
-
-    # Node details (we build later after we know per-node related)
-    node_details_tmp = []  # list of dicts, then we merge
-
-    # 2) crawl persons
-    print("🧭 Crawling PERSON pages…")
-    with ThreadPoolExecutor(max_workers=max(1, int(args.workers))) as ex:
-        futs = {ex.submit(worker_person, p, people_norm_seed, uni_norm_seed, args.sleep, args.http_timeout): p
-                for p in persons_all}
-        for fut in as_completed(futs):
-            try:
-                r = fut.result()
-            except Exception:
-                continue
-            t_final = r.get("title_final")
-            # edges
-            mentions_pp.extend(r.get("mentions_pp", []))
-            mentions_pu.extend(r.get("mentions_pu", []))
-            alumni_pu.extend(r.get("alumni_pu", []))
-            # props
-            infobox_json = r.get("infobox_json", "{}")
-            person_props.append((t_final, infobox_json))
-            # node details (person)
-            node_details_tmp.append({
-                "title": t_final,
-                "type": "person",
-                "link": wiki_link(t_final),
-                "related": r.get("anchors_intersect", []),
-                "properties": json.loads(infobox_json) if infobox_json else {}
-            })
+# ---------- aggregation ----------
+def new_buckets():
+    # Edge buckets (NO LINKS_TO) + props + node details (we build later after we know per-node related)
+    return {
+        "mentions_pp": [], "mentions_pu": [],
+        "uni_mentions_p": [], "uni_mentions_u": [],
+        "alumni_pu": [],
+        "person_props": [], "uni_props": [],
+        "node_details": [],
+    }
 
-    # canonical sets after person crawl
-    people_norm = {normalize(t) for (t, _) in person_props}
-
-    # 3) crawl universities
-    print("🏛️ Crawling UNIVERSITY pages…")
-    with ThreadPoolExecutor(max_workers=max(1, int(args.workers))) as ex:
-        futs = {ex.submit(worker_university, u, people_norm, uni_norm_seed, args.sleep, args.http_timeout): u
-                for u in unis_all}
-        for fut in as_completed(futs):
-            try:
-                r = fut.result()
-            except Exception:
-                continue
-            t_final = r.get("title_final")
-            uni_mentions_p.extend(r.get("uni_mentions_p", []))
-            uni_mentions_u.extend(r.get("uni_mentions_u", []))   # NEW
-            infobox_json = r.get("infobox_json", "{}")
-            uni_props.append((t_final, infobox_json))
-            # node details (university)
-            node_details_tmp.append({
-                "title": t_final,
-                "type": "university",
-                "link": wiki_link(t_final),
-                "related": r.get("anchors_intersect", []),
-                "properties": json.loads(infobox_json) if infobox_json else {}
-            })
+def add_person_result(b, r):
+    t_final = r.get("title_final")
+    # edges
+    b["mentions_pp"].extend(r.get("mentions_pp", []))
+    b["mentions_pu"].extend(r.get("mentions_pu", []))
+    b["alumni_pu"].extend(r.get("alumni_pu", []))
+    # props
+    infobox_json = r.get("infobox_json", "{}")
+    b["person_props"].append((t_final, infobox_json))
+    # node details (person)
+    b["node_details"].append({
+        "title": t_final,
+        "type": "person",
+        "link": wiki_link(t_final),
+        "related": r.get("anchors_intersect", []),
+        "properties": json.loads(infobox_json) if infobox_json else {}
+    })
+
+def add_university_result(b, r):
+    t_final = r.get("title_final")
+    b["uni_mentions_p"].extend(r.get("uni_mentions_p", []))
+    b["uni_mentions_u"].extend(r.get("uni_mentions_u", []))   # NEW
+    infobox_json = r.get("infobox_json", "{}")
+    b["uni_props"].append((t_final, infobox_json))
+    # node details (university)
+    b["node_details"].append({
+        "title": t_final,
+        "type": "university",
+        "link": wiki_link(t_final),
+        "related": r.get("anchors_intersect", []),
+        "properties": json.loads(infobox_json) if infobox_json else {}
+    })
+
+def finalize_outputs(odir, b, legacy_json=False):
+    """Dedupe + SHARED_UNI + ghi toàn bộ file Step 4 (dùng chung với merge của crawl_cluster). Trả về summary."""
+    person_props, uni_props = b["person_props"], b["uni_props"]
+    node_details_tmp = b["node_details"]
 
     # 4) dedupe edges
-    mentions_pp     = dedupe_norm(mentions_pp)
-    mentions_pu     = dedupe_norm(mentions_pu)
-    uni_mentions_p  = dedupe_norm(uni_mentions_p)
-    uni_mentions_u  = dedupe_norm(uni_mentions_u)  # NEW
-    alumni_pu       = dedupe_norm(alumni_pu)
+    mentions_pp     = dedupe_norm(b["mentions_pp"])
+    mentions_pu     = dedupe_norm(b["mentions_pu"])
+    uni_mentions_p  = dedupe_norm(b["uni_mentions_p"])
+    uni_mentions_u  = dedupe_norm(b["uni_mentions_u"])  # NEW
+    alumni_pu       = dedupe_norm(b["alumni_pu"])
 
     # 5) SHARED_UNI
     edu_map = defaultdict(set)  # person -> set(unis)
@@ -369,8 +331,14 @@ def main():
               ["title","type","link","related","properties"],
               nd_csv_rows)
 
-    with open(os.path.join(odir, "node_details.json"), "w", encoding="utf-8") as f:
-        json.dump(node_details_tmp, f, ensure_ascii=False, indent=2)
+    # NDJSON gọn + chỉ mục title → offset (đọc stream / seek 1 title, không cần nạp cả file)
+    write_node_details(os.path.join(odir, "node_details.ndjson"), node_details_tmp)
+    # Kho SQLite có chỉ mục title / title chuẩn hoá cho chatbot (tra lười, không nạp cả file)
+    write_node_details_sqlite(os.path.join(odir, "node_details.sqlite"), node_details_tmp,
+                              source=os.path.join(odir, "node_details.ndjson"))
+    if legacy_json:
+        with open(os.path.join(odir, "node_details.json"), "w", encoding="utf-8") as f:
+            json.dump(node_details_tmp, f, ensure_ascii=False, indent=2)
 
     summary = {
         "persons_crawled": len(person_props),
@@ -388,6 +356,73 @@ def main():
     with open(os.path.join(odir, "step4_summary.json"), "w", encoding="utf-8") as f:
         json.dump(summary, f, ensure_ascii=False, indent=2)
 
+    return summary
+
+# ---------- main ----------
+def main():
+    ap = argparse.ArgumentParser(description="Step 4 — Re-crawl to add edges, node details (include roots).")
+    ap.add_argument("--outdir", default="graph_out")
+    ap.add_argument("--workers", type=int, default=12)
+    ap.add_argument("--http-timeout", type=float, default=6.0)
+    ap.add_argument("--sleep", type=float, default=0.06)
+
+    ap.add_argument("--limit-persons", type=int, default=None)
+    ap.add_argument("--limit-universities", type=int, default=None)
+
+    ap.add_argument("--persons-csv", default="nodes_persons.csv")
+    ap.add_argument("--universities-csv", default="nodes_universities.csv")
+    ap.add_argument("--roots-csv", default="root_nodes.csv")
+    ap.add_argument("--legacy-json", action="store_true",
+                    help="Ghi thêm node_details.json (mảng JSON indent=2) cho công cụ cũ")
+    args = ap.parse_args()
+
+    odir = args.outdir
+    os.makedirs(odir, exist_ok=True)
+
+    # 1) Load nodes + roots
+    persons_all, unis_all = load_crawl_targets(odir, args.persons_csv, args.universities_csv, args.roots_csv)
+
+    if args.limit_persons:      persons_all = persons_all[:args.limit_persons]
+    if args.limit_universities: unis_all    = unis_all[:args.limit_universities]
+
+    print(f"Persons to crawl     : {len(persons_all)}")
+    print(f"Universities to crawl: {len(unis_all)}")
+
+    # seed normalization (before canonical titles)
+    people_norm_seed = {normalize(t) for t in persons_all}
+    uni_norm_seed    = {normalize(t) for t in unis_all}
+
+    buckets = new_buckets()
+
+    # 2) crawl persons
+    print("🧭 Crawling PERSON pages…")
+    with ThreadPoolExecutor(max_workers=max(1, int(args.workers))) as ex:
+        futs = {ex.submit(worker_person, p, people_norm_seed, uni_norm_seed, args.sleep, args.http_timeout): p
+                for p in persons_all}
+        for fut in as_completed(futs):
+            try:
+                r = fut.result()
+            except Exception:
+                continue
+            add_person_result(buckets, r)
+
+    # canonical sets after person crawl
+    people_norm = {normalize(t) for (t, _) in buckets["person_props"]}
+
+    # 3) crawl universities
+    print("🏛️ Crawling UNIVERSITY pages…")
+    with ThreadPoolExecutor(max_workers=max(1, int(args.workers))) as ex:
+        futs = {ex.submit(worker_university, u, people_norm, uni_norm_seed, args.sleep, args.http_timeout): u
+                for u in unis_all}
+        for fut in as_completed(futs):
+            try:
+                r = fut.result()
+            except Exception:
+                continue
+            add_university_result(buckets, r)
+
+    summary = finalize_outputs(odir, buckets, legacy_json=args.legacy_json)
+
     print("\n✅ STEP 4 DONE")
     for k,v in summary.items():
         print(f"  {k}: {v}")
@@ -1,9 +1,10 @@
 # -*- coding: utf-8 -*-
 """
 step5_clean.py — Dọn thư mục output, chỉ giữ whitelist để import Neo4j.
+File cho `neo4j-admin database import` (bulk, offline) do neo4j_export.py sinh từ đồ thị hợp nhất.
 """
 
-import os, argparse, shutil
+import os, argparse, shutil, fnmatch
 
 # === Danh sách file cần giữ lại ===
 KEEP_FILES = {
@@ -14,16 +15,32 @@ KEEP_FILES = {
     "edges_shared_uni_pp.csv",
     "edges_uni_mentions_p.csv",
     "edges_uni_mentions_u.csv",
-    # graph + node details
+    # graph + node details (graph.json là manifest → giữ các CSV mà nó trỏ tới)
     "graph.json",
+    "nodes_persons.csv",
+    "nodes_universities.csv",
+    "edges_up.csv",
+    "edges_shared.csv",
+    "edges_same_grad.csv",
+    "graph_edges.ndjson",
     "node_details.csv",
     "node_details.json",
+    "node_details.ndjson",
+    "node_details.idx.json",
+    "node_details.sqlite",
     # node props
     "nodes_persons_props.csv",
     "nodes_universities_props.csv",
+    # map alias → nút chuẩn (entity_resolution.py, có thể đã được duyệt tay) — create_unified_graph.py đọc lại
+    "entity_merge_map.csv",
 }
 
-def clean_keep_only(outdir: str, keep_files: set, dry_run: bool = False):
+# Mẫu tên file giữ lại (tên phụ thuộc tham số): cache incremental của data_enrichment_vi_v3.py --incremental
+KEEP_PATTERNS = (
+    "enrich_cache_*.json",
+)
+
+def clean_keep_only(outdir: str, keep_files: set, dry_run: bool = False, keep_patterns=KEEP_PATTERNS):
     removed, kept = [], []
     if not os.path.isdir(outdir):
         print(f"[Step5] Folder không tồn tại: {outdir}")
@@ -42,7 +59,7 @@ def clean_keep_only(outdir: str, keep_files: set, dry_run: bool = False):
         for f in files:
             full = os.path.join(root, f)
             rel = os.path.relpath(full, outdir).replace("\\", "/")
-            if rel in keep_files:
+            if rel in keep_files or any(fnmatch.fnmatchcase(rel, p) for p in keep_patterns):
                 kept.append(rel)
             else:
                 if dry_run:
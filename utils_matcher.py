@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+utils_matcher.py — Automaton Aho-Corasick đa mẫu, quét văn bản một lượt
+
+- AhoCorasick(patterns)        : patterns = iterable (chuỗi mẫu, payload); trùng mẫu → nhiều payload
+- .finditer(text)              : duyệt (start, end, payload) cho MỌI lần xuất hiện (kể cả chồng lấn)
+- is_word_boundary(text, i)    : đúng ngữ nghĩa `\\b` của module re (Unicode: isalnum() hoặc '_')
+
+Dùng cho trích xuất từ điển (quốc gia / tỉnh / nghề nghiệp) trong data_enrichment_vi_v3.py thay cho
+vòng lặp re.search theo từng mục từ điển.
+"""
+from collections import deque
+
+def _is_word(ch):
+    return ch.isalnum() or ch == "_"
+
+def is_word_boundary(text, i):
+    """Tương đương `\\b` của re tại vị trí i."""
+    before = i > 0 and _is_word(text[i - 1])
+    after = i < len(text) and _is_word(text[i])
+    return before != after
+
+class AhoCorasick:
+    """Trie + liên kết fail; output của mỗi trạng thái đã gộp sẵn theo chuỗi fail."""
+
+    def __init__(self, patterns):
+        self.goto = [{}]
+        self.out = [[]]
+        for pattern, payload in patterns:
+            if not pattern:
+                continue
+            s = 0
+            for ch in pattern:
+                nxt = self.goto[s].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[s][ch] = nxt
+                    self.goto.append({})
+                    self.out.append([])
+                s = nxt
+            self.out[s].append((len(pattern), payload))
+
+        self.fail = [0] * len(self.goto)
+        queue = deque(self.goto[0].values())
+        while queue:
+            s = queue.popleft()
+            for ch, nxt in self.goto[s].items():
+                queue.append(nxt)
+                f = self.fail[s]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def __len__(self):
+        return len(self.goto)
+
+    def finditer(self, text):
+        goto, fail, out = self.goto, self.fail, self.out
+        s = 0
+        for i, ch in enumerate(text):
+            while s and ch not in goto[s]:
+                s = fail[s]
+            s = goto[s].get(ch, 0)
+            if out[s]:
+                end = i + 1
+                for length, payload in out[s]:
+                    yield end - length, end, payload
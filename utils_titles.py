@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+utils_titles.py — Bộ phân loại tiêu đề DÙNG CHUNG cho mọi bước (step2, step3, crawl_cluster,
+run_pipeline_clean, data_enrichment_vi_v3). Mọi luật heuristic về tiêu đề nằm ở đây:
+
+- is_system(title)             : trang hệ thống / namespace (Thể loại:, Danh sách ..., có ':')
+- is_date_or_year(title)       : "1999", "2 tháng 9"
+- is_university(title)         : luật chặt (tiền tố / hậu tố / từ khoá), dùng khi lọc học vấn ở Step 3
+- is_university_keyword(title) : luật lỏng theo từ khoá (lower-case), dùng lọc node không rõ type ở data_enrichment
+- is_university_title(title)   : luật từ khoá của step2 (thêm "trường ", " viện ", "khoa ", school, faculty, ...),
+                                 dùng đoán loại root ở step2 (infobox của trang xác nhận thêm)
+- is_university_root(title)    : luật hẹp theo từ khoá (đại học / học viện / university / institute / college),
+                                 dùng đoán loại root ở run_pipeline_clean — không khớp "Trường Chinh",
+                                 "Khoa học máy tính"
+- classify(titles)             : phân loại theo lô → [TitleClass]
+
+Các luật được biên dịch thành vài regex alternation và kết quả được memo theo tiêu đề.
+"""
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+# =========================
+# ---- Rule definitions ----
+# =========================
+UNI_PREFIXES = (
+    "Đại học", "Trường", "Học viện", "Viện",                     # VI
+    "University", "College", "Institute", "Academy", "Faculty",  # EN
+    "School", "Law School", "Business School",
+    "École", "Universität", "Universidade", "Università", "Universidad", "Polytechnic"
+)
+
+UNI_SUFFIXES = (
+    "University", "College", "Institute", "Academy",
+    "School", "Law School", "Business School", "Faculty",
+    "Đại học", "Học viện", "Viện", "Trường", "Khoa"
+)
+
+UNI_WORDS = (
+    "University", "College", "Institute", "Academy", "École",
+    "Universit[aä]t", "Universidad", "Universidade", "Polytechnic"
+)
+
+# Từ khoá luật lỏng (so khớp chuỗi con trên tiêu đề lower-case) — lọc node không rõ type khi làm giàu dữ liệu
+UNIVERSITY_KEYWORDS = (
+    "dai hoc", "university", "truong dai hoc", "hoc vien", "college",
+    "institute", "academy", "school", "technical", "polytechnic",
+    "high school", "trung hoc", "secondary"
+)
+
+# Từ khoá đoán loại root của step2 (so khớp chuỗi con trên tiêu đề lower-case)
+UNIVERSITY_TITLE_KEYWORDS = (
+    "đại học", "học viện", "trường ", " viện ", "khoa ",
+    "university", "college", "institute", "academy", "faculty", "school", "law school", "business school"
+)
+
+# Từ khoá luật hẹp cho root: root sai type kéo theo cả nhánh crawl sai, nên chỉ nhận tên trường rõ ràng
+ROOT_UNIVERSITY_KEYWORDS = ("đại học", "university", "học viện", "institute", "college")
+
+DEGREE_KEYWORDS = frozenset({
+    "Cử nhân", "Cử nhân Nghệ thuật", "Cử nhân Khoa học",
+    "Bachelor", "Bachelor of Arts", "Bachelor of Science", "B.A.", "BA", "BSc", "B.Sc.",
+    "Master", "Thạc sĩ", "M.A.", "MA", "MSc", "M.Sc.",
+    "Doctor", "Tiến sĩ", "PhD", "Ph.D.", "JD", "LLB", "LLM",
+    "Alma mater"
+})
+
+NS_PREFIXES = ("Danh sách", "Thể loại", "Wikipedia", "Trợ giúp", "Bản mẫu", "Portal", "Chủ đề", "Tập tin", "File")
+
+def _alt(words, escape=True):
+    return "|".join(re.escape(w) if escape else w for w in words)
+
+# =========================
+# ---- Compiled rules ----
+# =========================
+NS_BLACKLIST = re.compile(rf"^(?:{_alt(NS_PREFIXES)})\b", re.I)
+SYSTEM_RE    = re.compile(rf":|^(?:{_alt(NS_PREFIXES)})\b", re.I)
+DATE_RE      = re.compile(r"\d{4}|\d{1,2}\s+tháng\s+\d{1,2}", re.I)
+UNI_AFFIX_RE = re.compile(rf"^(?:{_alt(UNI_PREFIXES)})|(?:{_alt(UNI_SUFFIXES)})$|Đại học")
+UNI_WORD_RE  = re.compile(rf"\b(?:{_alt(UNI_WORDS, escape=False)})\b", re.I)
+UNI_KW_RE    = re.compile(_alt(UNIVERSITY_KEYWORDS))
+UNI_TITLE_RE = re.compile(_alt(UNIVERSITY_TITLE_KEYWORDS))
+UNI_ROOT_RE  = re.compile(_alt(ROOT_UNIVERSITY_KEYWORDS))
+
+TitleClass = namedtuple("TitleClass", ["is_system", "is_date_or_year", "is_university", "is_university_keyword",
+                                       "is_university_title", "is_university_root"])
+
+_EMPTY = TitleClass(True, True, False, False, False, False)
+
+@lru_cache(maxsize=1 << 18)
+def _classify_one(title):
+    if not title:
+        return _EMPTY
+    t = title.strip()
+    if t in DEGREE_KEYWORDS:
+        uni = False
+    else:
+        uni = bool(UNI_AFFIX_RE.search(t) or UNI_WORD_RE.search(t))
+    lower = t.lower()
+    return TitleClass(
+        is_system=bool(SYSTEM_RE.search(title)),
+        is_date_or_year=bool(DATE_RE.fullmatch(title)),
+        is_university=uni,
+        is_university_keyword=bool(UNI_KW_RE.search(lower)),
+        is_university_title=bool(UNI_TITLE_RE.search(lower)),
+        is_university_root=bool(UNI_ROOT_RE.search(lower)),
+    )
+
+def classify_title(title):
+    return _classify_one(title or "")
+
+def classify(titles):
+    """Phân loại theo lô: [title] → [TitleClass] (cùng thứ tự)."""
+    return [_classify_one(t or "") for t in titles]
+
+def is_system(title):
+    return _classify_one(title or "").is_system
+
+def is_date_or_year(title):
+    return _classify_one(title or "").is_date_or_year
+
+def is_skippable(title):
+    """Link không đáng crawl: trang hệ thống hoặc ngày/năm."""
+    c = _classify_one(title or "")
+    return c.is_system or c.is_date_or_year
+
+def is_university(title):
+    return _classify_one(title or "").is_university
+
+def is_university_keyword(title):
+    return _classify_one(title or "").is_university_keyword
+
+def is_university_title(title):
+    return _classify_one(title or "").is_university_title
+
+def is_university_root(title):
+    return _classify_one(title or "").is_university_root
+
+def cache_info():
+    return _classify_one.cache_info()
@@ -5,6 +5,8 @@ from urllib.parse import quote
 
 WIKI_HOST = "https://vi.wikipedia.org"
 API_PARSE = WIKI_HOST + "/w/api.php?action=parse&page={title}&prop=text|links&format=json"
+API_URL = WIKI_HOST + "/w/api.php"
+CATEGORY_NS = "Thể loại:"
 UA = "UET-AlumniGraph/1.0"
 TIMEOUT = 10
 HEADERS = {"User-Agent": UA}
@@ -24,6 +26,31 @@ def fetch_parse_html(title, sleep=0.2):
     time.sleep(sleep)
     return html, links
 
+def fetch_category_members(category, sleep=0.2, limit=500):
+    """
+    Liệt kê thành viên 1 thể loại (list=categorymembers, cmlimit tối đa 500/lần, tự phân trang).
+    Trả về (pages, subcats, n_calls) — pages: bài viết ns=0, subcats: tiêu đề thể loại con.
+    """
+    cat = category if category.startswith(CATEGORY_NS) else CATEGORY_NS + category
+    params = {
+        "action": "query", "list": "categorymembers", "cmtitle": cat,
+        "cmtype": "page|subcat", "cmnamespace": "0|14", "cmlimit": limit,
+        "format": "json", "continue": ""
+    }
+    pages, subcats, n_calls = [], [], 0
+    while True:
+        r = requests.get(API_URL, params=params, headers=HEADERS, timeout=TIMEOUT)
+        r.raise_for_status()
+        data = r.json()
+        n_calls += 1
+        for m in data.get("query", {}).get("categorymembers", []):
+            (subcats if m.get("ns") == 14 else pages).append(m["title"])
+        time.sleep(sleep)
+        if "continue" not in data:
+            break
+        params.update(data["continue"])
+    return pages, subcats, n_calls
+
 def soup_from_html(html):
     return BeautifulSoup(html, "html.parser") if html else None
 
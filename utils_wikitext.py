@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+utils_wikitext.py — Trích xuất trực tiếp từ WIKITEXT (mwparserfromhell)
+Thay thế cho đường HTML/BeautifulSoup trong utils_wiki / step3 / step4:
+- fetch_parse_wikitext          ~ fetch_parse_html (payload nhỏ hơn nhiều)
+- is_person_wikitext            ~ is_person_page
+- extract_page_links_wikitext   ~ extract_page_links
+- extract_person_education_wikitext ~ extract_person_education  → [(university_title, year?)]
+- parse_infobox_wikitext        ~ parse_infobox_person / extract_infobox_json (dict nhãn → giá trị)
+"""
+import re, time, requests
+import mwparserfromhell
+from urllib.parse import quote
+
+from utils_wiki import WIKI_HOST, HEADERS, TIMEOUT, normalize
+
+API_PARSE_WIKITEXT = WIKI_HOST + "/w/api.php?action=parse&page={title}&prop=wikitext|links&format=json"
+
+YEAR_RE = re.compile(r"\b(?:19|20)\d{2}\b")
+INFOBOX_NAME_RE = re.compile(r"^\s*(thông tin|hộp thông tin|infobox)\b", re.I)
+
+# Tham số infobox (đã chuẩn hoá: lower, '_' → ' ') tương ứng EDU_KEYS của utils_wiki
+EDU_PARAMS = {
+    "alma mater", "học vấn", "giáo dục", "education", "trường", "trường học",
+    "trường theo học", "đào tạo", "cơ sở đào tạo", "tốt nghiệp"
+}
+BIRTH_PARAMS = {
+    "sinh", "ngày sinh", "nơi sinh", "năm sinh", "birth date", "birth place"
+}
+
+# Tham số → nhãn hiển thị (giống th của bảng infobox HTML) để dict thuộc tính khớp node_details
+PARAM_LABELS = {
+    "alma mater": "Alma mater", "học vấn": "Học vấn", "giáo dục": "Giáo dục", "education": "Giáo dục",
+    "trường": "Trường", "trường theo học": "Trường theo học", "đào tạo": "Đào tạo",
+    "sinh": "Sinh", "ngày sinh": "Sinh", "birth date": "Sinh", "nơi sinh": "Sinh", "birth place": "Sinh",
+    "mất": "Mất", "ngày mất": "Mất", "death date": "Mất", "nơi mất": "Mất", "death place": "Mất",
+    "quốc tịch": "Quốc tịch", "nationality": "Quốc tịch",
+    "nghề nghiệp": "Nghề nghiệp", "occupation": "Nghề nghiệp",
+    "đảng": "Đảng chính trị", "party": "Đảng chính trị",
+    "phối ngẫu": "Phối ngẫu", "spouse": "Phối ngẫu",
+    "con cái": "Con cái", "children": "Con cái",
+    "website": "Website", "chữ ký": "Chữ ký", "signature": "Chữ ký",
+    "tôn giáo": "Tôn giáo", "religion": "Tôn giáo",
+}
+
+def fetch_parse_wikitext(title, sleep=0.2, timeout=TIMEOUT):
+    url = API_PARSE_WIKITEXT.format(title=quote(title))
+    r = requests.get(url, headers=HEADERS, timeout=timeout)
+    r.raise_for_status()
+    data = r.json()
+    wt = data["parse"]["wikitext"].get("*") if "parse" in data and "wikitext" in data["parse"] else None
+    links = [lk["*"] for lk in data["parse"].get("links", []) if lk.get("exists")] if "parse" in data else []
+    time.sleep(sleep)
+    return wt, links
+
+def code_from_wikitext(wikitext):
+    return mwparserfromhell.parse(wikitext) if wikitext else None
+
+def _param_key(name):
+    return (normalize(str(name).replace("_", " ")) or "").lower()
+
+def _link_title(link):
+    # [[đại học Harvard|Harvard]] → "Đại học Harvard" (MediaWiki viết hoa ký tự đầu)
+    t = normalize(str(link.title).replace("_", " "))
+    if not t or ":" in t or t.startswith("#"):
+        return None
+    t = t.split("#", 1)[0].strip()
+    return (t[0].upper() + t[1:]) if t else None
+
+def find_infoboxes(code):
+    if code is None: return []
+    return [t for t in code.filter_templates(recursive=False) if INFOBOX_NAME_RE.match(str(t.name))]
+
+def is_person_wikitext(code):
+    for box in find_infoboxes(code):
+        for p in box.params:
+            if _param_key(p.name) in BIRTH_PARAMS and p.value.strip():
+                return True
+    return False
+
+def extract_page_links_wikitext(code):
+    out = []
+    if code is None: return out
+    seen = set()
+    for lk in code.filter_wikilinks():
+        title = _link_title(lk)
+        if title and title not in seen:
+            seen.add(title)
+            out.append(title)
+    return out
+
+def extract_person_education_wikitext(code):
+    # Return list of (university_title, year?) — cùng dạng với utils_wiki.extract_person_education
+    out = []
+    for box in find_infoboxes(code):
+        for p in box.params:
+            if _param_key(p.name) not in EDU_PARAMS:
+                continue
+            uni_titles = [_link_title(lk) for lk in p.value.filter_wikilinks()]
+            text = p.value.strip_code(keep_template_params=True)
+            years = YEAR_RE.findall(text)
+            year = int(years[0]) if years else None
+            for ut in uni_titles:
+                if ut:
+                    out.append((ut, year))
+    return out
+
+def _value_text(value):
+    text = value.strip_code(keep_template_params=True)
+    parts = [normalize(x) for x in re.split(r"\n+", text)]
+    parts = [x.lstrip("*#: ").strip() for x in parts if x]
+    parts = [x for x in parts if x]
+    if not parts: return None
+    return parts if len(parts) > 1 else parts[0]
+
+def parse_infobox_wikitext(code):
+    """Dict nhãn → giá trị (str | list) — tương đương parse_infobox_person / extract_infobox_json."""
+    out = {}
+    for box in find_infoboxes(code):
+        for p in box.params:
+            key = _param_key(p.name)
+            if not key or key.isdigit():
+                continue
+            val = _value_text(p.value)
+            if not val:
+                continue
+            label = PARAM_LABELS.get(key, normalize(str(p.name)))
+            if label in out and label == "Sinh":
+                # ngày sinh + nơi sinh gộp chung một hàng như HTML
+                prev = out[label] if isinstance(out[label], list) else [out[label]]
+                out[label] = prev + (val if isinstance(val, list) else [val])
+            else:
+                out.setdefault(label, val)
+    return out